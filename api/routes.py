@@ -13,6 +13,7 @@ from services.script_processor import ScriptProcessor
 from services.elevenlabs_service import ElevenLabsService
 from services.nca_service import NCAService
 from services.goapi_service import GoAPIService
+from utils.job_payload import job_payload_from_fields
 from utils.logger import APILogger
 
 logger = logging.getLogger(__name__)
@@ -522,16 +523,14 @@ def get_job_status(job_id):
         # (Related Video/Segment fields don't exist in current schema)
         if 'Request Payload' in fields:
             try:
-                import ast
-                payload = ast.literal_eval(fields['Request Payload'])
-                if isinstance(payload, dict):
-                    if 'video_id' in payload:
-                        response['video_id'] = payload['video_id']
-                        response['entity_type'] = 'video'
-                    if 'segment_id' in payload:
-                        response['segment_id'] = payload['segment_id']
-                        response['entity_type'] = 'segment'
-            except:
+                payload = job_payload_from_fields(fields)
+                if payload.video_id:
+                    response['video_id'] = payload.video_id
+                    response['entity_type'] = 'video'
+                if payload.segment_id:
+                    response['segment_id'] = payload.segment_id
+                    response['entity_type'] = 'segment'
+            except ValueError:
                 pass  # Ignore parsing errors
         
         # Add error details if failed
@@ -4,7 +4,10 @@ import logging
 import requests
 import base64
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from flask import Blueprint, jsonify, request
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -16,6 +19,12 @@ from services.script_processor import ScriptProcessor
 from services.elevenlabs_service import ElevenLabsService
 from services.nca_service import NCAService
 from services.goapi_service import GoAPIService
+from services.concat_planner import STRATEGY_NORMALIZE, submit_after_normalization
+from services.tts_cache import estimate_mp3_duration, get_tts_cache, normalize_tts_text, tts_cache_key
+from services.encoding_profiles import ENCODING_PROFILES, get_encoding_profile
+from services.zoom_renderer import ZOOM_MODES, build_zoom_payload, resolve_zoom_mode
+from utils.job_payload import encode_job_payload
+from utils.job_progress import summarize_progress
 
 logger = logging.getLogger(__name__)
 
@@ -41,14 +50,32 @@ class GenerateVoiceoverWebhookSchema(Schema):
     record_id = fields.String(required=True)
 
 
+class GenerateVoiceoversWebhookSchema(Schema):
+    """Schema for generating the voiceovers of every pending segment of a video."""
+    record_id = fields.String(required=True)
+    max_concurrency = fields.Integer(required=False, missing=None,
+                                     validate=lambda x: x > 0 if x is not None else True)
+    regenerate = fields.Boolean(required=False, missing=False)
+
+
 class CombineSegmentMediaWebhookSchema(Schema):
     """Schema for webhook-based combine segment media request."""
     record_id = fields.String(required=True)
 
 
+class CombineAllSegmentMediaWebhookSchema(Schema):
+    """Schema for combining the media of every segment of a video under one parent job."""
+    record_id = fields.String(required=True)
+    max_concurrency = fields.Integer(required=False, missing=None,
+                                     validate=lambda x: x > 0 if x is not None else True)
+    allow_partial = fields.Boolean(required=False, missing=False)
+
+
 class CombineAllSegmentsWebhookSchema(Schema):
     """Schema for webhook-based combine all segments request."""
     record_id = fields.String(required=True)
+    encoding_profile = fields.String(required=False, missing=None,
+                                     validate=lambda x: x in ENCODING_PROFILES if x is not None else True)
 
 
 class GenerateAndAddMusicWebhookSchema(Schema):
@@ -59,6 +86,8 @@ class GenerateAndAddMusicWebhookSchema(Schema):
 class AddMusicToVideoWebhookSchema(Schema):
     """Schema for webhook-based add music to video request."""
     record_id = fields.String(required=True)
+    encoding_profile = fields.String(required=False, missing=None,
+                                     validate=lambda x: x in ENCODING_PROFILES if x is not None else True)
 
 
 class GenerateAIImageWebhookSchema(Schema):
@@ -69,6 +98,14 @@ class GenerateAIImageWebhookSchema(Schema):
     # Note: quality parameter removed - gpt-image-1 produces high-fidelity output by default
 
 
+class GenerateAIImagePromptsWebhookSchema(Schema):
+    """Schema for webhook-based generate AI image prompts (whole video) request."""
+    record_id = fields.String(required=True)
+    batch_size = fields.Integer(required=False, missing=None,
+                                validate=lambda x: x >= 1 if x is not None else True)
+    regenerate = fields.Boolean(required=False, missing=False)
+
+
 class GenerateVideoWebhookSchema(Schema):
     """Schema for webhook-based generate video request."""
     segment_id = fields.String(required=True)
@@ -78,6 +115,10 @@ class GenerateVideoWebhookSchema(Schema):
                                 validate=lambda x: x in ['1:1', '16:9', 'auto'])
     quality = fields.String(required=False, missing='standard',
                            validate=lambda x: x in ['standard', 'high'])
+    zoom_mode = fields.String(required=False, missing=None,
+                              validate=lambda x: x in ZOOM_MODES if x is not None else True)
+    encoding_profile = fields.String(required=False, missing=None,
+                                     validate=lambda x: x in ENCODING_PROFILES if x is not None else True)
 
 
 @api_v2_bp.route('/process-script', methods=['POST'])
@@ -143,6 +184,105 @@ def process_script_webhook():
         return jsonify({'error': 'Failed to process script', 'details': str(e)}), 500
 
 
+def _lookup_float(value, default: float, low: float, high: float, name: str, record_id: str) -> float:
+    """Coerce a (possibly lookup-list) Airtable value to a float clamped to [low, high]."""
+    # Airtable lookup fields (like 'Speed (from Voices)') often return as a list.
+    if isinstance(value, list):
+        value = value[0] if value else None
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid {name} value '{value}' for {record_id}. Defaulting to {default}.")
+        number = default
+    if number < low or number > high:
+        clamped = min(max(number, low), high)
+        logger.warning(f"{name} {number} for {record_id} is outside [{low}, {high}]. Clamping to {clamped}.")
+        number = clamped
+    return number
+
+
+def _resolve_voice_settings(voice: Dict, segment_fields: Dict, voice_record_id: str) -> Dict:
+    """ElevenLabs synthesis arguments for a voice record (speed comes from the segment's lookup)."""
+    use_speaker_boost = voice['fields'].get('Speaker Boost (from Voices)', True)
+    if not isinstance(use_speaker_boost, bool):
+        logger.warning(f"Invalid 'Speaker Boost (from Voices)' value '{use_speaker_boost}' for voice {voice_record_id}. Defaulting to True.")
+        use_speaker_boost = True
+    return {
+        'voice_id': voice['fields'].get('Voice ID'),
+        'stability': voice['fields'].get('Stability', 0.5),
+        'similarity_boost': voice['fields'].get('Similarity Boost', 0.5),
+        # ElevenLabs accepts speeds in [0.7, 1.2]
+        'speed': _lookup_float(segment_fields.get('Speed (from Voices)', 1.0), 1.0, 0.7, 1.2,
+                               'Speed', voice_record_id),
+        'style_exaggeration': _lookup_float(voice['fields'].get('Style Exaggeration', 0.0), 0.0, 0.0, 1.0,
+                                            'Style Exaggeration', voice_record_id),
+        'use_speaker_boost': use_speaker_boost
+    }
+
+
+def _cached_voiceover(elevenlabs: ElevenLabsService, nca: NCAService, text: str, settings: Dict) -> Optional[Dict]:
+    """Stored voiceover for text synthesized with the same voice, model and settings, if any.
+
+    A hit is only reused if its file is still stored; entries whose file was
+    deleted are dropped so the text is synthesized again. If the check itself
+    fails, the entry is trusted.
+    """
+    cache = get_tts_cache(config)
+    if not cache:
+        return None
+    key = tts_cache_key(text, model_id=elevenlabs.model_id, **settings)
+    cached = cache.get(key)
+    if not cached:
+        return None
+    try:
+        exists = nca.stored_file_exists(cached['url'])
+    except Exception as e:
+        logger.warning(f"Could not confirm cached voiceover {cached['url']}, reusing it: {e}")
+        exists = True
+    if not exists:
+        logger.info(f"Cached voiceover {cached['url']} no longer exists, synthesizing again")
+        cache.invalidate(key)
+        return None
+    return {'url': cached['url'], 'duration': cached['duration'], 'cached': True}
+
+
+def _synthesize_voiceover(elevenlabs: ElevenLabsService, nca: NCAService, segment_id: str,
+                          text: str, settings: Dict) -> Dict:
+    """Synthesize text with ElevenLabs, store the MP3 and remember it in the TTS cache.
+
+    With ELEVENLABS_STREAMING the audio is piped from the streaming endpoint
+    into the S3 upload (and backup spool) as it arrives. Content hashing is
+    skipped there, since it would have to read the whole stream before uploading.
+    """
+    filename = f"voiceover_{segment_id}.mp3"
+    if config.ELEVENLABS_STREAMING:
+        with elevenlabs.stream_voice(text=text, **settings) as chunks:
+            upload_result = nca.upload_file(
+                file_data=chunks,
+                filename=filename,
+                content_type='audio/mpeg',
+                file_type='voiceovers',
+                content_hash=False
+            )
+        size = upload_result['size']
+    else:
+        result = elevenlabs.generate_voice_sync(text=text, **settings)
+        upload_result = nca.upload_file(
+            file_data=result['audio_data'],
+            filename=filename,
+            content_type='audio/mpeg',
+            file_type='voiceovers'
+        )
+        size = len(result['audio_data'])
+    duration = estimate_mp3_duration(size)
+
+    cache = get_tts_cache(config)
+    if cache:
+        cache.put(tts_cache_key(text, model_id=elevenlabs.model_id, **settings),
+                  upload_result['url'], duration, len(normalize_tts_text(text)))
+    return {'url': upload_result['url'], 'duration': duration, 'cached': False}
+
+
 @api_v2_bp.route('/generate-voiceover', methods=['POST'])
 @limiter.limit("20 per minute")
 def generate_voiceover_direct():
@@ -181,109 +321,26 @@ def generate_voiceover_direct():
         if not voice_id:
             return jsonify({'error': 'Voice ID field is empty in voice record'}), 400
         
-        # Get voice settings with defaults
-        stability = voice['fields'].get('Stability', 0.5)
-        similarity_boost = voice['fields'].get('Similarity Boost', 0.5) # Fetch from voice record
-        speed_value = segment['fields'].get('Speed (from Voices)', 1.0) # Fetch speed, default to 1.0
-        style_exaggeration_value = voice['fields'].get('Style Exaggeration', 0.0) # Fetch style exaggeration, default to 0.0
-        use_speaker_boost_value = voice['fields'].get('Speaker Boost (from Voices)', True) # Fetch speaker boost, default to True
-        
-        # Ensure speed is a float and within valid range for ElevenLabs (0.7-1.2)
-        # Airtable lookup fields (like 'Speed (from Voices)') often return as a list.
-        if isinstance(speed_value, list):
-            if len(speed_value) > 0:
-                try:
-                    speed = float(speed_value[0])
-                except (ValueError, TypeError):
-                    logger.warning(f"Invalid speed value in list '{speed_value[0]}' for segment {data['record_id']}. Defaulting to 1.0.")
-                    speed = 1.0
-            else: # Empty list
-                logger.warning(f"Empty speed value list for segment {data['record_id']}. Defaulting to 1.0.")
-                speed = 1.0
-        elif isinstance(speed_value, (float, int)):
-            speed = float(speed_value)
-        else: # Try to convert if it's a string or other type that might be valid
-            try:
-                speed = float(speed_value)
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid speed value '{speed_value}' (type: {type(speed_value)}) for segment {data['record_id']}. Defaulting to 1.0.")
-                speed = 1.0
-        
-        # Clamp speed to ElevenLabs valid range [0.7, 1.2]
-        if speed < 0.7:
-            logger.warning(f"Speed {speed} for segment {data['record_id']} is below 0.7. Clamping to 0.7.")
-            speed = 0.7
-        elif speed > 1.2:
-            logger.warning(f"Speed {speed} for segment {data['record_id']} is above 1.2. Clamping to 1.2.")
-            speed = 1.2
-
-        # Ensure style_exaggeration is a float and within valid range [0.0, 1.0]
-        if isinstance(style_exaggeration_value, list):
-            if len(style_exaggeration_value) > 0:
-                try:
-                    style_exaggeration = float(style_exaggeration_value[0])
-                except (ValueError, TypeError):
-                    logger.warning(f"Invalid style_exaggeration value in list '{style_exaggeration_value[0]}' for voice {voice_record_id}. Defaulting to 0.0.")
-                    style_exaggeration = 0.0
-            else: # Empty list
-                logger.warning(f"Empty style_exaggeration value list for voice {voice_record_id}. Defaulting to 0.0.")
-                style_exaggeration = 0.0
-        elif isinstance(style_exaggeration_value, (float, int)):
-            style_exaggeration = float(style_exaggeration_value)
-        else: # Try to convert if it's a string or other type that might be valid
-            try:
-                style_exaggeration = float(style_exaggeration_value)
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid style_exaggeration value '{style_exaggeration_value}' (type: {type(style_exaggeration_value)}) for voice {voice_record_id}. Defaulting to 0.0.")
-                style_exaggeration = 0.0
-
-        # Clamp style_exaggeration to [0.0, 1.0]
-        if style_exaggeration < 0.0:
-            logger.warning(f"Style Exaggeration {style_exaggeration} for voice {voice_record_id} is below 0.0. Clamping to 0.0.")
-            style_exaggeration = 0.0
-        elif style_exaggeration > 1.0:
-            logger.warning(f"Style Exaggeration {style_exaggeration} for voice {voice_record_id} is above 1.0. Clamping to 1.0.")
-            style_exaggeration = 1.0
-
-
-        # Ensure use_speaker_boost is a boolean
-        if not isinstance(use_speaker_boost_value, bool):
-            logger.warning(f"Invalid 'Speaker Boost (from Voices)' value '{use_speaker_boost_value}' (type: {type(use_speaker_boost_value)}) for voice {voice_record_id}. Defaulting to True.")
-            use_speaker_boost = True # Default to True if not a valid boolean
-        else:
-            use_speaker_boost = use_speaker_boost_value
-        
-        # Update segment status to 'Generating Voiceover'
-        airtable.update_segment(data['record_id'], {
-            'Status': 'Generating Voiceover'
-        })
+        settings = _resolve_voice_settings(voice, segment['fields'], voice_record_id)
+        stability = settings['stability']
+        similarity_boost = settings['similarity_boost']
         
         # Initialize services
         elevenlabs = ElevenLabsService()
         nca = NCAService()
         
-        # Generate voiceover synchronously
-        result = elevenlabs.generate_voice_sync(
-            text=segment_text,
-            voice_id=voice_id,
-            stability=stability,
-            similarity_boost=similarity_boost,
-            speed=speed,
-            style_exaggeration=style_exaggeration,
-            use_speaker_boost=use_speaker_boost
-        )
-        
-        # Upload audio to NCA for storage
-        upload_result = nca.upload_file(
-            file_data=result['audio_data'],
-            filename=f"voiceover_{data['record_id']}.mp3",
-            content_type='audio/mpeg',
-            file_type='voiceovers'
-        )
+        # Unchanged text and settings reuse the stored audio without calling ElevenLabs
+        voiceover = _cached_voiceover(elevenlabs, nca, segment_text, settings)
+        if not voiceover:
+            # Update segment status to 'Generating Voiceover'
+            airtable.update_segment(data['record_id'], {
+                'Status': 'Generating Voiceover'
+            })
+            voiceover = _synthesize_voiceover(elevenlabs, nca, data['record_id'], segment_text, settings)
         
         # Update segment with voiceover URL and success status
         airtable.update_segment(data['record_id'], {
-            'Voiceover': [{'url': upload_result['url']}],
+            'Voiceover': [{'url': voiceover['url']}],
             'Status': 'Voiceover Ready'
         })
         
@@ -293,7 +350,9 @@ def generate_voiceover_direct():
             'voice_name': voice['fields'].get('Name', 'Unknown'),
             'stability': stability,
             'similarity_boost': similarity_boost,
-            'voiceover_url': upload_result['url'],
+            'voiceover_url': voiceover['url'],
+            'duration': voiceover['duration'],
+            'cached': voiceover['cached'],
             'status': 'completed'
         }), 200
         
@@ -311,6 +370,217 @@ def generate_voiceover_direct():
         return jsonify({'error': 'Failed to generate voiceover', 'details': str(e)}), 500
 
 
+def _voiceover_batch_progress(parent_job_id: str, video_id: str, results: Dict[str, Dict]) -> Dict:
+    """Progress of a voiceover batch from its per-segment results (segment ID -> result)."""
+    return {
+        'parent_job_id': parent_job_id,
+        'video_id': video_id,
+        **summarize_progress(result['status'] for result in results.values()),
+        'segments': list(results.values())
+    }
+
+
+def _write_voiceover_batch_progress(parent_job_id: str, progress: Dict):
+    """Record a voiceover batch's progress on its parent job."""
+    fields = {
+        'Status': progress['status'],
+        'Notes': (f"{progress['completed']}/{progress['total']} voiced, {progress['failed']} failed, "
+                  f"{progress['in_progress']} in progress"),
+        'Response Payload': json.dumps(progress, default=str)
+    }
+    if progress['status'] == config.STATUS_FAILED:
+        failed = [s['segment_id'] for s in progress['segments'] if s['status'] == config.STATUS_FAILED]
+        fields['Error Details'] = f"Voiceover failed for segments: {', '.join(failed)}"
+    airtable.update_job(parent_job_id, fields)
+
+
+def _synthesize_segment_voiceover(elevenlabs: ElevenLabsService, nca: NCAService,
+                                  segment: Dict, settings: Dict) -> Dict:
+    """Synthesize, store and record one segment's voiceover for a batch.
+
+    Never raises: failures are recorded on the segment and reported in the
+    returned dict.
+    """
+    segment_id = segment['id']
+    try:
+        text = segment['fields']['SRT Text']
+        voiceover = _cached_voiceover(elevenlabs, nca, text, settings) or \
+            _synthesize_voiceover(elevenlabs, nca, segment_id, text, settings)
+        airtable.update_segment(segment_id, {
+            'Voiceover': [{'url': voiceover['url']}],
+            'Status': 'Voiceover Ready'
+        })
+        return {'segment_id': segment_id, 'status': config.STATUS_COMPLETED,
+                'voiceover_url': voiceover['url'], 'cached': voiceover['cached']}
+    except Exception as e:
+        logger.error(f"Error generating voiceover for segment {segment_id}: {e}")
+        try:
+            airtable.update_segment(segment_id, {'Status': 'Voiceover Failed'})
+        except Exception:
+            pass  # Don't fail the batch if status updates fail
+        return {'segment_id': segment_id, 'status': config.STATUS_FAILED, 'error': str(e)}
+
+
+def _run_voiceover_batch(parent_job_id: str, video_id: str, segments: List[Dict],
+                         settings: Dict[str, Dict], max_workers: int) -> Dict:
+    """Synthesize a batch's segments with bounded concurrency.
+
+    Each segment's row is written as soon as its audio is stored, and the
+    parent job's progress is updated after every segment.
+    """
+    elevenlabs = ElevenLabsService()
+    nca = NCAService()
+    results = {segment['id']: {'segment_id': segment['id'], 'status': config.STATUS_PENDING}
+               for segment in segments}
+    progress_lock = threading.Lock()
+
+    def run(segment: Dict) -> Dict:
+        outcome = _synthesize_segment_voiceover(elevenlabs, nca, segment, settings[segment['id']])
+        with progress_lock:
+            results[segment['id']] = outcome
+            progress = _voiceover_batch_progress(parent_job_id, video_id, results)
+            try:
+                _write_voiceover_batch_progress(parent_job_id, progress)
+            except Exception as e:
+                logger.warning(f"Could not update voiceover batch {parent_job_id}: {e}")
+        return outcome
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='voiceover') as executor:
+            list(executor.map(run, segments))
+    except Exception as e:
+        logger.error(f"Voiceover batch {parent_job_id} aborted: {e}")
+        airtable.fail_job(parent_job_id, str(e))
+    return _voiceover_batch_progress(parent_job_id, video_id, results)
+
+
+@api_v2_bp.route('/generate-voiceovers', methods=['POST'])
+@limiter.limit("5 per minute")
+def generate_voiceovers_webhook():
+    """Generate voiceovers for every pending segment of a video under one job.
+
+    Voice settings are resolved once per linked voice, synthesis runs in the
+    background capped at the ElevenLabs plan's concurrency, and each segment
+    is written as soon as its audio is stored. Poll
+    GET /generate-voiceovers/<job_id> for progress. If the worker stops
+    mid-batch, the job monitor fails the job and its unfinished segments;
+    re-sending the request picks up the segments still without a voiceover.
+    """
+    try:
+        # Validate input
+        schema = GenerateVoiceoversWebhookSchema()
+        data = schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'details': err.messages}), 400
+
+    video_id = data['record_id']
+    try:
+        segments = airtable.get_video_segments(video_id)
+        if not segments:
+            return jsonify({'error': 'No segments found for this video'}), 404
+
+        pending, skipped, voices, settings = [], [], {}, {}
+        for segment in segments:
+            segment_fields = segment['fields']
+            if segment_fields.get('Voiceover') and not data['regenerate']:
+                continue
+            voice_links = segment_fields.get('Voices', [])
+            if not segment_fields.get('SRT Text'):
+                skipped.append({'segment_id': segment['id'], 'error': 'Segment text is empty'})
+                continue
+            if not voice_links:
+                skipped.append({'segment_id': segment['id'], 'error': 'No voice linked'})
+                continue
+
+            voice_record_id = voice_links[0]
+            if voice_record_id not in voices:
+                voice = airtable.get_voice(voice_record_id)
+                voices[voice_record_id] = _resolve_voice_settings(voice, segment_fields, voice_record_id) \
+                    if voice and voice['fields'].get('Voice ID') else None
+            if not voices[voice_record_id]:
+                skipped.append({'segment_id': segment['id'], 'error': 'Linked voice has no Voice ID'})
+                continue
+            settings[segment['id']] = voices[voice_record_id]
+            pending.append(segment)
+
+        if not pending:
+            return jsonify({
+                'video_id': video_id,
+                'status': config.STATUS_COMPLETED,
+                'total': 0,
+                'skipped_segments': skipped,
+                'message': 'No segments need a voiceover'
+            }), 200
+
+        parent_job = airtable.create_job(
+            job_type=config.JOB_TYPE_VOICEOVER,
+            video_id=video_id,
+            request_payload={'record_id': video_id, 'mode': 'batch',
+                             'segment_ids': [segment['id'] for segment in pending],
+                             'skipped_segments': skipped}
+        )
+        parent_job_id = parent_job['id']
+
+        # Batched status writes (when the write buffer is enabled)
+        with airtable.buffered_writes():
+            for segment in pending:
+                airtable.update_segment(segment['id'], {'Status': 'Generating Voiceover'})
+        results = {segment['id']: {'segment_id': segment['id'], 'status': config.STATUS_PENDING}
+                   for segment in pending}
+        progress = _voiceover_batch_progress(parent_job_id, video_id, results)
+        _write_voiceover_batch_progress(parent_job_id, progress)
+
+        # The plan's limit caps every batch, whatever the request asks for
+        max_workers = min(data['max_concurrency'] or config.ELEVENLABS_MAX_CONCURRENCY,
+                          config.ELEVENLABS_MAX_CONCURRENCY, len(pending))
+        threading.Thread(
+            target=_run_voiceover_batch,
+            args=(parent_job_id, video_id, pending, settings, max_workers),
+            name=f"voiceover-batch-{parent_job_id}",
+            daemon=True
+        ).start()
+
+        return jsonify({
+            'job_id': parent_job_id,
+            'video_id': video_id,
+            'status': progress['status'],
+            'total': len(pending),
+            'max_concurrency': max_workers,
+            'voices': len([v for v in voices.values() if v]),
+            'skipped_segments': skipped,
+            'progress_url': f"/api/v2/generate-voiceovers/{parent_job_id}"
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error generating voiceovers for video {video_id}: {e}")
+        if 'parent_job_id' in locals():
+            airtable.fail_job(parent_job_id, str(e))
+        return jsonify({'error': 'Failed to generate voiceovers', 'details': str(e)}), 500
+
+
+def _batch_job_progress(job_id: str) -> Dict:
+    """Progress recorded on a batch job's Response Payload, with its current status and notes."""
+    job = airtable.get_job(job_id, use_index=False)
+    try:
+        progress = json.loads(job['fields'].get('Response Payload') or '{}')
+    except ValueError:
+        progress = {}
+    progress.setdefault('parent_job_id', job_id)
+    progress['status'] = job['fields'].get('Status', progress.get('status'))
+    progress['notes'] = job['fields'].get('Notes')
+    return progress
+
+
+@api_v2_bp.route('/generate-voiceovers/<job_id>', methods=['GET'])
+def generate_voiceovers_progress(job_id):
+    """Progress of a generate-voiceovers batch job."""
+    try:
+        return jsonify(_batch_job_progress(job_id)), 200
+    except Exception as e:
+        logger.error(f"Error getting voiceover progress for job {job_id}: {e}")
+        return jsonify({'error': 'Failed to get job progress', 'details': str(e)}), 500
+
+
 @api_v2_bp.route('/combine-segment-media', methods=['POST'])
 @limiter.limit("20 per minute")
 def combine_segment_media_webhook():
@@ -441,6 +711,179 @@ def combine_segment_media_webhook():
         return jsonify({'error': 'Failed to combine media', 'details': str(e)}), 500
 
 
+def _segment_media_problem(segment: Dict) -> str:
+    """Return why a segment can't be combined yet, or '' if it can."""
+    segment_fields = segment.get('fields', {})
+    if not segment_fields.get('Video'):
+        return 'Background video not uploaded'
+    if not segment_fields.get('Voiceover'):
+        return 'Voiceover not ready'
+    return ''
+
+
+def _submit_segment_combine(nca: NCAService, segment: Dict, child_job_id: str) -> Dict:
+    """Submit one segment's voiceover + video mux for a fan-out parent job.
+
+    Never raises: failures are recorded on the child job and segment and
+    reported in the returned dict.
+    """
+    segment_id = segment['id']
+    segment_fields = segment['fields']
+    webhook_url = (f"{config.WEBHOOK_BASE_URL}/webhooks/nca-toolkit?job_id={child_job_id}"
+                   f"&operation=combine&target_id={segment_id}")
+    try:
+        airtable.update_segment(segment_id, {'Status': 'Combining Media'})
+        result = nca.combine_audio_video(
+            video_url=segment_fields['Video'][0]['url'],
+            audio_url=segment_fields['Voiceover'][0]['url'],
+            output_filename=f"segment_{segment_id}_combined.mp4",
+            webhook_url=webhook_url,
+            custom_id=child_job_id
+        )
+
+        if result.get('code') == 200 and 'response' in result:
+            output_url = None
+            if isinstance(result['response'], list) and len(result['response']) > 0:
+                output_url = result['response'][0].get('file_url')
+            if not output_url:
+                raise ValueError('No output URL in NCA response')
+            airtable.update_segment(segment_id, {
+                'Voiceover + Video': [{'url': output_url}],
+                'Status': 'Ready'
+            })
+            airtable.update_job(child_job_id, {
+                'External Job ID': result.get('job_id', 'sync-' + child_job_id),
+                'Status': config.STATUS_COMPLETED,
+                'Response Payload': json.dumps(result),
+                'Notes': 'Processed synchronously by NCA'
+            })
+            return {'segment_id': segment_id, 'job_id': child_job_id,
+                    'status': config.STATUS_COMPLETED, 'output_url': output_url}
+
+        if 'job_id' not in result:
+            raise ValueError(f"Unexpected NCA response: {json.dumps(result)}")
+        airtable.update_job(child_job_id, {
+            'External Job ID': result['job_id'],
+            'Webhook URL': webhook_url,
+            'Status': config.STATUS_PROCESSING
+        })
+        return {'segment_id': segment_id, 'job_id': child_job_id, 'status': config.STATUS_PROCESSING}
+
+    except Exception as e:
+        logger.error(f"Error submitting combine for segment {segment_id}: {e}")
+        try:
+            airtable.update_segment(segment_id, {'Status': 'Combination Failed'})
+            airtable.fail_job(child_job_id, str(e))
+        except Exception:
+            pass  # Don't fail the batch if status updates fail
+        return {'segment_id': segment_id, 'job_id': child_job_id,
+                'status': config.STATUS_FAILED, 'error': str(e)}
+
+
+@api_v2_bp.route('/combine-all-segment-media', methods=['POST'])
+@limiter.limit("5 per minute")
+def combine_all_segment_media_webhook():
+    """Combine voiceover with base video for every segment of a video under one parent job.
+
+    Segments are validated with one batched read, the muxes are submitted with
+    bounded concurrency, and each child job's webhook updates the parent's
+    aggregated progress (see GET /combine-all-segment-media/<parent_job_id>).
+    """
+    try:
+        # Validate input
+        schema = CombineAllSegmentMediaWebhookSchema()
+        data = schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'details': err.messages}), 400
+
+    video_id = data['record_id']
+    try:
+        # One video read plus batched segment reads
+        segments = airtable.get_video_segments(video_id)
+        if not segments:
+            return jsonify({'error': 'No segments found for this video'}), 404
+
+        invalid, ready = [], []
+        for segment in segments:
+            problem = _segment_media_problem(segment)
+            if problem:
+                invalid.append({'segment_id': segment['id'], 'error': problem})
+            else:
+                ready.append(segment)
+        if not ready or (invalid and not data['allow_partial']):
+            return jsonify({
+                'error': 'Segments not ready for combining',
+                'invalid_segments': invalid
+            }), 400
+
+        # Parent job tracks the fan-out; children are ordinary combine jobs
+        parent_job = airtable.create_job(
+            job_type=config.JOB_TYPE_COMBINE,
+            video_id=video_id,
+            request_payload={'record_id': video_id, 'mode': 'fan_out'}
+        )
+        parent_job_id = parent_job['id']
+
+        def create_child_job(segment: Dict) -> str:
+            return airtable.create_job(
+                job_type=config.JOB_TYPE_COMBINE,
+                segment_id=segment['id'],
+                request_payload={'record_id': segment['id'], 'parent_job_id': parent_job_id}
+            )['id']
+
+        nca = NCAService()
+        max_workers = min(data['max_concurrency'] or config.COMBINE_ALL_MAX_CONCURRENCY, len(ready))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            child_jobs = dict(zip([segment['id'] for segment in ready],
+                                  executor.map(create_child_job, ready)))
+
+            # Record the children before submitting so early webhooks can find them
+            airtable.update_job(parent_job_id, {
+                'Request Payload': encode_job_payload({
+                    'record_id': video_id,
+                    'video_id': video_id,
+                    'mode': 'fan_out',
+                    'child_jobs': child_jobs,
+                    'skipped_segments': invalid
+                }),
+                'Status': config.STATUS_PROCESSING
+            })
+
+            submissions = list(executor.map(
+                lambda segment: _submit_segment_combine(nca, segment, child_jobs[segment['id']]), ready))
+
+        progress = airtable.refresh_parent_job(
+            parent_job_id, child_statuses={s['job_id']: s['status'] for s in submissions})
+
+        return jsonify({
+            'job_id': parent_job_id,
+            'video_id': video_id,
+            'status': progress['status'],
+            'total': progress['total'],
+            'submitted': sum(1 for s in submissions if s['status'] != config.STATUS_FAILED),
+            'failed_submissions': [s for s in submissions if s['status'] == config.STATUS_FAILED],
+            'skipped_segments': invalid,
+            'segments': submissions,
+            'progress_url': f"/api/v2/combine-all-segment-media/{parent_job_id}"
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error combining all segment media for video {video_id}: {e}")
+        if 'parent_job_id' in locals():
+            airtable.fail_job(parent_job_id, str(e))
+        return jsonify({'error': 'Failed to combine segment media', 'details': str(e)}), 500
+
+
+@api_v2_bp.route('/combine-all-segment-media/<job_id>', methods=['GET'])
+def combine_all_segment_media_progress(job_id):
+    """Aggregated progress of a combine-all-segment-media parent job."""
+    try:
+        return jsonify(airtable.refresh_parent_job(job_id)), 200
+    except Exception as e:
+        logger.error(f"Error getting combine progress for job {job_id}: {e}")
+        return jsonify({'error': 'Failed to get job progress', 'details': str(e)}), 500
+
+
 @api_v2_bp.route('/combine-all-segments', methods=['POST'])
 @limiter.limit("5 per minute")
 def combine_all_segments_webhook():
@@ -497,42 +940,103 @@ def combine_all_segments_webhook():
         # except:
         #     pass  # Continue if status update fails
         
+        # Initialize NCA service
+        nca = NCAService()
+        
+        # Stream copy when the segments' probed codec parameters allow it
+        plan = nca.plan_concatenation(video_urls, data.get('encoding_profile'))
+        logger.info(f"Video {record_id}: {plan.summary()}")
+        output_filename = f"video_{record_id}_combined.mp4"
+        
         # Create job record
         job = airtable.create_job(
             job_type=config.JOB_TYPE_CONCATENATE,
             video_id=record_id,
-            request_payload=data
+            request_payload={**data, 'concat_plan': plan.to_dict()}
         )
         job_id = job['id']
         
         # Generate webhook URL
         webhook_url = f"{config.WEBHOOK_BASE_URL}/webhooks/nca-toolkit?job_id={job_id}&operation=concatenate"
         
-        # Initialize NCA service
-        nca = NCAService()
-        
-        # Concatenate videos
-        result = nca.concatenate_videos(
-            video_urls=video_urls,
-            output_filename=f"video_{record_id}_combined.mp4",
-            webhook_url=webhook_url,
-            custom_id=job_id
-        )
-        
-        # Update job with external ID
-        if 'job_id' in result:
+        if plan.strategy == STRATEGY_NORMALIZE:
+            # Re-encode only the odd segments; their webhooks submit the concat when all are done
+            normalize_jobs = {}
+            for index in plan.odd_indexes:
+                child_job = airtable.create_job(
+                    job_type=config.JOB_TYPE_CONCATENATE,
+                    request_payload={'record_id': record_id, 'operation': 'normalize',
+                                     'parent_job_id': job_id, 'segment_index': index}
+                )
+                normalize_jobs[str(index)] = child_job['id']
+            
             airtable.update_job(job_id, {
-                'External Job ID': result['job_id'],
-                'Webhook URL': webhook_url,
-                'Status': config.STATUS_PROCESSING
+                'Request Payload': encode_job_payload({
+                    **data, 'video_id': record_id, 'concat_plan': plan.to_dict(),
+                    'video_urls': video_urls, 'normalize_jobs': normalize_jobs,
+                    'output_filename': output_filename
+                }),
+                'Status': config.STATUS_PROCESSING,
+                'Notes': plan.summary()
             })
+            
+            # A child that can't be submitted is failed on its own; the plan then
+            # falls back to the generic concat once the submitted ones finish
+            failed_children = {}
+            for index, child_job_id in normalize_jobs.items():
+                child_webhook_url = (f"{config.WEBHOOK_BASE_URL}/webhooks/nca-toolkit?job_id={child_job_id}"
+                                     f"&operation=normalize&video_id={record_id}")
+                try:
+                    result = nca.normalize_video(
+                        video_url=video_urls[int(index)],
+                        reference=plan.reference,
+                        output_filename=f"video_{record_id}_segment_{index}_normalized.mp4",
+                        webhook_url=child_webhook_url,
+                        custom_id=child_job_id,
+                        encoding_profile=data.get('encoding_profile')
+                    )
+                    airtable.update_job(child_job_id, {
+                        'External Job ID': result.get('job_id'),
+                        'Webhook URL': child_webhook_url,
+                        'Status': config.STATUS_PROCESSING
+                    })
+                except Exception as e:
+                    logger.error(f"Failed to submit normalization job {child_job_id} for segment {index}: {e}")
+                    failed_children[child_job_id] = {'status': config.STATUS_FAILED}
+                    try:
+                        airtable.fail_job(child_job_id, f"Normalization submission failed: {e}")
+                    except Exception as fail_exc:
+                        logger.error(f"Failed to mark normalization job {child_job_id} as failed: {fail_exc}")
+            
+            if failed_children:
+                submit_after_normalization(airtable, nca, job_id, config.WEBHOOK_BASE_URL,
+                                           child_results=failed_children)
+        else:
+            # Concatenate videos
+            result = nca.concatenate_videos(
+                video_urls=video_urls,
+                output_filename=output_filename,
+                webhook_url=webhook_url,
+                custom_id=job_id,
+                plan=plan
+            )
+            
+            # Update job with external ID
+            if 'job_id' in result:
+                airtable.update_job(job_id, {
+                    'External Job ID': result['job_id'],
+                    'Webhook URL': webhook_url,
+                    'Status': config.STATUS_PROCESSING,
+                    'Notes': plan.summary()
+                })
         
         return jsonify({
             'job_id': job_id,
             'video_id': record_id,
             'segment_count': len(segments),
             'status': 'processing',
-            'webhook_url': webhook_url
+            'webhook_url': webhook_url,
+            'concat_plan': plan.to_dict()
         }), 202
         
     except Exception as e:
@@ -721,7 +1225,8 @@ def add_music_to_video_webhook():
             output_filename=output_filename,
             # volume_ratio=0.2, # Example, adjust as needed or make configurable in Airtable
             webhook_url=nca_webhook_url,
-            custom_id=job_id  # Pass the Airtable job ID to ensure it's returned in webhook
+            custom_id=job_id,  # Pass the Airtable job ID to ensure it's returned in webhook
+            encoding_profile=data.get('encoding_profile')
         )
         
         airtable.update_job(job_id, {
@@ -752,6 +1257,208 @@ def add_music_to_video_webhook():
         return jsonify({'error': 'Failed to initiate adding music to video', 'details': str(e)}), 500
 
 
+def _decode_and_upload_images(nca: NCAService, image_data_list: List[Dict], segment_id: str,
+                              timestamp: str) -> Tuple[List[Dict], List[Dict]]:
+    """Decode and upload gpt-image-1 results concurrently.
+
+    Uploads run in a bounded pool (AI_IMAGE_UPLOAD_WORKERS), so wall time is
+    roughly that of the slowest single upload.
+
+    Returns:
+        (uploaded, failed): uploaded images in response order as {'url': ...},
+        and {'index': n, 'error': ...} for each image that could not be stored
+    """
+    def decode_and_upload(i: int, image_data: Dict) -> Dict:
+        # gpt-image-1 returns base64-encoded data in 'b64_json' field (not URLs)
+        if 'b64_json' not in image_data:
+            raise Exception(f"Expected 'b64_json' field in gpt-image-1 response, got: {list(image_data.keys())}")
+        image_binary = base64.b64decode(image_data['b64_json'])
+        
+        return nca.upload_file(
+            file_data=image_binary,
+            filename=f"ai_generated_{segment_id}_{timestamp}_{i+1}.png",
+            content_type='image/png'
+        )
+    
+    max_workers = max(1, min(config.AI_IMAGE_UPLOAD_WORKERS, len(image_data_list)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(decode_and_upload, i, image_data)
+                   for i, image_data in enumerate(image_data_list)]
+    
+    uploaded_images = []
+    failed_images = []
+    for i, future in enumerate(futures):
+        try:
+            uploaded_images.append({'url': future.result()['url']})
+        except Exception as e:
+            logger.error(f"Failed to store AI image {i+1} for segment {segment_id}: {e}")
+            failed_images.append({'index': i + 1, 'error': str(e)})
+    
+    return uploaded_images, failed_images
+
+
+def _run_ai_image_prompt_batch(job_id: str, video_id: str, segments: List[Dict], full_script: str,
+                               theme_descriptions: List[Optional[str]], batch_size: Optional[int]) -> Dict:
+    """Generate a video's missing AI image prompts and write them back in batch.
+
+    Prompts come from OpenAIService.generate_ai_image_prompts (the script is
+    sent once per window of segments). Each window's prompts are written with
+    batch_update, 10 segments per Airtable request, as soon as the window
+    finishes, and the job's notes record the progress. If the worker stops
+    mid-batch, the job monitor fails the job; the written prompts are kept.
+    """
+    from services.openai_service import OpenAIService
+
+    result = {'parent_job_id': job_id, 'video_id': video_id, 'total': len(segments),
+              'completed': 0, 'failed': 0, 'status': config.STATUS_PROCESSING, 'failed_segments': []}
+    written = {}
+
+    def write_prompts(prompts_by_index: Dict[int, str]):
+        updates = {segments[i]['id']: {'AI Image Prompt': prompt} for i, prompt in prompts_by_index.items()}
+        airtable.update_segments(updates)
+        written.update(updates)
+        airtable.update_job(job_id, {'Notes': f"{len(written)}/{len(segments)} AI image prompts written"})
+
+    try:
+        prompts = OpenAIService().generate_ai_image_prompts(
+            [segment['fields']['Original SRT Text'] for segment in segments],
+            full_script,
+            theme_descriptions,
+            batch_size=batch_size,
+            on_prompts=write_prompts
+        )
+        updates = {segment['id']: {'AI Image Prompt': prompt}
+                   for segment, prompt in zip(segments, prompts) if prompt}
+        unwritten = {segment_id: fields for segment_id, fields in updates.items() if segment_id not in written}
+        if unwritten:
+            airtable.update_segments(unwritten)
+
+        result['completed'] = len(updates)
+        result['failed_segments'] = [segment['id'] for segment in segments if segment['id'] not in updates]
+        result['failed'] = len(result['failed_segments'])
+        result['status'] = config.STATUS_FAILED if result['failed'] else config.STATUS_COMPLETED
+        notes = f"{result['completed']}/{result['total']} AI image prompts written, {result['failed']} failed"
+        if result['failed']:
+            airtable.update_job(job_id, {
+                'Status': config.STATUS_FAILED,
+                'Notes': notes,
+                'Response Payload': json.dumps(result),
+                'Error Details': f"AI image prompt failed for segments: {', '.join(result['failed_segments'])}"
+            })
+        else:
+            airtable.complete_job(job_id, response_payload=result, notes=notes)
+    except Exception as e:
+        logger.error(f"AI image prompt batch {job_id} failed: {e}")
+        result['status'] = config.STATUS_FAILED
+        result['error'] = str(e)
+        airtable.fail_job(job_id, str(e))
+    return result
+
+
+@api_v2_bp.route('/generate-ai-image-prompts', methods=['POST'])
+@limiter.limit("5 per minute")
+def generate_ai_image_prompts_webhook():
+    """Generate AI image prompts for every segment of a video under one job.
+
+    The video script is read once and sent once per window of segments
+    instead of once per segment, and the prompts are written back in batch,
+    so /generate-ai-image finds 'AI Image Prompt' already filled in. Poll
+    GET /generate-ai-image-prompts/<job_id> for the result. If the worker
+    stops mid-batch, the job monitor fails the job; re-sending the request
+    picks up the segments still without a prompt.
+    """
+    try:
+        # Validate input
+        schema = GenerateAIImagePromptsWebhookSchema()
+        data = schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'details': err.messages}), 400
+
+    video_id = data['record_id']
+    try:
+        video = airtable.get_video(video_id)
+        full_script = video['fields'].get('Video Script')
+        if not full_script:
+            return jsonify({'error': 'Video has no script'}), 400
+
+        segments = airtable.get_video_segments(video_id)
+        if not segments:
+            return jsonify({'error': 'No segments found for this video'}), 404
+
+        pending, skipped, themes, theme_descriptions = [], [], {}, []
+        for segment in segments:
+            segment_fields = segment['fields']
+            if segment_fields.get('AI Image Prompt') and not data['regenerate']:
+                continue
+            if not segment_fields.get('Original SRT Text'):
+                skipped.append({'segment_id': segment['id'], 'error': 'Segment has no Original SRT Text'})
+                continue
+
+            theme_ids = segment_fields.get('Image Theme')
+            theme_id = theme_ids[0] if theme_ids else None
+            if theme_id and theme_id not in themes:
+                try:
+                    theme = airtable.get_record(config.IMAGE_THEMES_TABLE, theme_id)
+                    themes[theme_id] = theme['fields'].get('Theme Description')
+                except Exception as e:
+                    logger.warning(f"Failed to fetch Image Theme {theme_id}: {e}")
+                    themes[theme_id] = None
+            theme_descriptions.append(themes.get(theme_id))
+            pending.append(segment)
+
+        if not pending:
+            return jsonify({
+                'video_id': video_id,
+                'status': config.STATUS_COMPLETED,
+                'total': 0,
+                'skipped_segments': skipped,
+                'message': 'No segments need an AI image prompt'
+            }), 200
+
+        job = airtable.create_job(
+            job_type=config.JOB_TYPE_AI_IMAGE,
+            video_id=video_id,
+            request_payload={'record_id': video_id, 'mode': 'prompts',
+                             'segment_ids': [segment['id'] for segment in pending],
+                             'skipped_segments': skipped}
+        )
+        job_id = job['id']
+        airtable.update_job(job_id, {'Status': config.STATUS_PROCESSING})
+
+        threading.Thread(
+            target=_run_ai_image_prompt_batch,
+            args=(job_id, video_id, pending, full_script, theme_descriptions, data['batch_size']),
+            name=f"ai-image-prompts-{job_id}",
+            daemon=True
+        ).start()
+
+        return jsonify({
+            'job_id': job_id,
+            'video_id': video_id,
+            'status': config.STATUS_PROCESSING,
+            'total': len(pending),
+            'themes': len(themes),
+            'skipped_segments': skipped,
+            'progress_url': f"/api/v2/generate-ai-image-prompts/{job_id}"
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error generating AI image prompts for video {video_id}: {e}")
+        if 'job_id' in locals():
+            airtable.fail_job(job_id, str(e))
+        return jsonify({'error': 'Failed to generate AI image prompts', 'details': str(e)}), 500
+
+
+@api_v2_bp.route('/generate-ai-image-prompts/<job_id>', methods=['GET'])
+def generate_ai_image_prompts_progress(job_id):
+    """Result of a generate-ai-image-prompts job."""
+    try:
+        return jsonify(_batch_job_progress(job_id)), 200
+    except Exception as e:
+        logger.error(f"Error getting AI image prompt progress for job {job_id}: {e}")
+        return jsonify({'error': 'Failed to get job progress', 'details': str(e)}), 500
+
+
 @api_v2_bp.route('/generate-ai-image', methods=['POST'])
 @limiter.limit("10 per minute")
 def generate_ai_image_webhook():
@@ -791,7 +1498,7 @@ def generate_ai_image_webhook():
                 theme_description = None
                 if theme_ids:
                     try:
-                        theme = airtable.get_record('Image Themes', theme_ids[0])
+                        theme = airtable.get_record(config.IMAGE_THEMES_TABLE, theme_ids[0])
                         theme_description = theme['fields'].get('Theme Description')
                     except Exception as e:
                         logger.warning(f"Failed to fetch Image Theme: {e}")
@@ -875,28 +1582,16 @@ def generate_ai_image_webhook():
         result = response.json()
         image_data_list = result['data']  # This will be an array of 4 images
         
-        # Process all 4 images
-        uploaded_images = []
+        # Decode and upload all 4 images in parallel
         nca = NCAService()
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        uploaded_images, failed_images = _decode_and_upload_images(
+            nca, image_data_list, data['segment_id'], timestamp
+        )
         
-        for i, image_data in enumerate(image_data_list):
-            # gpt-image-1 returns base64-encoded data in 'b64_json' field (not URLs)
-            if 'b64_json' in image_data:
-                # Base64 encoded response from gpt-image-1
-                image_binary = base64.b64decode(image_data['b64_json'])
-            else:
-                # Fallback error handling
-                raise Exception(f"Expected 'b64_json' field in gpt-image-1 response, got: {list(image_data.keys())}")
-            
-            # Upload each image to S3 using NCA service
-            upload_result = nca.upload_file(
-                file_data=image_binary,
-                filename=f"ai_generated_{data['segment_id']}_{timestamp}_{i+1}.png",
-                content_type='image/png'
-            )
-            
-            uploaded_images.append({'url': upload_result['url']})
+        if not uploaded_images:
+            raise Exception(f"All {len(image_data_list)} image uploads failed: "
+                            f"{'; '.join(f['error'] for f in failed_images)}")
         
         # Update segment with ALL 4 image URLs
         airtable.update_segment(data['segment_id'], {
@@ -913,7 +1608,8 @@ def generate_ai_image_webhook():
                 'prompt': ai_image_prompt,
                 'size': data['size'],
                 'model': 'gpt-image-1',
-                'output_format': 'png'
+                'output_format': 'png',
+                'failed_images': failed_images
             })
         })
         
@@ -926,7 +1622,8 @@ def generate_ai_image_webhook():
             'size': data['size'],
             'model': 'gpt-image-1',
             'output_format': 'png',
-            'status': 'completed'
+            'failed_images': failed_images,
+            'status': 'partial' if failed_images else 'completed'
         }), 200
         
     except Exception as e:
@@ -994,13 +1691,17 @@ def generate_video_webhook():
         job_id = job['id']
 
         if video_style == 'Zoom':
-            # --- Parameters for smooth zoom, based on new documentation ---
-            OUTPUT_W, OUTPUT_H = 1920, 1080
-            FPS = 60  # Increased from 25 to 60 for ultra-smooth zoom animation
-            MAX_ZOOM = 1.15  # Reduced from 1.2 to 1.15 for more gradual zoom effect
-            INITIAL_SCALE_FACTOR = 3 # Increased from 2 to 3 for better quality during zoom
+            zoom_mode = resolve_zoom_mode(data.get('zoom_mode'), segment['fields'], config.ZOOM_RENDER_MODE)
 
+            nca = NCAService()
+
+            # Prefer the voiceover's probed length over the estimated 'Duration' field
             actual_segment_duration = segment['fields'].get('Duration')
+            voiceover = segment['fields'].get('Voiceover')
+            if voiceover:
+                voiceover_info = nca.probe_media(voiceover[0]['url']).get(voiceover[0]['url'])
+                if voiceover_info and voiceover_info.duration:
+                    actual_segment_duration = voiceover_info.duration
             if not actual_segment_duration or actual_segment_duration <= 0:
                 error_msg = "Segment 'Duration' is missing or invalid for Zoom video style."
                 logger.error(f"{error_msg} Segment ID: {data['segment_id']}")
@@ -1010,51 +1711,15 @@ def generate_video_webhook():
 
             # Add 20% to the duration for zoom videos to ensure smooth transitions
             zoom_duration = actual_segment_duration * 1.2
-            logger.info(f"Zoom video for segment {data['segment_id']}: Original duration={actual_segment_duration}s, Extended duration={zoom_duration}s (+20%)")
+            logger.info(f"Zoom video ({zoom_mode}) for segment {data['segment_id']}: Original duration={actual_segment_duration}s, Extended duration={zoom_duration}s (+20%)")
             
-            total_frames = int(zoom_duration * FPS)
-            if total_frames < 1: # Ensure at least 1 frame
-                total_frames = 1
-            
-            zoom_increment = (MAX_ZOOM - 1.0) / total_frames if total_frames > 0 else 0.0
-
-            input_image_filename = "source_image.jpg"
-            nca_inputs_payload = [
-                {
-                    'file_url': image_url,
-                    'filename': input_image_filename,
-                    'options': [
-                        {'option': '-loop', 'argument': "1"},
-                        {'option': '-framerate', 'argument': str(FPS)}
-                    ]
-                }
-            ]
-
-            initial_scale_width = OUTPUT_W * INITIAL_SCALE_FACTOR
-            zoom_filter_string = (
-                f"scale={initial_scale_width}:-1,"
-                f"zoompan=z='min(zoom+{zoom_increment:.6f},{MAX_ZOOM})':"
-                f"x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':"
-                f"d={total_frames}:s={OUTPUT_W}x{OUTPUT_H}:fps={FPS}"
-            )
-            nca_filters_payload = [
-                {"filter": zoom_filter_string}
-            ]
+            encoding_profile = get_encoding_profile(data.get('encoding_profile'))
+            zoom_payload = build_zoom_payload(image_url, zoom_duration, zoom_mode, encoding_profile)
+            nca_inputs_payload = zoom_payload['inputs']
+            nca_filters_payload = zoom_payload['filters']
+            nca_outputs_payload = zoom_payload['outputs']
 
             output_filename_zoom = f"zoom_{data['segment_id']}_{job_id}.mp4"
-            nca_outputs_payload = [
-                {
-                    'options': [
-                        {"option": "-t", "argument": str(zoom_duration)},
-                        {"option": "-c:v", "argument": "libx264"},
-                        {"option": "-preset", "argument": "slow"},
-                        {"option": "-crf", "argument": "23"},
-                        {"option": "-pix_fmt", "argument": "yuv420p"},
-                        {"option": "-an"},
-                        {"option": "-movflags", "argument": "+faststart"}
-                    ]
-                }
-            ]
 
             nca_compose_payload = {
                 "inputs": nca_inputs_payload,
@@ -1068,8 +1733,6 @@ def generate_video_webhook():
                 nca_webhook_params += f"&video_id={video_id}"
             webhook_url_nca = f"{config.WEBHOOK_BASE_URL}/webhooks/nca-toolkit?{nca_webhook_params}"
 
-            nca = NCAService()
-            
             try:
                 # Call the new method in NCAService, passing the structured payload components
                 nca_response = nca.invoke_ffmpeg_compose_job(
@@ -1086,13 +1749,15 @@ def generate_video_webhook():
                     'External Job ID': external_nca_job_id,
                     'Webhook URL': webhook_url_nca,
                     'Status': config.STATUS_PROCESSING,
-                    'Notes': f"NCA Zoom video (smooth) generation initiated. NCA Job ID: {external_nca_job_id}"
+                    'Notes': f"NCA Zoom video ({zoom_mode}) generation initiated. NCA Job ID: {external_nca_job_id}"
                 })
                 
                 return jsonify({
                     'job_id': job_id,
                     'segment_id': data['segment_id'],
-                    'video_style': 'Zoom (smooth)',
+                    'video_style': f'Zoom ({zoom_mode})',
+                    'zoom_mode': zoom_mode,
+                    'encoding_profile': encoding_profile.name,
                     'image_url_processed': image_url,
                     'original_duration_seconds': actual_segment_duration,
                     'extended_duration_seconds': zoom_duration,
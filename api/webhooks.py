@@ -9,7 +9,6 @@ Key fixes:
 
 import logging
 import json
-import ast
 import requests
 import uuid
 import traceback # Add for detailed traceback logging
@@ -19,7 +18,9 @@ from flask import Blueprint, request, jsonify, current_app
 from config import get_config
 from config_pydantic import get_settings
 from services.airtable_service import AirtableService
+from services.concat_planner import submit_after_normalization
 from services.nca_service import NCAService
+from utils.job_payload import job_payload_from_fields, parse_job_payload
 from utils.logger import APILogger
 from utils.webhook_validator import webhook_validation_required
 
@@ -69,6 +70,7 @@ def elevenlabs_webhook_deprecated():
 
 @webhooks_bp.route('/nca-toolkit', methods=['POST'])
 @webhook_validation_required('nca-toolkit')
+@airtable.buffered_writes()
 def nca_toolkit_webhook():
     """Handle NCA Toolkit media processing callbacks with Pydantic validation.
     Refactored for robust error handling, detailed logging, and reliable Airtable updates.
@@ -340,7 +342,7 @@ def nca_toolkit_webhook():
                     current_target_id = airtable_job_record['fields'].get('Related Segment Video', [None])[0]
                     if not current_target_id:
                         try:
-                            payload_data = ast.literal_eval(request_payload_str) # request_payload_str from line 262
+                            payload_data = parse_job_payload(request_payload_str)
                             current_target_id = payload_data.get('segment_id') or payload_data.get('record_id')
                         except (ValueError, SyntaxError, TypeError) as e_eval:
                             logger.warning(f"Failed to parse Request Payload for target_id (Operation: {param_operation}, Job ID: {airtable_job_id}, Status: {nca_status}): {e_eval}")
@@ -397,7 +399,7 @@ def nca_toolkit_webhook():
                     target_id = airtable_job_record['fields'].get('Related Video', [None])[0]
                     if not target_id:
                         try:
-                            payload_data = ast.literal_eval(request_payload_str)
+                            payload_data = parse_job_payload(request_payload_str)
                             target_id = payload_data.get('video_id') or payload_data.get('record_id')
                         except (ValueError, SyntaxError, TypeError) as e_eval:
                             logger.warning(f"Failed to parse Request Payload for target_id (Operation: {param_operation}, Job ID: {airtable_job_id}, Status: {nca_status}): {e_eval}")
@@ -410,7 +412,7 @@ def nca_toolkit_webhook():
                     target_id = airtable_job_record['fields'].get('Related Video', [None])[0]
                     if not target_id:
                         try:
-                            payload_data = ast.literal_eval(request_payload_str)
+                            payload_data = parse_job_payload(request_payload_str)
                             target_id = payload_data.get('video_id') or payload_data.get('record_id')
                         except (ValueError, SyntaxError, TypeError) as e_eval:
                             logger.warning(f"Failed to parse Request Payload for target_id (Operation: {param_operation}, Job ID: {airtable_job_id}, Status: {nca_status}): {e_eval}")
@@ -419,6 +421,11 @@ def nca_toolkit_webhook():
                     else: logger.warning(f"Add_music op for {airtable_job_id} done, but no video_id found to update.")
                     logger.info(f"Video {target_id} updated with 'Video + Music'.")
 
+                elif param_operation == 'normalize':
+                    # Kept on the job so the parent concat can pick it up
+                    airtable_job_updates['Response Payload'] = json.dumps({'output_url': nca_output_url})
+                    webhook_event_notes += " Segment normalized for stream-copy concat."
+
                 else: # Unknown completed operation
                     logger.warning(f"Unknown operation '{param_operation}' for completed NCA job {airtable_job_id}. Storing output URL in Job record.")
                     airtable_job_updates['Notes'] = f"Completed with unknown op '{param_operation}'. {airtable_job_updates.get('Notes', '')}".strip()
@@ -426,6 +433,11 @@ def nca_toolkit_webhook():
                 if webhook_event_id:
                     airtable.mark_webhook_processed(webhook_event_id['id'], success=True, notes=webhook_event_notes)
                 airtable.update_job(airtable_job_id, airtable_job_updates)
+                if param_operation == 'combine':
+                    refresh_parent_progress(airtable_job_record, airtable_job_id, config.STATUS_COMPLETED)
+                elif param_operation == 'normalize':
+                    continue_planned_concat(airtable_job_record, airtable_job_id,
+                                            {'status': config.STATUS_COMPLETED, 'output_url': nca_output_url})
                 return jsonify({'status': 'success', 'message': f'NCA job {airtable_job_id} ({param_operation}) processed as completed.', 'output_url': nca_output_url}), 200
 
         elif nca_status == 'failed':
@@ -447,7 +459,7 @@ def nca_toolkit_webhook():
                 target_id_for_failure = airtable_job_record['fields'].get('Related Segment Video', [None])[0]
                 if not target_id_for_failure:
                     try:
-                        payload_data = ast.literal_eval(request_payload_str_for_failure)
+                        payload_data = parse_job_payload(request_payload_str_for_failure)
                         target_id_for_failure = payload_data.get('segment_id') or payload_data.get('record_id')
                     except (ValueError, SyntaxError, TypeError) as e_eval:
                         logger.warning(f"Failed to parse Request Payload for target_id on combine failure (Job ID: {airtable_job_id}): {e_eval}")
@@ -470,7 +482,7 @@ def nca_toolkit_webhook():
                 target_id_for_failure = airtable_job_record['fields'].get('Related Video', [None])[0]
                 if not target_id_for_failure:
                     try:
-                        payload_data = ast.literal_eval(request_payload_str_for_failure)
+                        payload_data = parse_job_payload(request_payload_str_for_failure)
                         target_id_for_failure = payload_data.get('video_id') or payload_data.get('record_id')
                     except (ValueError, SyntaxError, TypeError) as e_eval:
                         logger.warning(f"Failed to parse Request Payload for target_id on concatenate failure (Job ID: {airtable_job_id}): {e_eval}")
@@ -478,11 +490,14 @@ def nca_toolkit_webhook():
                     airtable.safe_update_video_status(target_id_for_failure, 'Concatenation Failed', error_details=str(nca_error_message))
                     webhook_event_notes += f" Video {target_id_for_failure} status updated to Concatenation Failed."
 
+            elif param_operation == 'normalize':
+                webhook_event_notes += " Segment normalization failed; the concat falls back to NCA's generic concatenate."
+
             elif param_operation == 'add_music':
                 target_id_for_failure = airtable_job_record['fields'].get('Related Video', [None])[0]
                 if not target_id_for_failure:
                     try:
-                        payload_data = ast.literal_eval(request_payload_str_for_failure)
+                        payload_data = parse_job_payload(request_payload_str_for_failure)
                         target_id_for_failure = payload_data.get('video_id') or payload_data.get('record_id')
                     except (ValueError, SyntaxError, TypeError) as e_eval:
                         logger.warning(f"Failed to parse Request Payload for target_id on add_music failure (Job ID: {airtable_job_id}): {e_eval}")
@@ -504,6 +519,10 @@ def nca_toolkit_webhook():
                     logger.error(f"[Image Zoom Bypass] Failed to update job {airtable_job_id} (update_job for NCA failure, operation: {param_operation}) due to: {job_update_exc}. Continuing webhook processing.")
             else:
                 airtable.update_job(airtable_job_id, airtable_job_updates)
+            if param_operation == 'combine':
+                refresh_parent_progress(airtable_job_record, airtable_job_id, config.STATUS_FAILED)
+            elif param_operation == 'normalize':
+                continue_planned_concat(airtable_job_record, airtable_job_id, {'status': config.STATUS_FAILED})
             
             return jsonify({'status': 'failed', 'message': f'NCA job {airtable_job_id} ({param_operation}) processed as failed.', 'error': nca_error_message}), 200
 
@@ -561,6 +580,43 @@ def nca_toolkit_webhook():
         return jsonify({'status': 'error', 'message': f"Internal server error: {str(e)}", 'traceback': tb_str}), 500
 
 
+def refresh_parent_progress(job_record, job_id, status):
+    """Update the fan-out parent of a child job, if it has one, after the child's status changed."""
+    try:
+        parent_job_id = job_payload_from_fields(job_record['fields']).get('parent_job_id')
+    except ValueError:
+        return
+    if not parent_job_id:
+        return
+    try:
+        progress = airtable.refresh_parent_job(parent_job_id, child_statuses={job_id: status})
+        logger.info(f"Parent job {parent_job_id}: {progress['completed']}/{progress['total']} completed, {progress['failed']} failed")
+    except Exception as e:
+        # The child's own update already succeeded; the progress endpoint recomputes on demand
+        logger.error(f"Failed to refresh parent job {parent_job_id} after child {job_id} finished: {e}")
+
+
+def continue_planned_concat(job_record, job_id, result):
+    """Submit the parent concat of a normalization job once all of its siblings have finished."""
+    try:
+        parent_job_id = job_payload_from_fields(job_record['fields']).get('parent_job_id')
+    except ValueError:
+        return
+    if not parent_job_id:
+        return
+    try:
+        submitted = submit_after_normalization(airtable, NCAService(), parent_job_id, config.WEBHOOK_BASE_URL,
+                                               child_results={job_id: result})
+        if submitted:
+            logger.info(f"Concat job {parent_job_id} submitted after normalization: {submitted.get('job_id')}")
+    except Exception as e:
+        logger.error(f"Failed to submit concat job {parent_job_id} after normalization job {job_id}: {e}")
+        try:
+            airtable.fail_job(parent_job_id, f"Concat submission after normalization failed: {e}")
+        except Exception as fail_exc:
+            logger.error(f"Failed to mark concat job {parent_job_id} as failed: {fail_exc}")
+
+
 # ADD NEW FUNCTION: NCA Job Validation
 def validate_nca_job_exists(job_id, max_retries=3, retry_delay=2):
     """
@@ -611,6 +667,7 @@ def validate_nca_job_exists(job_id, max_retries=3, retry_delay=2):
 
 @webhooks_bp.route('/goapi', methods=['POST'])
 @webhook_validation_required('goapi')
+@airtable.buffered_writes()
 def goapi_webhook():
     """Handle GoAPI music generation callbacks with Pydantic validation."""
     try:
@@ -752,15 +809,9 @@ def goapi_webhook():
                         # Fallback: If 'Related Video' is not populated (e.g. older jobs or different setup),
                         # try to parse from the 'Request Payload' stored in the 'Jobs' record.
                         # The 'generate_and_add_music_webhook' function in routes_v2.py sends 'record_id'.
-                        request_payload_str = job['fields'].get('Request Payload', '{}')
                         try:
-                            import ast
-                            # Ensure the string is a valid dict literal, handle potential 'None' or other non-dict strings
-                            if request_payload_str and request_payload_str.strip().startswith('{') and request_payload_str.strip().endswith('}'):
-                                payload_data = ast.literal_eval(request_payload_str)
-                                video_id = payload_data.get('record_id') # 'record_id' is used by generate_and_add_music_webhook
-                            else:
-                                logger.warning(f"Request Payload for job {job_id} is not a dict string: {request_payload_str}")
+                            payload_data = job_payload_from_fields(job['fields'])
+                            video_id = payload_data.record_id # 'record_id' is used by generate_and_add_music_webhook
                         except Exception as e_parse:
                             logger.error(f"Failed to parse Request Payload for video_id (job {job_id}): {e_parse}")
                         
@@ -795,8 +846,7 @@ def goapi_webhook():
                         # Fallback: Extract from Request Payload
                         request_payload = job['fields'].get('Request Payload', '{}')
                         try:
-                            import ast
-                            payload_data = ast.literal_eval(request_payload)
+                            payload_data = parse_job_payload(request_payload)
                             segment_id = payload_data.get('segment_id')
                         except Exception as e:
                             logger.error(f"Failed to parse Request Payload for segment ID: {e}")
@@ -836,8 +886,7 @@ def goapi_webhook():
                         # Fallback: Extract from Request Payload
                         request_payload = job['fields'].get('Request Payload', '{}')
                         try:
-                            import ast
-                            payload_data = ast.literal_eval(request_payload)
+                            payload_data = parse_job_payload(request_payload)
                             video_id = payload_data.get('record_id') or payload_data.get('video_id')
                         except Exception as e:
                             logger.error(f"Failed to parse Request Payload for video ID: {e}")
@@ -937,8 +986,7 @@ def goapi_webhook():
                     else:
                         request_payload = job['fields'].get('Request Payload', '{}')
                         try:
-                            import ast
-                            payload_data = ast.literal_eval(request_payload)
+                            payload_data = parse_job_payload(request_payload)
                             segment_id = payload_data.get('segment_id')
                         except:
                             segment_id = None
@@ -969,8 +1017,7 @@ def goapi_webhook():
                         # Fallback: Extract from Request Payload
                         request_payload = job['fields'].get('Request Payload', '{}')
                         try:
-                            import ast
-                            payload_data = ast.literal_eval(request_payload)
+                            payload_data = parse_job_payload(request_payload)
                             video_id = payload_data.get('record_id') or payload_data.get('video_id')
                         except:
                             video_id = None
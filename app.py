@@ -15,6 +15,13 @@ from api.webhooks import webhooks_bp
 from utils.logger import setup_logging, APILogger
 from flask_swagger_ui import get_swaggerui_blueprint
 from utils.metrics import MetricsCollector
+from utils.rate_limiter import rate_limit_priority, PRIORITY_BACKGROUND
+from utils.s3 import get_upload_index
+from utils.backup_queue import get_backup_queue
+from services.media_backend import local_backend_stats
+from services.media_probe import media_probe_stats
+from services.tts_cache import tts_cache_stats
+from services.markup_cache import markup_cache_stats
 from datetime import datetime
 import time
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -103,6 +110,38 @@ def create_app(config_name=None):
         
         return response
     
+    # Flush coalesced Airtable writes at the end of every request
+    from services.airtable_service import get_job_index, get_rate_limiter, get_reference_cache, get_write_buffer
+    if config_obj.AIRTABLE_WRITE_BUFFER_ENABLED:
+        @app.teardown_request
+        def flush_airtable_writes(exc):
+            """Write any Airtable updates buffered during the request."""
+            try:
+                get_write_buffer().flush()
+            except Exception as e:
+                app.logger.error(f"Failed to flush Airtable write buffer: {e}")
+        
+        metrics_collector.register_provider('airtable_write_buffer', lambda: get_write_buffer().stats())
+    
+    # Report reference cache effectiveness on /metrics
+    metrics_collector.register_provider('airtable_reference_cache', lambda: get_reference_cache().stats())
+    if config_obj.AIRTABLE_RATE_LIMIT_ENABLED:
+        metrics_collector.register_provider('airtable_rate_limiter', lambda: get_rate_limiter().stats())
+    if config_obj.JOB_INDEX_ENABLED:
+        metrics_collector.register_provider('job_index', lambda: get_job_index().stats())
+    if config_obj.S3_CONTENT_HASH_UPLOADS:
+        metrics_collector.register_provider('upload_dedup', lambda: get_upload_index(config_obj).stats())
+    if config_obj.BACKUP_QUEUE_ENABLED:
+        metrics_collector.register_provider('backup_queue', lambda: get_backup_queue(config_obj).stats())
+    if config_obj.MEDIA_BACKEND in ('local', 'auto'):
+        metrics_collector.register_provider('local_ffmpeg', local_backend_stats)
+    if config_obj.MEDIA_PROBE_ENABLED:
+        metrics_collector.register_provider('media_probe', media_probe_stats)
+    if config_obj.TTS_CACHE_ENABLED:
+        metrics_collector.register_provider('tts_cache', tts_cache_stats)
+    if config_obj.MARKUP_CACHE_ENABLED:
+        metrics_collector.register_provider('markup_cache', markup_cache_stats)
+    
     # Metrics endpoint
     @app.route('/metrics')
     @limiter.exempt
@@ -257,10 +296,24 @@ def create_app(config_name=None):
             """Check for stuck jobs periodically."""
             try:
                 logger.info("Running scheduled job check")
-                job_monitor.run_check_cycle()
+                # Polling yields to request handlers for the shared Airtable budget
+                with rate_limit_priority(PRIORITY_BACKGROUND):
+                    job_monitor.run_check_cycle()
             except Exception as e:
                 logger.error(f"Error in scheduled job check: {e}")
         
+        if app.config.get('JOB_INDEX_ENABLED'):
+            reconcile_interval = app.config.get('JOB_INDEX_RECONCILE_MINUTES', 5)
+            
+            @scheduler.scheduled_job('interval', minutes=reconcile_interval)
+            def reconcile_job_index():
+                """Pull job changes made outside the service into the local job index."""
+                try:
+                    with rate_limit_priority(PRIORITY_BACKGROUND):
+                        job_monitor.airtable.reconcile_job_index()
+                except Exception as e:
+                    logger.error(f"Error reconciling job index: {e}")
+        
         # Start the scheduler
         scheduler.start()
         logger.info(f"Job polling enabled - checking every {polling_interval} minutes")
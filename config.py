@@ -2,6 +2,7 @@
 
 import os
 import logging
+import tempfile
 from typing import List
 from dotenv import load_dotenv
 import sentry_sdk
@@ -48,6 +49,40 @@ class Config:
     AIRTABLE_API_KEY = os.getenv('AIRTABLE_API_KEY')
     AIRTABLE_BASE_ID = os.getenv('AIRTABLE_BASE_ID')
     
+    # Batched Airtable reads (record IDs per RECORD_ID() formula query, parallel chunk fetches)
+    AIRTABLE_BATCH_READ_CHUNK_SIZE = int(os.getenv('AIRTABLE_BATCH_READ_CHUNK_SIZE', '50'))
+    AIRTABLE_BATCH_READ_WORKERS = int(os.getenv('AIRTABLE_BATCH_READ_WORKERS', '1'))
+    
+    # Per-process cache for reference tables that rarely change (seconds, max entries)
+    AIRTABLE_REFERENCE_CACHE_ENABLED = os.getenv('AIRTABLE_REFERENCE_CACHE_ENABLED', 'true').lower() == 'true'
+    AIRTABLE_REFERENCE_CACHE_TTL = int(os.getenv('AIRTABLE_REFERENCE_CACHE_TTL', '300'))
+    AIRTABLE_REFERENCE_CACHE_SIZE = int(os.getenv('AIRTABLE_REFERENCE_CACHE_SIZE', '256'))
+    
+    # Opt-in coalescing of record updates into batch_update calls (seconds between timed flushes)
+    AIRTABLE_WRITE_BUFFER_ENABLED = os.getenv('AIRTABLE_WRITE_BUFFER_ENABLED', 'false').lower() == 'true'
+    AIRTABLE_WRITE_BUFFER_FLUSH_INTERVAL = float(os.getenv('AIRTABLE_WRITE_BUFFER_FLUSH_INTERVAL', '2.0'))
+    
+    # Token bucket shared by all workers (Airtable allows 5 requests/second per base).
+    # Backend is 'file' (flock'd file, per host), 'redis' (all hosts) or 'memory' (per process).
+    AIRTABLE_RATE_LIMIT_ENABLED = os.getenv('AIRTABLE_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    AIRTABLE_RATE_LIMIT_BACKEND = os.getenv('AIRTABLE_RATE_LIMIT_BACKEND', 'file')
+    AIRTABLE_RATE_LIMIT_PER_SECOND = float(os.getenv('AIRTABLE_RATE_LIMIT_PER_SECOND', '5'))
+    AIRTABLE_RATE_LIMIT_BURST = float(os.getenv('AIRTABLE_RATE_LIMIT_BURST', '5'))
+    AIRTABLE_RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv('AIRTABLE_RATE_LIMIT_BACKGROUND_RESERVE', '2'))
+    AIRTABLE_RATE_LIMIT_MAX_WAIT = float(os.getenv('AIRTABLE_RATE_LIMIT_MAX_WAIT', '60'))
+    AIRTABLE_RATE_LIMIT_FILE = os.getenv(
+        'AIRTABLE_RATE_LIMIT_FILE',
+        os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'yve-airtable-ratelimit.json')
+    )
+    AIRTABLE_RATE_LIMIT_REDIS_URL = os.getenv('AIRTABLE_RATE_LIMIT_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+    # Locks and semaphores shared by all workers (concat submission, ElevenLabs request slots).
+    # Same backends as the token bucket: 'file' (per host), 'redis' (all hosts) or 'memory' (per process).
+    SHARED_LOCK_BACKEND = os.getenv('SHARED_LOCK_BACKEND', AIRTABLE_RATE_LIMIT_BACKEND)
+    SHARED_LOCK_DIR = os.getenv('SHARED_LOCK_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+    SHARED_LOCK_REDIS_URL = os.getenv('SHARED_LOCK_REDIS_URL', AIRTABLE_RATE_LIMIT_REDIS_URL)
+    AIRTABLE_THROTTLE_PAUSE_SECONDS = float(os.getenv('AIRTABLE_THROTTLE_PAUSE_SECONDS', '30'))
+    AIRTABLE_THROTTLE_MAX_RETRIES = int(os.getenv('AIRTABLE_THROTTLE_MAX_RETRIES', '3'))
+    
     # NCA Toolkit Configuration
     NCA_API_KEY = os.getenv('NCA_API_KEY', 'K2_JVFN!csh&i1248')
     NCA_BASE_URL = os.getenv('NCA_BASE_URL', 'https://no-code-architect-app-gpxhq.ondigitalocean.app')
@@ -57,6 +92,39 @@ class Config:
     NCA_S3_SECRET_KEY = os.getenv('NCA_S3_SECRET_KEY')
     NCA_S3_REGION = os.getenv('NCA_S3_REGION', 'nyc3')
     
+    # Where FFmpeg jobs run: 'nca', 'local' (in-house ffmpeg) or 'auto' (stream-copy jobs local, the rest on NCA)
+    MEDIA_BACKEND = os.getenv('MEDIA_BACKEND', 'nca').lower()
+    LOCAL_FFMPEG_PATH = os.getenv('LOCAL_FFMPEG_PATH', 'ffmpeg')
+    LOCAL_FFMPEG_WORKERS = int(os.getenv('LOCAL_FFMPEG_WORKERS', '2'))
+    LOCAL_FFMPEG_TIMEOUT_SECONDS = int(os.getenv('LOCAL_FFMPEG_TIMEOUT_SECONDS', '1800'))
+    
+    # ffprobe metadata for asset URLs, cached by URL + ETag in a local SQLite file
+    MEDIA_PROBE_ENABLED = os.getenv('MEDIA_PROBE_ENABLED', 'true').lower() == 'true'
+    FFPROBE_PATH = os.getenv('FFPROBE_PATH', 'ffprobe')
+    MEDIA_PROBE_CACHE_PATH = os.getenv('MEDIA_PROBE_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'yve-media-probe.sqlite3'))
+    MEDIA_PROBE_TIMEOUT_SECONDS = int(os.getenv('MEDIA_PROBE_TIMEOUT_SECONDS', '30'))
+    MEDIA_PROBE_WORKERS = int(os.getenv('MEDIA_PROBE_WORKERS', '4'))
+    
+    # Zoom video style renderer: 'smooth' (3x upscale, 60 fps zoompan) or 'fast'; a segment's 'Zoom Mode' overrides it
+    ZOOM_RENDER_MODE = os.getenv('ZOOM_RENDER_MODE', 'smooth').lower()
+    
+    # Default encoding profile for re-encoded streams: 'draft', 'standard' or 'final' (the pre-profile settings)
+    ENCODING_PROFILE = os.getenv('ENCODING_PROFILE', 'final').lower()
+    
+    # Concurrent segment mux submissions per /combine-all-segment-media request
+    COMBINE_ALL_MAX_CONCURRENCY = int(os.getenv('COMBINE_ALL_MAX_CONCURRENCY', '8'))
+    
+    # Shared S3 client pool and multipart upload tuning
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32'))
+    S3_MULTIPART_THRESHOLD_MB = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', '16'))
+    S3_MULTIPART_CHUNK_MB = int(os.getenv('S3_MULTIPART_CHUNK_MB', '8'))
+    S3_MULTIPART_CONCURRENCY = int(os.getenv('S3_MULTIPART_CONCURRENCY', '4'))
+    
+    # Content-addressed uploads: identical bytes map to one object keyed by SHA-256 (opt-in;
+    # NCAService.upload_file also takes content_hash per call)
+    S3_CONTENT_HASH_UPLOADS = os.getenv('S3_CONTENT_HASH_UPLOADS', 'false').lower() == 'true'
+    S3_CONTENT_INDEX_PATH = os.getenv('S3_CONTENT_INDEX_PATH', os.path.join(tempfile.gettempdir(), 'yve-upload-index.sqlite3'))
+    
     # Local backup configuration
     LOCAL_BACKUP_PATH = os.getenv('LOCAL_BACKUP_PATH', './local_backups')
     
@@ -64,9 +132,29 @@ class Config:
     LOCAL_RECEIVER_URL = os.getenv('LOCAL_RECEIVER_URL')  # e.g., http://192.168.1.100:8181
     LOCAL_UPLOAD_SECRET = os.getenv('LOCAL_UPLOAD_SECRET')  # Shared secret for authentication
     
+    # Remote backups are spooled to disk and sent by background workers
+    BACKUP_QUEUE_ENABLED = os.getenv('BACKUP_QUEUE_ENABLED', 'true').lower() == 'true'
+    BACKUP_QUEUE_DIR = os.getenv('BACKUP_QUEUE_DIR', os.path.join(tempfile.gettempdir(), 'yve-backup-spool'))
+    BACKUP_QUEUE_WORKERS = int(os.getenv('BACKUP_QUEUE_WORKERS', '2'))
+    BACKUP_QUEUE_BATCH_SIZE = int(os.getenv('BACKUP_QUEUE_BATCH_SIZE', '10'))
+    BACKUP_QUEUE_MAX_MB = int(os.getenv('BACKUP_QUEUE_MAX_MB', '2048'))
+    BACKUP_QUEUE_MAX_ATTEMPTS = int(os.getenv('BACKUP_QUEUE_MAX_ATTEMPTS', '20'))
+    BACKUP_QUEUE_BACKOFF_SECONDS = float(os.getenv('BACKUP_QUEUE_BACKOFF_SECONDS', '5'))
+    BACKUP_QUEUE_MAX_BACKOFF_SECONDS = float(os.getenv('BACKUP_QUEUE_MAX_BACKOFF_SECONDS', '900'))
+    
     # ElevenLabs Configuration
     ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
     ELEVENLABS_BASE_URL = 'https://api.elevenlabs.io/v1'
+    # Concurrent TTS requests allowed by the ElevenLabs plan (e.g. Creator 5, Pro 10, Scale 15)
+    ELEVENLABS_MAX_CONCURRENCY = int(os.getenv('ELEVENLABS_MAX_CONCURRENCY', '5'))
+    ELEVENLABS_MODEL_ID = os.getenv('ELEVENLABS_MODEL_ID', 'eleven_multilingual_v2')
+    # Stream TTS audio straight into the S3 upload instead of buffering the whole MP3
+    ELEVENLABS_STREAMING = os.getenv('ELEVENLABS_STREAMING', 'true').lower() == 'true'
+    ELEVENLABS_STREAM_CHUNK_BYTES = int(os.getenv('ELEVENLABS_STREAM_CHUNK_BYTES', str(64 * 1024)))
+    
+    # Synthesized voiceovers are reused when text, voice, model and settings are unchanged
+    TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+    TTS_CACHE_PATH = os.getenv('TTS_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'yve-tts-cache.sqlite3'))
     
     # GoAPI Configuration
     GOAPI_API_KEY = os.getenv('GOAPI_API_KEY')
@@ -75,6 +163,21 @@ class Config:
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_BASE_URL = 'https://api.openai.com/v1'
+    # OpenAI request budget for markup generation (requests per minute of the account tier)
+    OPENAI_RATE_LIMIT_PER_MINUTE = float(os.getenv('OPENAI_RATE_LIMIT_PER_MINUTE', '500'))
+    OPENAI_RATE_LIMIT_PAUSE_SECONDS = float(os.getenv('OPENAI_RATE_LIMIT_PAUSE_SECONDS', '10'))
+    # Concurrent markup requests per /process-script call
+    MARKUP_MAX_CONCURRENCY = int(os.getenv('MARKUP_MAX_CONCURRENCY', '8'))
+    # Segments marked up per request by the batched mode (1 = one request per segment)
+    MARKUP_BATCH_SIZE = int(os.getenv('MARKUP_BATCH_SIZE', '10'))
+    # Generated markup is reused while a line, its neighbours, the prompt and the model are unchanged
+    MARKUP_CACHE_ENABLED = os.getenv('MARKUP_CACHE_ENABLED', 'true').lower() == 'true'
+    MARKUP_CACHE_PATH = os.getenv('MARKUP_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'yve-markup-cache.sqlite3'))
+    # Segments per request when generating a video's AI image prompts (the script is sent once per request)
+    AI_IMAGE_PROMPT_BATCH_SIZE = int(os.getenv('AI_IMAGE_PROMPT_BATCH_SIZE', '25'))
+    # Concurrent image prompt requests per /generate-ai-image-prompts call
+    AI_IMAGE_PROMPT_MAX_CONCURRENCY = int(os.getenv('AI_IMAGE_PROMPT_MAX_CONCURRENCY', '4'))
+    AI_IMAGE_UPLOAD_WORKERS = int(os.getenv('AI_IMAGE_UPLOAD_WORKERS', '4'))
     
     # Application Configuration
     WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', 'http://localhost:5000')
@@ -83,6 +186,29 @@ class Config:
     POLLING_ENABLED = os.getenv('POLLING_ENABLED', 'true').lower() == 'true'
     POLLING_INTERVAL_MINUTES = int(os.getenv('POLLING_INTERVAL_MINUTES', '2'))
     POLLING_MAX_AGE_HOURS = int(os.getenv('POLLING_MAX_AGE_HOURS', '24'))
+    
+    # Stuck-job scan: re-read only rows changed since the last cycle (with this much overlap),
+    # and rescan everything every N cycles
+    JOB_MONITOR_INCREMENTAL_SCAN = os.getenv('JOB_MONITOR_INCREMENTAL_SCAN', 'true').lower() == 'true'
+    JOB_MONITOR_FULL_SCAN_EVERY = int(os.getenv('JOB_MONITOR_FULL_SCAN_EVERY', '30'))
+    JOB_MONITOR_WATERMARK_OVERLAP_SECONDS = int(os.getenv('JOB_MONITOR_WATERMARK_OVERLAP_SECONDS', '120'))
+    JOB_MONITOR_PAGE_SIZE = int(os.getenv('JOB_MONITOR_PAGE_SIZE', '100'))
+    
+    # Per-cycle output checks: one listing of the NCA output prefix (capped at N pages of 1000 keys),
+    # then concurrent status checks for the rest, deferring whatever doesn't fit in the time budget
+    JOB_MONITOR_OUTPUT_PREFIX = os.getenv('JOB_MONITOR_OUTPUT_PREFIX', 'phi-bucket/')
+    JOB_MONITOR_LIST_MAX_PAGES = int(os.getenv('JOB_MONITOR_LIST_MAX_PAGES', '20'))
+    JOB_MONITOR_STATUS_WORKERS = int(os.getenv('JOB_MONITOR_STATUS_WORKERS', '8'))
+    JOB_MONITOR_CYCLE_BUDGET_SECONDS = int(os.getenv('JOB_MONITOR_CYCLE_BUDGET_SECONDS', '90'))
+    # Background batches (generate-voiceovers, generate-ai-image-prompts) run in a worker thread and record
+    # progress as they go; a batch job with no progress for this long lost its worker and is failed
+    JOB_MONITOR_BATCH_STALE_MINUTES = int(os.getenv('JOB_MONITOR_BATCH_STALE_MINUTES', '15'))
+    
+    # Local SQLite mirror of the Jobs table (Airtable remains the system of record); opt-in
+    JOB_INDEX_ENABLED = os.getenv('JOB_INDEX_ENABLED', 'false').lower() == 'true'
+    JOB_INDEX_PATH = os.getenv('JOB_INDEX_PATH', os.path.join(tempfile.gettempdir(), 'yve-job-index.sqlite3'))
+    JOB_INDEX_RECONCILE_MINUTES = int(os.getenv('JOB_INDEX_RECONCILE_MINUTES', '5'))
+    JOB_INDEX_RETENTION_HOURS = int(os.getenv('JOB_INDEX_RETENTION_HOURS', '72'))
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     
     # Rate Limiting Configuration
@@ -99,6 +225,10 @@ class Config:
     VOICES_TABLE = 'Voices'
     JOBS_TABLE = 'Jobs'
     WEBHOOK_EVENTS_TABLE = 'Webhook Events'
+    IMAGE_THEMES_TABLE = 'Image Themes'
+    
+    # Tables served from the reference cache
+    AIRTABLE_REFERENCE_TABLES = [VOICES_TABLE, IMAGE_THEMES_TABLE]
     
     # Job Types
     JOB_TYPE_VOICEOVER = 'voiceover'
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Zoom video renderers: encode time and SSIM against the smooth renderer.
+
+Renders the same still with every zoom mode using the local ffmpeg binary and
+the exact payloads the API would send to NCA, then compares each output with
+the 'smooth' render at the 'final' profile frame by frame (after matching
+frame size and rate).
+
+Usage:
+    python scripts/benchmark_zoom.py path/to/image.jpg
+    python scripts/benchmark_zoom.py https://example.com/image.png --duration 8 --profile standard
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.encoding_profiles import ENCODING_PROFILES, PROFILE_FINAL, get_encoding_profile
+from services.media_backend import build_ffmpeg_command
+from services.zoom_renderer import ZOOM_MODE_SMOOTH, ZOOM_MODES, build_zoom_payload
+
+
+def render(ffmpeg: str, image: str, duration: float, mode: str, profile, output_path: str) -> float:
+    """Render one mode and return the wall-clock seconds it took."""
+    command = build_ffmpeg_command(build_zoom_payload(image, duration, mode, profile), [output_path], ffmpeg)
+    started = time.monotonic()
+    subprocess.run(command, check=True, capture_output=True)
+    return time.monotonic() - started
+
+
+def ssim(ffmpeg: str, reference_path: str, candidate_path: str, profile) -> float:
+    """Mean SSIM of candidate against reference, sampled at the candidate's size and frame rate."""
+    completed = subprocess.run([
+        ffmpeg, '-hide_banner', '-nostdin', '-i', reference_path, '-i', candidate_path,
+        '-lavfi', f"[0:v]fps={profile.fps},scale={profile.width}:{profile.height}[ref];[ref][1:v]ssim",
+        '-f', 'null', '-'
+    ], check=True, capture_output=True, text=True)
+    match = re.search(r'All:([0-9.]+)', completed.stderr)
+    return float(match.group(1)) if match else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('image', help='Image path or URL')
+    parser.add_argument('--duration', type=float, default=6.0, help='Clip length in seconds')
+    parser.add_argument('--ffmpeg', default='ffmpeg', help='ffmpeg binary')
+    parser.add_argument('--profile', default=PROFILE_FINAL, choices=sorted(ENCODING_PROFILES),
+                        help='Encoding profile for the candidate modes (the reference is always smooth/final)')
+    args = parser.parse_args()
+    profile = get_encoding_profile(args.profile)
+    reference_profile = get_encoding_profile(PROFILE_FINAL)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        reference = os.path.join(workdir, 'reference.mp4')
+        baseline = render(args.ffmpeg, args.image, args.duration, ZOOM_MODE_SMOOTH, reference_profile, reference)
+
+        print(f"{'mode':<8} {'profile':<9} {'seconds':>9} {'speedup':>8} {'ssim':>7}")
+        print(f"{ZOOM_MODE_SMOOTH:<8} {reference_profile.name:<9} {baseline:>9.2f} {1.0:>7.1f}x {1.0:>7.4f}")
+        for mode in ZOOM_MODES:
+            output_path = os.path.join(workdir, f"{mode}.mp4")
+            seconds = render(args.ffmpeg, args.image, args.duration, mode, profile, output_path)
+            # SSIM needs matching frame sizes; compare at the candidate's size and frame rate
+            score = ssim(args.ffmpeg, reference, output_path, profile)
+            print(f"{mode:<8} {profile.name:<9} {seconds:>9.2f} {baseline / seconds:>7.1f}x {score:>7.4f}")
+
+
+if __name__ == '__main__':
+    main()
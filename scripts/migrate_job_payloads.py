@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+One-shot migration of Jobs 'Request Payload' values to the versioned JSON encoding.
+
+Older rows were written with str(dict) (or bare JSON) and had to be parsed with
+ast.literal_eval. The reader in utils/job_payload.py still accepts them, but
+rewriting them once lets every reader take the fast JSON path.
+
+Usage:
+    python scripts/migrate_job_payloads.py --dry-run
+    python scripts/migrate_job_payloads.py
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.airtable_service import AirtableService
+from utils.job_payload import encode_job_payload, parse_job_payload
+
+
+def migrate(dry_run: bool = False, batch_size: int = 10):
+    """Rewrite legacy Request Payload values in the Jobs table."""
+    airtable = AirtableService()
+    jobs_table = airtable.jobs_table
+
+    scanned = 0
+    current = 0
+    unparseable = []
+    pending = []
+    migrated = 0
+
+    def flush():
+        nonlocal migrated
+        if pending and not dry_run:
+            jobs_table.batch_update(pending)
+        migrated += len(pending)
+        pending.clear()
+
+    for page in jobs_table.iterate(formula="{Request Payload} != ''", fields=['Request Payload']):
+        for record in page:
+            scanned += 1
+            raw = record['fields'].get('Request Payload')
+            try:
+                payload = parse_job_payload(raw)
+            except ValueError:
+                unparseable.append(record['id'])
+                continue
+
+            if not payload.is_legacy:
+                current += 1
+                continue
+
+            pending.append({'id': record['id'], 'fields': {'Request Payload': encode_job_payload(payload.data)}})
+            if len(pending) >= batch_size:
+                flush()
+    flush()
+
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"Scanned {scanned} jobs with a Request Payload")
+    print(f"  {action}: {migrated}")
+    print(f"  Already current: {current}")
+    print(f"  Unparseable (left as-is): {len(unparseable)}")
+    for record_id in unparseable:
+        print(f"    {record_id}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+    args = parser.parse_args()
+    migrate(dry_run=args.dry_run)
@@ -1,15 +1,252 @@
 """Airtable service for YouTube Video Engine."""
 
+import atexit
+import json
 import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Any
-from pyairtable import Api
-from pyairtable.formulas import match
+from pyairtable import Api, retry_strategy
+from pyairtable.formulas import match, OR, escape_quotes
 from config import get_config
+from services.job_index import JobIndex
+from utils.cache import TTLCache
+from utils.job_payload import encode_job_payload, job_payload_from_fields
+from utils.job_progress import FAILED_STATUSES, summarize_progress
 from utils.logger import APILogger
+from utils.rate_limiter import FileTokenBucket, LocalTokenBucket, RateLimitedAdapter, RedisTokenBucket, TokenBucket
 
 logger = logging.getLogger(__name__)
 api_logger = APILogger()
 
+# Per-process cache for rarely-changing reference tables (Voices, Image Themes).
+# Shared by every AirtableService instance in the worker.
+_reference_cache: Optional[TTLCache] = None
+
+
+def get_reference_cache() -> TTLCache:
+    """Return the process-wide reference table cache, creating it on first use."""
+    global _reference_cache
+    if _reference_cache is None:
+        config = get_config()()
+        _reference_cache = TTLCache(
+            ttl_seconds=config.AIRTABLE_REFERENCE_CACHE_TTL,
+            max_size=config.AIRTABLE_REFERENCE_CACHE_SIZE
+        )
+    return _reference_cache
+
+
+# Per-process handle on the token bucket shared by every worker talking to the base.
+_rate_limiter: Optional[TokenBucket] = None
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Return the Airtable token bucket, creating it on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        config = get_config()()
+        bucket_args = (config.AIRTABLE_RATE_LIMIT_PER_SECOND, config.AIRTABLE_RATE_LIMIT_BURST)
+        bucket_kwargs = {
+            'background_reserve': config.AIRTABLE_RATE_LIMIT_BACKGROUND_RESERVE,
+            'max_wait': config.AIRTABLE_RATE_LIMIT_MAX_WAIT
+        }
+        backend = config.AIRTABLE_RATE_LIMIT_BACKEND
+        if backend == 'redis':
+            _rate_limiter = RedisTokenBucket(config.AIRTABLE_RATE_LIMIT_REDIS_URL,
+                                             f"airtable-ratelimit:{config.AIRTABLE_BASE_ID}",
+                                             *bucket_args, **bucket_kwargs)
+        elif backend == 'file':
+            _rate_limiter = FileTokenBucket(config.AIRTABLE_RATE_LIMIT_FILE, *bucket_args, **bucket_kwargs)
+        else:
+            _rate_limiter = LocalTokenBucket(*bucket_args, **bucket_kwargs)
+    return _rate_limiter
+
+
+class AirtableWriteBuffer:
+    """Coalesces field updates per record and flushes them with batch_update.
+
+    Pending updates are merged per record (later values win), so several small
+    writes to the same record become one. Each table is flushed in groups of
+    ``batch_size`` records as soon as a group is full, after ``flush_interval``
+    seconds, or when flush() is called explicitly (e.g. at the end of a request).
+    """
+
+    def __init__(self, batch_size: int = 10, flush_interval: float = 2.0):
+        """
+        Initialize the buffer.
+
+        Args:
+            batch_size: Records per batch_update call (Airtable allows at most 10)
+            flush_interval: Seconds before pending updates are flushed by the timer
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, 'OrderedDict[str, Dict]'] = {}
+        self._tables: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+        # Counters
+        self.queued = 0
+        self.coalesced = 0
+        self.flushed_records = 0
+        self.batch_calls = 0
+        self.failed_records = 0
+
+    def add(self, table_name: str, table, record_id: str, fields: Dict) -> Dict:
+        """Queue a field update, merging it into any pending update for the record.
+
+        Returns:
+            Record-shaped dict with the merged pending fields
+        """
+        with self._lock:
+            self._tables[table_name] = table
+            records = self._pending.setdefault(table_name, OrderedDict())
+            self.queued += 1
+            if record_id in records:
+                self.coalesced += 1
+                records[record_id].update(fields)
+            else:
+                records[record_id] = dict(fields)
+            merged = {'id': record_id, 'fields': dict(records[record_id])}
+            table_full = len(records) >= self.batch_size
+
+        if table_full:
+            self.flush(table_name)
+        else:
+            self._schedule_flush()
+        return merged
+
+    def take(self, table_name: str, record_id: str) -> Dict:
+        """Remove and return the pending fields for a record (empty if none)."""
+        with self._lock:
+            records = self._pending.get(table_name)
+            if not records:
+                return {}
+            return records.pop(record_id, None) or {}
+
+    def pending_count(self) -> int:
+        """Number of records with unflushed updates."""
+        with self._lock:
+            return sum(len(records) for records in self._pending.values())
+
+    def flush(self, table_name: Optional[str] = None) -> int:
+        """Write pending updates to Airtable.
+
+        Args:
+            table_name: Flush only this table (all tables if omitted)
+
+        Returns:
+            Number of records written
+        """
+        with self._lock:
+            table_names = [table_name] if table_name else list(self._pending)
+            work = []
+            for name in table_names:
+                records = self._pending.pop(name, None)
+                if records:
+                    work.append((name, self._tables[name], list(records.items())))
+            if not self._pending and self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+        written = 0
+        for name, table, records in work:
+            for i in range(0, len(records), self.batch_size):
+                chunk = records[i:i + self.batch_size]
+                written += self._write_chunk(name, table, chunk)
+        return written
+
+    def _write_chunk(self, table_name: str, table, chunk: List) -> int:
+        """Write one group of records, falling back to per-record updates on failure."""
+        try:
+            table.batch_update([{'id': record_id, 'fields': fields} for record_id, fields in chunk])
+            with self._lock:
+                self.batch_calls += 1
+                self.flushed_records += len(chunk)
+            return len(chunk)
+        except Exception as e:
+            # One bad record (e.g. an unknown select option) rejects the whole batch,
+            # so retry individually to get the rest through.
+            logger.warning(f"Batch update of {len(chunk)} {table_name} records failed, retrying individually: {e}")
+            api_logger.log_error('airtable', e, {'operation': 'write_buffer_flush', 'table': table_name,
+                                                 'records': len(chunk)})
+
+        written = 0
+        for record_id, fields in chunk:
+            try:
+                table.update(record_id, fields)
+                written += 1
+            except Exception as e:
+                api_logger.log_error('airtable', e, {'operation': 'write_buffer_flush_record',
+                                                     'table': table_name, 'record_id': record_id})
+        with self._lock:
+            self.flushed_records += written
+            self.failed_records += len(chunk) - written
+        return written
+
+    def _schedule_flush(self):
+        """Start the flush timer if it isn't already running."""
+        with self._lock:
+            if self._timer is not None or not self._pending:
+                return
+            self._timer = threading.Timer(self.flush_interval, self._timer_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timer_flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Timed write buffer flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return buffer counters for metrics reporting."""
+        pending = self.pending_count()
+        with self._lock:
+            return {
+                'pending_records': pending,
+                'queued_updates': self.queued,
+                'coalesced_updates': self.coalesced,
+                'flushed_records': self.flushed_records,
+                'batch_calls': self.batch_calls,
+                'failed_records': self.failed_records
+            }
+
+
+# Per-process write buffer, shared by every AirtableService instance in the worker.
+_write_buffer: Optional[AirtableWriteBuffer] = None
+
+
+def get_write_buffer() -> AirtableWriteBuffer:
+    """Return the process-wide write buffer, creating it on first use."""
+    global _write_buffer
+    if _write_buffer is None:
+        config = get_config()()
+        _write_buffer = AirtableWriteBuffer(
+            flush_interval=config.AIRTABLE_WRITE_BUFFER_FLUSH_INTERVAL
+        )
+        atexit.register(_write_buffer.flush)
+    return _write_buffer
+
+
+# Per-process handle on the SQLite job index shared by every worker on the host.
+_job_index: Optional[JobIndex] = None
+
+
+def get_job_index() -> JobIndex:
+    """Return the local job index, opening it on first use."""
+    global _job_index
+    if _job_index is None:
+        config = get_config()()
+        _job_index = JobIndex(config.JOB_INDEX_PATH)
+    return _job_index
+
 
 class AirtableService:
     """Service for interacting with Airtable."""
@@ -49,6 +286,8 @@ class AirtableService:
         self.logger = logging.getLogger(__name__) # Initialize logger for the service instance
         self.config = get_config()()
         self.api = Api(self.config.AIRTABLE_API_KEY)
+        if self.config.AIRTABLE_RATE_LIMIT_ENABLED:
+            self._install_rate_limiter()
         self.base = self.api.base(self.config.AIRTABLE_BASE_ID)
         
         # Table references
@@ -57,6 +296,81 @@ class AirtableService:
         self.voices_table = self.base.table(self.config.VOICES_TABLE)
         self.jobs_table = self.base.table(self.config.JOBS_TABLE)
         self.webhook_events_table = self.base.table(self.config.WEBHOOK_EVENTS_TABLE)
+        
+        # Reference tables served from the per-process TTL cache
+        self.reference_tables = set(self.config.AIRTABLE_REFERENCE_TABLES)
+        self.reference_cache = get_reference_cache() if self.config.AIRTABLE_REFERENCE_CACHE_ENABLED else None
+        
+        # Local mirror of the Jobs table for fast status reads and webhook routing
+        self.job_index = get_job_index() if self.config.JOB_INDEX_ENABLED else None
+        
+        # Opt-in write coalescing (see buffered_writes)
+        self.write_buffer = get_write_buffer() if self.config.AIRTABLE_WRITE_BUFFER_ENABLED else None
+        self._buffering = threading.local()
+        self._tables_by_name = {
+            self.config.VIDEOS_TABLE: self.videos_table,
+            self.config.SEGMENTS_TABLE: self.segments_table,
+            self.config.JOBS_TABLE: self.jobs_table,
+            self.config.WEBHOOK_EVENTS_TABLE: self.webhook_events_table
+        }
+    
+    def _install_rate_limiter(self):
+        """Route every request from this service through the shared token bucket.
+        
+        The adapter handles 429s itself (pausing all workers for Retry-After), so
+        urllib3 only retries connection errors here.
+        """
+        adapter = RateLimitedAdapter(
+            get_rate_limiter(),
+            throttle_pause=self.config.AIRTABLE_THROTTLE_PAUSE_SECONDS,
+            max_throttle_retries=self.config.AIRTABLE_THROTTLE_MAX_RETRIES,
+            max_retries=retry_strategy(status_forcelist=())
+        )
+        self.api.session.mount('https://', adapter)
+        self.api.session.mount('http://', adapter)
+    
+    # Write buffering
+    @contextmanager
+    def buffered_writes(self):
+        """Coalesce update_* writes made by this thread inside the block.
+        
+        Inside the block, update_video, update_segment, update_job and
+        mark_webhook_processed queue their fields in the write buffer instead of
+        writing immediately, and return the merged pending record. Pending writes
+        are flushed when the outermost block exits. Has no effect unless
+        AIRTABLE_WRITE_BUFFER_ENABLED is set. Also usable as a decorator.
+        """
+        depth = getattr(self._buffering, 'depth', 0)
+        self._buffering.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._buffering.depth = depth
+            if depth == 0 and self.write_buffer:
+                self.write_buffer.flush()
+    
+    def _is_buffering(self) -> bool:
+        return bool(self.write_buffer) and getattr(self._buffering, 'depth', 0) > 0
+    
+    def queue_update(self, table_name: str, record_id: str, fields: Dict) -> Dict:
+        """Queue an update in the write buffer, or write it now if buffering is disabled."""
+        table = self._tables_by_name[table_name]
+        if not self.write_buffer:
+            return table.update(record_id, fields)
+        return self.write_buffer.add(table_name, table, record_id, fields)
+    
+    def _with_pending(self, table_name: str, record_id: str, fields: Dict) -> Dict:
+        """Fold any buffered fields for a record into an immediate write.
+        
+        Keeps a direct write from being overwritten by an older buffered one.
+        """
+        if not self.write_buffer:
+            return fields
+        pending = self.write_buffer.take(table_name, record_id)
+        if not pending:
+            return fields
+        pending.update(fields)
+        return pending
     
     # Video operations
     def create_video(self, name: str, script: str, music_prompt: Optional[str] = None) -> Dict:
@@ -99,6 +413,10 @@ class AirtableService:
                     # Pass through unmapped fields as-is (for direct field names)
                     mapped_fields[key] = value
             
+            if self._is_buffering():
+                return self.queue_update(self.config.VIDEOS_TABLE, video_id, mapped_fields)
+            
+            mapped_fields = self._with_pending(self.config.VIDEOS_TABLE, video_id, mapped_fields)
             record = self.videos_table.update(video_id, mapped_fields)
             api_logger.log_api_response('airtable', 'update_video', 200, record)
             return record
@@ -125,6 +443,7 @@ class AirtableService:
         Note: The existing Videos table doesn't have a Status field, so this logs the intent but may not update.
         """
         fields = additional_fields.copy() if additional_fields else {}
+        fields = self._with_pending(self.config.VIDEOS_TABLE, video_id, fields)
         
         # Try to add Status field if it exists, otherwise just log
         try:
@@ -144,7 +463,7 @@ class AirtableService:
             
             # Try without Status field and with error details if provided
             try:
-                fields_without_status = additional_fields.copy() if additional_fields else {}
+                fields_without_status = {k: v for k, v in fields.items() if k != 'Status'}
                 if error_details:
                     fields_without_status['Error Details'] = error_details
                 
@@ -221,6 +540,10 @@ class AirtableService:
     def update_segment(self, segment_id: str, fields: Dict) -> Dict:
         """Update a segment record."""
         try:
+            if self._is_buffering():
+                return self.queue_update(self.config.SEGMENTS_TABLE, segment_id, fields)
+            
+            fields = self._with_pending(self.config.SEGMENTS_TABLE, segment_id, fields)
             record = self.segments_table.update(segment_id, fields)
             api_logger.log_api_response('airtable', 'update_segment', 200, record)
             return record
@@ -228,9 +551,26 @@ class AirtableService:
             api_logger.log_error('airtable', e, {'operation': 'update_segment', 'segment_id': segment_id})
             raise
     
+    def update_segments(self, updates: Dict[str, Dict]) -> List[Dict]:
+        """Update many segment records with batch_update (10 records per request)."""
+        try:
+            records = [
+                {'id': segment_id, 'fields': self._with_pending(self.config.SEGMENTS_TABLE, segment_id, fields)}
+                for segment_id, fields in updates.items()
+            ]
+            if not records:
+                return []
+            updated = self.segments_table.batch_update(records)
+            api_logger.log_api_response('airtable', 'update_segments', 200, {'count': len(updated)})
+            return updated
+        except Exception as e:
+            api_logger.log_error('airtable', e, {'operation': 'update_segments', 'count': len(updates)})
+            raise
+    
     def safe_update_segment_status(self, segment_id: str, status: str, additional_fields: Optional[Dict] = None) -> Dict:
         """Safely update segment status with fallback to 'Undefined'."""
         fields = additional_fields.copy() if additional_fields else {}
+        fields = self._with_pending(self.config.SEGMENTS_TABLE, segment_id, fields)
         fields['Status'] = status
         
         try:
@@ -265,6 +605,55 @@ class AirtableService:
                 })
                 raise e  # Re-raise original error
 
+    @staticmethod
+    def _segment_sort_key(segment_record: Dict):
+        """Sort key for segment records by 'SRT Segment ID'.
+
+        Sorts numerically if 'SRT Segment ID' is an int or a string representing an int,
+        otherwise sorts as string. Missing values are pushed to the end.
+        """
+        fields = segment_record.get('fields', {})
+        srt_id_value = fields.get('SRT Segment ID')
+        if srt_id_value is None:
+            return (float('inf'), '') # Sort Nones last
+        if isinstance(srt_id_value, (int, float)):
+            return (0, srt_id_value)
+        if isinstance(srt_id_value, str):
+            try:
+                return (0, int(srt_id_value)) # Try to convert string to int
+            except ValueError:
+                return (1, srt_id_value) # Sort as string if not convertible
+        return (2, srt_id_value) # Fallback for other types
+
+    def get_records_by_ids(self, table, record_ids: List[str],
+                           chunk_size: Optional[int] = None,
+                           max_workers: Optional[int] = None) -> List[Dict]:
+        """Fetch many records from a table with chunked RECORD_ID() formula queries.
+
+        Replaces one ``table.get()`` round trip per record with one list request per
+        chunk of IDs. Chunks can optionally be fetched in parallel. Records are returned
+        in the order of ``record_ids``; IDs that no longer exist are skipped.
+        """
+        chunk_size = chunk_size or self.config.AIRTABLE_BATCH_READ_CHUNK_SIZE
+        max_workers = max_workers or self.config.AIRTABLE_BATCH_READ_WORKERS
+
+        # Preserve order and drop duplicate IDs
+        unique_ids = list(dict.fromkeys(record_ids))
+        chunks = [unique_ids[i:i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+
+        def fetch_chunk(chunk_ids: List[str]) -> List[Dict]:
+            formula = OR(*[f"RECORD_ID()='{escape_quotes(record_id)}'" for record_id in chunk_ids])
+            return table.all(formula=formula)
+
+        if max_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                chunk_results = list(executor.map(fetch_chunk, chunks))
+        else:
+            chunk_results = [fetch_chunk(chunk) for chunk in chunks]
+
+        records_by_id = {record['id']: record for records in chunk_results for record in records}
+        return [records_by_id[record_id] for record_id in unique_ids if record_id in records_by_id]
+
     def get_video_segments(self, video_id: str) -> List[Dict]:
         """Get all segments for a video by retrieving the video record and its linked segment IDs."""
         try:
@@ -282,32 +671,17 @@ class AirtableService:
 
             self.logger.info(f"Found {len(segment_ids)} segment IDs linked to video {video_id}: {segment_ids}")
 
-            segments_data = []
-            for segment_id in segment_ids:
-                segment_record = self.segments_table.get(segment_id)
-                if segment_record:
-                    segments_data.append(segment_record)
-                else:
-                    self.logger.warning(f"Segment record {segment_id} linked from video {video_id} not found in Segments table.", extra={'operation': 'get_video_segments', 'video_id': video_id, 'segment_id': segment_id})
-            
+            # Batch-fetch linked segments instead of one request per segment
+            segments_data = self.get_records_by_ids(self.segments_table, segment_ids)
+
+            if len(segments_data) < len(set(segment_ids)):
+                found_ids = {segment['id'] for segment in segments_data}
+                for segment_id in segment_ids:
+                    if segment_id not in found_ids:
+                        self.logger.warning(f"Segment record {segment_id} linked from video {video_id} not found in Segments table.", extra={'operation': 'get_video_segments', 'video_id': video_id, 'segment_id': segment_id})
+
             # Sort segments by 'SRT Segment ID'
-            # This key attempts to sort numerically if 'SRT Segment ID' is an int or a string representing an int,
-            # otherwise sorts as string. Handles missing values by pushing them to the end.
-            def get_sort_key(segment_record):
-                fields = segment_record.get('fields', {})
-                srt_id_value = fields.get('SRT Segment ID')
-                if srt_id_value is None:
-                    return (float('inf'), '') # Sort Nones last
-                if isinstance(srt_id_value, (int, float)):
-                    return (0, srt_id_value)
-                if isinstance(srt_id_value, str):
-                    try:
-                        return (0, int(srt_id_value)) # Try to convert string to int
-                    except ValueError:
-                        return (1, srt_id_value) # Sort as string if not convertible
-                return (2, srt_id_value) # Fallback for other types
-
-            segments_data.sort(key=get_sort_key)
+            segments_data.sort(key=self._segment_sort_key)
             self.logger.info(f"Returning {len(segments_data)} segments for video {video_id} after fetching and sorting.")
             return segments_data
 
@@ -317,21 +691,25 @@ class AirtableService:
     
     # Voice operations
     def get_voice(self, voice_id: str) -> Dict:
-        """Get a voice record by ID."""
+        """Get a voice record by ID (served from the reference cache when possible)."""
         try:
-            record = self.voices_table.get(voice_id)
-            return record
+            return self._get_reference_record(self.config.VOICES_TABLE, voice_id,
+                                              lambda: self.voices_table.get(voice_id))
         except Exception as e:
             api_logger.log_error('airtable', e, {'operation': 'get_voice', 'voice_id': voice_id})
             raise
     
     # Generic table operations
     def get_record(self, table_name: str, record_id: str) -> Dict:
-        """Get a record from any table by ID."""
+        """Get a record from any table by ID.
+        
+        Records from reference tables (Voices, Image Themes) are served from the cache.
+        """
         try:
-            table = self.base.table(table_name)
-            record = table.get(record_id)
-            return record
+            loader = lambda: self.base.table(table_name).get(record_id)
+            if table_name in self.reference_tables:
+                return self._get_reference_record(table_name, record_id, loader)
+            return loader()
         except Exception as e:
             api_logger.log_error('airtable', e, {
                 'operation': 'get_record', 
@@ -340,6 +718,34 @@ class AirtableService:
             })
             raise
     
+    def _get_reference_record(self, table_name: str, record_id: str, loader) -> Dict:
+        """Read-through lookup of a reference table record."""
+        if not self.reference_cache:
+            return loader()
+        return self.reference_cache.get_or_load((table_name, record_id), loader)
+    
+    def invalidate_reference_cache(self, table_name: Optional[str] = None,
+                                   record_id: Optional[str] = None) -> int:
+        """Drop cached reference records.
+        
+        Args:
+            table_name: Limit invalidation to one table (all tables if omitted)
+            record_id: Limit invalidation to one record of table_name
+            
+        Returns:
+            Number of cache entries removed
+        """
+        if not self.reference_cache:
+            return 0
+        if table_name and record_id:
+            removed = self.reference_cache.invalidate(key=(table_name, record_id))
+        elif table_name:
+            removed = self.reference_cache.invalidate(predicate=lambda key: key[0] == table_name)
+        else:
+            removed = self.reference_cache.invalidate()
+        logger.info(f"Invalidated {removed} reference cache entries (table={table_name}, record={record_id})")
+        return removed
+    
     # Job operations
     def create_job(self, job_type: str, video_id: Optional[str] = None, 
                    segment_id: Optional[str] = None, external_job_id: Optional[str] = None,
@@ -353,7 +759,7 @@ class AirtableService:
             
             # Note: Related Video and Related Segment fields don't exist in current schema
             # These would need to be added to the Jobs table in Airtable
-            # For now, storing as plain text in Request Payload
+            # For now, storing them in the versioned JSON Request Payload
             if video_id:
                 if not request_payload:
                     request_payload = {}
@@ -367,9 +773,10 @@ class AirtableService:
             if webhook_url:
                 fields['Webhook URL'] = webhook_url
             if request_payload:
-                fields['Request Payload'] = str(request_payload)
+                fields['Request Payload'] = encode_job_payload(request_payload)
             
             record = self.jobs_table.create(fields)
+            self._index_job(record)
             api_logger.log_job_status(record['id'], self.config.STATUS_PENDING, 
                                     {'type': job_type})
             return record
@@ -377,20 +784,33 @@ class AirtableService:
             api_logger.log_error('airtable', e, {'operation': 'create_job'})
             raise
     
-    def get_job(self, job_id: str) -> Dict:
-        """Get a job record by ID."""
+    def get_job(self, job_id: str, use_index: bool = True) -> Dict:
+        """Get a job record by ID, from the local job index when possible."""
         try:
+            if use_index:
+                record = self._lookup_job_index('get', job_id)
+                if record:
+                    return record
+            
             record = self.jobs_table.get(job_id)
+            self._index_job(record)
             return record
         except Exception as e:
             api_logger.log_error('airtable', e, {'operation': 'get_job', 'job_id': job_id})
             raise
     
-    def get_job_by_external_id(self, external_job_id: str) -> Optional[Dict]:
-        """Get a job record by external job ID."""
+    def get_job_by_external_id(self, external_job_id: str, use_index: bool = True) -> Optional[Dict]:
+        """Get a job record by external job ID, from the local job index when possible."""
         try:
+            if use_index:
+                record = self._lookup_job_index('get_by_external_id', external_job_id)
+                if record:
+                    return record
+            
             formula = match({'External Job ID': external_job_id})
             records = self.jobs_table.all(formula=formula)
+            if records:
+                self._index_job(records[0])
             return records[0] if records else None
         except Exception as e:
             api_logger.log_error('airtable', e, {'operation': 'get_job_by_external_id', 
@@ -400,7 +820,13 @@ class AirtableService:
     def update_job(self, job_id: str, fields: Dict) -> Dict:
         """Update a job record."""
         try:
-            record = self.jobs_table.update(job_id, fields)
+            if self._is_buffering():
+                record = self.queue_update(self.config.JOBS_TABLE, job_id, fields)
+                self._index_job_fields(job_id, fields)
+            else:
+                fields = self._with_pending(self.config.JOBS_TABLE, job_id, fields)
+                record = self.jobs_table.update(job_id, fields)
+                self._index_job(record)
             
             # Log status changes
             if 'Status' in fields:
@@ -414,11 +840,13 @@ class AirtableService:
     def safe_update_job_status(self, job_id: str, status: str, additional_fields: Optional[Dict] = None) -> Dict:
         """Safely update job status with fallback to 'Undefined'."""
         fields = additional_fields.copy() if additional_fields else {}
+        fields = self._with_pending(self.config.JOBS_TABLE, job_id, fields)
         fields['Status'] = status
         
         try:
             # Try to update with the intended status
             record = self.jobs_table.update(job_id, fields)
+            self._index_job(record)
             
             # Log status changes
             api_logger.log_job_status(job_id, status, fields)
@@ -438,6 +866,7 @@ class AirtableService:
             try:
                 fields['Status'] = 'Undefined'
                 record = self.jobs_table.update(job_id, fields)
+                self._index_job(record)
                 logger.info(f"Successfully set job {job_id} status to 'Undefined' as fallback")
                 api_logger.log_job_status(job_id, 'Undefined', fields)
                 api_logger.log_api_response('airtable', 'safe_update_job_status', 200, 
@@ -455,11 +884,13 @@ class AirtableService:
     def safe_update_job_type(self, job_id: str, job_type: str, additional_fields: Optional[Dict] = None) -> Dict:
         """Safely update job type with fallback to 'Undefined'."""
         fields = additional_fields.copy() if additional_fields else {}
+        fields = self._with_pending(self.config.JOBS_TABLE, job_id, fields)
         fields['Type'] = job_type
         
         try:
             # Try to update with the intended type
             record = self.jobs_table.update(job_id, fields)
+            self._index_job(record)
             api_logger.log_api_response('airtable', 'safe_update_job_type', 200, 
                                       {'job_id': job_id, 'type': job_type, 'success': True})
             return record
@@ -476,6 +907,7 @@ class AirtableService:
             try:
                 fields['Type'] = 'Undefined'
                 record = self.jobs_table.update(job_id, fields)
+                self._index_job(record)
                 logger.info(f"Successfully set job {job_id} type to 'Undefined' as fallback")
                 api_logger.log_api_response('airtable', 'safe_update_job_type', 200, 
                                           {'job_id': job_id, 'type': 'Undefined', 'fallback': True})
@@ -493,7 +925,7 @@ class AirtableService:
         """Mark a job as completed."""
         additional_fields = {}
         if response_payload:
-            additional_fields['Response Payload'] = str(response_payload)
+            additional_fields['Response Payload'] = json.dumps(response_payload, default=str)
         if notes:
             additional_fields['Notes'] = notes
         return self.safe_update_job_status(job_id, self.config.STATUS_COMPLETED, additional_fields)
@@ -504,6 +936,141 @@ class AirtableService:
         if notes:
             additional_fields['Notes'] = notes
         return self.safe_update_job_status(job_id, self.config.STATUS_FAILED, additional_fields)
+
+    def refresh_parent_job(self, parent_job_id: str, child_statuses: Optional[Dict[str, str]] = None) -> Dict:
+        """Recompute a fan-out parent job's progress from its child jobs.
+
+        The parent's Request Payload maps segment IDs to child job IDs
+        ('child_jobs'). Children are read with one batched query, and the parent
+        is rewritten only when the aggregate changes; once every child is
+        terminal the parent is completed, or failed if any child failed.
+
+        Args:
+            parent_job_id: Parent job record ID
+            child_statuses: Statuses the caller just wrote for some children
+                (job ID -> status), used in place of possibly unflushed reads
+
+        Returns:
+            Progress dict with total, completed, failed, in_progress, percent_complete,
+            status and per-segment child job states
+        """
+        # This request's own child status write may still be in the write buffer.
+        # Flush it first, so a sibling finishing at the same time reads it as done.
+        if self.write_buffer:
+            self.write_buffer.flush(self.config.JOBS_TABLE)
+        
+        parent = self.get_job(parent_job_id, use_index=False)
+        payload = job_payload_from_fields(parent['fields'])
+        child_jobs = payload.get('child_jobs') or {}
+        overrides = child_statuses or {}
+
+        records = self.get_records_by_ids(self.jobs_table, list(child_jobs.values())) if child_jobs else []
+        statuses = {record['id']: record['fields'].get('Status') for record in records}
+        statuses.update(overrides)
+
+        segments = [{'segment_id': segment_id, 'job_id': child_job_id,
+                     'status': statuses.get(child_job_id) or self.config.STATUS_PENDING}
+                    for segment_id, child_job_id in child_jobs.items()]
+        progress = {
+            'parent_job_id': parent_job_id,
+            **summarize_progress(segment['status'] for segment in segments),
+            'segments': segments
+        }
+        status = progress['status']
+
+        notes = (f"{progress['completed']}/{progress['total']} combined, {progress['failed']} failed, "
+                 f"{progress['in_progress']} in progress")
+        if parent['fields'].get('Status') == status and parent['fields'].get('Notes') == notes:
+            return progress
+
+        if status == self.config.STATUS_COMPLETED:
+            self.complete_job(parent_job_id, response_payload=progress, notes=notes)
+        elif status == self.config.STATUS_FAILED:
+            failed_segments = [s['segment_id'] for s in segments if s['status'] in FAILED_STATUSES]
+            self.fail_job(parent_job_id, f"Combine failed for segments: {', '.join(failed_segments)}", notes=notes)
+        else:
+            self.update_job(parent_job_id, {
+                'Status': status,
+                'Notes': notes,
+                'Response Payload': json.dumps(progress, default=str)
+            })
+        return progress
+
+    # Job index
+    def _lookup_job_index(self, method: str, key: str) -> Optional[Dict]:
+        """Look a job up in the local index, treating index errors as a miss.
+        
+        Only finished jobs are served from the index. Other workers and hosts
+        may have moved an in-flight job on since it was indexed, so those are
+        re-read from Airtable by record ID.
+        """
+        if not self.job_index:
+            return None
+        try:
+            record = getattr(self.job_index, method)(key)
+        except Exception as e:
+            logger.warning(f"Job index lookup failed for {key}: {e}")
+            return None
+        if record and record['fields'].get('Status') not in (self.config.STATUS_COMPLETED,
+                                                              self.config.STATUS_FAILED):
+            record = self.jobs_table.get(record['id'])
+            self._index_job(record)
+        return record
+    
+    def _index_job(self, record: Optional[Dict]):
+        """Write a job record through to the local index."""
+        if not self.job_index or not record:
+            return
+        try:
+            self.job_index.upsert(record)
+        except Exception as e:
+            logger.warning(f"Failed to index job {record.get('id')}: {e}")
+    
+    def _index_job_fields(self, job_id: str, fields: Dict):
+        """Apply a partial (e.g. buffered) job update to the local index."""
+        if not self.job_index:
+            return
+        try:
+            self.job_index.merge_fields(job_id, fields)
+        except Exception as e:
+            logger.warning(f"Failed to index fields for job {job_id}: {e}")
+    
+    def reconcile_job_index(self) -> int:
+        """Pull job changes made outside this service into the local index.
+        
+        Fetches jobs modified since the last reconcile (or created within
+        JOB_INDEX_RETENTION_HOURS on the first run) and prunes index rows that
+        haven't been touched for that long.
+        
+        Returns:
+            Number of jobs written to the index
+        """
+        if not self.job_index:
+            return 0
+        try:
+            started = datetime.utcnow()
+            retention = timedelta(hours=self.config.JOB_INDEX_RETENTION_HOURS)
+            watermark = self.job_index.get_meta('reconciled_at')
+            if watermark:
+                formula = f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{watermark}'))"
+            else:
+                since = (started - retention).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+                formula = f"IS_AFTER(CREATED_TIME(), DATETIME_PARSE('{since}'))"
+            
+            written = 0
+            for page in self.jobs_table.iterate(formula=formula):
+                written += self.job_index.upsert_many(page)
+            
+            # Overlap the next window a little so edits made during this scan aren't missed
+            next_watermark = started - timedelta(seconds=60)
+            self.job_index.set_meta('reconciled_at', next_watermark.strftime('%Y-%m-%dT%H:%M:%S.000Z'))
+            pruned = self.job_index.prune(retention.total_seconds())
+            
+            logger.info(f"Job index reconciled: {written} updated, {pruned} pruned")
+            return written
+        except Exception as e:
+            api_logger.log_error('airtable', e, {'operation': 'reconcile_job_index'})
+            raise
     
     # Webhook event operations
     def create_webhook_event(self, service: str, endpoint: str, payload: Dict,
@@ -540,6 +1107,10 @@ class AirtableService:
             if notes is not None:
                 fields['Notes'] = notes
             
+            if self._is_buffering():
+                return self.queue_update(self.config.WEBHOOK_EVENTS_TABLE, event_id, fields)
+            
+            fields = self._with_pending(self.config.WEBHOOK_EVENTS_TABLE, event_id, fields)
             record = self.webhook_events_table.update(event_id, fields)
             # Log the main action; detailed params can be inferred from context or added if APILogger is extended
             api_logger.log_api_response('airtable', 'mark_webhook_processed', 200, record)
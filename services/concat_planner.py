@@ -0,0 +1,267 @@
+"""Choose how to concatenate segment videos from their probe metadata."""
+
+import json
+import logging
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.encoding_profiles import EncodingProfile
+from services.media_probe import MediaInfo
+from utils.job_payload import job_payload_from_fields
+from utils.shared_lock import shared_lock
+
+logger = logging.getLogger(__name__)
+
+# Every segment shares codec parameters: concat demuxer, -c copy
+STRATEGY_STREAM_COPY = 'stream_copy'
+# Most segments match: re-encode the odd ones to match, then stream copy
+STRATEGY_NORMALIZE = 'normalize'
+# Metadata missing or no usable reference: NCA's /v1/video/concatenate as before
+STRATEGY_GENERIC = 'generic'
+
+# Codecs the normalization step can produce (libx264 / aac)
+NORMALIZABLE_VIDEO_CODECS = ('h264',)
+NORMALIZABLE_AUDIO_CODECS = ('aac',)
+
+# Rough wall-clock cost per second of media. Copying is I/O bound; x264 cost is
+# for 1080p30 on one NCA worker and scales with pixels per second.
+COPY_SECONDS_PER_MEDIA_SECOND = 0.02
+ENCODE_SECONDS_PER_MEDIA_SECOND = {
+    'ultrafast': 0.15, 'superfast': 0.2, 'veryfast': 0.3, 'faster': 0.4, 'fast': 0.5,
+    'medium': 0.7, 'slow': 1.3, 'slower': 2.5, 'veryslow': 5.0,
+}
+# Jobs without probe data: assume NCA re-encodes everything at 'medium'
+GENERIC_PRESET = 'medium'
+REFERENCE_PIXEL_RATE = 1920 * 1080 * 30
+
+CONCAT_PROTOCOL_WHITELIST = 'file,http,https,tcp,tls,crypto'
+
+# Serializes the "all normalizations done -> submit concat" check across workers
+CONTINUATION_LOCK_NAME = 'concat-continuation'
+
+SIGNATURE_FIELDS = ('video_codec', 'width', 'height', 'fps', 'pix_fmt', 'audio_codec', 'sample_rate', 'channels')
+
+
+@dataclass(frozen=True)
+class ConcatPlan:
+    """How a list of segments will be concatenated, and what it should cost."""
+    strategy: str
+    segment_count: int
+    reason: str
+    odd_indexes: Tuple[int, ...] = ()
+    reference: Dict[str, Any] = field(default_factory=dict)
+    total_duration: Optional[float] = None
+    estimated_seconds: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['odd_indexes'] = list(self.odd_indexes)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ConcatPlan':
+        data = {key: value for key, value in data.items() if key in cls.__dataclass_fields__}
+        data['odd_indexes'] = tuple(data.get('odd_indexes') or ())
+        return cls(**data)
+
+    def summary(self) -> str:
+        """One-line description for job notes."""
+        cost = f", est. {self.estimated_seconds:.0f}s" if self.estimated_seconds is not None else ''
+        odd = f", normalizing {len(self.odd_indexes)}/{self.segment_count} segments" if self.odd_indexes else ''
+        return f"Concat plan: {self.strategy}{odd}{cost} ({self.reason})"
+
+
+def stream_signature(info: MediaInfo) -> Tuple:
+    """Parameters that must match for the concat demuxer to copy streams."""
+    return tuple(round(info.fps, 2) if name == 'fps' and info.fps else getattr(info, name)
+                 for name in SIGNATURE_FIELDS)
+
+
+def encode_seconds(duration: float, preset: str, width: Optional[int], height: Optional[int],
+                   fps: Optional[float]) -> float:
+    """Estimated x264 encode time for duration seconds of media."""
+    pixel_rate = (width or 1920) * (height or 1080) * (fps or 30)
+    factor = ENCODE_SECONDS_PER_MEDIA_SECOND.get(preset, ENCODE_SECONDS_PER_MEDIA_SECOND[GENERIC_PRESET])
+    return duration * factor * pixel_rate / REFERENCE_PIXEL_RATE
+
+
+def plan_concat(infos: Sequence[Optional[MediaInfo]], profile: EncodingProfile) -> ConcatPlan:
+    """Plan a concatenation from per-segment probe results (None where probing failed).
+
+    The most common stream signature is the reference. Segments that match it
+    are copied; the rest are re-encoded to it with the profile's preset and CRF,
+    provided they have the same streams and the reference codecs are ones we
+    encode (H.264 / AAC).
+    """
+    count = len(infos)
+    missing = [i for i, info in enumerate(infos) if info is None or info.duration is None]
+    if not infos or missing:
+        return ConcatPlan(STRATEGY_GENERIC, count, f"no probe data for segments {missing}",
+                          estimated_seconds=None)
+
+    total = sum(info.duration for info in infos)
+    signatures = [stream_signature(info) for info in infos]
+    reference_signature, _ = Counter(signatures).most_common(1)[0]
+    reference = dict(zip(SIGNATURE_FIELDS, reference_signature))
+    odd = tuple(i for i, signature in enumerate(signatures) if signature != reference_signature)
+    copy_cost = total * COPY_SECONDS_PER_MEDIA_SECOND
+
+    if not odd:
+        return ConcatPlan(STRATEGY_STREAM_COPY, count, 'all segments share codec parameters',
+                          reference=reference, total_duration=total, estimated_seconds=round(copy_cost, 1))
+
+    generic_cost = round(encode_seconds(total, GENERIC_PRESET, reference['width'], reference['height'],
+                                        reference['fps']), 1)
+    if reference['video_codec'] not in NORMALIZABLE_VIDEO_CODECS or \
+            (reference['audio_codec'] and reference['audio_codec'] not in NORMALIZABLE_AUDIO_CODECS):
+        return ConcatPlan(STRATEGY_GENERIC, count, f"reference codecs {reference['video_codec']}/"
+                          f"{reference['audio_codec']} can't be matched by re-encoding",
+                          odd_indexes=odd, reference=reference, total_duration=total,
+                          estimated_seconds=generic_cost)
+    for i in odd:
+        if not infos[i].has_video or infos[i].has_audio != bool(reference['audio_codec']):
+            return ConcatPlan(STRATEGY_GENERIC, count, f"segment {i} has different streams",
+                              odd_indexes=odd, reference=reference, total_duration=total,
+                              estimated_seconds=generic_cost)
+
+    normalize_cost = sum(encode_seconds(infos[i].duration, profile.preset, reference['width'],
+                                        reference['height'], reference['fps']) for i in odd)
+    return ConcatPlan(STRATEGY_NORMALIZE, count, f"{len(odd)} segments differ from the majority",
+                      odd_indexes=odd, reference=reference, total_duration=total,
+                      estimated_seconds=round(normalize_cost + copy_cost, 1))
+
+
+def build_normalize_payload(video_url: str, reference: Dict[str, Any], profile: EncodingProfile) -> Dict[str, Any]:
+    """Compose payload re-encoding one segment to the reference stream parameters."""
+    width, height = reference['width'], reference['height']
+    video_chain = (
+        f"[0:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={reference['fps']},format={reference['pix_fmt'] or 'yuv420p'}[v]"
+    )
+    filters = [{'filter': video_chain}]
+    # The format filter already produces the reference pixel format
+    options = [{'option': '-map', 'argument': '[v]'}]
+    options += [opt for opt in profile.video_options() if opt['option'] != '-pix_fmt']
+
+    if reference['audio_codec']:
+        filters.append({'filter': f"[0:a]aresample={reference['sample_rate']}[a]"})
+        options += [
+            {'option': '-map', 'argument': '[a]'},
+            *profile.audio_options(),
+            {'option': '-ar', 'argument': str(reference['sample_rate'])},
+            {'option': '-ac', 'argument': str(reference['channels'])}
+        ]
+    options.append({'option': '-movflags', 'argument': '+faststart'})
+
+    return {'inputs': [{'file_url': video_url}], 'filters': filters, 'outputs': [{'options': options}]}
+
+
+def build_concat_list(video_urls: List[str]) -> str:
+    """Concat demuxer list file referencing each segment by URL."""
+    return ''.join("file '{}'\n".format(url.replace("'", "'\\''")) for url in video_urls)
+
+
+def build_stream_copy_concat_payload(list_url: str) -> Dict[str, Any]:
+    """Compose payload concatenating the segments in a list file with -c copy."""
+    return {
+        'inputs': [{
+            'file_url': list_url,
+            'options': [
+                {'option': '-f', 'argument': 'concat'},
+                {'option': '-safe', 'argument': '0'},
+                {'option': '-protocol_whitelist', 'argument': CONCAT_PROTOCOL_WHITELIST}
+            ]
+        }],
+        'outputs': [{
+            'options': [
+                {'option': '-c', 'argument': 'copy'},
+                {'option': '-movflags', 'argument': '+faststart'}
+            ]
+        }]
+    }
+
+
+def submit_after_normalization(airtable, nca, parent_job_id: str, webhook_base_url: str,
+                               child_results: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+    """Submit a normalize plan's concat once every normalization job has finished.
+
+    The parent concatenate job's Request Payload holds the original
+    'video_urls' and 'normalize_jobs' (segment index -> child job ID). When all
+    children completed, their outputs replace the odd segments and the list is
+    joined with a stream copy; if any failed, the original segments go to NCA's
+    generic concatenate instead.
+
+    The check and the External Job ID claim run under a lock shared by every
+    worker process, and the claim is flushed before the lock is released, so
+    two children finishing together submit the concat once.
+
+    Args:
+        airtable: AirtableService
+        nca: NCAService
+        parent_job_id: The concatenate job
+        webhook_base_url: Base URL for the concatenate webhook
+        child_results: Just-written child results (job ID -> {'status', 'output_url'}),
+            used in place of possibly unflushed reads
+
+    Returns:
+        The concat submission result, or None if children are still running or
+        the concat was already submitted
+    """
+    with shared_lock(airtable.config, CONTINUATION_LOCK_NAME):
+        parent = airtable.get_job(parent_job_id, use_index=False)
+        if parent['fields'].get('External Job ID'):
+            return None
+        payload = job_payload_from_fields(parent['fields'])
+        normalize_jobs = payload.get('normalize_jobs') or {}
+        child_results = child_results or {}
+
+        records = airtable.get_records_by_ids(airtable.jobs_table, list(normalize_jobs.values()))
+        results = {}
+        for record in records:
+            try:
+                output_url = json.loads(record['fields'].get('Response Payload') or '{}').get('output_url')
+            except (ValueError, AttributeError):
+                output_url = None
+            results[record['id']] = {'status': record['fields'].get('Status'), 'output_url': output_url}
+        for child_job_id, result in child_results.items():
+            results[child_job_id] = {**results.get(child_job_id, {}), **result}
+
+        video_urls = list(payload.get('video_urls') or [])
+        failed = []
+        for index, child_job_id in normalize_jobs.items():
+            result = results.get(child_job_id, {})
+            if result.get('status') == airtable.config.STATUS_COMPLETED and result.get('output_url'):
+                video_urls[int(index)] = result['output_url']
+            elif result.get('status') in (airtable.config.STATUS_FAILED, 'webhook_error', airtable.config.STATUS_COMPLETED):
+                failed.append(int(index))
+            else:
+                return None
+
+        plan = ConcatPlan.from_dict(payload.get('concat_plan') or {'strategy': STRATEGY_GENERIC, 'segment_count': len(video_urls), 'reason': ''})
+        if failed:
+            video_urls = list(payload.get('video_urls') or [])
+            plan = ConcatPlan(STRATEGY_GENERIC, len(video_urls), f"normalization failed for segments {sorted(failed)}")
+        else:
+            plan = ConcatPlan(STRATEGY_STREAM_COPY, len(video_urls), 'odd segments normalized',
+                              reference=plan.reference, total_duration=plan.total_duration,
+                              estimated_seconds=plan.estimated_seconds)
+
+        webhook_url = f"{webhook_base_url}/webhooks/nca-toolkit?job_id={parent_job_id}&operation=concatenate"
+        result = nca.concatenate_videos(
+            video_urls=video_urls,
+            output_filename=payload.get('output_filename') or f"video_{payload.get('video_id')}_combined.mp4",
+            webhook_url=webhook_url,
+            custom_id=parent_job_id,
+            plan=plan
+        )
+        logger.info(f"Submitted concat for job {parent_job_id} after normalization: {plan.summary()}")
+        airtable.update_job(parent_job_id, {
+            'External Job ID': result.get('job_id'),
+            'Webhook URL': webhook_url,
+            'Notes': plan.summary()
+        })
+        if airtable.write_buffer:
+            airtable.write_buffer.flush(airtable.config.JOBS_TABLE)
+        return result
@@ -3,17 +3,29 @@
 import logging
 import requests
 import uuid
-from typing import Dict, Optional, List
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, List
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from config import get_config
 from utils.logger import APILogger
+from utils.shared_lock import SharedSemaphore, get_shared_semaphore
 
 logger = logging.getLogger(__name__)
 api_logger = APILogger()
 
 
+def get_request_slots(config) -> SharedSemaphore:
+    """Cap on in-flight text-to-speech requests across every worker process.
+
+    ElevenLabs rejects requests beyond the plan's concurrency limit with 429s,
+    so every synthesis on this host (or, with the Redis backend, every host)
+    shares ELEVENLABS_MAX_CONCURRENCY slots.
+    """
+    return get_shared_semaphore(config, 'elevenlabs-tts', config.ELEVENLABS_MAX_CONCURRENCY)
+
+
 class ElevenLabsService:
     """Service for interacting with ElevenLabs API."""
     
@@ -22,6 +34,7 @@ class ElevenLabsService:
         self.config = get_config()()
         self.api_key = self.config.ELEVENLABS_API_KEY
         self.base_url = self.config.ELEVENLABS_BASE_URL
+        self.model_id = self.config.ELEVENLABS_MODEL_ID
         
         # Create session with retry logic
         self.session = requests.Session()
@@ -31,7 +44,8 @@ class ElevenLabsService:
             allowed_methods=["HEAD", "GET", "OPTIONS", "POST"],
             backoff_factor=1
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(max_retries=retry_strategy,
+                              pool_maxsize=max(self.config.ELEVENLABS_MAX_CONCURRENCY, 10))
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
@@ -79,7 +93,7 @@ class ElevenLabsService:
         try:
             payload = {
                 'text': text,
-                'model_id': 'eleven_multilingual_v2',
+                'model_id': self.model_id,
                 'voice_settings': {
                     'stability': stability,
                     'similarity_boost': similarity_boost,
@@ -102,11 +116,13 @@ class ElevenLabsService:
                 'Accept': 'audio/mpeg'
             }
             
-            response = self.session.post(
-                endpoint, 
-                json=payload,
-                headers=headers
-            )
+            # Hold one of the plan's concurrency slots for the request
+            with get_request_slots(self.config).hold():
+                response = self.session.post(
+                    endpoint, 
+                    json=payload,
+                    headers=headers
+                )
             response.raise_for_status()
             
             # Return audio data immediately
@@ -127,6 +143,60 @@ class ElevenLabsService:
             api_logger.log_error('elevenlabs', e, {'operation': 'generate_voice_sync'})
             raise
     
+    @contextmanager
+    def stream_voice(self, text: str, voice_id: str,
+                     stability: float = 0.5, similarity_boost: float = 0.5,
+                     speed: float = 1.0, style_exaggeration: float = 0.0,
+                     use_speaker_boost: bool = True) -> Iterator[Iterator[bytes]]:
+        """Stream synthesized MP3 chunks as ElevenLabs produces them.
+        
+        Yields an iterator of byte chunks from the streaming endpoint, so the
+        audio can be uploaded while it is generated without holding it in
+        memory. The request and its concurrency slot are held until the block
+        exits. A connection that breaks mid-stream raises RuntimeError rather
+        than a requests exception, so callers don't retry on a half-read body.
+        """
+        payload = {
+            'text': text,
+            'model_id': self.model_id,
+            'voice_settings': {
+                'stability': stability,
+                'similarity_boost': similarity_boost,
+                'speed': speed,
+                'style_exaggeration': style_exaggeration,
+                'use_speaker_boost': use_speaker_boost
+            }
+        }
+        api_logger.log_api_request('elevenlabs', 'stream_voice', {
+            'voice_id': voice_id,
+            'text_length': len(text)
+        })
+        
+        with get_request_slots(self.config).hold():
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/text-to-speech/{voice_id}/stream",
+                    json=payload,
+                    headers={'xi-api-key': self.api_key, 'Content-Type': 'application/json', 'Accept': 'audio/mpeg'},
+                    stream=True
+                )
+                response.raise_for_status()
+            except Exception as e:
+                api_logger.log_error('elevenlabs', e, {'operation': 'stream_voice'})
+                raise
+            
+            def chunks() -> Iterator[bytes]:
+                try:
+                    yield from response.iter_content(chunk_size=self.config.ELEVENLABS_STREAM_CHUNK_BYTES)
+                except requests.exceptions.RequestException as e:
+                    api_logger.log_error('elevenlabs', e, {'operation': 'stream_voice'})
+                    raise RuntimeError(f"ElevenLabs audio stream interrupted: {e}") from e
+            
+            try:
+                yield chunks()
+            finally:
+                response.close()
+    
     def generate_voice(self, text: str, voice_id: str, 
                       stability: float = 0.5, similarity_boost: float = 0.5,
                       speed: float = 1.0, style_exaggeration: float = 0.0,
@@ -0,0 +1,83 @@
+"""Named encoding profiles for FFmpeg compose jobs."""
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional
+
+from config import get_config
+
+PROFILE_DRAFT = 'draft'
+PROFILE_STANDARD = 'standard'
+PROFILE_FINAL = 'final'
+
+# x264 presets, fastest first
+X264_PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow')
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """Encoder settings for every stream a compose job re-encodes.
+
+    Streams a job only remuxes (-c copy) are left alone: copying is already
+    the cheapest and lossless option, whatever the profile.
+    """
+    name: str
+    preset: str
+    crf: int
+    fps: int
+    width: int
+    height: int
+    audio_bitrate: Optional[str]
+    video_codec: str = 'libx264'
+    audio_codec: str = 'aac'
+
+    @property
+    def size(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    def capped(self, max_fps: Optional[int] = None, slowest_preset: Optional[str] = None) -> 'EncodingProfile':
+        """Return this profile with fps and preset no higher/slower than the given caps."""
+        fps = min(self.fps, max_fps) if max_fps else self.fps
+        preset = self.preset
+        if slowest_preset and X264_PRESETS.index(preset) > X264_PRESETS.index(slowest_preset):
+            preset = slowest_preset
+        return replace(self, fps=fps, preset=preset)
+
+    def video_options(self) -> List[Dict[str, Any]]:
+        """Output options for an encoded H.264 video stream, in NCA format."""
+        return [
+            {'option': '-c:v', 'argument': self.video_codec},
+            {'option': '-preset', 'argument': self.preset},
+            {'option': '-crf', 'argument': str(self.crf)},
+            {'option': '-pix_fmt', 'argument': 'yuv420p'}
+        ]
+
+    def audio_options(self) -> List[Dict[str, Any]]:
+        """Output options for an encoded audio stream, in NCA format (no bitrate means the encoder default)."""
+        options = [{'option': '-c:a', 'argument': self.audio_codec}]
+        if self.audio_bitrate:
+            options.append({'option': '-b:a', 'argument': self.audio_bitrate})
+        return options
+
+
+ENCODING_PROFILES = {
+    # Previews: 720p, 24 fps, fastest preset
+    PROFILE_DRAFT: EncodingProfile(PROFILE_DRAFT, preset='ultrafast', crf=28, fps=24,
+                                   width=1280, height=720, audio_bitrate='96k'),
+    PROFILE_STANDARD: EncodingProfile(PROFILE_STANDARD, preset='medium', crf=23, fps=30,
+                                      width=1920, height=1080, audio_bitrate='128k'),
+    # Settings the renders used before profiles existed (and the default ENCODING_PROFILE)
+    PROFILE_FINAL: EncodingProfile(PROFILE_FINAL, preset='slow', crf=23, fps=60,
+                                   width=1920, height=1080, audio_bitrate=None),
+}
+
+
+def get_encoding_profile(name: Optional[str] = None) -> EncodingProfile:
+    """Return a profile by name, or the configured ENCODING_PROFILE when name is empty.
+
+    Raises:
+        ValueError: If the name isn't a known profile
+    """
+    name = (name or get_config().ENCODING_PROFILE).lower()
+    if name not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}'. Expected one of {sorted(ENCODING_PROFILES)}")
+    return ENCODING_PROFILES[name]
@@ -0,0 +1,135 @@
+"""Local SQLite index of Airtable job records."""
+
+import json
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+from utils.sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    external_job_id TEXT,
+    status TEXT,
+    created_time TEXT,
+    fields TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_external_job_id ON jobs (external_job_id);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class JobIndex(SQLiteCache):
+    """Write-through cache of the Airtable Jobs table in a local SQLite file.
+
+    Airtable stays the system of record. AirtableService writes every job it
+    creates or updates here, and a background reconcile pulls in changes made
+    elsewhere, so status reads and webhook routing don't need an API call. The
+    database runs in WAL mode so all worker processes on the host can share it.
+    """
+
+    SCHEMA = _SCHEMA
+    SYNCHRONOUS = 'NORMAL'
+
+    @staticmethod
+    def _row_to_record(row) -> Dict:
+        record_id, created_time, fields = row
+        return {'id': record_id, 'createdTime': created_time, 'fields': json.loads(fields)}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the indexed job record, or None if it isn't indexed."""
+        row = self._connection().execute(
+            'SELECT id, created_time, fields FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        self._count(row is not None)
+        return self._row_to_record(row) if row else None
+
+    def get_by_external_id(self, external_job_id: str) -> Optional[Dict]:
+        """Return the most recently updated job with the given External Job ID."""
+        row = self._connection().execute(
+            'SELECT id, created_time, fields FROM jobs WHERE external_job_id = ? '
+            'ORDER BY updated_at DESC LIMIT 1', (external_job_id,)
+        ).fetchone()
+        self._count(row is not None)
+        return self._row_to_record(row) if row else None
+
+    def upsert(self, record: Dict):
+        """Store a full job record as returned by Airtable."""
+        self.upsert_many([record])
+
+    def upsert_many(self, records: Iterable[Dict]) -> int:
+        """Store several full job records in one transaction.
+
+        Returns:
+            Number of records written
+        """
+        now = time.time()
+        rows = [
+            (record['id'], record['fields'].get('External Job ID'), record['fields'].get('Status'),
+             record.get('createdTime'), json.dumps(record['fields']), now)
+            for record in records
+        ]
+        if not rows:
+            return 0
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT INTO jobs (id, external_job_id, status, created_time, fields, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET external_job_id = excluded.external_job_id, '
+                'status = excluded.status, created_time = COALESCE(excluded.created_time, jobs.created_time), '
+                'fields = excluded.fields, updated_at = excluded.updated_at',
+                rows
+            )
+        return len(rows)
+
+    def merge_fields(self, job_id: str, fields: Dict):
+        """Apply a partial field update to an indexed job (no-op if it isn't indexed)."""
+        conn = self._connection()
+        with conn:
+            row = conn.execute('SELECT fields FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return
+            merged = json.loads(row[0])
+            merged.update(fields)
+            conn.execute(
+                'UPDATE jobs SET external_job_id = ?, status = ?, fields = ?, updated_at = ? WHERE id = ?',
+                (merged.get('External Job ID'), merged.get('Status'), json.dumps(merged), time.time(), job_id)
+            )
+
+    def delete(self, job_id: str):
+        """Remove a job from the index."""
+        with self._connection() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Drop jobs that haven't been written for older_than_seconds.
+
+        Returns:
+            Number of jobs removed
+        """
+        with self._connection() as conn:
+            cursor = conn.execute('DELETE FROM jobs WHERE updated_at < ?', (time.time() - older_than_seconds,))
+            return cursor.rowcount
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Read a value from the index's metadata table."""
+        row = self._connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        """Write a value to the index's metadata table."""
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def stats(self) -> Dict:
+        """Return index counters for metrics reporting."""
+        size = self._connection().execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+        return {'size': size, **super().stats(), 'last_reconciled': self.get_meta('reconciled_at')}
@@ -1,16 +1,24 @@
 """Job monitoring service for detecting and processing stuck jobs."""
 
+import os
 import time
 import logging
 import requests
-import ast
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
+
+from requests.adapters import HTTPAdapter
+
+from pyairtable.formulas import AND, FIELD, OR, match
 
 from services.airtable_service import AirtableService
+from services.concat_planner import submit_after_normalization
 from services.nca_service import NCAService
 from config import get_config
+from utils.job_payload import job_payload_from_fields
 from utils.logger import APILogger
+from utils.s3 import get_s3_client
 
 logger = logging.getLogger(__name__)
 api_logger = APILogger()
@@ -26,42 +34,32 @@ class JobMonitor:
         self.nca = NCAService()
         self.logger = logger
         
+        # Pooled connections for output HEAD checks made by the status workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(self.config.JOB_MONITOR_STATUS_WORKERS, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # Incremental stuck-job scan state (see iter_stuck_jobs)
+        self._stuck_index: Dict[str, Dict] = {}
+        self._watermark: Optional[datetime] = None
+        self._previous_cutoff: Optional[datetime] = None
+        self._scan_age_minutes: Optional[int] = None
+        self._cycles_since_full_scan = 0
+        
+    # Fields the monitor reads from job records; everything else is left on the server. Airtable
+    # rejects unknown field names, so only Jobs table fields belong here (segment and video IDs
+    # live in the Request Payload).
+    SCAN_FIELDS = ['Status', 'Created Time', 'External Job ID', 'Request Payload', 'Type']
+    
+    # Request Payload modes of jobs run by an in-process background thread rather than NCA
+    # ('batch': generate-voiceovers, 'prompts': generate-ai-image-prompts)
+    BATCH_MODES = ('batch', 'prompts')
+    
     def check_stuck_jobs(self, older_than_minutes: int = 5) -> List[Dict]:
         """Find jobs that have been processing for too long."""
         try:
-            # Get the jobs table
-            jobs_table = self.airtable.jobs_table
-            
-            # Get all jobs
-            all_jobs = jobs_table.all()
-            
-            # Filter for stuck jobs
-            stuck_jobs = []
-            current_time = datetime.utcnow()
-            
-            for job in all_jobs:
-                fields = job.get('fields', {})
-                status = fields.get('Status', '')
-                created_time = fields.get('Created Time', '')
-                
-                # Check if job is in processing state
-                if status == self.config.STATUS_PROCESSING:
-                    # Parse created time
-                    if created_time:
-                        try:
-                            # Airtable returns ISO format with Z suffix
-                            created_dt = datetime.fromisoformat(created_time.replace('Z', '+00:00').replace('+00:00', ''))
-                            age_minutes = (current_time - created_dt).total_seconds() / 60
-                            
-                            if age_minutes > older_than_minutes:
-                                stuck_jobs.append({
-                                    'id': job['id'],
-                                    'fields': fields,
-                                    'age_minutes': age_minutes
-                                })
-                        except Exception as e:
-                            self.logger.warning(f"Error parsing created time for job {job['id']}: {e}")
-            
+            stuck_jobs = list(self.iter_stuck_jobs(older_than_minutes))
             self.logger.info(f"Found {len(stuck_jobs)} stuck jobs older than {older_than_minutes} minutes")
             return stuck_jobs
             
@@ -69,10 +67,118 @@ class JobMonitor:
             self.logger.error(f"Error getting stuck jobs: {e}")
             return []
     
+    def iter_stuck_jobs(self, older_than_minutes: int = 5):
+        """Yield jobs that have been processing for longer than older_than_minutes.
+        
+        The status and age filters run in Airtable and only SCAN_FIELDS are
+        fetched, page by page. With JOB_MONITOR_INCREMENTAL_SCAN enabled, the
+        monitor keeps the set of stuck jobs between cycles and only asks for rows
+        modified since the last cycle (the watermark) or that crossed the age
+        cutoff since then, with a full rescan every JOB_MONITOR_FULL_SCAN_EVERY
+        cycles to drop deleted rows.
+        """
+        current_time = datetime.utcnow()
+        cutoff = current_time - timedelta(minutes=older_than_minutes)
+        
+        if not self.config.JOB_MONITOR_INCREMENTAL_SCAN:
+            for job in self._fetch_jobs(self._stuck_jobs_formula(cutoff)):
+                stuck = self._as_stuck_job(job, current_time)
+                if stuck:
+                    yield stuck
+            return
+        
+        full_scan = (
+            self._watermark is None
+            or self._scan_age_minutes != older_than_minutes
+            or self._cycles_since_full_scan >= self.config.JOB_MONITOR_FULL_SCAN_EVERY
+        )
+        
+        if full_scan:
+            self._stuck_index = {}
+            for job in self._fetch_jobs(self._stuck_jobs_formula(cutoff)):
+                self._stuck_index[job['id']] = job
+            self._cycles_since_full_scan = 0
+            self._scan_age_minutes = older_than_minutes
+        else:
+            formula = self._changed_jobs_formula(cutoff, self._previous_cutoff, self._watermark)
+            for job in self._fetch_jobs(formula):
+                if job.get('fields', {}).get('Status') == self.config.STATUS_PROCESSING:
+                    self._stuck_index[job['id']] = job
+                else:
+                    self._stuck_index.pop(job['id'], None)
+            self._cycles_since_full_scan += 1
+        
+        # Rows modified while this scan ran are picked up again next cycle
+        self._watermark = current_time - timedelta(seconds=self.config.JOB_MONITOR_WATERMARK_OVERLAP_SECONDS)
+        self._previous_cutoff = cutoff
+        
+        for job in list(self._stuck_index.values()):
+            stuck = self._as_stuck_job(job, current_time)
+            if stuck:
+                yield stuck
+    
+    def forget_job(self, job_id: str):
+        """Drop a job from the incremental stuck-job index once it has been handled."""
+        self._stuck_index.pop(job_id, None)
+    
+    def _fetch_jobs(self, formula: str):
+        """Lazily yield job records matching formula, one page at a time."""
+        pages = self.airtable.jobs_table.iterate(
+            formula=formula,
+            fields=self.SCAN_FIELDS,
+            page_size=self.config.JOB_MONITOR_PAGE_SIZE
+        )
+        for page in pages:
+            yield from page
+    
+    @staticmethod
+    def _formula_time(value: datetime) -> str:
+        return f"DATETIME_PARSE('{value.strftime('%Y-%m-%dT%H:%M:%S.000Z')}')"
+    
+    def _stuck_jobs_formula(self, cutoff: datetime) -> str:
+        """Processing jobs created before the cutoff."""
+        return AND(
+            match({'Status': self.config.STATUS_PROCESSING}),
+            f"IS_BEFORE({FIELD('Created Time')}, {self._formula_time(cutoff)})"
+        )
+    
+    def _changed_jobs_formula(self, cutoff: datetime, previous_cutoff: datetime, watermark: datetime) -> str:
+        """Jobs old enough to be stuck that changed, or aged past the cutoff, since the last cycle.
+        
+        Status isn't filtered here: rows that left 'processing' are needed to drop
+        them from the index.
+        """
+        return AND(
+            f"IS_BEFORE({FIELD('Created Time')}, {self._formula_time(cutoff)})",
+            OR(
+                f"IS_AFTER(LAST_MODIFIED_TIME(), {self._formula_time(watermark)})",
+                f"NOT(IS_BEFORE({FIELD('Created Time')}, {self._formula_time(previous_cutoff)}))"
+            )
+        )
+    
+    def _as_stuck_job(self, job: Dict, current_time: datetime) -> Optional[Dict]:
+        """Return the stuck-job entry for a record, with its age in minutes."""
+        fields = job.get('fields', {})
+        created_time = fields.get('Created Time', '')
+        if not created_time:
+            return None
+        try:
+            # Airtable returns ISO format with Z suffix
+            created_dt = datetime.fromisoformat(created_time.replace('Z', '+00:00').replace('+00:00', ''))
+        except Exception as e:
+            self.logger.warning(f"Error parsing created time for job {job['id']}: {e}")
+            return None
+        
+        return {
+            'id': job['id'],
+            'fields': fields,
+            'age_minutes': (current_time - created_dt).total_seconds() / 60
+        }
+    
     def check_file_exists(self, url: str) -> bool:
         """Check if a file exists at the given URL."""
         try:
-            response = requests.head(url, timeout=5)
+            response = self.session.head(url, timeout=5)
             return response.status_code == 200
         except requests.exceptions.RequestException as e:
             self.logger.debug(f"File check failed for {url}: {e}")
@@ -81,80 +187,79 @@ class JobMonitor:
             self.logger.error(f"Unexpected error checking file {url}: {e}")
             return False
     
+    def construct_output_key(self, external_job_id: str) -> str:
+        """Object key NCA writes a job's first output to."""
+        return f"{self.config.JOB_MONITOR_OUTPUT_PREFIX}{external_job_id}_output_0.mp4"
+    
     def construct_output_url(self, external_job_id: str) -> str:
         """Construct the expected output URL based on NCA's pattern."""
         # NCA stores files in this pattern
-        return f"https://phi-bucket.nyc3.digitaloceanspaces.com/phi-bucket/{external_job_id}_output_0.mp4"
+        return f"https://{self.config.NCA_S3_BUCKET_NAME}.nyc3.digitaloceanspaces.com/{self.construct_output_key(external_job_id)}"
     
-    def extract_segment_id(self, job_fields: Dict) -> Optional[str]:
-        """Extract segment ID from job fields."""
-        # First try Related Segment Video field
-        segment_id = None
-        related_segments = job_fields.get('Related Segment Video', [])
-        if related_segments and len(related_segments) > 0:
-            segment_id = related_segments[0]
+    def list_output_keys(self, expected_keys: List[str]) -> Tuple[Optional[Set[str]], bool]:
+        """List the NCA output prefix once and return the keys found.
         
-        # Fallback to parsing request payload
-        if not segment_id:
-            request_payload = job_fields.get('Request Payload', '{}')
-            try:
-                if request_payload and request_payload != '{}':
-                    # Try to parse as dict
-                    if request_payload.startswith('{'):
-                        payload_data = ast.literal_eval(request_payload)
-                    else:
-                        payload_data = {}
-                    
-                    segment_id = payload_data.get('segment_id') or payload_data.get('record_id')
-            except Exception as e:
-                self.logger.debug(f"Could not parse request payload: {e}")
+        The listing is narrowed to the longest prefix shared by expected_keys and
+        capped at JOB_MONITOR_LIST_MAX_PAGES pages.
         
-        return segment_id
-    
-    def extract_video_id(self, job_fields: Dict) -> Optional[str]:
-        """Extract video ID from job fields."""
-        # First try Related Video field
-        video_id = None
-        related_videos = job_fields.get('Related Video', [])
-        if related_videos and len(related_videos) > 0:
-            video_id = related_videos[0]
+        Returns:
+            (keys, complete): keys is None if the bucket can't be listed; complete
+            is False when the page cap cut the listing short, in which case a
+            missing key proves nothing
+        """
+        if not expected_keys or not self.config.NCA_S3_ACCESS_KEY:
+            return None, False
         
-        # Fallback to parsing request payload
-        if not video_id:
-            request_payload = job_fields.get('Request Payload', '{}')
-            try:
-                if request_payload and request_payload != '{}':
-                    # Try to parse as dict
-                    if request_payload.startswith('{'):
-                        payload_data = ast.literal_eval(request_payload)
-                    else:
-                        payload_data = {}
-                    
-                    video_id = payload_data.get('video_id') or payload_data.get('record_id')
-            except Exception as e:
-                self.logger.debug(f"Could not parse request payload: {e}")
+        prefix = os.path.commonprefix(expected_keys)
+        keys = set()
+        try:
+            paginator = get_s3_client(self.config).get_paginator('list_objects_v2')
+            pages = paginator.paginate(
+                Bucket=self.config.NCA_S3_BUCKET_NAME,
+                Prefix=prefix,
+                PaginationConfig={'MaxItems': self.config.JOB_MONITOR_LIST_MAX_PAGES * 1000, 'PageSize': 1000}
+            )
+            truncated = False
+            for page in pages:
+                keys.update(obj['Key'] for obj in page.get('Contents', []))
+                truncated = page.get('IsTruncated', False)
+        except Exception as e:
+            self.logger.warning(f"Could not list NCA outputs under '{prefix}', falling back to per-job checks: {e}")
+            return None, False
         
-        return video_id
+        self.logger.info(f"Listed {len(keys)} NCA output keys under '{prefix}'" + (" (truncated)" if truncated else ""))
+        return keys, not truncated
+    
+    def extract_segment_id(self, job_fields: Dict) -> Optional[str]:
+        """Extract segment ID from the job's request payload."""
+        try:
+            payload = job_payload_from_fields(job_fields)
+            return payload.segment_id or payload.record_id
+        except Exception as e:
+            self.logger.debug(f"Could not parse request payload: {e}")
+            return None
+    
+    def extract_video_id(self, job_fields: Dict) -> Optional[str]:
+        """Extract video ID from the job's request payload."""
+        try:
+            payload = job_payload_from_fields(job_fields)
+            return payload.video_id or payload.record_id
+        except Exception as e:
+            self.logger.debug(f"Could not parse request payload: {e}")
+            return None
     
     def extract_operation(self, job_fields: Dict) -> str:
         """Extract operation type from job fields."""
         # Try to get from request payload
-        request_payload = job_fields.get('Request Payload', '{}')
         try:
-            if request_payload and request_payload != '{}':
-                if request_payload.startswith('{'):
-                    payload_data = ast.literal_eval(request_payload)
-                else:
-                    payload_data = {}
-                
-                operation = payload_data.get('operation', '')
-                if operation:
-                    return operation
-        except:
+            operation = job_payload_from_fields(job_fields).operation
+            if operation:
+                return operation
+        except ValueError:
             pass
         
         # Fallback based on job type
-        job_type = job_fields.get('Job Type', '')
+        job_type = job_fields.get('Type', '')
         if job_type == self.config.JOB_TYPE_COMBINATION:
             return 'combine'
         elif job_type == self.config.JOB_TYPE_CONCATENATION:
@@ -213,6 +318,12 @@ class JobMonitor:
                 notes=f'Completed via polling at {datetime.utcnow().isoformat()}. Output: {output_url}'
             )
             
+            if operation == 'normalize':
+                # Last normalized segment in: submit the parent's stream-copy concat
+                self.continue_parent_concat(
+                    job_id, job_fields, {'status': self.config.STATUS_COMPLETED, 'output_url': output_url}
+                )
+            
             # Log successful completion
             api_logger.log_job_status(job_id, self.config.STATUS_COMPLETED, {
                 'completed_via': 'polling',
@@ -224,6 +335,37 @@ class JobMonitor:
             self.logger.error(f"Error handling job completion for {job_id}: {e}", exc_info=True)
             raise
     
+    def continue_parent_concat(self, job_id: str, job_fields: Dict, result: Dict):
+        """Submit the parent concat of a finished normalization job, as the webhook does.
+        
+        A failed child still completes the set: the parent then falls back to a
+        generic concat of the original segments. If submission itself fails, the
+        parent is failed rather than left processing.
+        """
+        try:
+            parent_job_id = job_payload_from_fields(job_fields).get('parent_job_id')
+        except ValueError:
+            return
+        if not parent_job_id:
+            return
+        try:
+            submit_after_normalization(self.airtable, self.nca, parent_job_id, self.config.WEBHOOK_BASE_URL,
+                                       child_results={job_id: result})
+        except Exception as e:
+            self.logger.error(f"Failed to submit concat job {parent_job_id} after normalization job {job_id}: {e}")
+            try:
+                self.airtable.fail_job(parent_job_id, f"Concat submission after normalization failed: {e}")
+            except Exception as fail_exc:
+                self.logger.error(f"Failed to mark concat job {parent_job_id} as failed: {fail_exc}")
+    
+    def fail_probed_job(self, job: Dict, error_msg: str, notes: str):
+        """Fail a job the monitor gave up on, continuing its parent concat if it was a normalization."""
+        job_id = job['id']
+        self.airtable.fail_job(job_id, error_msg, notes=notes)
+        if self.extract_operation(job['fields']) == 'normalize':
+            self.continue_parent_concat(job_id, job['fields'], {'status': self.config.STATUS_FAILED})
+        self.forget_job(job_id)
+    
     def process_completed_job(self, job: Dict, output_url: str):
         """Process a job that we've determined is complete."""
         job_id = job['id']
@@ -244,10 +386,139 @@ class JobMonitor:
             self.logger.debug(f"Could not get NCA status for job {external_job_id}: {e}")
             return None
     
+    def probe_job(self, job: Dict, check_output: bool) -> Tuple[Optional[str], Optional[Dict]]:
+        """Look for a stuck job's output, then ask NCA for its status.
+        
+        Runs on the status worker pool; Airtable writes are left to the caller.
+        
+        Returns:
+            (output_url, nca_status): output_url is set if the output file was found
+        """
+        external_id = job['fields']['External Job ID']
+        if check_output:
+            output_url = self.construct_output_url(external_id)
+            if self.check_file_exists(output_url):
+                return output_url, None
+        return None, self.check_nca_job_status(external_id)
+    
+    def apply_probe_result(self, job: Dict, output_url: Optional[str], nca_status: Optional[Dict]) -> Optional[str]:
+        """Record what a probe found for a stuck job.
+        
+        Returns:
+            'processed', 'failed', or None if the job is left for a later cycle
+        """
+        job_id = job['id']
+        if output_url:
+            self.logger.info(f"Found completed file for job {job_id}: {output_url}")
+            self.process_completed_job(job, output_url)
+            self.forget_job(job_id)
+            return 'processed'
+        
+        if nca_status:
+            status = nca_status.get('status', '').lower()
+            
+            if status == 'failed':
+                error_msg = nca_status.get('error', 'Job failed in NCA')
+                self.logger.warning(f"Job {job_id} failed in NCA: {error_msg}")
+                self.fail_probed_job(job, error_msg, f"Failed via polling check at {datetime.utcnow().isoformat()}")
+                return 'failed'
+            elif status == 'completed' and nca_status.get('output_url'):
+                # Local FFmpeg jobs report where their output was uploaded
+                self.process_completed_job(job, nca_status['output_url'])
+                self.forget_job(job_id)
+                return 'processed'
+            elif status == 'completed':
+                # Status says completed but no file found
+                self.logger.warning(f"Job {job_id} marked as completed in NCA but no file found")
+                # Try alternative URL patterns or wait for next cycle
+            else:
+                self.logger.debug(f"Job {job_id} still processing in NCA (status: {status})")
+        else:
+            # If job is very old (>1 hour), consider it failed
+            if job['age_minutes'] > 60:
+                self.logger.warning(f"Job {job_id} is {job['age_minutes']:.0f} minutes old with no output, marking as failed")
+                self.fail_probed_job(
+                    job,
+                    "Job timed out - no output after 1 hour",
+                    f"Timed out via polling at {datetime.utcnow().isoformat()}"
+                )
+                return 'failed'
+        return None
+    
+    def _interrupted_batch_statuses(self) -> Dict[str, Tuple[str, str]]:
+        """Job type -> (segment status while its batch runs, status to reset it to if the batch dies)."""
+        return {self.config.JOB_TYPE_VOICEOVER: ('Generating Voiceover', 'Voiceover Failed')}
+    
+    def fail_interrupted_batches(self) -> int:
+        """Fail background batch jobs whose worker stopped before finishing them.
+        
+        Batch jobs run on a thread of the worker that accepted the request, so a
+        worker restart (gunicorn max_requests, deploys) ends them silently. They
+        record progress after every segment; a batch parent still processing
+        with no change for JOB_MONITOR_BATCH_STALE_MINUTES is failed, and its
+        segments left mid-batch are marked failed so the request can be re-sent.
+        Segments the batch finished keep their results.
+        
+        Returns:
+            Number of batch jobs failed
+        """
+        cutoff = datetime.utcnow() - timedelta(minutes=self.config.JOB_MONITOR_BATCH_STALE_MINUTES)
+        formula = AND(
+            match({'Status': self.config.STATUS_PROCESSING}),
+            f"{FIELD('External Job ID')} = BLANK()",
+            f"IS_BEFORE(LAST_MODIFIED_TIME(), {self._formula_time(cutoff)})"
+        )
+        segment_statuses = self._interrupted_batch_statuses()
+        failed = 0
+        for job in self._fetch_jobs(formula):
+            fields = job.get('fields', {})
+            try:
+                payload = job_payload_from_fields(fields)
+            except ValueError:
+                continue
+            if payload.get('mode') not in self.BATCH_MODES:
+                continue
+            
+            self.logger.warning(f"Batch job {job['id']} made no progress for "
+                                f"{self.config.JOB_MONITOR_BATCH_STALE_MINUTES} minutes, marking as failed")
+            self.airtable.fail_job(
+                job['id'],
+                "Batch interrupted - its worker stopped before finishing",
+                notes=f"Failed via polling at {datetime.utcnow().isoformat()}"
+            )
+            failed += 1
+            
+            statuses = segment_statuses.get(fields.get('Type'))
+            segment_ids = payload.get('segment_ids') or []
+            if not statuses or not segment_ids:
+                continue
+            running_status, failed_status = statuses
+            try:
+                segments = self.airtable.get_records_by_ids(self.airtable.segments_table, segment_ids)
+                self.airtable.update_segments({
+                    segment['id']: {'Status': failed_status}
+                    for segment in segments if segment['fields'].get('Status') == running_status
+                })
+            except Exception as e:
+                self.logger.error(f"Failed to reset segments of batch job {job['id']}: {e}")
+        return failed
+    
     def run_check_cycle(self):
-        """Run a single check cycle for stuck jobs."""
+        """Run a single check cycle for stuck jobs.
+        
+        Outputs are matched against one listing of the NCA output prefix; the
+        remaining jobs are probed concurrently on JOB_MONITOR_STATUS_WORKERS
+        threads. Jobs not probed within JOB_MONITOR_CYCLE_BUDGET_SECONDS are
+        deferred to the next cycle so cycles don't overlap.
+        """
         try:
             self.logger.info("Starting job monitoring cycle")
+            deadline = time.monotonic() + self.config.JOB_MONITOR_CYCLE_BUDGET_SECONDS
+            
+            try:
+                self.fail_interrupted_batches()
+            except Exception as e:
+                self.logger.error(f"Error checking for interrupted batch jobs: {e}")
             
             # Get stuck jobs
             stuck_jobs = self.check_stuck_jobs(older_than_minutes=5)
@@ -258,63 +529,58 @@ class JobMonitor:
             
             self.logger.info(f"Processing {len(stuck_jobs)} stuck jobs")
             
-            processed_count = 0
-            failed_count = 0
+            counts = {'processed': 0, 'failed': 0}
             
+            jobs = []
             for job in stuck_jobs:
+                if job['fields'].get('External Job ID'):
+                    jobs.append(job)
+                else:
+                    self.logger.debug(f"Job {job['id']} has no external ID, skipping")
+            
+            # One listing instead of a HEAD request per job
+            output_keys, listing_complete = self.list_output_keys(
+                [self.construct_output_key(job['fields']['External Job ID']) for job in jobs])
+            
+            to_probe = []
+            for job in jobs:
+                external_id = job['fields']['External Job ID']
+                if output_keys is not None and self.construct_output_key(external_id) in output_keys:
+                    try:
+                        result = self.apply_probe_result(job, self.construct_output_url(external_id), None)
+                        if result:
+                            counts[result] += 1
+                    except Exception as e:
+                        self.logger.error(f"Error processing job {job['id']}: {e}", exc_info=True)
+                else:
+                    to_probe.append(job)
+            
+            deferred = 0
+            if to_probe:
+                # Keys missing from a complete listing don't need a HEAD request
+                check_output = not listing_complete
+                executor = ThreadPoolExecutor(max_workers=min(max(self.config.JOB_MONITOR_STATUS_WORKERS, 1), len(to_probe)))
+                futures = {executor.submit(self.probe_job, job, check_output): job for job in to_probe}
                 try:
-                    job_id = job['id']
-                    fields = job['fields']
-                    external_id = fields.get('External Job ID')
-                    
-                    if not external_id:
-                        self.logger.debug(f"Job {job_id} has no external ID, skipping")
-                        continue
-                    
-                    self.logger.info(f"Checking job {job_id} with external ID {external_id}")
-                    
-                    # Check if output file exists on DO Spaces
-                    output_url = self.construct_output_url(external_id)
-                    
-                    if self.check_file_exists(output_url):
-                        self.logger.info(f"Found completed file for job {job_id}: {output_url}")
-                        self.process_completed_job(job, output_url)
-                        processed_count += 1
-                    else:
-                        # File doesn't exist, try to get status from NCA
-                        self.logger.debug(f"No file found at {output_url}, checking NCA status")
-                        
-                        nca_status = self.check_nca_job_status(external_id)
-                        if nca_status:
-                            status = nca_status.get('status', '').lower()
-                            
-                            if status == 'failed':
-                                error_msg = nca_status.get('error', 'Job failed in NCA')
-                                self.logger.warning(f"Job {job_id} failed in NCA: {error_msg}")
-                                self.airtable.fail_job(job_id, error_msg, notes=f"Failed via polling check at {datetime.utcnow().isoformat()}")
-                                failed_count += 1
-                            elif status == 'completed':
-                                # Status says completed but no file found
-                                self.logger.warning(f"Job {job_id} marked as completed in NCA but no file found")
-                                # Try alternative URL patterns or wait for next cycle
-                            else:
-                                self.logger.debug(f"Job {job_id} still processing in NCA (status: {status})")
-                        else:
-                            # If job is very old (>1 hour), consider it failed
-                            if job['age_minutes'] > 60:
-                                self.logger.warning(f"Job {job_id} is {job['age_minutes']:.0f} minutes old with no output, marking as failed")
-                                self.airtable.fail_job(
-                                    job_id, 
-                                    "Job timed out - no output after 1 hour",
-                                    notes=f"Timed out via polling at {datetime.utcnow().isoformat()}"
-                                )
-                                failed_count += 1
-                                
-                except Exception as e:
-                    self.logger.error(f"Error processing job {job.get('id', 'unknown')}: {e}", exc_info=True)
+                    for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                        job = futures[future]
+                        try:
+                            output_url, nca_status = future.result()
+                            result = self.apply_probe_result(job, output_url, nca_status)
+                            if result:
+                                counts[result] += 1
+                        except Exception as e:
+                            self.logger.error(f"Error processing job {job.get('id', 'unknown')}: {e}", exc_info=True)
+                except TimeoutError:
+                    deferred = sum(1 for future in futures if not future.done())
+                    self.logger.warning(f"Job check budget of {self.config.JOB_MONITOR_CYCLE_BUDGET_SECONDS}s exhausted, "
+                                        f"deferring {deferred} jobs to the next cycle")
+                finally:
+                    executor.shutdown(wait=False, cancel_futures=True)
             
-            self.logger.info(f"Job monitoring cycle complete. Processed: {processed_count}, Failed: {failed_count}")
+            self.logger.info(f"Job monitoring cycle complete. Processed: {counts['processed']}, "
+                             f"Failed: {counts['failed']}, Deferred: {deferred}")
             
         except Exception as e:
             self.logger.error(f"Error in job monitoring cycle: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,80 @@
+"""Persistent cache of ElevenLabs markup, keyed by a segment and its neighbours."""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def markup_cache_key(target: str, previous: Optional[str], following: Optional[str],
+                     prompt_version: str, model: str, temperature: float) -> str:
+    """SHA-256 of everything the markup request depends on."""
+    material = json.dumps([previous, target, following, prompt_version, model, round(float(temperature), 3)],
+                          separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class MarkupCache(SQLiteCache):
+    """Local SQLite map of markup request key to the marked-up text.
+
+    Re-processing a script with a few edited lines only calls the API for the
+    edited lines and their neighbours, whose context changed.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS markups ('
+        'key TEXT PRIMARY KEY, marked_text TEXT NOT NULL, tokens INTEGER NOT NULL, '
+        'created_at REAL NOT NULL)'
+    )
+    SAVED_STAT = 'tokens_saved'
+
+    def get(self, key: str, *fallback_keys: str) -> Optional[str]:
+        """Return the cached marked-up text under the first key that has one, or None.
+
+        A lookup counts once as a hit or miss however many keys it tries.
+        """
+        conn = self._connection()
+        for candidate in (key, *fallback_keys):
+            row = conn.execute(
+                'SELECT marked_text, tokens FROM markups WHERE key = ?', (candidate,)
+            ).fetchone()
+            if row:
+                self._count(True, row[1])
+                return row[0]
+        self._count(False)
+        return None
+
+    def put(self, key: str, marked_text: str, tokens: int = 0):
+        """Remember a generated markup and the tokens the request used."""
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO markups (key, marked_text, tokens, created_at) VALUES (?, ?, ?, ?)',
+                (key, marked_text, tokens, time.time())
+            )
+
+
+def get_markup_cache(config) -> Optional[MarkupCache]:
+    """Return the process-wide markup cache, or None if it is disabled."""
+    global _cache
+    if not config.MARKUP_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MarkupCache(config.MARKUP_CACHE_PATH)
+    return _cache
+
+
+def markup_cache_stats() -> Dict[str, Any]:
+    """Stats of the cache, empty until it has been created."""
+    cache = _cache
+    return cache.stats() if cache else {}
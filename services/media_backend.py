@@ -0,0 +1,330 @@
+"""Execution backends for FFmpeg compose and concatenate jobs."""
+
+import hashlib
+import hmac
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Output options that mean a stream is decoded and re-encoded
+CODEC_OPTIONS = ('-c', '-codec', '-c:v', '-c:a', '-vcodec', '-acodec', '-codec:v', '-codec:a')
+FILTER_OPTIONS = ('-vf', '-af', '-filter', '-filter:v', '-filter:a', '-filter_complex', '-lavfi')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def is_stream_copy(payload: Dict[str, Any]) -> bool:
+    """Return True if a compose payload only remuxes (no filters, every codec is 'copy')."""
+    if payload.get('filters'):
+        return False
+    outputs = payload.get('outputs') or []
+    if not outputs:
+        return False
+    for output in outputs:
+        codecs = []
+        for opt in output.get('options', []):
+            if opt.get('option') in FILTER_OPTIONS:
+                return False
+            if opt.get('option') in CODEC_OPTIONS:
+                codecs.append(str(opt.get('argument')))
+        if not codecs or any(codec != 'copy' for codec in codecs):
+            return False
+    return True
+
+
+def _flatten_option(opt: Dict[str, Any]) -> List[str]:
+    args = [str(opt['option'])]
+    if opt.get('argument') is not None:
+        args.append(str(opt['argument']))
+    return args
+
+
+def build_ffmpeg_command(payload: Dict[str, Any], output_paths: List[str], ffmpeg: str = 'ffmpeg') -> List[str]:
+    """Translate an NCA /v1/ffmpeg/compose payload into an ffmpeg argument list."""
+    command = [ffmpeg, '-hide_banner', '-nostdin']
+    for opt in payload.get('global_options') or []:
+        command += _flatten_option(opt)
+    if '-y' not in command:
+        command.append('-y')
+
+    for input_spec in payload['inputs']:
+        for opt in input_spec.get('options') or []:
+            command += _flatten_option(opt)
+        command += ['-i', input_spec['file_url']]
+
+    filters = [f['filter'] for f in payload.get('filters') or []]
+    if filters:
+        command += ['-filter_complex', ';'.join(filters)]
+
+    for output, path in zip(payload['outputs'], output_paths):
+        for opt in output.get('options') or []:
+            command += _flatten_option(opt)
+        command.append(path)
+    return command
+
+
+class MediaBackend(ABC):
+    """Where FFmpeg compose and concatenate jobs run.
+
+    Backends take the NCA Toolkit payloads (inputs/filters/outputs, or
+    video_urls for concatenation) and return an NCA-style submission result
+    with a 'job_id'. Completion is reported the way NCA reports it: a callback
+    POSTed to the payload's webhook_url with the payload's 'id'.
+    """
+
+    name = 'base'
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        """Return True if this backend should run the job."""
+        return True
+
+    @abstractmethod
+    def compose(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit a compose job."""
+
+    @abstractmethod
+    def concatenate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit a concatenation job."""
+
+    def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job's status, or None if the job isn't this backend's."""
+        return None
+
+
+class LocalFFmpegBackend(MediaBackend):
+    """Runs jobs with a local ffmpeg binary.
+
+    At most `workers` ffmpeg processes run at once; further jobs wait in the
+    executor queue. Outputs are uploaded with the given uploader (normally
+    NCAService.upload_file) and announced with an NCA-compatible webhook, so
+    the existing /webhooks/nca-toolkit handler completes the job unchanged.
+    """
+
+    name = 'local'
+    JOB_PREFIX = 'local-'
+
+    def __init__(self, uploader: Callable[..., Dict], mode: str = 'local', ffmpeg_path: str = 'ffmpeg',
+                 workers: int = 2, timeout_seconds: float = 1800, max_tracked_jobs: int = 500,
+                 webhook_secret: Optional[str] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            uploader: upload_file-compatible callable used to store outputs
+            mode: 'local' to run every job here, 'auto' for stream-copy compose jobs only
+            ffmpeg_path: ffmpeg binary
+            workers: Maximum concurrent ffmpeg processes
+            timeout_seconds: Per-job ffmpeg timeout
+            max_tracked_jobs: How many finished jobs get_job_status remembers
+            webhook_secret: NCA webhook secret used to sign callbacks (X-NCA-Signature)
+        """
+        self.uploader = uploader
+        self.mode = mode
+        self.ffmpeg_path = ffmpeg_path
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.max_tracked_jobs = max_tracked_jobs
+        self.webhook_secret = webhook_secret
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='local-ffmpeg')
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        if self.mode == 'local':
+            return True
+        # 'auto': only cheap remuxes run in-house; concatenation and re-encodes go to NCA
+        return 'video_urls' not in payload and is_stream_copy(payload)
+
+    # Submission
+
+    def _submit(self, endpoint: str, payload: Dict[str, Any], run: Callable[..., List[str]]) -> Dict[str, Any]:
+        job_id = f"{self.JOB_PREFIX}{uuid.uuid4()}"
+        with self._lock:
+            self._jobs[job_id] = {'status': 'queued', 'submitted_at': time.time()}
+            while len(self._jobs) > self.max_tracked_jobs:
+                self._jobs.popitem(last=False)
+            self.submitted += 1
+        self._executor.submit(self._execute, job_id, endpoint, payload, run)
+        logger.info(f"Queued local {endpoint} job {job_id} (custom ID: {payload.get('id')})")
+        return {
+            'job_id': job_id,
+            'id': payload.get('id'),
+            'backend': self.name,
+            'message': 'processing'
+        }
+
+    def compose(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run an NCA /v1/ffmpeg/compose payload locally."""
+        if not payload.get('inputs') or not payload.get('outputs'):
+            raise ValueError("Compose payload needs 'inputs' and 'outputs'")
+        return self._submit('/v1/ffmpeg/compose', payload, self._run_compose)
+
+    def concatenate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run an NCA /v1/video/concatenate payload locally (concat demuxer, stream copy)."""
+        if not payload.get('video_urls'):
+            raise ValueError("Concatenate payload needs 'video_urls'")
+        return self._submit('/v1/video/concatenate', payload, self._run_concatenate)
+
+    # Execution
+
+    def _run_compose(self, job_id: str, workdir: str, payload: Dict[str, Any]) -> List[str]:
+        output_paths = []
+        for i, output in enumerate(payload['outputs']):
+            filename = os.path.basename(output.get('filename') or f"{job_id}_output_{i}.mp4")
+            output_paths.append(os.path.join(workdir, filename))
+        self._run_ffmpeg(build_ffmpeg_command(payload, output_paths, self.ffmpeg_path))
+        return output_paths
+
+    def _run_concatenate(self, job_id: str, workdir: str, payload: Dict[str, Any]) -> List[str]:
+        list_path = os.path.join(workdir, 'inputs.txt')
+        with open(list_path, 'w') as f:
+            for item in payload['video_urls']:
+                url = item['video_url'] if isinstance(item, dict) else item
+                f.write("file '{}'\n".format(url.replace("'", "'\\''")))
+        output_path = os.path.join(workdir, f"{job_id}_output_0.mp4")
+        self._run_ffmpeg([
+            self.ffmpeg_path, '-hide_banner', '-nostdin', '-y',
+            '-f', 'concat', '-safe', '0', '-protocol_whitelist', 'file,http,https,tcp,tls,crypto',
+            '-i', list_path, '-c', 'copy', '-movflags', '+faststart', output_path
+        ])
+        return [output_path]
+
+    def _run_ffmpeg(self, command: List[str]):
+        logger.debug(f"Running: {' '.join(command)}")
+        completed = subprocess.run(command, capture_output=True, timeout=self.timeout_seconds)
+        if completed.returncode != 0:
+            stderr = completed.stderr.decode('utf-8', errors='replace').strip().splitlines()
+            raise RuntimeError(f"ffmpeg exited with {completed.returncode}: {' | '.join(stderr[-5:])}")
+
+    def _execute(self, job_id: str, endpoint: str, payload: Dict[str, Any], run: Callable):
+        started = time.time()
+        self._set_status(job_id, status='processing', started_at=started)
+        workdir = tempfile.mkdtemp(prefix=f"{job_id}-")
+        try:
+            urls = []
+            for path in run(job_id, workdir, payload):
+                filename = os.path.basename(path)
+                content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                with open(path, 'rb') as f:
+                    urls.append(self.uploader(file_data=f, filename=filename,
+                                              content_type=content_type, file_type='videos')['url'])
+
+            run_time = round(time.time() - started, 3)
+            self._set_status(job_id, status='completed', output_url=urls[0], run_time=run_time)
+            with self._lock:
+                self.completed += 1
+            logger.info(f"Local {endpoint} job {job_id} completed in {run_time}s: {urls[0]}")
+
+            # /v1/video/concatenate reports a bare URL, compose reports outputs
+            response = urls[0] if endpoint == '/v1/video/concatenate' else {'outputs': [{'url': url} for url in urls]}
+            self._notify(payload, {'code': 200, 'message': 'success', 'response': response}, job_id, endpoint, run_time)
+        except Exception as e:
+            run_time = round(time.time() - started, 3)
+            self._set_status(job_id, status='failed', error=str(e), run_time=run_time)
+            with self._lock:
+                self.failed += 1
+            logger.error(f"Local {endpoint} job {job_id} failed: {e}")
+            self._notify(payload, {'code': 500, 'message': str(e), 'response': None}, job_id, endpoint, run_time)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _notify(self, payload: Dict[str, Any], body: Dict[str, Any], job_id: str, endpoint: str, run_time: float):
+        """POST an NCA-style callback to the job's webhook_url."""
+        webhook_url = payload.get('webhook_url')
+        if not webhook_url:
+            return
+        body.update({'endpoint': endpoint, 'id': payload.get('id'), 'job_id': job_id,
+                     'run_time': run_time, 'backend': self.name})
+        data = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.webhook_secret:
+            # Signed the way WebhookValidator checks /webhooks/nca-toolkit
+            headers['X-NCA-Signature'] = hmac.new(
+                self.webhook_secret.encode('utf-8'), data, hashlib.sha256
+            ).hexdigest()
+        for attempt in range(3):
+            try:
+                response = requests.post(webhook_url, data=data, headers=headers, timeout=30)
+                if 200 <= response.status_code < 300:
+                    return
+                logger.warning(f"Webhook for local job {job_id} returned {response.status_code}")
+            except requests.RequestException as e:
+                logger.warning(f"Webhook for local job {job_id} failed: {e}")
+            time.sleep(2 ** attempt)
+        logger.error(f"Giving up on webhook for local job {job_id}; the job monitor will pick it up")
+
+    # Status
+
+    def _set_status(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not job_id or not job_id.startswith(self.JOB_PREFIX):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                # Finished long ago, or submitted by another (possibly restarted)
+                # process: report nothing so the job monitor's age timeout applies
+                return None
+            return dict(job, job_id=job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counters for metrics reporting."""
+        with self._lock:
+            states = [job['status'] for job in self._jobs.values()]
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'queued': states.count('queued'),
+                'running': states.count('processing'),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+
+def get_media_backend(config, uploader: Callable[..., Dict]) -> Optional[MediaBackend]:
+    """Return the process-wide local backend, or None when every job goes to NCA."""
+    global _backend
+    if config.MEDIA_BACKEND not in ('local', 'auto'):
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = LocalFFmpegBackend(
+                    uploader=uploader,
+                    mode=config.MEDIA_BACKEND,
+                    ffmpeg_path=config.LOCAL_FFMPEG_PATH,
+                    workers=config.LOCAL_FFMPEG_WORKERS,
+                    timeout_seconds=config.LOCAL_FFMPEG_TIMEOUT_SECONDS,
+                    webhook_secret=config.WEBHOOK_SECRET_NCA or None
+                )
+    return _backend
+
+
+def local_backend_stats() -> Dict[str, Any]:
+    """Stats of the local backend, empty until it has been created."""
+    backend = _backend
+    return backend.stats() if isinstance(backend, LocalFFmpegBackend) else {}
@@ -0,0 +1,262 @@
+"""Media metadata (duration, codecs, size, fps) for asset URLs, cached across processes."""
+
+import json
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import requests
+
+from utils.sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+_probe = None
+_probe_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """What ffprobe reported for one asset."""
+    url: str
+    duration: Optional[float] = None
+    format_name: Optional[str] = None
+    size: Optional[int] = None
+    video_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    pix_fmt: Optional[str] = None
+    audio_codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_codec is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MediaInfo':
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Parse an ffprobe frame rate ('30000/1001', '25/1') into frames per second."""
+    if not rate:
+        return None
+    try:
+        numerator, _, denominator = str(rate).partition('/')
+        value = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return round(value, 3) if value > 0 else None
+
+
+def _to_number(value: Any, cast=float) -> Optional[Any]:
+    try:
+        return cast(value) if value not in (None, '', 'N/A') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_ffprobe_output(url: str, data: Dict[str, Any]) -> MediaInfo:
+    """Build a MediaInfo from `ffprobe -show_format -show_streams -print_format json` output."""
+    streams = data.get('streams') or []
+    fmt = data.get('format') or {}
+    video = next((s for s in streams if s.get('codec_type') == 'video'
+                  and not (s.get('disposition') or {}).get('attached_pic')), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+    duration = _to_number(fmt.get('duration'))
+    if duration is None:
+        durations = [_to_number(s.get('duration')) for s in streams]
+        durations = [d for d in durations if d is not None]
+        duration = max(durations) if durations else None
+
+    return MediaInfo(
+        url=url,
+        duration=duration,
+        format_name=fmt.get('format_name'),
+        size=_to_number(fmt.get('size'), int),
+        video_codec=video.get('codec_name') if video else None,
+        width=_to_number(video.get('width'), int) if video else None,
+        height=_to_number(video.get('height'), int) if video else None,
+        fps=_parse_rate(video.get('avg_frame_rate') or video.get('r_frame_rate')) if video else None,
+        pix_fmt=video.get('pix_fmt') if video else None,
+        audio_codec=audio.get('codec_name') if audio else None,
+        sample_rate=_to_number(audio.get('sample_rate'), int) if audio else None,
+        channels=_to_number(audio.get('channels'), int) if audio else None
+    )
+
+
+class ProbeCache(SQLiteCache):
+    """Local SQLite store of probe results keyed by URL and validator (ETag or Last-Modified + size).
+
+    A changed validator makes the old entry a miss, so replaced objects are
+    re-probed; URLs served without a validator are cached by URL alone.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS probes ('
+        'url TEXT PRIMARY KEY, validator TEXT NOT NULL, info TEXT NOT NULL, probed_at REAL NOT NULL)'
+    )
+
+    def get(self, url: str, validator: str) -> Optional[MediaInfo]:
+        """Return the cached result for url if it was probed with the same validator."""
+        row = self._connection().execute(
+            'SELECT info FROM probes WHERE url = ? AND validator = ?', (url, validator)
+        ).fetchone()
+        self._count(row is not None)
+        return MediaInfo.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, url: str, validator: str, info: MediaInfo):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO probes (url, validator, info, probed_at) VALUES (?, ?, ?, ?)',
+                (url, validator, json.dumps(info.to_dict()), time.time())
+            )
+
+
+class MediaProbe:
+    """Probe asset URLs with ffprobe, reusing cached results while the object is unchanged.
+
+    ffprobe reads the URL itself over HTTP, seeking with Range requests, so only
+    the container headers (and an MP4's moov atom wherever it sits) are fetched
+    rather than the whole file.
+    """
+
+    def __init__(self, cache: ProbeCache, ffprobe_path: str = 'ffprobe', timeout_seconds: int = 30,
+                 workers: int = 4, session: Optional[requests.Session] = None):
+        self.cache = cache
+        self.ffprobe_path = ffprobe_path
+        self.timeout_seconds = timeout_seconds
+        self.workers = max(workers, 1)
+        self.session = session or requests.Session()
+        self._stats_lock = threading.Lock()
+        self.probes_run = 0
+        self.probe_failures = 0
+        self.probe_seconds = 0.0
+
+    def validator(self, url: str) -> str:
+        """Return the object's ETag, or Last-Modified plus size, from a HEAD or one-byte ranged GET."""
+        headers = {}
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=10)
+            if response.status_code >= 400:
+                # Some signed URLs only allow GET; a one-byte range returns the same headers
+                response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=10)
+                response.close()
+            if response.status_code < 400:
+                headers = response.headers
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Could not read validator for {url}: {e}")
+
+        etag = headers.get('ETag')
+        if etag:
+            return etag.strip('"')
+        size = headers.get('Content-Range', '').rpartition('/')[2] or headers.get('Content-Length', '')
+        last_modified = headers.get('Last-Modified', '')
+        return f"{last_modified}|{size}" if last_modified else ''
+
+    def run_ffprobe(self, url: str) -> MediaInfo:
+        """Probe url with ffprobe (no cache).
+
+        Raises:
+            RuntimeError: If ffprobe fails or times out
+        """
+        command = [
+            self.ffprobe_path, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams',
+            '-rw_timeout', str(self.timeout_seconds * 1_000_000), url
+        ]
+        started = time.monotonic()
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout_seconds)
+        except subprocess.TimeoutExpired as e:
+            self._record(False, time.monotonic() - started)
+            raise RuntimeError(f"ffprobe timed out after {self.timeout_seconds}s for {url}") from e
+        if completed.returncode != 0:
+            self._record(False, time.monotonic() - started)
+            raise RuntimeError(f"ffprobe failed for {url}: {completed.stderr.strip()[-500:]}")
+        self._record(True, time.monotonic() - started)
+        return parse_ffprobe_output(url, json.loads(completed.stdout or '{}'))
+
+    def probe(self, url: str) -> MediaInfo:
+        """Return media info for url, from the cache while the object's validator is unchanged."""
+        validator = self.validator(url)
+        cached = self.cache.get(url, validator)
+        if cached:
+            return cached
+        info = self.run_ffprobe(url)
+        self.cache.put(url, validator, info)
+        return info
+
+    def probe_many(self, urls: Iterable[str]) -> Dict[str, Optional[MediaInfo]]:
+        """Probe several URLs concurrently; failed probes map to None."""
+        unique_urls = list(dict.fromkeys(urls))
+
+        def safe_probe(url: str) -> Tuple[str, Optional[MediaInfo]]:
+            try:
+                return url, self.probe(url)
+            except Exception as e:
+                logger.warning(f"Media probe failed for {url}: {e}")
+                return url, None
+
+        if len(unique_urls) <= 1:
+            return dict(safe_probe(url) for url in unique_urls)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(unique_urls))) as executor:
+            return dict(executor.map(safe_probe, unique_urls))
+
+    def _record(self, success: bool, seconds: float):
+        with self._stats_lock:
+            self.probes_run += 1
+            self.probe_seconds += seconds
+            if not success:
+                self.probe_failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = {
+                'probes_run': self.probes_run,
+                'probe_failures': self.probe_failures,
+                'probe_seconds': round(self.probe_seconds, 3)
+            }
+        stats.update({f"cache_{key}": value for key, value in self.cache.stats().items()})
+        return stats
+
+
+def get_media_probe(config) -> Optional[MediaProbe]:
+    """Return the process-wide probe, or None if probing is disabled or ffprobe isn't installed."""
+    global _probe
+    if not config.MEDIA_PROBE_ENABLED:
+        return None
+    if _probe is None:
+        with _probe_lock:
+            if _probe is None:
+                if not shutil.which(config.FFPROBE_PATH):
+                    logger.warning(f"ffprobe not found at '{config.FFPROBE_PATH}'; media probing disabled")
+                    return None
+                _probe = MediaProbe(
+                    cache=ProbeCache(config.MEDIA_PROBE_CACHE_PATH),
+                    ffprobe_path=config.FFPROBE_PATH,
+                    timeout_seconds=config.MEDIA_PROBE_TIMEOUT_SECONDS,
+                    workers=config.MEDIA_PROBE_WORKERS
+                )
+    return _probe
+
+
+def media_probe_stats() -> Dict[str, Any]:
+    """Stats of the probe, empty until it has been created."""
+    probe = _probe
+    return probe.stats() if probe else {}
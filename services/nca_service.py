@@ -2,15 +2,28 @@
 
 import logging
 import json
+import time
 import requests
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Union
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from config import get_config
 from utils.logger import APILogger
 from utils.decorators import retry, rate_limit
-from utils.remote_backup import send_to_remote_backup, determine_file_type
+from services.concat_planner import (
+    STRATEGY_STREAM_COPY, ConcatPlan, build_concat_list, build_normalize_payload,
+    build_stream_copy_concat_payload, plan_concat
+)
+from services.encoding_profiles import get_encoding_profile
+from services.media_backend import MediaBackend, get_media_backend
+from services.media_probe import MediaInfo, get_media_probe
+from utils.backup_queue import get_backup_queue
+from utils.remote_backup import send_to_remote_backup, remote_backup_configured, determine_file_type
+from utils.s3 import (
+    UploadSource, TeeReader, as_file_object, get_s3_client, get_transfer_config,
+    get_upload_index, hash_upload_source, object_exists
+)
 
 logger = logging.getLogger(__name__)
 api_logger = APILogger()
@@ -42,6 +55,18 @@ class NCAService:
             'x-api-key': self.api_key,
             'Content-Type': 'application/json'
         })
+        
+        # In-house FFmpeg executor (None when MEDIA_BACKEND is 'nca')
+        self.media_backend = get_media_backend(self.config, self.upload_file)
+        
+        # Cached ffprobe metadata (None when probing is disabled or ffprobe is missing)
+        self.media_probe = get_media_probe(self.config)
+    
+    def _local_backend_for(self, payload: Dict[str, Any]) -> Optional[MediaBackend]:
+        """Return the in-house backend if it should run this job, None to send it to NCA."""
+        if self.media_backend and self.media_backend.accepts(payload):
+            return self.media_backend
+        return None
     
     def check_health(self) -> bool:
         """Check if NCA Toolkit service is healthy."""
@@ -60,24 +85,25 @@ class NCAService:
             return False
     
     @retry(max_attempts=3, exceptions=(requests.RequestException,))
-    def upload_file(self, file_data: bytes, filename: str, 
+    def upload_file(self, file_data: UploadSource, filename: str, 
                    content_type: str = 'application/octet-stream',
-                   file_type: Optional[str] = None) -> Dict:
-        """Upload a file directly to S3 storage and optionally save locally."""
+                   file_type: Optional[str] = None,
+                   content_hash: Optional[bool] = None) -> Dict:
+        """Upload a file directly to S3 storage and optionally save locally.
+        
+        file_data may be bytes, a readable file object or an iterator of byte
+        chunks. Streams are never read fully into memory: anything above
+        S3_MULTIPART_THRESHOLD_MB goes up as a parallel multipart upload, and the
+        local backup is written as the bytes stream past.
+        
+        In content-hash mode (content_hash, default S3_CONTENT_HASH_UPLOADS, off
+        unless configured) the key is derived from the folder, the content type
+        and the SHA-256 of the bytes. Content that is already in the bucket
+        under that key (confirmed with an S3 HEAD) is not transferred again; the
+        existing URL is returned with 'deduplicated': True.
+        """
         try:
-            import boto3
-            from botocore.client import Config
-            import os
-            
-            # Initialize S3 client with DigitalOcean Spaces credentials
-            s3_client = boto3.client(
-                's3',
-                endpoint_url='https://nyc3.digitaloceanspaces.com',
-                aws_access_key_id=self.config.NCA_S3_ACCESS_KEY,
-                aws_secret_access_key=self.config.NCA_S3_SECRET_KEY,
-                config=Config(signature_version='s3v4'),
-                region_name=self.config.NCA_S3_REGION
-            )
+            s3_client = get_s3_client(self.config)
             
             # Determine file type if not provided
             if not file_type:
@@ -101,76 +127,249 @@ class NCAService:
                 'unknown': 'misc'
             }
             folder = folder_map.get(file_type, 'misc')
-            key = f"youtube-video-engine/{folder}/{timestamp}_{unique_id}_{filename}"
-            
-            # Save file locally if LOCAL_BACKUP_PATH is configured
-            local_path = None
-            if hasattr(self.config, 'LOCAL_BACKUP_PATH') and self.config.LOCAL_BACKUP_PATH:
-                # Create directory structure
-                local_dir = os.path.join(self.config.LOCAL_BACKUP_PATH, 'youtube-video-engine', folder)
-                os.makedirs(local_dir, exist_ok=True)
-                
-                # Save file locally
-                local_filename = f"{timestamp}_{unique_id}_{filename}"
-                local_path = os.path.join(local_dir, local_filename)
-                
-                with open(local_path, 'wb') as f:
-                    f.write(file_data)
-                
-                logger.info(f"File saved locally: {local_path}")
-            
-            # Send to remote backup (e.g., local machine)
-            remote_backup_result = send_to_remote_backup(
-                file_data=file_data,
-                filename=f"{timestamp}_{unique_id}_{filename}",
-                file_type=file_type,
-                original_path=key
-            )
-            
-            # Upload to S3
-            s3_client.put_object(
-                Bucket=self.config.NCA_S3_BUCKET_NAME,
-                Key=key,
-                Body=file_data,
-                ContentType=content_type,
-                ACL='public-read'  # Make it publicly accessible
-            )
-            
-            # Return the public URL
-            public_url = f"https://{self.config.NCA_S3_BUCKET_NAME}.nyc3.digitaloceanspaces.com/{key}"
-            
-            result = {
-                'url': public_url,
-                'key': key,
-                'bucket': self.config.NCA_S3_BUCKET_NAME,
-                'file_type': file_type
-            }
-            
-            if local_path:
-                result['local_path'] = local_path
-            
-            if remote_backup_result:
-                result['remote_backup'] = remote_backup_result
             
+            if content_hash is None:
+                content_hash = self.config.S3_CONTENT_HASH_UPLOADS
+            if not content_hash:
+                key = f"youtube-video-engine/{folder}/{timestamp}_{unique_id}_{filename}"
+                backup_filename = f"{timestamp}_{unique_id}_{filename}"
+                return self._store_object(s3_client, file_data, key, backup_filename, folder, file_type, content_type)
+            
+            digest, body = hash_upload_source(file_data, get_transfer_config(self.config).multipart_threshold)
+            key = self._content_key(folder, digest, filename, content_type)
+            try:
+                existing = self._find_existing_upload(s3_client, key, digest)
+                if existing:
+                    existing['file_type'] = file_type
+                    logger.info(f"Skipped upload of {filename}: identical content already stored at {existing['key']}")
+                    return existing
+                
+                result = self._store_object(s3_client, body, key, f"{digest[:16]}_{filename}",
+                                            folder, file_type, content_type)
+            finally:
+                if body is not file_data:
+                    body.close()
+            
+            result['content_sha256'] = digest
+            result['deduplicated'] = False
+            index = get_upload_index(self.config)
+            index.put(key, result['url'], result['size'])
+            index.record(deduplicated=False)
             return result
             
         except Exception as e:
             api_logger.log_error('nca', e, {'operation': 'upload_file'})
             raise
     
+    @staticmethod
+    def _content_key(folder: str, digest: str, filename: str, content_type: str) -> str:
+        """Object key for content-addressed uploads.
+        
+        The content type is part of the key, so the same bytes uploaded with a
+        different type get their own object (S3 serves the type it was stored with).
+        """
+        import os
+        import re
+        extension = os.path.splitext(filename)[1].lower()
+        media_type = re.sub(r'[^a-z0-9.+-]+', '-', (content_type or '').split(';')[0].strip().lower())
+        return f"youtube-video-engine/{folder}/sha256/{media_type or 'unknown'}/{digest}{extension}"
+    
+    def _public_url(self, key: str) -> str:
+        return f"https://{self.config.NCA_S3_BUCKET_NAME}.nyc3.digitaloceanspaces.com/{key}"
+    
+    def stored_file_exists(self, url: str) -> bool:
+        """Whether a previously stored file is still there.
+        
+        Files in the NCA bucket are checked with an S3 HEAD; any other URL with
+        an HTTP HEAD request.
+        """
+        prefix = self._public_url('')
+        if url.startswith(prefix):
+            return object_exists(get_s3_client(self.config), self.config.NCA_S3_BUCKET_NAME, url[len(prefix):])
+        response = self.session.head(url, timeout=10, allow_redirects=True)
+        return response.status_code != 404
+    
+    def _find_existing_upload(self, s3_client, key: str, digest: str) -> Optional[Dict]:
+        """Return the stored object for a content key, or None if it must be uploaded.
+        
+        The object is always confirmed with a HEAD: the local index only knows
+        what this host stored, not whether the object has since been deleted.
+        """
+        index = get_upload_index(self.config)
+        known = index.get(key)
+        if not object_exists(s3_client, self.config.NCA_S3_BUCKET_NAME, key):
+            if known:
+                logger.info(f"Dropping stale upload index entry for deleted object {key}")
+                index.remove(key)
+            return None
+        
+        if known:
+            url, size = known['url'], known['size']
+        else:
+            url, size = self._public_url(key), None
+            index.put(key, url)
+        
+        index.record(deduplicated=True, size=size or 0)
+        return {
+            'url': url,
+            'key': key,
+            'bucket': self.config.NCA_S3_BUCKET_NAME,
+            'size': size,
+            'content_sha256': digest,
+            'deduplicated': True
+        }
+    
+    def _backup_remotely(self, source: Union[bytes, str], backup_filename: str,
+                         file_type: str, key: str) -> Optional[Dict]:
+        """Queue (or, with the queue disabled, send) the remote backup of an upload.
+        
+        source is the file bytes or the path of the local backup copy.
+        """
+        if not remote_backup_configured():
+            return None
+        
+        if self.config.BACKUP_QUEUE_ENABLED:
+            entry_id = get_backup_queue(self.config).enqueue(
+                source, filename=backup_filename, file_type=file_type, original_path=key
+            )
+            return {'queued': entry_id is not None, 'queue_id': entry_id}
+        
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return send_to_remote_backup(file_data=f, filename=backup_filename,
+                                             file_type=file_type, original_path=key)
+        return send_to_remote_backup(file_data=source, filename=backup_filename,
+                                     file_type=file_type, original_path=key)
+    
+    def _store_object(self, s3_client, file_data: UploadSource, key: str, backup_filename: str,
+                      folder: str, file_type: str, content_type: str) -> Dict:
+        """Upload a body to S3 under key, then write the local backup and queue the remote one."""
+        import os
+        
+        in_memory = isinstance(file_data, (bytes, bytearray))
+        
+        # Save file locally if LOCAL_BACKUP_PATH is configured
+        local_path = None
+        local_file = None
+        if hasattr(self.config, 'LOCAL_BACKUP_PATH') and self.config.LOCAL_BACKUP_PATH:
+            # Create directory structure
+            local_dir = os.path.join(self.config.LOCAL_BACKUP_PATH, 'youtube-video-engine', folder)
+            os.makedirs(local_dir, exist_ok=True)
+            local_path = os.path.join(local_dir, backup_filename)
+            
+            if in_memory:
+                with open(local_path, 'wb') as f:
+                    f.write(file_data)
+                logger.info(f"File saved locally: {local_path}")
+            else:
+                # Streams are written out while they upload
+                local_file = open(local_path, 'wb')
+        
+        # Without a local copy to link from, a stream is teed straight into the backup spool
+        spool_entry, spool_file = None, None
+        if not in_memory and not local_path and remote_backup_configured() and self.config.BACKUP_QUEUE_ENABLED:
+            spool_entry, spool_file = get_backup_queue(self.config).open_spool()
+        
+        # Upload to S3
+        extra_args = {
+            'ContentType': content_type,
+            'ACL': 'public-read'  # Make it publicly accessible
+        }
+        transfer_config = get_transfer_config(self.config)
+        started = time.monotonic()
+        try:
+            if in_memory and len(file_data) < transfer_config.multipart_threshold:
+                s3_client.put_object(
+                    Bucket=self.config.NCA_S3_BUCKET_NAME,
+                    Key=key,
+                    Body=file_data,
+                    **extra_args
+                )
+                size = len(file_data)
+            else:
+                sinks = [f.write for f in (local_file, spool_file) if f]
+                body = TeeReader(as_file_object(file_data), *sinks)
+                s3_client.upload_fileobj(
+                    body,
+                    self.config.NCA_S3_BUCKET_NAME,
+                    key,
+                    ExtraArgs=extra_args,
+                    Config=transfer_config
+                )
+                size = body.bytes_read
+        except Exception:
+            if spool_file:
+                spool_file.close()
+                get_backup_queue(self.config).discard(spool_entry)
+                spool_file = None
+            raise
+        finally:
+            if local_file:
+                local_file.close()
+            if spool_file:
+                spool_file.close()
+        
+        elapsed = time.monotonic() - started
+        bytes_per_second = size / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Uploaded {key} ({size} bytes) in {elapsed:.2f}s "
+                    f"({bytes_per_second / (1024 * 1024):.2f} MB/s)")
+        
+        if local_file:
+            logger.info(f"File saved locally: {local_path}")
+        
+        # Send to remote backup (e.g., local machine) once S3 has the file
+        remote_backup_result = None
+        if spool_entry:
+            entry_id = get_backup_queue(self.config).commit(
+                spool_entry, filename=backup_filename, file_type=file_type, original_path=key
+            )
+            remote_backup_result = {'queued': entry_id is not None, 'queue_id': entry_id}
+        elif in_memory or local_path:
+            remote_backup_result = self._backup_remotely(
+                file_data if in_memory else local_path, backup_filename, file_type, key
+            )
+        
+        # Return the public URL
+        public_url = self._public_url(key)
+        
+        result = {
+            'url': public_url,
+            'key': key,
+            'bucket': self.config.NCA_S3_BUCKET_NAME,
+            'file_type': file_type,
+            'size': size,
+            'upload_seconds': round(elapsed, 3),
+            'bytes_per_second': round(bytes_per_second)
+        }
+        
+        if local_path:
+            result['local_path'] = local_path
+        
+        if remote_backup_result:
+            result['remote_backup'] = remote_backup_result
+        
+        return result
+    
+    def probe_media(self, *urls: str) -> Dict[str, Optional[MediaInfo]]:
+        """Probe asset URLs (cached); empty when probing is unavailable, None for failed probes."""
+        if not self.media_probe:
+            return {}
+        return self.media_probe.probe_many(urls)
+    
     def combine_audio_video(self, video_url: str, audio_url: str, 
                           output_filename: str, webhook_url: Optional[str] = None,
                           custom_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Combine audio and video files using FFmpeg compose endpoint.
         
-        Duration matching behavior:
-        - If video is shorter than audio: Video will loop/repeat
-        - If video is longer than audio: Video will be truncated
-        - Output duration matches the SHORTEST stream (typically audio)
+        Duration matching behavior (when both assets can be probed):
+        - If video is shorter than audio: Video loops (-stream_loop, still stream copy)
+        - If video is longer than audio: Video is trimmed
+        - Output duration is exactly the audio duration (-t)
         
-        Uses -shortest flag without filters to avoid NCA timeout issues.
-        The tpad filter was causing consistent 524 timeouts on NCA.
+        Without probe results, falls back to -shortest, which stops at the
+        shorter stream. No filters either way: the tpad filter was causing
+        consistent 524 timeouts on NCA.
         """
         current_payload_for_logging: Optional[Dict[str, Any]] = None
         try:
@@ -202,10 +401,20 @@ class NCAService:
                 {'option': '-map', 'argument': '0:v'},
                 {'option': '-map', 'argument': '1:a'},
                 {'option': '-c:v', 'argument': 'copy'},
-                {'option': '-c:a', 'argument': 'copy'},
-                {'option': '-shortest'}  # No argument for -shortest flag
+                {'option': '-c:a', 'argument': 'copy'}
             ]
-            logger.info(f"Using -shortest flag to match output duration to shortest stream. Video codec: copy, Audio codec: copy.")
+            
+            probes = self.probe_media(video_url, audio_url)
+            video_info, audio_info = probes.get(video_url), probes.get(audio_url)
+            if video_info and audio_info and video_info.duration and audio_info.duration:
+                if video_info.duration < audio_info.duration:
+                    video_input_spec['options'] = [{'option': '-stream_loop', 'argument': '-1'}]
+                ffmpeg_output_options_payload.append({'option': '-t', 'argument': f"{audio_info.duration:.3f}"})
+                logger.info(f"Probed durations: video={video_info.duration:.3f}s, audio={audio_info.duration:.3f}s. "
+                            f"Output trimmed to audio{' with looped video' if video_info.duration < audio_info.duration else ''}.")
+            else:
+                ffmpeg_output_options_payload.append({'option': '-shortest'})  # No argument for -shortest flag
+                logger.info(f"Using -shortest flag to match output duration to shortest stream. Video codec: copy, Audio codec: copy.")
 
             # Define the output object, including its filename and options
             output_definition = {
@@ -230,6 +439,10 @@ class NCAService:
             if custom_id:
                 current_payload_for_logging['id'] = custom_id
             
+            backend = self._local_backend_for(current_payload_for_logging)
+            if backend:
+                return backend.compose(current_payload_for_logging)
+            
             api_logger.log_api_request('nca', 'combine_audio_video', current_payload_for_logging)
             logger.debug(f"NCA /v1/ffmpeg/compose payload: {json.dumps(current_payload_for_logging, indent=2)}")
             
@@ -271,10 +484,49 @@ class NCAService:
             api_logger.log_error('nca', e, error_context)
             raise
     
+    def plan_concatenation(self, video_urls: List[str], encoding_profile: Optional[str] = None) -> ConcatPlan:
+        """Plan stream copy vs. normalization for video_urls from their (cached) probe metadata."""
+        probes = self.probe_media(*video_urls)
+        return plan_concat([probes.get(url) for url in video_urls], get_encoding_profile(encoding_profile))
+    
+    def normalize_video(self, video_url: str, reference: Dict[str, Any], output_filename: str,
+                        webhook_url: Optional[str] = None, custom_id: Optional[str] = None,
+                        encoding_profile: Optional[str] = None) -> Dict[str, Any]:
+        """Re-encode one segment to a concat plan's reference stream parameters."""
+        payload = build_normalize_payload(video_url, reference, get_encoding_profile(encoding_profile))
+        payload['outputs'][0]['filename'] = output_filename
+        return self.invoke_ffmpeg_compose_job(
+            inputs_payload=payload['inputs'],
+            outputs_payload=payload['outputs'],
+            filters_payload=payload['filters'],
+            global_options_payload=[{'option': '-y'}],
+            webhook_url=webhook_url,
+            custom_id=custom_id
+        )
+    
     def concatenate_videos(self, video_urls: List[str], output_filename: str,
                          webhook_url: Optional[str] = None, 
-                         custom_id: Optional[str] = None) -> Dict:
-        """Concatenate multiple videos into one using NCA video concatenate endpoint."""
+                         custom_id: Optional[str] = None,
+                         plan: Optional[ConcatPlan] = None) -> Dict:
+        """Concatenate multiple videos into one.
+        
+        With a stream_copy plan the segments are joined by the concat demuxer
+        with -c copy (list file uploaded alongside); otherwise NCA's video
+        concatenate endpoint is used.
+        """
+        if plan and plan.strategy == STRATEGY_STREAM_COPY:
+            list_upload = self.upload_file(build_concat_list(video_urls).encode('utf-8'),
+                                           f"{output_filename}.txt", content_type='text/plain')
+            payload = build_stream_copy_concat_payload(list_upload['url'])
+            payload['outputs'][0]['filename'] = output_filename
+            return self.invoke_ffmpeg_compose_job(
+                inputs_payload=payload['inputs'],
+                outputs_payload=payload['outputs'],
+                global_options_payload=[{'option': '-y'}],
+                webhook_url=webhook_url,
+                custom_id=custom_id
+            )
+        
         try:
             # Use correct NCA Toolkit payload structure based on API documentation
             payload = {
@@ -290,6 +542,10 @@ class NCAService:
             if custom_id:
                 payload['id'] = custom_id
             
+            backend = self._local_backend_for(payload)
+            if backend:
+                return backend.concatenate(payload)
+            
             api_logger.log_api_request('nca', 'concatenate_videos', payload)
             
             # Use correct NCA Toolkit endpoint for video concatenation
@@ -311,9 +567,15 @@ class NCAService:
     def add_background_music(self, video_url: str, music_url: str, 
                            output_filename: str, volume_ratio: float = 0.2,
                            webhook_url: Optional[str] = None,
-                           custom_id: Optional[str] = None) -> Dict:
-        """Add background music to a video using FFmpeg compose endpoint."""
+                           custom_id: Optional[str] = None,
+                           encoding_profile: Optional[str] = None) -> Dict:
+        """Add background music to a video using FFmpeg compose endpoint.
+        
+        The video stream is copied; the mixed audio is encoded with the
+        encoding profile's codec and bitrate.
+        """
         try:
+            profile = get_encoding_profile(encoding_profile)
             # Use correct NCA Toolkit payload structure based on API documentation
             payload = {
                 'inputs': [
@@ -328,7 +590,7 @@ class NCAService:
                         {'option': '-map', 'argument': '0:v'},      # Map video from 1st input
                         {'option': '-map', 'argument': '[aout]'},   # Map the mixed audio stream
                         {'option': '-c:v', 'argument': 'copy'},  # Copy video without re-encoding
-                        {'option': '-c:a', 'argument': 'aac'},   # Encode audio to AAC
+                        *profile.audio_options(),                # Encode the mix per the profile
                         {'option': '-shortest'} # Ensure output terminates with the shortest stream
                     ]
                 }],
@@ -344,6 +606,10 @@ class NCAService:
             if custom_id:
                 payload['id'] = custom_id
             
+            backend = self._local_backend_for(payload)
+            if backend:
+                return backend.compose(payload)
+            
             api_logger.log_api_request('nca', 'add_background_music', payload)
             
             # Use correct NCA Toolkit endpoint
@@ -466,6 +732,10 @@ class NCAService:
             
             current_payload_for_logging = payload
             
+            backend = self._local_backend_for(current_payload_for_logging)
+            if backend:
+                return backend.compose(current_payload_for_logging)
+            
             api_logger.log_api_request('nca', 'submit_ffmpeg_commands', current_payload_for_logging)
             logger.debug(f"NCA /v1/ffmpeg/compose payload: {json.dumps(current_payload_for_logging, indent=2)}")
             
@@ -562,6 +832,10 @@ class NCAService:
             
             current_payload_for_logging = payload
             
+            backend = self._local_backend_for(current_payload_for_logging)
+            if backend:
+                return backend.compose(current_payload_for_logging)
+            
             api_logger.log_api_request('nca', operation_name, current_payload_for_logging)
             logger.debug(f"NCA /v1/ffmpeg/compose payload for {operation_name}: {json.dumps(current_payload_for_logging, indent=2)}")
             
@@ -611,6 +885,11 @@ class NCAService:
 
     def get_job_status(self, job_id: str) -> Dict:
         """Get the status of a processing job using correct NCA endpoint."""
+        if self.media_backend:
+            local_status = self.media_backend.get_job_status(job_id)
+            if local_status is not None:
+                return local_status
+        
         try:
             api_logger.log_api_request('nca', 'get_job_status', {'job_id': job_id})
             
@@ -1,19 +1,42 @@
 """OpenAI service for GPT-4o API integration."""
 
+import hashlib
 import logging
 import os
-from typing import List, Dict, Optional, Tuple
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import openai
 from openai import OpenAI
 import time
 import json
 
 from config import get_config
+from services.markup_cache import get_markup_cache, markup_cache_key
 from utils.logger import APILogger
+from utils.rate_limiter import LocalTokenBucket, TokenBucket, parse_retry_after
 
 logger = logging.getLogger(__name__)
 api_logger = APILogger()
 
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_openai_rate_limiter(config) -> TokenBucket:
+    """Return the process-wide OpenAI request budget shared by concurrent markup calls."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = LocalTokenBucket(
+                    config.OPENAI_RATE_LIMIT_PER_MINUTE / 60.0,
+                    max(config.MARKUP_MAX_CONCURRENCY, 1)
+                )
+    return _rate_limiter
+
 
 class OpenAIService:
     """Service for interacting with OpenAI's GPT-4o model."""
@@ -178,6 +201,16 @@ Following segment: "Tears streamed down her face."
 
 **Output:**
 I can't do this anymore—<break time="0.8s"/> I just... <break time="1.0s"/> I just CAN'T."""
+    # Changes whenever the prompt text does, so cached markup from an older prompt is not reused
+    MARKUP_PROMPT_VERSION = hashlib.sha256(MARKUP_PROMPT.encode('utf-8')).hexdigest()[:12]
+    MARKUP_TEMPERATURE = 0.7
+    
+    # Appended to MARKUP_PROMPT for process_segments_batch
+    MARKUP_BATCH_INSTRUCTIONS = """## Batch Mode
+You will receive several consecutive TARGET SEGMENTS, each with its index in brackets, plus the segment before the first target and the segment after the last one. Mark up every target segment by the rules above, using the segments around it as context. Do not merge, split or reorder segments.
+
+Respond with a JSON object of the form {"segments": [{"index": <index>, "text": "<marked-up segment>"}]} containing exactly one entry per target segment."""
+    MARKUP_BATCH_PROMPT_VERSION = hashlib.sha256((MARKUP_PROMPT + MARKUP_BATCH_INSTRUCTIONS).encode('utf-8')).hexdigest()[:12]
     
     def __init__(self):
         """Initialize OpenAI service."""
@@ -230,6 +263,15 @@ I can't do this anymore—<break time="0.8s"/> I just... <break time="1.0s"/> I
         Returns:
             The marked-up segment text
         """
+        # Unchanged lines with unchanged neighbours reuse earlier markup
+        cache = get_markup_cache(self.config)
+        cache_key = markup_cache_key(target_segment, previous_segment, following_segment,
+                                     self.MARKUP_PROMPT_VERSION, self.model, self.MARKUP_TEMPERATURE)
+        if cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # Return original text if client not initialized
         if not self.client:
             logger.warning("OpenAI client not initialized, returning original text")
@@ -243,88 +285,266 @@ I can't do this anymore—<break time="0.8s"/> I just... <break time="1.0s"/> I
                 following_segment
             )
             
-            # Make API call with retries
-            for attempt in range(self.max_retries):
-                try:
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": self.MARKUP_PROMPT},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        temperature=0.7,
-                        max_tokens=500
-                    )
-                    
-                    marked_text = response.choices[0].message.content.strip()
-                    
-                    # Log the API response
-                    api_logger.log_api_response(
-                        service="OpenAI",
-                        endpoint="chat.completions",
-                        status_code=200,
-                        response={
-                            "model": self.model,
-                            "marked_text": marked_text[:50] + "..." if len(marked_text) > 50 else marked_text
-                        }
-                    )
-                    
-                    return marked_text
-                    
-                except Exception as e:
-                    logger.warning(f"OpenAI API attempt {attempt + 1} failed: {e}")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay * (attempt + 1))
-                    else:
-                        raise
+            response = self._create_chat_completion(
+                messages=[
+                    {"role": "system", "content": self.MARKUP_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=500,
+                temperature=self.MARKUP_TEMPERATURE
+            )
+            
+            marked_text = response.choices[0].message.content.strip()
+            if cache:
+                cache.put(cache_key, marked_text, self._total_tokens(response))
+            
+            # Log the API response
+            api_logger.log_api_response(
+                service="OpenAI",
+                endpoint="chat.completions",
+                status_code=200,
+                response={
+                    "model": self.model,
+                    "marked_text": marked_text[:50] + "..." if len(marked_text) > 50 else marked_text
+                }
+            )
+            
+            return marked_text
                         
         except Exception as e:
             logger.error(f"Failed to generate markup for segment: {e}")
             # Return original text as fallback
             return target_segment
     
+    def _create_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **kwargs):
+        """Chat completion with retries under the shared OpenAI rate limit.
+        
+        Used by markup and image prompt generation alike. A RateLimitError
+        pauses the shared bucket for the Retry-After period so every concurrent
+        call backs off together.
+        
+        Raises:
+            The last error once max_retries attempts have failed
+        """
+        rate_limiter = get_openai_rate_limiter(self.config)
+        for attempt in range(self.max_retries):
+            try:
+                rate_limiter.acquire()
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                )
+            except openai.RateLimitError as e:
+                headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+                pause = parse_retry_after(headers.get('retry-after'), self.config.OPENAI_RATE_LIMIT_PAUSE_SECONDS)
+                logger.warning(f"OpenAI rate limited request (attempt {attempt + 1}); pausing {pause}s")
+                rate_limiter.pause(pause)
+                if attempt == self.max_retries - 1:
+                    raise
+            except Exception as e:
+                logger.warning(f"OpenAI API attempt {attempt + 1} failed: {e}")
+                if attempt < self.max_retries - 1:
+                    time.sleep(self.retry_delay * (attempt + 1))
+                else:
+                    raise
+    
+    @staticmethod
+    def _parse_indexed_entries(content: str, key: str, value_key: str, window: List[int],
+                               validate: Callable[[int, Any], bool]) -> Dict[int, str]:
+        """Map a JSON-mode reply of the form {key: [{"index": i, value_key: ...}]} back to indexes.
+        
+        Entries for indexes outside the window, repeated indexes and values
+        that fail validate(index, value) are dropped.
+        
+        Raises:
+            ValueError: If content is not JSON
+        """
+        entries = json.loads(content).get(key, [])
+        results = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get('index'))
+            except (TypeError, ValueError):
+                continue
+            value = entry.get(value_key)
+            if index in window and index not in results and validate(index, value):
+                results[index] = value.strip()
+        return results
+    
+    @staticmethod
+    def _total_tokens(response) -> int:
+        usage = getattr(response, 'usage', None)
+        return int(getattr(usage, 'total_tokens', 0) or 0)
+    
     def process_segments_batch(
         self,
         segments: List[Dict[str, any]],
-        batch_size: int = 5
+        batch_size: Optional[int] = None
     ) -> List[Dict[str, any]]:
         """
-        Process multiple segments in batches for efficiency.
+        Mark up a script's segments with one request per window of segments.
+        
+        Each window of batch_size consecutive segments (default
+        MARKUP_BATCH_SIZE) goes to GPT-4o in a single JSON-mode request along
+        with the segment before and after it. Results are mapped back by index;
+        only segments whose entry is missing or fails validation are retried
+        with a single-segment request. Windows and retries run concurrently
+        (MARKUP_MAX_CONCURRENCY) within the shared OpenAI rate limit, and cached
+        markup is reused without a request.
         
         Args:
             segments: List of segment dictionaries with 'text' field
-            batch_size: Number of segments to process concurrently
+            batch_size: Number of segments per request
             
         Returns:
-            List of segments with added 'marked_text' field
+            List of segments with added 'original_text' and 'marked_text' fields
         """
-        processed_segments = []
+        batch_size = max(1, batch_size or self.config.MARKUP_BATCH_SIZE)
+        texts = [segment['text'] for segment in segments]
+        marked: Dict[int, str] = {}
+        
+        cache = get_markup_cache(self.config)
         
+        def cache_key(i: int, prompt_version: str) -> str:
+            return markup_cache_key(texts[i], texts[i - 1] if i > 0 else None,
+                                    texts[i + 1] if i < len(texts) - 1 else None,
+                                    prompt_version, self.model, self.MARKUP_TEMPERATURE)
+        
+        keys = [cache_key(i, self.MARKUP_BATCH_PROMPT_VERSION) for i in range(len(texts))]
+        if cache:
+            for i, key in enumerate(keys):
+                # Segments that went through the single-segment fallback were cached under its prompt version
+                cached = cache.get(key, cache_key(i, self.MARKUP_PROMPT_VERSION))
+                if cached is not None:
+                    marked[i] = cached
+        
+        # Windows of consecutive uncached segments, so each has one previous and one following segment
+        windows: List[List[int]] = []
+        for i in range(len(texts)):
+            if i in marked:
+                continue
+            if windows and windows[-1][-1] == i - 1 and len(windows[-1]) < batch_size:
+                windows[-1].append(i)
+            else:
+                windows.append([i])
+        if windows and self.client:
+            max_workers = min(self.config.MARKUP_MAX_CONCURRENCY, len(windows))
+            with ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix='markup') as executor:
+                for window_result in executor.map(lambda window: self._mark_up_window(texts, window), windows):
+                    for i, (text, tokens) in window_result.items():
+                        marked[i] = text
+                        if cache:
+                            cache.put(keys[i], text, tokens)
+        
+        # Per-segment requests only for whatever the batches didn't return valid markup for
+        failed = [i for i in range(len(texts)) if i not in marked]
+        if failed:
+            logger.info(f"Falling back to single-segment markup for {len(failed)} of {len(texts)} segments")
+            max_workers = min(self.config.MARKUP_MAX_CONCURRENCY, len(failed))
+            with ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix='markup') as executor:
+                fallback = executor.map(
+                    lambda i: self.generate_elevenlabs_markup(
+                        texts[i],
+                        texts[i - 1] if i > 0 else None,
+                        texts[i + 1] if i < len(texts) - 1 else None
+                    ),
+                    failed
+                )
+                for i, text in zip(failed, fallback):
+                    marked[i] = text
+        
+        processed_segments = []
         for i, segment in enumerate(segments):
-            # Get context segments
-            previous = segments[i - 1]['text'] if i > 0 else None
-            following = segments[i + 1]['text'] if i < len(segments) - 1 else None
-            
-            # Generate markup
-            marked_text = self.generate_elevenlabs_markup(
-                segment['text'],
-                previous,
-                following
-            )
-            
-            # Add to segment data
             segment_with_markup = segment.copy()
             segment_with_markup['original_text'] = segment['text']
-            segment_with_markup['marked_text'] = marked_text
-            
+            segment_with_markup['marked_text'] = marked[i]
             processed_segments.append(segment_with_markup)
-            
-            # Small delay to avoid rate limits
-            if (i + 1) % batch_size == 0:
-                time.sleep(0.5)
-        
         return processed_segments
     
+    def _mark_up_window(self, texts: List[str], window: List[int]) -> Dict[int, Tuple[str, int]]:
+        """Mark up one window of segment indexes in a single request.
+        
+        Returns:
+            Index -> (marked text, apportioned tokens) for the entries that
+            passed validation; empty if the request failed
+        """
+        try:
+            response = self._create_chat_completion(
+                messages=[
+                    {"role": "system", "content": self.MARKUP_PROMPT + "\n\n" + self.MARKUP_BATCH_INSTRUCTIONS},
+                    {"role": "user", "content": self._build_window_prompt(texts, window)}
+                ],
+                max_tokens=min(400 * len(window) + 200, 16000),
+                temperature=self.MARKUP_TEMPERATURE,
+                response_format={"type": "json_object"}
+            )
+            marked = self._parse_indexed_entries(
+                response.choices[0].message.content, 'segments', 'text', window,
+                lambda index, text: self._valid_markup(texts[index], text)
+            )
+        except Exception as e:
+            logger.error(f"Batched markup failed for segments {window[0]}-{window[-1]}: {e}")
+            return {}
+        
+        tokens = self._total_tokens(response) // max(len(window), 1)
+        results = {index: (text, tokens) for index, text in marked.items()}
+        
+        api_logger.log_api_response(
+            service="OpenAI",
+            endpoint="chat.completions",
+            status_code=200,
+            response={"model": self.model, "batch_size": len(window), "valid": len(results)}
+        )
+        return results
+    
+    def _build_window_prompt(self, texts: List[str], window: List[int]) -> str:
+        """Build the user prompt for a window of segments."""
+        first, last = window[0], window[-1]
+        parts = []
+        if first > 0:
+            parts.append(f"Previous segment: \"{texts[first - 1]}\"")
+        else:
+            parts.append("Previous segment: [NONE - The first target is the first segment]")
+        
+        parts.append("TARGET SEGMENTS:")
+        for i in window:
+            parts.append(f"[{i}] \"{texts[i]}\"")
+        
+        if last < len(texts) - 1:
+            parts.append(f"Following segment: \"{texts[last + 1]}\"")
+        else:
+            parts.append("Following segment: [NONE - The last target is the last segment]")
+        
+        return "\n".join(parts)
+    
+    @staticmethod
+    def _valid_markup(original: str, marked) -> bool:
+        """Check that marked-up text still says what the original said.
+        
+        Markup may add tags, pauses, emphasis and repetitions, but at least 80%
+        of the original words must survive and the text must not balloon.
+        """
+        if not isinstance(marked, str) or not marked.strip():
+            return False
+        original_words = re.findall(r"[a-z0-9']+", original.lower())
+        marked_words = re.findall(r"[a-z0-9']+", re.sub(r'<[^>]+>', ' ', marked).lower())
+        if not original_words:
+            return True
+        if len(marked_words) > 2 * len(original_words) + 10:
+            return False
+        available = Counter(marked_words)
+        kept = 0
+        for word in original_words:
+            if available[word]:
+                available[word] -= 1
+                kept += 1
+        return kept >= 0.8 * len(original_words)
+    
     def _build_segment_prompt(
         self,
         target: str,
@@ -371,6 +591,14 @@ The aim is to create prompts that will inspire detailed and lively realistic pho
 
 Return ONLY the image prompt, no additional explanation."""
     
+    IMAGE_PROMPT_TEMPERATURE = 0.7
+    
+    # Appended to IMAGE_PROMPT_SYSTEM for generate_ai_image_prompts
+    IMAGE_PROMPT_BATCH_INSTRUCTIONS = """## Batch Mode
+Instead of a single segment you will receive several segments of the story, each with its index in brackets. Write one AI image prompt per segment by the guidelines above, using the full story as context. Keep characters and settings consistent across the segments.
+
+Respond with a JSON object of the form {"prompts": [{"index": <index>, "prompt": "<image prompt>"}]} containing exactly one entry per segment."""
+    
     def generate_ai_image_prompt(
         self,
         segment_text: str,
@@ -406,43 +634,159 @@ Style guide to follow:
 Generate an AI image prompt for this segment."""
         
         try:
-            # Make API call with retries
-            for attempt in range(self.max_retries):
-                try:
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": self.IMAGE_PROMPT_SYSTEM},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        temperature=0.7,
-                        max_tokens=300
-                    )
-                    
-                    prompt = response.choices[0].message.content.strip()
-                    
-                    # Log the API response
-                    api_logger.log_api_response(
-                        service="OpenAI",
-                        endpoint="chat.completions",
-                        status_code=200,
-                        response={
-                            "model": self.model,
-                            "purpose": "ai_image_prompt_generation",
-                            "generated_prompt": prompt[:50] + "..." if len(prompt) > 50 else prompt
-                        }
-                    )
-                    
-                    logger.info(f"Generated AI image prompt: {prompt[:100]}...")
-                    return prompt
-                    
-                except Exception as e:
-                    logger.warning(f"OpenAI API attempt {attempt + 1} failed: {e}")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay * (attempt + 1))
-                    else:
-                        raise
+            response = self._create_chat_completion(
+                messages=[
+                    {"role": "system", "content": self.IMAGE_PROMPT_SYSTEM},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=300,
+                temperature=self.IMAGE_PROMPT_TEMPERATURE
+            )
+            prompt = response.choices[0].message.content.strip()
+            
+            # Log the API response
+            api_logger.log_api_response(
+                service="OpenAI",
+                endpoint="chat.completions",
+                status_code=200,
+                response={
+                    "model": self.model,
+                    "purpose": "ai_image_prompt_generation",
+                    "generated_prompt": prompt[:50] + "..." if len(prompt) > 50 else prompt
+                }
+            )
+            
+            logger.info(f"Generated AI image prompt: {prompt[:100]}...")
+            return prompt
                         
         except Exception as e:
             logger.error(f"Failed to generate AI image prompt: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def generate_ai_image_prompts(
+        self,
+        segment_texts: List[str],
+        full_video_script: str,
+        theme_descriptions: Optional[List[Optional[str]]] = None,
+        batch_size: Optional[int] = None,
+        on_prompts: Optional[Callable[[Dict[int, str]], None]] = None
+    ) -> List[Optional[str]]:
+        """
+        Generate AI image prompts for all of a video's segments.
+        
+        Consecutive segments sharing a style guide are grouped into windows of
+        up to batch_size (default AI_IMAGE_PROMPT_BATCH_SIZE), and each window
+        goes to GPT-4o in a single JSON-mode request carrying the full script
+        once. Segments missing from a window's response are retried with
+        generate_ai_image_prompt. Windows and retries run concurrently
+        (AI_IMAGE_PROMPT_MAX_CONCURRENCY) within the shared OpenAI rate limit.
+        
+        Args:
+            segment_texts: Segment texts (from "Original SRT Text"), in order
+            full_video_script: The complete video script for context
+            theme_descriptions: Style guide per segment (None for no style guide)
+            batch_size: Number of segments per request
+            on_prompts: Called from this thread with each window's prompts
+                (index -> prompt) as it finishes, then once with the retried ones
+            
+        Returns:
+            Prompt per segment, in order; None where generation failed
+        """
+        if not self.client:
+            logger.warning("OpenAI client not initialized")
+            raise Exception("OpenAI service not available")
+        
+        batch_size = max(1, batch_size or self.config.AI_IMAGE_PROMPT_BATCH_SIZE)
+        themes = list(theme_descriptions) if theme_descriptions else [None] * len(segment_texts)
+        concurrency = max(self.config.AI_IMAGE_PROMPT_MAX_CONCURRENCY, 1)
+        
+        windows: List[List[int]] = []
+        for i in range(len(segment_texts)):
+            if windows and themes[windows[-1][-1]] == themes[i] and len(windows[-1]) < batch_size:
+                windows[-1].append(i)
+            else:
+                windows.append([i])
+        
+        prompts: Dict[int, str] = {}
+        if windows:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(windows)), thread_name_prefix='image-prompts') as executor:
+                for window_result in executor.map(
+                    lambda window: self._image_prompts_for_window(segment_texts, window, full_video_script,
+                                                                  themes[window[0]]),
+                    windows
+                ):
+                    prompts.update(window_result)
+                    if on_prompts and window_result:
+                        on_prompts(window_result)
+        
+        failed = [i for i in range(len(segment_texts)) if i not in prompts]
+        if failed:
+            logger.info(f"Falling back to single-segment image prompts for {len(failed)} of {len(segment_texts)} segments")
+            
+            def single_prompt(i: int) -> Optional[str]:
+                try:
+                    return self.generate_ai_image_prompt(segment_texts[i], full_video_script, themes[i])
+                except Exception as e:
+                    logger.error(f"Failed to generate AI image prompt for segment {i}: {e}")
+                    return None
+            
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(failed)), thread_name_prefix='image-prompts') as executor:
+                retried = {i: prompt for i, prompt in zip(failed, executor.map(single_prompt, failed)) if prompt}
+            prompts.update(retried)
+            if on_prompts and retried:
+                on_prompts(retried)
+        
+        return [prompts.get(i) for i in range(len(segment_texts))]
+    
+    def _image_prompts_for_window(
+        self,
+        segment_texts: List[str],
+        window: List[int],
+        full_video_script: str,
+        theme_description: Optional[str]
+    ) -> Dict[int, str]:
+        """Generate image prompts for one window of segment indexes in a single request.
+        
+        Returns:
+            Index -> prompt for the entries the response contained; empty if
+            the request failed
+        """
+        segment_lines = "\n".join(f"[{i}] \"{segment_texts[i]}\"" for i in window)
+        user_prompt = f"""*** begin story ***
+{full_video_script}
+*** end story ***
+
+Segments to create images for:
+{segment_lines}
+
+Style guide to follow:
+{theme_description if theme_description else "No specific style guide provided. Create a realistic, professional image."}
+
+Generate an AI image prompt for each segment."""
+        
+        try:
+            response = self._create_chat_completion(
+                messages=[
+                    {"role": "system", "content": self.IMAGE_PROMPT_SYSTEM + "\n\n" + self.IMAGE_PROMPT_BATCH_INSTRUCTIONS},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=min(300 * len(window) + 200, 16000),
+                temperature=self.IMAGE_PROMPT_TEMPERATURE,
+                response_format={"type": "json_object"}
+            )
+            results = self._parse_indexed_entries(
+                response.choices[0].message.content, 'prompts', 'prompt', window,
+                lambda index, prompt: isinstance(prompt, str) and bool(prompt.strip())
+            )
+        except Exception as e:
+            logger.error(f"Batched AI image prompts failed for segments {window[0]}-{window[-1]}: {e}")
+            return {}
+        
+        api_logger.log_api_response(
+            service="OpenAI",
+            endpoint="chat.completions",
+            status_code=200,
+            response={"model": self.model, "purpose": "ai_image_prompt_generation",
+                      "batch_size": len(window), "valid": len(results)}
+        )
+        return results
@@ -3,6 +3,7 @@
 import logging
 import re
 import math
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from dataclasses import dataclass, asdict
 
@@ -293,6 +294,14 @@ class ScriptProcessor:
         """
         Process segments to add ElevenLabs markup using GPT-4o.
         
+        With MARKUP_BATCH_SIZE > 1, windows of segments are marked up per
+        request (OpenAIService.process_segments_batch). Otherwise each segment
+        gets its own request. Either way requests run concurrently (up to
+        MARKUP_MAX_CONCURRENCY, within the shared OpenAI rate limit), each
+        segment is marked up with its neighbours' original text as context,
+        and results come back in script order. A segment whose markup fails
+        after retries keeps its original text.
+        
         Args:
             segments: List of Segment objects
             
@@ -305,22 +314,32 @@ class ScriptProcessor:
                 logger.warning("OpenAI service not available, returning segments without markup")
                 return self._segments_without_markup(segments)
             
-            processed_segments = []
-            
-            for i, segment in enumerate(segments):
+            def mark_up(i: int) -> str:
                 # Get context segments
                 previous_text = segments[i - 1].text if i > 0 else None
                 following_text = segments[i + 1].text if i < len(segments) - 1 else None
-                
-                # Generate markup
-                marked_text = self.openai_service.generate_elevenlabs_markup(
-                    segment.text,
+                return self.openai_service.generate_elevenlabs_markup(
+                    segments[i].text,
                     previous_text,
                     following_text
                 )
-                
+            
+            if self.config.MARKUP_BATCH_SIZE > 1:
+                batch = self.openai_service.process_segments_batch(
+                    [{'text': segment.text} for segment in segments],
+                    batch_size=self.config.MARKUP_BATCH_SIZE
+                )
+                marked_texts = [item['marked_text'] for item in batch]
+            else:
+                max_workers = max(1, min(self.config.MARKUP_MAX_CONCURRENCY, len(segments)))
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='markup') as executor:
+                    # map() yields in submission order, whatever order the requests finish in
+                    marked_texts = list(executor.map(mark_up, range(len(segments))))
+            
+            processed_segments = []
+            for segment, marked_text in zip(segments, marked_texts):
                 # Create segment data with both original and marked text
-                segment_data = {
+                processed_segments.append({
                     'original_text': segment.text,
                     'text': marked_text,  # This will go in 'SRT Text' field
                     'order': segment.order,
@@ -328,9 +347,7 @@ class ScriptProcessor:
                     'end_time': segment.end_time,
                     'estimated_duration': segment.estimated_duration,
                     'word_count': segment.word_count
-                }
-                
-                processed_segments.append(segment_data)
+                })
                 
             logger.info(f"Processed {len(processed_segments)} segments with ElevenLabs markup")
             return processed_segments
@@ -0,0 +1,106 @@
+"""Persistent cache of synthesized voiceovers, keyed by text and voice settings."""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+# ElevenLabs' default output format (mp3_44100_128) is constant bitrate
+MP3_BITS_PER_SECOND = 128_000
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_tts_text(text: str) -> str:
+    """Collapse whitespace so reformatted but unchanged text maps to the same key."""
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def tts_cache_key(text: str, voice_id: str, model_id: str, stability: float, similarity_boost: float,
+                  speed: float, style_exaggeration: float, use_speaker_boost: bool) -> str:
+    """SHA-256 of everything that changes the synthesized audio."""
+    material = json.dumps([
+        normalize_tts_text(text), voice_id, model_id,
+        round(float(stability), 4), round(float(similarity_boost), 4), round(float(speed), 4),
+        round(float(style_exaggeration), 4), bool(use_speaker_boost)
+    ], separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def estimate_mp3_duration(size_bytes: int) -> float:
+    """Duration in seconds of a constant-bitrate ElevenLabs MP3."""
+    return round(size_bytes * 8 / MP3_BITS_PER_SECOND, 3)
+
+
+class TTSCache(SQLiteCache):
+    """Local SQLite map of synthesis key to the stored voiceover URL and its duration.
+
+    A hit means ElevenLabs already voiced this exact text with these settings,
+    so the stored audio is reused without spending characters or latency.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS voiceovers ('
+        'key TEXT PRIMARY KEY, url TEXT NOT NULL, duration REAL, '
+        'characters INTEGER NOT NULL, created_at REAL NOT NULL)'
+    )
+    SAVED_STAT = 'characters_saved'
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return {'url', 'duration', 'characters'} for a cached synthesis, or None."""
+        row = self._connection().execute(
+            'SELECT url, duration, characters FROM voiceovers WHERE key = ?', (key,)
+        ).fetchone()
+        self._count(row is not None, row[2] if row else 0)
+        return {'url': row[0], 'duration': row[1], 'characters': row[2]} if row else None
+
+    def put(self, key: str, url: str, duration: Optional[float], characters: int):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO voiceovers (key, url, duration, characters, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, url, duration, characters, time.time())
+            )
+
+    def invalidate(self, key: str) -> bool:
+        """Forget an entry whose stored file is gone; returns whether it existed.
+
+        The lookup that returned it is recounted as a miss.
+        """
+        with self._connection() as conn:
+            row = conn.execute('SELECT characters FROM voiceovers WHERE key = ?', (key,)).fetchone()
+            if not row:
+                return False
+            conn.execute('DELETE FROM voiceovers WHERE key = ?', (key,))
+        with self._stats_lock:
+            if self.hits:
+                self.hits -= 1
+                self.misses += 1
+                self.saved = max(self.saved - row[0], 0)
+        return True
+
+
+def get_tts_cache(config) -> Optional[TTSCache]:
+    """Return the process-wide voiceover cache, or None if it is disabled."""
+    global _cache
+    if not config.TTS_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache(config.TTS_CACHE_PATH)
+    return _cache
+
+
+def tts_cache_stats() -> Dict[str, Any]:
+    """Stats of the cache, empty until it has been created."""
+    cache = _cache
+    return cache.stats() if cache else {}
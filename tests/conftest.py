@@ -6,6 +6,9 @@ from unittest.mock import Mock
 from datetime import datetime
 import json
 
+# Test modules import the app and services at module level, which read the config
+os.environ.setdefault('FLASK_ENV', 'testing')
+
 # Test configuration
 TEST_VIDEO_ID = "test_video_123"
 TEST_SEGMENT_ID = "test_segment_456"
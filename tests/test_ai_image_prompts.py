@@ -0,0 +1,206 @@
+"""Tests for video-level AI image prompt generation."""
+
+import json
+import re
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+import services.openai_service as openai_module
+from app import create_app
+from api import routes_v2
+from services.openai_service import OpenAIService
+from utils.rate_limiter import LocalTokenBucket
+
+SCRIPT = 'The whole story, told once.'
+
+
+def make_segment(segment_id, text='A quiet harbour at dawn', prompt=None, theme='recTheme1'):
+    fields = {'Original SRT Text': text, 'Image Theme': [theme] if theme else []}
+    if prompt:
+        fields['AI Image Prompt'] = prompt
+    return {'id': segment_id, 'fields': fields}
+
+
+def prompts_reply(**kwargs):
+    """Answer a batched request with one prompt per listed segment."""
+    user_prompt = kwargs['messages'][1]['content']
+    indexes = [int(i) for i in re.findall(r'^\[(\d+)\]', user_prompt, re.MULTILINE)]
+    response = MagicMock()
+    response.choices[0].message.content = json.dumps(
+        {'prompts': [{'index': i, 'prompt': f'Photo {i}'} for i in indexes]})
+    return response
+
+
+class TestGenerateAIImagePrompts:
+    """Test windowing, index mapping and fallback of OpenAIService.generate_ai_image_prompts."""
+
+    @pytest.fixture
+    def service(self):
+        with patch.object(openai_module, '_rate_limiter', LocalTokenBucket(1000, 10)):
+            service = OpenAIService()
+            service.client = MagicMock()
+            service.retry_delay = 0
+            yield service
+
+    def test_script_sent_once_per_window(self, service):
+        """Five segments in windows of two take three requests, each carrying the script once."""
+        create = service.client.chat.completions.create
+        create.side_effect = prompts_reply
+
+        prompts = service.generate_ai_image_prompts([f'Line {i}' for i in range(5)], SCRIPT, batch_size=2)
+
+        assert prompts == [f'Photo {i}' for i in range(5)]
+        assert create.call_count == 3
+        for call in create.call_args_list:
+            assert call.kwargs['messages'][1]['content'].count(SCRIPT) == 1
+            assert call.kwargs['response_format'] == {'type': 'json_object'}
+
+    def test_windows_split_on_theme_change(self, service):
+        """Each request carries a single style guide."""
+        create = service.client.chat.completions.create
+        create.side_effect = prompts_reply
+
+        service.generate_ai_image_prompts(['A', 'B', 'C'], SCRIPT, ['Noir', 'Noir', 'Pastel'])
+
+        user_prompts = [call.kwargs['messages'][1]['content'] for call in create.call_args_list]
+        assert len(user_prompts) == 2
+        assert 'Noir' in user_prompts[0] and '[1] "B"' in user_prompts[0]
+        assert 'Pastel' in user_prompts[1] and '[2] "C"' in user_prompts[1]
+
+    def test_missing_entry_falls_back_to_single_request(self, service):
+        """Only the segment the response left out is retried on its own."""
+        batch = MagicMock()
+        batch.choices[0].message.content = json.dumps({'prompts': [{'index': 0, 'prompt': 'Photo 0'}]})
+        single = MagicMock()
+        single.choices[0].message.content = 'Photo 1 alone'
+        service.client.chat.completions.create.side_effect = [batch, single]
+
+        assert service.generate_ai_image_prompts(['A', 'B'], SCRIPT) == ['Photo 0', 'Photo 1 alone']
+
+    def test_on_prompts_reports_each_window(self, service):
+        service.client.chat.completions.create.side_effect = prompts_reply
+        reported = []
+
+        service.generate_ai_image_prompts(['A', 'B', 'C'], SCRIPT, batch_size=2, on_prompts=reported.append)
+
+        assert reported == [{0: 'Photo 0', 1: 'Photo 1'}, {2: 'Photo 2'}]
+
+    def test_fallback_runs_concurrently(self, service):
+        """Single-segment retries share the AI_IMAGE_PROMPT_MAX_CONCURRENCY bound."""
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def single(segment_text, full_video_script, theme_description):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return f'Alone {segment_text}'
+
+        empty = MagicMock()
+        empty.choices[0].message.content = json.dumps({'prompts': []})
+        service.client.chat.completions.create.return_value = empty
+        service.config.AI_IMAGE_PROMPT_MAX_CONCURRENCY = 3
+
+        with patch.object(service, 'generate_ai_image_prompt', side_effect=single):
+            prompts = service.generate_ai_image_prompts([str(i) for i in range(8)], SCRIPT)
+
+        assert prompts == [f'Alone {i}' for i in range(8)]
+        assert 1 < peak[0] <= 3
+
+    def test_failed_fallback_returns_none(self, service):
+        service.client.chat.completions.create.side_effect = RuntimeError('down')
+
+        assert service.generate_ai_image_prompts(['A'], SCRIPT) == [None]
+
+
+class TestGenerateAIImagePromptsEndpoint:
+    """Test /api/v2/generate-ai-image-prompts segment selection and the background hand-off."""
+
+    @pytest.fixture
+    def client(self):
+        return create_app('testing').test_client()
+
+    @pytest.fixture
+    def mock_airtable(self):
+        airtable = MagicMock()
+        airtable.get_video.return_value = {'id': 'recVideo', 'fields': {'Video Script': SCRIPT}}
+        airtable.get_record.return_value = {'id': 'recTheme1', 'fields': {'Theme Description': 'Noir'}}
+        airtable.create_job.return_value = {'id': 'recJob'}
+        with patch('api.routes_v2.airtable', airtable):
+            yield airtable
+
+    @pytest.fixture
+    def mock_run_batch(self):
+        started = threading.Event()
+        run_batch = Mock(side_effect=lambda *args: started.set())
+        run_batch.started = started
+        with patch('api.routes_v2._run_ai_image_prompt_batch', run_batch):
+            yield run_batch
+
+    def test_returns_progress_handle(self, client, mock_airtable, mock_run_batch):
+        """Segments without a prompt are handed off together; the theme is read once."""
+        mock_airtable.get_video_segments.return_value = [
+            make_segment('recSeg0'), make_segment('recSeg1', prompt='Done already'),
+            make_segment('recSeg2'), make_segment('recSeg3', text='')
+        ]
+
+        response = client.post('/api/v2/generate-ai-image-prompts', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['total'] == 2
+        assert data['progress_url'] == '/api/v2/generate-ai-image-prompts/recJob'
+        assert len(data['skipped_segments']) == 1
+        assert mock_run_batch.started.wait(5)
+        _, _, segments, script, themes, _ = mock_run_batch.call_args.args
+        assert [s['id'] for s in segments] == ['recSeg0', 'recSeg2']
+        assert script == SCRIPT
+        assert themes == ['Noir', 'Noir']
+        mock_airtable.get_record.assert_called_once()
+
+    def test_nothing_pending(self, client, mock_airtable, mock_run_batch):
+        mock_airtable.get_video_segments.return_value = [make_segment('recSeg0', prompt='Done')]
+
+        response = client.post('/api/v2/generate-ai-image-prompts', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 200
+        mock_airtable.create_job.assert_not_called()
+        mock_run_batch.assert_not_called()
+
+    def test_batch_writes_prompts_together(self, mock_airtable):
+        """The background job writes every prompt in one update_segments call."""
+        openai_service = MagicMock()
+        openai_service.generate_ai_image_prompts.return_value = ['Photo 0', None]
+        segments = [make_segment('recSeg0'), make_segment('recSeg1')]
+
+        with patch('services.openai_service.OpenAIService', return_value=openai_service):
+            result = routes_v2._run_ai_image_prompt_batch('recJob', 'recVideo', segments, SCRIPT, [None, None], None)
+
+        mock_airtable.update_segments.assert_called_once_with({'recSeg0': {'AI Image Prompt': 'Photo 0'}})
+        assert result['completed'] == 1
+        assert result['failed_segments'] == ['recSeg1']
+        assert mock_airtable.update_job.call_args.args[1]['Status'] == 'failed'
+
+    def test_batch_writes_each_window_as_it_finishes(self, mock_airtable):
+        """Prompts reported per window are written then, with the job's progress, and not again."""
+        openai_service = MagicMock()
+
+        def generate(texts, script, themes, batch_size, on_prompts):
+            on_prompts({0: 'Photo 0'})
+            on_prompts({1: 'Photo 1'})
+            return ['Photo 0', 'Photo 1']
+
+        openai_service.generate_ai_image_prompts.side_effect = generate
+        segments = [make_segment('recSeg0'), make_segment('recSeg1')]
+
+        with patch('services.openai_service.OpenAIService', return_value=openai_service):
+            result = routes_v2._run_ai_image_prompt_batch('recJob', 'recVideo', segments, SCRIPT, [None, None], None)
+
+        assert [c.args[0] for c in mock_airtable.update_segments.call_args_list] == [
+            {'recSeg0': {'AI Image Prompt': 'Photo 0'}}, {'recSeg1': {'AI Image Prompt': 'Photo 1'}}]
+        assert mock_airtable.update_job.call_args_list[0].args[1] == {'Notes': '1/2 AI image prompts written'}
+        assert result['status'] == 'completed'
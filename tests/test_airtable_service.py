@@ -0,0 +1,331 @@
+"""Unit tests for AirtableService request batching and caching."""
+
+import pytest
+from unittest.mock import Mock, patch
+
+import services.airtable_service as airtable_module
+from services.airtable_service import AirtableService, AirtableWriteBuffer
+from services.job_index import JobIndex
+from utils.cache import TTLCache
+
+
+@pytest.fixture
+def airtable():
+    """AirtableService with the pyairtable Api mocked out."""
+    airtable_module._reference_cache = None
+    with patch('services.airtable_service.Api') as mock_api_class:
+        mock_base = Mock()
+        mock_base.table.side_effect = lambda name: Mock(name=f"table_{name}")
+        mock_api_class.return_value.base.return_value = mock_base
+        service = AirtableService()
+        service.job_index = None
+        yield service
+
+
+class TestGetVideoSegments:
+    """Test batched segment reads."""
+
+    def test_fetches_segments_in_chunks_and_sorts(self, airtable):
+        """Linked segments are read with chunked formula queries, not one get() per ID."""
+        segment_ids = [f"rec{i:03d}" for i in range(7)]
+        airtable.videos_table.get.return_value = {'id': 'recVideo', 'fields': {'Segments': segment_ids}}
+
+        def fake_all(formula):
+            ids = [part.split("'")[1] for part in formula[3:-1].split(',')]
+            # Return records in reverse order to check sorting by SRT Segment ID
+            return [{'id': rid, 'fields': {'SRT Segment ID': str(int(rid[3:]) + 1)}} for rid in reversed(ids)]
+
+        airtable.segments_table.all.side_effect = fake_all
+        airtable.config.AIRTABLE_BATCH_READ_CHUNK_SIZE = 3
+
+        segments = airtable.get_video_segments('recVideo')
+
+        assert airtable.segments_table.all.call_count == 3
+        airtable.segments_table.get.assert_not_called()
+        assert [s['id'] for s in segments] == segment_ids
+
+    def test_missing_segments_are_skipped(self, airtable):
+        """Segments that no longer exist are dropped from the result."""
+        airtable.videos_table.get.return_value = {'id': 'recVideo', 'fields': {'Segments': ['recA', 'recB']}}
+        airtable.segments_table.all.return_value = [{'id': 'recB', 'fields': {'SRT Segment ID': '2'}}]
+
+        segments = airtable.get_video_segments('recVideo')
+
+        assert [s['id'] for s in segments] == ['recB']
+
+    def test_parallel_chunks_preserve_order(self, airtable):
+        """Parallel chunk fetching still returns every record exactly once."""
+        segment_ids = [f"rec{i:03d}" for i in range(10)]
+        airtable.segments_table.all.side_effect = lambda formula: [
+            {'id': part.split("'")[1], 'fields': {}} for part in formula[3:-1].split(',')
+        ]
+
+        records = airtable.get_records_by_ids(airtable.segments_table, segment_ids,
+                                              chunk_size=2, max_workers=4)
+
+        assert [r['id'] for r in records] == segment_ids
+
+    def test_no_linked_segments(self, airtable):
+        """A video without linked segments returns an empty list without querying segments."""
+        airtable.videos_table.get.return_value = {'id': 'recVideo', 'fields': {'Segments': []}}
+
+        assert airtable.get_video_segments('recVideo') == []
+        airtable.segments_table.all.assert_not_called()
+
+
+class TestReferenceCache:
+    """Test the read-through cache for reference tables."""
+
+    def test_get_voice_is_cached(self, airtable):
+        """Repeated voice lookups hit Airtable once."""
+        airtable.voices_table.get.return_value = {'id': 'recVoice', 'fields': {'Voice ID': 'abc'}}
+
+        first = airtable.get_voice('recVoice')
+        second = airtable.get_voice('recVoice')
+
+        assert first == second
+        airtable.voices_table.get.assert_called_once_with('recVoice')
+        assert airtable.reference_cache.stats()['hits'] == 1
+
+    def test_cached_record_cannot_be_mutated(self, airtable):
+        """Callers get copies, not the cached object."""
+        airtable.voices_table.get.return_value = {'id': 'recVoice', 'fields': {'Voice ID': 'abc'}}
+
+        airtable.get_voice('recVoice')['fields']['Voice ID'] = 'changed'
+
+        assert airtable.get_voice('recVoice')['fields']['Voice ID'] == 'abc'
+
+    def test_non_reference_tables_bypass_cache(self, airtable):
+        """get_record only caches configured reference tables."""
+        airtable.get_record('Jobs', 'recJob')
+        airtable.get_record('Jobs', 'recJob')
+
+        assert airtable.reference_cache.stats()['size'] == 0
+
+    def test_invalidate_by_table(self, airtable):
+        """Invalidation can target a single table."""
+        airtable.voices_table.get.return_value = {'id': 'recVoice', 'fields': {}}
+        airtable.get_voice('recVoice')
+
+        assert airtable.invalidate_reference_cache(airtable.config.VOICES_TABLE) == 1
+        airtable.get_voice('recVoice')
+        assert airtable.voices_table.get.call_count == 2
+
+
+class TestTTLCache:
+    """Test TTLCache expiry and eviction."""
+
+    def test_entries_expire(self):
+        now = [0.0]
+        cache = TTLCache(ttl_seconds=10, max_size=10, clock=lambda: now[0])
+        cache.set('a', 1)
+
+        now[0] = 9.9
+        assert cache.get('a') == 1
+        now[0] = 10.0
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+
+    def test_lru_eviction(self):
+        cache = TTLCache(ttl_seconds=60, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+
+
+@pytest.fixture
+def buffered_airtable(airtable):
+    """AirtableService with a private write buffer whose timer never fires during a test."""
+    airtable.write_buffer = AirtableWriteBuffer(batch_size=10, flush_interval=60)
+    yield airtable
+    airtable.write_buffer.flush()
+
+
+class TestWriteBuffer:
+    """Test write coalescing through batch_update."""
+
+    def test_updates_to_same_record_are_merged(self, buffered_airtable):
+        """Several updates to one segment become a single batched write."""
+        with buffered_airtable.buffered_writes():
+            buffered_airtable.update_segment('recSeg', {'Status': 'Generating'})
+            buffered_airtable.update_segment('recSeg', {'Status': 'Done', 'Voiceover': [{'url': 'u'}]})
+            buffered_airtable.segments_table.batch_update.assert_not_called()
+
+        buffered_airtable.segments_table.batch_update.assert_called_once_with(
+            [{'id': 'recSeg', 'fields': {'Status': 'Done', 'Voiceover': [{'url': 'u'}]}}]
+        )
+        buffered_airtable.segments_table.update.assert_not_called()
+        assert buffered_airtable.write_buffer.stats()['coalesced_updates'] == 1
+
+    def test_flushes_in_groups_of_ten(self, buffered_airtable):
+        """A full group is written as soon as it reaches the batch size."""
+        with buffered_airtable.buffered_writes():
+            for i in range(23):
+                buffered_airtable.update_job(f"recJob{i}", {'Status': 'completed'})
+            assert buffered_airtable.jobs_table.batch_update.call_count == 2
+
+        sizes = [len(c.args[0]) for c in buffered_airtable.jobs_table.batch_update.call_args_list]
+        assert sizes == [10, 10, 3]
+
+    def test_failed_batch_falls_back_to_single_updates(self, buffered_airtable):
+        """When a batch is rejected, the records are retried one by one."""
+        buffered_airtable.segments_table.batch_update.side_effect = Exception('INVALID_MULTIPLE_CHOICE_OPTIONS')
+        buffered_airtable.segments_table.update.side_effect = [{'id': 'recA'}, Exception('bad option')]
+
+        with buffered_airtable.buffered_writes():
+            buffered_airtable.update_segment('recA', {'Status': 'Done'})
+            buffered_airtable.update_segment('recB', {'Status': 'Bogus'})
+
+        assert buffered_airtable.segments_table.update.call_count == 2
+        stats = buffered_airtable.write_buffer.stats()
+        assert stats['flushed_records'] == 1
+        assert stats['failed_records'] == 1
+
+    def test_immediate_write_includes_pending_fields(self, buffered_airtable):
+        """A direct write to a record absorbs its buffered fields instead of being overwritten later."""
+        buffered_airtable.write_buffer.add(buffered_airtable.config.JOBS_TABLE,
+                                           buffered_airtable.jobs_table, 'recJob', {'Notes': 'pending'})
+        buffered_airtable.safe_update_job_status('recJob', 'completed')
+
+        buffered_airtable.jobs_table.update.assert_called_once_with(
+            'recJob', {'Notes': 'pending', 'Status': 'completed'}
+        )
+        assert buffered_airtable.write_buffer.pending_count() == 0
+
+    def test_writes_are_immediate_outside_block(self, buffered_airtable):
+        """Without buffered_writes(), updates go straight to Airtable."""
+        buffered_airtable.update_segment('recSeg', {'Status': 'Done'})
+
+        buffered_airtable.segments_table.update.assert_called_once_with('recSeg', {'Status': 'Done'})
+        assert buffered_airtable.write_buffer.pending_count() == 0
+
+
+@pytest.fixture
+def indexed_airtable(airtable, tmp_path):
+    """AirtableService with a job index in a temporary SQLite file."""
+    airtable.job_index = JobIndex(str(tmp_path / 'jobs.sqlite3'))
+    return airtable
+
+
+class TestJobIndexWriteThrough:
+    """Test that job reads are served from the local index."""
+
+    def test_finished_job_is_read_locally(self, indexed_airtable):
+        indexed_airtable.jobs_table.create.return_value = {
+            'id': 'recJob', 'createdTime': '2024-01-01T00:00:00.000Z',
+            'fields': {'Type': 'combine', 'Status': 'completed'}
+        }
+        indexed_airtable.create_job('combine')
+
+        job = indexed_airtable.get_job('recJob')
+
+        assert job['fields']['Status'] == 'completed'
+        indexed_airtable.jobs_table.get.assert_not_called()
+
+    def test_in_flight_job_is_reread_from_airtable(self, indexed_airtable):
+        """An indexed job that hasn't finished may be stale, so it is fetched by ID."""
+        indexed_airtable.jobs_table.update.return_value = {
+            'id': 'recJob', 'fields': {'Status': 'processing', 'External Job ID': 'nca-1'}
+        }
+        indexed_airtable.safe_update_job_status('recJob', 'processing', {'External Job ID': 'nca-1'})
+        indexed_airtable.jobs_table.get.return_value = {
+            'id': 'recJob', 'fields': {'Status': 'completed', 'External Job ID': 'nca-1'}
+        }
+
+        job = indexed_airtable.get_job_by_external_id('nca-1')
+
+        assert job['fields']['Status'] == 'completed'
+        indexed_airtable.jobs_table.get.assert_called_once_with('recJob')
+        indexed_airtable.jobs_table.all.assert_not_called()
+
+    def test_index_miss_falls_back_to_airtable(self, indexed_airtable):
+        indexed_airtable.jobs_table.get.return_value = {'id': 'recJob', 'fields': {'Status': 'completed'}}
+
+        indexed_airtable.get_job('recJob')
+        indexed_airtable.get_job('recJob')
+
+        indexed_airtable.jobs_table.get.assert_called_once_with('recJob')
+
+    def test_reconcile_uses_watermark(self, indexed_airtable):
+        indexed_airtable.jobs_table.iterate.return_value = iter([[{'id': 'recJob', 'fields': {'Status': 'failed'}}]])
+
+        assert indexed_airtable.reconcile_job_index() == 1
+        assert 'CREATED_TIME()' in indexed_airtable.jobs_table.iterate.call_args.kwargs['formula']
+
+        indexed_airtable.jobs_table.iterate.return_value = iter([])
+        indexed_airtable.reconcile_job_index()
+        assert 'LAST_MODIFIED_TIME()' in indexed_airtable.jobs_table.iterate.call_args.kwargs['formula']
+        assert indexed_airtable.get_job('recJob')['fields']['Status'] == 'failed'
+
+
+class TestRefreshParentJob:
+    """Test aggregated progress of fan-out parent jobs."""
+
+    def parent(self, airtable, child_jobs, status='processing', notes=None):
+        from utils.job_payload import encode_job_payload
+        airtable.jobs_table.get.return_value = {'id': 'recParent', 'fields': {
+            'Status': status, 'Notes': notes,
+            'Request Payload': encode_job_payload({'mode': 'fan_out', 'child_jobs': child_jobs})
+        }}
+
+    def test_children_are_read_in_one_batch(self, airtable):
+        """Child statuses come from one formula query and are counted."""
+        self.parent(airtable, {'recSeg1': 'recJob1', 'recSeg2': 'recJob2', 'recSeg3': 'recJob3'})
+        airtable.jobs_table.all.return_value = [
+            {'id': 'recJob1', 'fields': {'Status': 'completed'}},
+            {'id': 'recJob2', 'fields': {'Status': 'failed'}},
+            {'id': 'recJob3', 'fields': {'Status': 'processing'}},
+        ]
+
+        progress = airtable.refresh_parent_job('recParent')
+
+        assert airtable.jobs_table.all.call_count == 1
+        assert (progress['completed'], progress['failed'], progress['in_progress']) == (1, 1, 1)
+        assert progress['status'] == 'processing'
+        assert airtable.jobs_table.update.call_args[0][1]['Status'] == 'processing'
+
+    def test_parent_completes_when_all_children_complete(self, airtable):
+        """Caller-supplied statuses override stale reads and finish the parent."""
+        self.parent(airtable, {'recSeg1': 'recJob1', 'recSeg2': 'recJob2'})
+        airtable.jobs_table.all.return_value = [
+            {'id': 'recJob1', 'fields': {'Status': 'completed'}},
+            {'id': 'recJob2', 'fields': {'Status': 'processing'}},
+        ]
+
+        progress = airtable.refresh_parent_job('recParent', child_statuses={'recJob2': 'completed'})
+
+        assert progress['status'] == 'completed'
+        assert progress['percent_complete'] == 100.0
+        assert airtable.jobs_table.update.call_args[0][1]['Status'] == 'completed'
+
+    def test_unchanged_progress_is_not_rewritten(self, airtable):
+        """No write happens when status and notes already match."""
+        self.parent(airtable, {'recSeg1': 'recJob1'}, notes='0/1 combined, 0 failed, 1 in progress')
+        airtable.jobs_table.all.return_value = [{'id': 'recJob1', 'fields': {'Status': 'processing'}}]
+
+        airtable.refresh_parent_job('recParent')
+
+        airtable.jobs_table.update.assert_not_called()
+
+    def test_own_buffered_write_is_flushed_before_reading_children(self, buffered_airtable):
+        """A child status queued in the write buffer reaches Airtable before siblings are read."""
+        airtable = buffered_airtable
+        self.parent(airtable, {'recSeg1': 'recJob1', 'recSeg2': 'recJob2'})
+        order = []
+        airtable.jobs_table.batch_update.side_effect = lambda records: order.append('flush') or records
+        airtable.jobs_table.all.side_effect = lambda **kwargs: order.append('read') or [
+            {'id': 'recJob1', 'fields': {'Status': 'completed'}},
+            {'id': 'recJob2', 'fields': {'Status': 'completed'}},
+        ]
+
+        with airtable.buffered_writes():
+            airtable.update_job('recJob2', {'Status': 'completed'})
+            progress = airtable.refresh_parent_job('recParent')
+
+        assert order[:2] == ['flush', 'read']
+        assert progress['status'] == 'completed'
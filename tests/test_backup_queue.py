@@ -0,0 +1,184 @@
+"""Unit tests for the durable remote backup queue."""
+
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+
+from utils.backup_queue import BackupQueue
+
+
+class RecordingSender:
+    """Fake send_to_remote_backup that fails a set number of times first."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def __call__(self, file_data, filename, file_type, original_path, session):
+        if self.failures:
+            self.failures -= 1
+            return None
+        self.sent.append((filename, file_data.read()))
+        return {'status': 'ok'}
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    return str(tmp_path / 'spool')
+
+
+class TestBackupQueue:
+    """Test spooling, delivery, retry and the disk budget."""
+
+    def test_enqueue_and_deliver(self, spool_dir):
+        sender = RecordingSender()
+        queue = BackupQueue(spool_dir, sender=sender)
+
+        queue.enqueue(b'audio', 'voice.mp3', 'voiceovers', 'key/voice.mp3')
+        assert queue.stats()['depth'] == 1
+
+        assert queue.process_once() == 1
+        assert sender.sent == [('voice.mp3', b'audio')]
+        assert queue.stats()['depth'] == 0
+        assert os.listdir(spool_dir) == []
+
+    def test_entries_survive_restart(self, spool_dir):
+        """A new queue over the same directory picks up undelivered entries."""
+        BackupQueue(spool_dir, sender=RecordingSender()).enqueue(b'a', 'a.mp3')
+
+        sender = RecordingSender()
+        BackupQueue(spool_dir, sender=sender).process_once()
+
+        assert sender.sent == [('a.mp3', b'a')]
+
+    def test_failed_delivery_backs_off(self, spool_dir):
+        sender = RecordingSender(failures=1)
+        queue = BackupQueue(spool_dir, sender=sender, backoff_seconds=60)
+        queue.enqueue(b'a', 'a.mp3')
+
+        queue.process_once()
+        # Not due again until the backoff has passed
+        assert queue.process_once() == 0
+        assert queue.stats()['retries'] == 1
+        assert queue.stats()['depth'] == 1
+
+        queue.backoff_seconds = 0
+        with patch('utils.backup_queue.time.time', return_value=10 ** 10):
+            queue.process_once()
+        assert sender.sent == [('a.mp3', b'a')]
+
+    def test_gives_up_after_max_attempts(self, spool_dir):
+        queue = BackupQueue(spool_dir, sender=RecordingSender(failures=5), max_attempts=1)
+        queue.enqueue(b'a', 'a.mp3')
+
+        queue.process_once()
+
+        assert queue.stats()['depth'] == 0
+        assert queue.stats()['dropped'] == 1
+
+    def test_disk_budget_drops_oldest(self, spool_dir):
+        queue = BackupQueue(spool_dir, sender=RecordingSender(), max_bytes=10)
+        queue.enqueue(b'x' * 6, 'old.mp3')
+        queue.enqueue(b'y' * 6, 'new.mp3')
+
+        stats = queue.stats()
+        assert stats['depth'] == 1
+        assert stats['bytes'] <= 10
+        assert stats['dropped'] == 1
+        assert queue.enqueue(b'z' * 11, 'huge.mp3') is None
+
+    def test_enqueue_from_path(self, spool_dir, tmp_path):
+        source = tmp_path / 'local.mp4'
+        source.write_bytes(b'video')
+        sender = RecordingSender()
+        queue = BackupQueue(spool_dir, sender=sender)
+
+        queue.enqueue(str(source), 'local.mp4', 'videos')
+        queue.process_once()
+
+        assert sender.sent == [('local.mp4', b'video')]
+        assert source.read_bytes() == b'video'
+
+    def test_spooled_entry_waits_for_commit(self, spool_dir):
+        """Bytes written through open_spool are only delivered once committed."""
+        sender = RecordingSender()
+        queue = BackupQueue(spool_dir, sender=sender)
+
+        entry_id, data_file = queue.open_spool()
+        data_file.write(b'stre')
+        data_file.write(b'amed')
+        data_file.close()
+        assert queue.process_once() == 0
+
+        assert queue.commit(entry_id, 'voice.mp3', 'voiceovers') == entry_id
+        queue.process_once()
+        assert sender.sent == [('voice.mp3', b'streamed')]
+
+    def test_discard_removes_spooled_data(self, spool_dir):
+        queue = BackupQueue(spool_dir, sender=RecordingSender())
+        entry_id, data_file = queue.open_spool()
+        data_file.close()
+
+        queue.discard(entry_id)
+
+        assert os.listdir(spool_dir) == []
+
+    def test_workers_deliver_in_background(self, spool_dir):
+        sender = RecordingSender()
+        queue = BackupQueue(spool_dir, sender=sender, poll_interval=0.05)
+        queue.start()
+        try:
+            queue.enqueue(b'a', 'a.mp3')
+            for _ in range(100):
+                if sender.sent:
+                    break
+                queue._stop.wait(0.02)
+        finally:
+            queue.stop()
+
+        assert sender.sent == [('a.mp3', b'a')]
+
+
+class TestUploadQueuesBackup:
+    """Test that upload_file hands the remote backup to the queue."""
+
+    def test_upload_returns_without_sending(self, tmp_path):
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.config.LOCAL_BACKUP_PATH = None
+        nca.config.S3_CONTENT_HASH_UPLOADS = False
+        nca.config.BACKUP_QUEUE_ENABLED = True
+        queue = MagicMock()
+        queue.enqueue.return_value = 'entry1'
+        with patch('services.nca_service.get_s3_client', return_value=MagicMock()), \
+                patch('services.nca_service.remote_backup_configured', return_value=True), \
+                patch('services.nca_service.get_backup_queue', return_value=queue), \
+                patch('services.nca_service.send_to_remote_backup') as send:
+            result = nca.upload_file(b'audio', 'voice.mp3', 'audio/mpeg')
+
+        send.assert_not_called()
+        queue.enqueue.assert_called_once()
+        assert result['remote_backup'] == {'queued': True, 'queue_id': 'entry1'}
+
+    def test_stream_is_teed_into_spool(self, tmp_path):
+        """A streamed upload without a local copy is written to the spool as it uploads."""
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.config.LOCAL_BACKUP_PATH = None
+        nca.config.BACKUP_QUEUE_ENABLED = True
+        queue = BackupQueue(str(tmp_path / 'spool'), sender=RecordingSender())
+        client = MagicMock()
+        client.upload_fileobj.side_effect = lambda body, *args, **kwargs: body.read()
+        with patch('services.nca_service.get_s3_client', return_value=client), \
+                patch('services.nca_service.remote_backup_configured', return_value=True), \
+                patch('services.nca_service.get_backup_queue', return_value=queue):
+            result = nca.upload_file(iter([b'mp3', b'-chunks']), 'voice.mp3', 'audio/mpeg', content_hash=False)
+
+        assert result['size'] == 10
+        assert result['remote_backup']['queued'] is True
+        queue.process_once()
+        (filename, data), = queue.sender.sent
+        assert filename.endswith('_voice.mp3')
+        assert data == b'mp3-chunks'
@@ -0,0 +1,142 @@
+"""Tests for the fan-out /api/v2/combine-all-segment-media endpoint."""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from app import create_app
+
+
+def make_segment(segment_id, video=True, voiceover=True):
+    fields = {'SRT Segment ID': segment_id[-1]}
+    if video:
+        fields['Video'] = [{'url': f'https://example.com/{segment_id}.mp4'}]
+    if voiceover:
+        fields['Voiceover'] = [{'url': f'https://example.com/{segment_id}.mp3'}]
+    return {'id': segment_id, 'fields': fields}
+
+
+@pytest.fixture
+def client():
+    app = create_app('testing')
+    return app.test_client()
+
+
+@pytest.fixture
+def mock_airtable():
+    airtable = Mock()
+    job_ids = iter(f'recJob{i}' for i in range(100))
+    airtable.create_job.side_effect = lambda **kwargs: {'id': next(job_ids)}
+    airtable.refresh_parent_job.side_effect = lambda parent_job_id, child_statuses=None: {
+        'parent_job_id': parent_job_id, 'status': 'processing', 'total': len(child_statuses or {})
+    }
+    with patch('api.routes_v2.airtable', airtable):
+        yield airtable
+
+
+@pytest.fixture
+def mock_nca():
+    nca = Mock()
+    nca.combine_audio_video.side_effect = lambda **kwargs: {'job_id': f"nca-{kwargs['custom_id']}"}
+    with patch('api.routes_v2.NCAService', return_value=nca):
+        yield nca
+
+
+class TestCombineAllSegmentMedia:
+    """Test validation, fan-out submission and parent job tracking."""
+
+    def test_submits_every_segment_under_parent(self, client, mock_airtable, mock_nca):
+        """Each ready segment gets a child job linked to one parent job."""
+        mock_airtable.get_video_segments.return_value = [make_segment(f'recSeg{i}') for i in range(3)]
+
+        response = client.post('/api/v2/combine-all-segment-media', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['job_id'] == 'recJob0'
+        assert data['submitted'] == 3
+        assert [s['segment_id'] for s in data['segments']] == ['recSeg0', 'recSeg1', 'recSeg2']
+        assert mock_nca.combine_audio_video.call_count == 3
+        mock_airtable.get_segment.assert_not_called()
+
+        child_payloads = [call.kwargs['request_payload'] for call in mock_airtable.create_job.call_args_list[1:]]
+        assert all(payload['parent_job_id'] == 'recJob0' for payload in child_payloads)
+        webhook_urls = [call.kwargs['webhook_url'] for call in mock_nca.combine_audio_video.call_args_list]
+        assert all('operation=combine' in url for url in webhook_urls)
+
+    def test_invalid_segments_reject_request(self, client, mock_airtable, mock_nca):
+        """Segments without media are reported and nothing is submitted."""
+        mock_airtable.get_video_segments.return_value = [make_segment('recSeg0'),
+                                                         make_segment('recSeg1', voiceover=False)]
+
+        response = client.post('/api/v2/combine-all-segment-media', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 400
+        assert response.get_json()['invalid_segments'][0]['segment_id'] == 'recSeg1'
+        mock_airtable.create_job.assert_not_called()
+        mock_nca.combine_audio_video.assert_not_called()
+
+    def test_allow_partial_skips_invalid_segments(self, client, mock_airtable, mock_nca):
+        """With allow_partial, ready segments are submitted and the rest are skipped."""
+        mock_airtable.get_video_segments.return_value = [make_segment('recSeg0'),
+                                                         make_segment('recSeg1', video=False)]
+
+        response = client.post('/api/v2/combine-all-segment-media',
+                               json={'record_id': 'recVideo', 'allow_partial': True})
+
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['submitted'] == 1
+        assert data['skipped_segments'][0]['segment_id'] == 'recSeg1'
+
+    def test_submission_failure_is_reported_per_segment(self, client, mock_airtable, mock_nca):
+        """One failed submission fails its child job without aborting the others."""
+        mock_airtable.get_video_segments.return_value = [make_segment(f'recSeg{i}') for i in range(2)]
+
+        def combine(**kwargs):
+            if 'recSeg1' in kwargs['output_filename']:
+                raise RuntimeError('NCA unavailable')
+            return {'job_id': 'nca-1'}
+
+        mock_nca.combine_audio_video.side_effect = combine
+
+        response = client.post('/api/v2/combine-all-segment-media',
+                               json={'record_id': 'recVideo', 'max_concurrency': 1})
+
+        data = response.get_json()
+        assert response.status_code == 202
+        assert data['submitted'] == 1
+        assert data['failed_submissions'][0]['segment_id'] == 'recSeg1'
+        mock_airtable.fail_job.assert_called_once()
+
+
+class TestCombineAllSegmentsNormalize:
+    """Test submitting a normalize plan's per-segment jobs."""
+
+    def test_failed_normalize_submission_fails_only_that_child(self, client, mock_airtable, mock_nca):
+        """A child that can't be submitted is failed and the plan falls back instead of hanging."""
+        from services.concat_planner import STRATEGY_NORMALIZE, ConcatPlan
+
+        mock_airtable.get_video.return_value = {'id': 'recVideo', 'fields': {}}
+        mock_airtable.get_video_segments.return_value = [
+            {'id': f'recSeg{i}', 'fields': {'Voiceover + Video': [{'url': f'https://example.com/{i}.mp4'}]}}
+            for i in range(3)
+        ]
+        mock_nca.plan_concatenation.return_value = ConcatPlan(STRATEGY_NORMALIZE, 3, 'odd segments',
+                                                              odd_indexes=(1, 2))
+
+        def normalize(**kwargs):
+            if kwargs['custom_id'] == 'recJob2':
+                raise RuntimeError('NCA unavailable')
+            return {'job_id': 'nca-norm-1'}
+
+        mock_nca.normalize_video.side_effect = normalize
+
+        with patch('api.routes_v2.submit_after_normalization') as submit:
+            response = client.post('/api/v2/combine-all-segments', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 202
+        assert mock_nca.normalize_video.call_count == 2
+        assert [c.args[0] for c in mock_airtable.fail_job.call_args_list] == ['recJob2']
+        submit.assert_called_once()
+        assert submit.call_args.args[2] == 'recJob0'
+        assert submit.call_args.kwargs['child_results'] == {'recJob2': {'status': 'failed'}}
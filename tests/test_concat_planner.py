@@ -0,0 +1,164 @@
+"""Unit tests for the concat planner."""
+
+import json
+import pytest
+from unittest.mock import MagicMock
+
+from services.concat_planner import (
+    STRATEGY_GENERIC, STRATEGY_NORMALIZE, STRATEGY_STREAM_COPY, ConcatPlan, build_concat_list,
+    build_normalize_payload, build_stream_copy_concat_payload, plan_concat, submit_after_normalization
+)
+from services.encoding_profiles import get_encoding_profile
+from services.media_backend import is_stream_copy
+from services.media_probe import MediaInfo
+from utils.job_payload import encode_job_payload
+
+
+def segment(duration=5.0, **overrides):
+    fields = dict(url='u', duration=duration, video_codec='h264', width=1920, height=1080, fps=30.0,
+                  pix_fmt='yuv420p', audio_codec='aac', sample_rate=44100, channels=2)
+    fields.update(overrides)
+    return MediaInfo(**fields)
+
+
+PROFILE = get_encoding_profile('standard')
+
+
+class TestPlanConcat:
+    """Test the stream copy / normalize / generic decision."""
+
+    def test_matching_segments_stream_copy(self):
+        plan = plan_concat([segment(), segment(), segment(4.0)], PROFILE)
+
+        assert plan.strategy == STRATEGY_STREAM_COPY
+        assert plan.total_duration == 14.0
+        assert plan.estimated_seconds < 1
+
+    def test_odd_segment_is_normalized(self):
+        plan = plan_concat([segment(), segment(width=1280, height=720), segment()], PROFILE)
+
+        assert plan.strategy == STRATEGY_NORMALIZE
+        assert plan.odd_indexes == (1,)
+        assert plan.reference['width'] == 1920
+        assert plan.estimated_seconds > plan_concat([segment()] * 3, PROFILE).estimated_seconds
+
+    def test_missing_probe_falls_back_to_generic(self):
+        plan = plan_concat([segment(), None], PROFILE)
+
+        assert plan.strategy == STRATEGY_GENERIC
+        assert '[1]' in plan.reason
+
+    def test_odd_segment_without_audio_is_generic(self):
+        plan = plan_concat([segment(), segment(), segment(audio_codec=None, sample_rate=None, channels=None)], PROFILE)
+
+        assert plan.strategy == STRATEGY_GENERIC
+
+    def test_plan_round_trips_through_dict(self):
+        plan = plan_concat([segment(), segment(fps=25.0), segment()], PROFILE)
+
+        assert ConcatPlan.from_dict(json.loads(json.dumps(plan.to_dict()))) == plan
+
+
+class TestPayloads:
+    """Test the compose payloads the planner builds."""
+
+    def test_stream_copy_concat_is_a_remux(self):
+        payload = build_stream_copy_concat_payload('https://cdn.example.com/list.txt')
+
+        assert is_stream_copy(payload)
+        assert {'option': '-f', 'argument': 'concat'} in payload['inputs'][0]['options']
+
+    def test_normalize_matches_reference(self):
+        reference = plan_concat([segment(), segment(), segment(fps=25.0)], PROFILE).reference
+
+        payload = build_normalize_payload('https://v/odd.mp4', reference, PROFILE)
+
+        assert 'scale=1920:1080' in payload['filters'][0]['filter']
+        assert 'fps=30.0' in payload['filters'][0]['filter']
+        assert {'option': '-ar', 'argument': '44100'} in payload['outputs'][0]['options']
+
+    def test_concat_list_quotes_urls(self):
+        assert build_concat_list(["https://v/a.mp4", "https://v/it's.mp4"]) == \
+            "file 'https://v/a.mp4'\nfile 'https://v/it'\\''s.mp4'\n"
+
+
+class TestSubmitAfterNormalization:
+    """Test submitting the concat once every normalization job has finished."""
+
+    @pytest.fixture
+    def airtable(self):
+        airtable = MagicMock()
+        airtable.config.STATUS_COMPLETED = 'completed'
+        airtable.config.STATUS_FAILED = 'failed'
+        plan = plan_concat([segment(), segment(width=1280, height=720), segment(fps=25.0)], PROFILE)
+        airtable.get_job.return_value = {'id': 'recParent', 'fields': {'Request Payload': encode_job_payload({
+            'video_id': 'recVideo', 'video_urls': ['https://v/0.mp4', 'https://v/1.mp4', 'https://v/2.mp4'],
+            'normalize_jobs': {'1': 'recN1', '2': 'recN2'}, 'concat_plan': plan.to_dict()
+        })}}
+        return airtable
+
+    def children(self, airtable, *records):
+        airtable.get_records_by_ids.return_value = [
+            {'id': job_id, 'fields': {'Status': status, 'Response Payload': json.dumps({'output_url': url})}}
+            for job_id, status, url in records
+        ]
+
+    def test_waits_for_running_children(self, airtable):
+        self.children(airtable, ('recN1', 'completed', 'https://v/1n.mp4'), ('recN2', 'processing', None))
+        nca = MagicMock()
+
+        assert submit_after_normalization(airtable, nca, 'recParent', 'https://hooks') is None
+        nca.concatenate_videos.assert_not_called()
+
+    def test_submits_stream_copy_with_normalized_urls(self, airtable):
+        self.children(airtable, ('recN1', 'completed', 'https://v/1n.mp4'), ('recN2', 'processing', None))
+        nca = MagicMock()
+        nca.concatenate_videos.return_value = {'job_id': 'nca-concat'}
+
+        submit_after_normalization(airtable, nca, 'recParent', 'https://hooks',
+                                   child_results={'recN2': {'status': 'completed', 'output_url': 'https://v/2n.mp4'}})
+
+        kwargs = nca.concatenate_videos.call_args.kwargs
+        assert kwargs['video_urls'] == ['https://v/0.mp4', 'https://v/1n.mp4', 'https://v/2n.mp4']
+        assert kwargs['plan'].strategy == STRATEGY_STREAM_COPY
+        assert 'operation=concatenate' in kwargs['webhook_url']
+        assert airtable.update_job.call_args[0][1]['External Job ID'] == 'nca-concat'
+
+    def test_failed_normalization_falls_back_to_generic(self, airtable):
+        self.children(airtable, ('recN1', 'failed', None), ('recN2', 'completed', 'https://v/2n.mp4'))
+        nca = MagicMock()
+        nca.concatenate_videos.return_value = {'job_id': 'nca-concat'}
+
+        submit_after_normalization(airtable, nca, 'recParent', 'https://hooks')
+
+        kwargs = nca.concatenate_videos.call_args.kwargs
+        assert kwargs['video_urls'] == ['https://v/0.mp4', 'https://v/1.mp4', 'https://v/2.mp4']
+        assert kwargs['plan'].strategy == STRATEGY_GENERIC
+
+    def test_already_submitted_is_skipped(self, airtable):
+        airtable.get_job.return_value['fields']['External Job ID'] = 'nca-concat'
+        nca = MagicMock()
+
+        assert submit_after_normalization(airtable, nca, 'recParent', 'https://hooks') is None
+        nca.concatenate_videos.assert_not_called()
+
+
+class TestConcatenateVideosWithPlan:
+    """Test that a stream_copy plan becomes a concat-demuxer compose job."""
+
+    def test_stream_copy_plan_uses_compose(self):
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.media_backend = None
+        nca.upload_file = MagicMock(return_value={'url': 'https://cdn.example.com/list.txt'})
+        nca.session = MagicMock()
+        nca.session.post.return_value.json.return_value = {'job_id': 'nca-1'}
+        plan = plan_concat([segment(), segment()], PROFILE)
+
+        nca.concatenate_videos(['https://v/0.mp4', 'https://v/1.mp4'], 'out.mp4', plan=plan)
+
+        assert nca.session.post.call_args[0][0].endswith('/v1/ffmpeg/compose')
+        payload = nca.session.post.call_args.kwargs['json']
+        assert payload['inputs'][0]['file_url'] == 'https://cdn.example.com/list.txt'
+        assert b"file 'https://v/1.mp4'" in nca.upload_file.call_args[0][0]
@@ -0,0 +1,65 @@
+"""Tests for streaming ElevenLabs audio into the voiceover upload."""
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+
+from api import routes_v2
+from services.elevenlabs_service import ElevenLabsService
+
+
+def streaming_response(chunks):
+    response = MagicMock(status_code=200)
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+class TestStreamVoice:
+    """Test ElevenLabsService.stream_voice."""
+
+    def test_yields_chunks_and_closes_response(self):
+        service = ElevenLabsService()
+        response = streaming_response([b'ab', b'cd'])
+        with patch.object(service.session, 'post', return_value=response) as post:
+            with service.stream_voice('Hello', 'el-voice') as chunks:
+                assert b''.join(chunks) == b'abcd'
+
+        assert post.call_args.args[0].endswith('/text-to-speech/el-voice/stream')
+        assert post.call_args.kwargs['stream'] is True
+        response.close.assert_called_once()
+
+    def test_interrupted_stream_is_not_a_request_error(self):
+        """A broken body raises RuntimeError so upload_file doesn't retry a half-read stream."""
+        service = ElevenLabsService()
+
+        def broken():
+            yield b'ab'
+            raise requests.exceptions.ChunkedEncodingError('reset')
+
+        response = streaming_response([])
+        response.iter_content.return_value = broken()
+        with patch.object(service.session, 'post', return_value=response):
+            with pytest.raises(RuntimeError):
+                with service.stream_voice('Hello', 'el-voice') as chunks:
+                    list(chunks)
+        response.close.assert_called_once()
+
+
+class TestStreamingVoiceover:
+    """Test that the voiceover routes pipe the stream into upload_file."""
+
+    def test_stream_passed_to_upload(self):
+        elevenlabs = MagicMock(model_id='eleven_multilingual_v2')
+        elevenlabs.stream_voice.return_value.__enter__.return_value = iter([b'x' * 16000])
+        nca = MagicMock()
+        nca.upload_file.return_value = {'url': 'https://cdn/v.mp3', 'size': 16000}
+
+        with patch('api.routes_v2.get_tts_cache', return_value=None), \
+                patch.object(routes_v2.config, 'ELEVENLABS_STREAMING', True):
+            voiceover = routes_v2._synthesize_voiceover(elevenlabs, nca, 'recSeg', 'Hello', {'voice_id': 'el-voice'})
+
+        assert voiceover == {'url': 'https://cdn/v.mp3', 'duration': 1.0, 'cached': False}
+        elevenlabs.generate_voice_sync.assert_not_called()
+        upload_kwargs = nca.upload_file.call_args.kwargs
+        assert upload_kwargs['content_hash'] is False
+        assert not isinstance(upload_kwargs['file_data'], bytes)
@@ -211,5 +211,43 @@ class TestGenerateAIImage:
         assert 'Validation error' in data['error']
 
 
+class TestDecodeAndUploadImages:
+    """Test the parallel decode+upload of gpt-image-1 results."""
+    
+    PIXEL = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+    
+    def test_results_keep_response_order(self):
+        """URLs come back in image order even when uploads finish out of order."""
+        import time
+        from api.routes_v2 import _decode_and_upload_images
+        
+        def upload(file_data, filename, content_type):
+            index = int(filename.rsplit('_', 1)[1].split('.')[0])
+            time.sleep(0.05 * (4 - index))
+            return {'url': f'https://example.com/{index}.png'}
+        
+        nca = Mock()
+        nca.upload_file.side_effect = upload
+        
+        uploaded, failed = _decode_and_upload_images(nca, [{'b64_json': self.PIXEL}] * 4, 'rec123', '20250101_000000')
+        
+        assert [img['url'] for img in uploaded] == [f'https://example.com/{i}.png' for i in range(1, 5)]
+        assert failed == []
+    
+    def test_partial_failure_is_reported(self):
+        """A failed image is reported by index and the rest are still uploaded."""
+        from api.routes_v2 import _decode_and_upload_images
+        
+        nca = Mock()
+        nca.upload_file.side_effect = lambda file_data, filename, content_type: {'url': filename}
+        images = [{'b64_json': self.PIXEL}, {'url': 'unexpected'}, {'b64_json': self.PIXEL}]
+        
+        uploaded, failed = _decode_and_upload_images(nca, images, 'rec123', '20250101_000000')
+        
+        assert len(uploaded) == 2
+        assert uploaded[1]['url'].endswith('_3.png')
+        assert [f['index'] for f in failed] == [2]
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,156 @@
+"""Tests for the batch /api/v2/generate-voiceovers endpoint."""
+
+import json
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+from app import create_app
+from api import routes_v2
+
+
+def make_segment(segment_id, voice='recVoice1', text='Hello there', voiceover=False):
+    fields = {'SRT Text': text, 'Voices': [voice] if voice else [], 'Speed (from Voices)': [1.5]}
+    if voiceover:
+        fields['Voiceover'] = [{'url': f'https://example.com/{segment_id}.mp3'}]
+    return {'id': segment_id, 'fields': fields}
+
+
+@pytest.fixture
+def client():
+    app = create_app('testing')
+    return app.test_client()
+
+
+@pytest.fixture
+def mock_airtable():
+    airtable = MagicMock()
+    airtable.create_job.return_value = {'id': 'recJobParent'}
+    airtable.get_voice.return_value = {'id': 'recVoice1', 'fields': {'Voice ID': 'el-voice', 'Stability': 0.6}}
+    with patch('api.routes_v2.airtable', airtable):
+        yield airtable
+
+
+@pytest.fixture(autouse=True)
+def no_tts_cache():
+    with patch('api.routes_v2.get_tts_cache', return_value=None), \
+            patch.object(routes_v2.config, 'ELEVENLABS_STREAMING', False):
+        yield
+
+
+@pytest.fixture
+def mock_run_batch():
+    started = threading.Event()
+    run_batch = Mock(side_effect=lambda *args: started.set())
+    run_batch.started = started
+    with patch('api.routes_v2._run_voiceover_batch', run_batch):
+        yield run_batch
+
+
+class TestGenerateVoiceovers:
+    """Test segment selection, voice resolution and the background hand-off."""
+
+    def test_returns_progress_handle(self, client, mock_airtable, mock_run_batch):
+        """Pending segments are handed to a background batch and the response is 202."""
+        mock_airtable.get_video_segments.return_value = [
+            make_segment('recSeg0'), make_segment('recSeg1'), make_segment('recSeg2', voiceover=True)
+        ]
+
+        response = client.post('/api/v2/generate-voiceovers', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['job_id'] == 'recJobParent'
+        assert data['total'] == 2
+        assert data['progress_url'] == '/api/v2/generate-voiceovers/recJobParent'
+        assert mock_run_batch.started.wait(5)
+        _, video_id, segments, settings, max_workers = mock_run_batch.call_args.args
+        assert [s['id'] for s in segments] == ['recSeg0', 'recSeg1']
+        assert settings['recSeg0']['speed'] == 1.2
+        assert max_workers == 2
+
+    def test_voice_resolved_once(self, client, mock_airtable, mock_run_batch):
+        """Segments sharing a voice read it once."""
+        mock_airtable.get_video_segments.return_value = [make_segment(f'recSeg{i}') for i in range(4)]
+
+        client.post('/api/v2/generate-voiceovers', json={'record_id': 'recVideo'})
+
+        mock_airtable.get_voice.assert_called_once_with('recVoice1')
+
+    def test_concurrency_capped_at_plan_limit(self, client, mock_airtable, mock_run_batch):
+        """A requested concurrency above ELEVENLABS_MAX_CONCURRENCY is capped."""
+        mock_airtable.get_video_segments.return_value = [make_segment(f'recSeg{i}') for i in range(20)]
+
+        response = client.post('/api/v2/generate-voiceovers', json={'record_id': 'recVideo', 'max_concurrency': 50})
+
+        assert response.get_json()['max_concurrency'] == routes_v2.config.ELEVENLABS_MAX_CONCURRENCY
+
+    def test_skips_segments_without_text_or_voice(self, client, mock_airtable, mock_run_batch):
+        """Segments that can't be voiced are reported, not submitted."""
+        mock_airtable.get_video_segments.return_value = [
+            make_segment('recSeg0', text=''), make_segment('recSeg1', voice=None)
+        ]
+
+        response = client.post('/api/v2/generate-voiceovers', json={'record_id': 'recVideo'})
+
+        assert response.status_code == 200
+        assert len(response.get_json()['skipped_segments']) == 2
+        mock_airtable.create_job.assert_not_called()
+        mock_run_batch.assert_not_called()
+
+
+class TestRunVoiceoverBatch:
+    """Test the background synthesis loop."""
+
+    def test_writes_each_segment_and_bounds_concurrency(self, mock_airtable):
+        """Every segment is written as it finishes with at most max_workers in flight."""
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def synthesize(text, **settings):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return {'audio_data': b'mp3'}
+
+        elevenlabs = Mock()
+        elevenlabs.generate_voice_sync.side_effect = synthesize
+        nca = Mock()
+        nca.upload_file.side_effect = lambda **kwargs: {'url': f"https://cdn/{kwargs['filename']}"}
+        segments = [make_segment(f'recSeg{i}') for i in range(6)]
+        settings = {s['id']: {'voice_id': 'el-voice'} for s in segments}
+
+        with patch('api.routes_v2.ElevenLabsService', return_value=elevenlabs), \
+                patch('api.routes_v2.NCAService', return_value=nca):
+            progress = routes_v2._run_voiceover_batch('recJobParent', 'recVideo', segments, settings, 2)
+
+        assert peak[0] <= 2
+        assert progress['completed'] == 6
+        assert progress['status'] == 'completed'
+        ready_writes = [c for c in mock_airtable.update_segment.call_args_list
+                        if c.args[1].get('Status') == 'Voiceover Ready']
+        assert len(ready_writes) == 6
+        final = mock_airtable.update_job.call_args_list[-1].args[1]
+        assert final['Status'] == 'completed'
+        assert json.loads(final['Response Payload'])['percent_complete'] == 100.0
+
+    def test_failed_segment_fails_parent(self, mock_airtable):
+        """One failed synthesis marks its segment and the parent job as failed."""
+        elevenlabs = Mock()
+        elevenlabs.generate_voice_sync.side_effect = [{'audio_data': b'mp3'}, RuntimeError('quota')]
+        nca = Mock()
+        nca.upload_file.return_value = {'url': 'https://cdn/a.mp3'}
+        segments = [make_segment('recSeg0'), make_segment('recSeg1')]
+        settings = {s['id']: {'voice_id': 'el-voice'} for s in segments}
+
+        with patch('api.routes_v2.ElevenLabsService', return_value=elevenlabs), \
+                patch('api.routes_v2.NCAService', return_value=nca):
+            progress = routes_v2._run_voiceover_batch('recJobParent', 'recVideo', segments, settings, 1)
+
+        assert progress['failed'] == 1
+        assert progress['status'] == 'failed'
+        mock_airtable.update_segment.assert_any_call('recSeg1', {'Status': 'Voiceover Failed'})
+        assert 'recSeg1' in mock_airtable.update_job.call_args_list[-1].args[1]['Error Details']
@@ -0,0 +1,57 @@
+"""Unit tests for the local SQLite job index."""
+
+import pytest
+
+from services.job_index import JobIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    return JobIndex(str(tmp_path / 'jobs.sqlite3'))
+
+
+class TestJobIndex:
+    """Test JobIndex storage and lookups."""
+
+    def test_upsert_and_lookup(self, index):
+        index.upsert({'id': 'recJob', 'createdTime': '2024-01-01T00:00:00.000Z',
+                      'fields': {'Status': 'processing', 'External Job ID': 'nca-1'}})
+
+        assert index.get('recJob')['fields']['Status'] == 'processing'
+        assert index.get_by_external_id('nca-1')['id'] == 'recJob'
+        assert index.get('recMissing') is None
+
+    def test_upsert_replaces_fields_but_keeps_created_time(self, index):
+        index.upsert({'id': 'recJob', 'createdTime': '2024-01-01T00:00:00.000Z', 'fields': {'Status': 'pending'}})
+        index.upsert({'id': 'recJob', 'fields': {'Status': 'completed'}})
+
+        job = index.get('recJob')
+        assert job['fields'] == {'Status': 'completed'}
+        assert job['createdTime'] == '2024-01-01T00:00:00.000Z'
+
+    def test_merge_fields(self, index):
+        index.upsert({'id': 'recJob', 'fields': {'Status': 'pending', 'Type': 'combine'}})
+
+        index.merge_fields('recJob', {'Status': 'processing', 'External Job ID': 'nca-2'})
+        index.merge_fields('recOther', {'Status': 'processing'})
+
+        assert index.get('recJob')['fields'] == {'Status': 'processing', 'Type': 'combine', 'External Job ID': 'nca-2'}
+        assert index.get_by_external_id('nca-2')['id'] == 'recJob'
+        assert index.get('recOther') is None
+
+    def test_shared_between_instances(self, tmp_path):
+        """Two handles on the same file (e.g. two workers) see each other's writes."""
+        path = str(tmp_path / 'jobs.sqlite3')
+        JobIndex(path).upsert({'id': 'recJob', 'fields': {'Status': 'pending'}})
+
+        assert JobIndex(path).get('recJob') is not None
+
+    def test_prune_and_stats(self, index):
+        index.upsert({'id': 'recJob', 'fields': {}})
+        index.get('recJob')
+        index.get('recMissing')
+
+        stats = index.stats()
+        assert stats['size'] == 1
+        assert stats['hit_rate'] == 0.5
+        assert index.prune(older_than_seconds=-1) == 1
@@ -0,0 +1,237 @@
+"""Unit tests for JobMonitor's stuck-job scan."""
+
+import time
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from services.job_monitor import JobMonitor
+
+
+def _job(job_id, status='processing', age_minutes=30):
+    created = datetime.utcnow() - timedelta(minutes=age_minutes)
+    return {'id': job_id, 'fields': {'Status': status, 'Created Time': created.strftime('%Y-%m-%dT%H:%M:%S.000Z')}}
+
+
+@pytest.fixture
+def monitor():
+    """JobMonitor with Airtable and NCA mocked out."""
+    with patch('services.job_monitor.AirtableService'), patch('services.job_monitor.NCAService'):
+        job_monitor = JobMonitor()
+        job_monitor.config.JOB_MONITOR_INCREMENTAL_SCAN = True
+        job_monitor.config.JOB_MONITOR_FULL_SCAN_EVERY = 30
+        yield job_monitor
+
+
+class TestStuckJobScan:
+    """Test the server-side filtered, incremental scan."""
+
+    def test_scan_filters_on_server(self, monitor):
+        """Status and age go into the formula and only needed fields are requested."""
+        monitor.airtable.jobs_table.iterate.return_value = iter([[_job('rec1')], [_job('rec2')]])
+
+        stuck = monitor.check_stuck_jobs(older_than_minutes=5)
+
+        assert [job['id'] for job in stuck] == ['rec1', 'rec2']
+        kwargs = monitor.airtable.jobs_table.iterate.call_args.kwargs
+        assert "{Status}='processing'" in kwargs['formula']
+        assert "IS_BEFORE({Created Time}" in kwargs['formula']
+        assert kwargs['fields'] == JobMonitor.SCAN_FIELDS
+        monitor.airtable.jobs_table.all.assert_not_called()
+
+    def test_scan_fields_exist_in_jobs_table(self):
+        """Every requested field is one create_job writes, or Airtable's created time."""
+        from services.airtable_service import AirtableService
+
+        with patch('services.airtable_service.Api') as api:
+            airtable = AirtableService()
+            airtable.job_index = None
+            airtable.create_job('voiceover', video_id='recVideo', segment_id='recSeg',
+                                external_job_id='ext', webhook_url='https://hooks', request_payload={})
+        written = api.return_value.base.return_value.table.return_value.create.call_args.args[0]
+
+        assert set(JobMonitor.SCAN_FIELDS) <= set(written) | {'Created Time'}
+
+    def test_later_cycles_fetch_only_changed_rows(self, monitor):
+        """After the first scan, only changed rows are fetched and merged into the index."""
+        iterate = monitor.airtable.jobs_table.iterate
+        iterate.return_value = iter([[_job('rec1'), _job('rec2')]])
+        monitor.check_stuck_jobs()
+
+        # rec1 completed, rec3 newly stuck; rec2 unchanged and not returned
+        iterate.return_value = iter([[_job('rec1', status='completed'), _job('rec3')]])
+        stuck = monitor.check_stuck_jobs()
+
+        assert sorted(job['id'] for job in stuck) == ['rec2', 'rec3']
+        formula = iterate.call_args.kwargs['formula']
+        assert 'LAST_MODIFIED_TIME()' in formula
+        assert "{Status}='processing'" not in formula
+
+    def test_periodic_full_rescan(self, monitor):
+        """The index is rebuilt from scratch every JOB_MONITOR_FULL_SCAN_EVERY cycles."""
+        monitor.config.JOB_MONITOR_FULL_SCAN_EVERY = 1
+        iterate = monitor.airtable.jobs_table.iterate
+        iterate.return_value = iter([[_job('rec1')]])
+        monitor.check_stuck_jobs()
+
+        iterate.return_value = iter([])
+        monitor.check_stuck_jobs()
+        iterate.return_value = iter([[_job('rec2')]])
+        stuck = monitor.check_stuck_jobs()
+
+        assert [job['id'] for job in stuck] == ['rec2']
+        assert "{Status}='processing'" in iterate.call_args.kwargs['formula']
+
+    def test_non_incremental_mode(self, monitor):
+        """With the watermark disabled every cycle is a filtered full scan."""
+        monitor.config.JOB_MONITOR_INCREMENTAL_SCAN = False
+        iterate = monitor.airtable.jobs_table.iterate
+        iterate.side_effect = lambda **kwargs: iter([[_job('rec1')]])
+
+        monitor.check_stuck_jobs()
+        monitor.check_stuck_jobs()
+
+        for call in iterate.call_args_list:
+            assert "{Status}='processing'" in call.kwargs['formula']
+
+
+class TestPayloadExtraction:
+    """Test reading job context from both payload encodings."""
+
+    @pytest.mark.parametrize('raw', [
+        str({'segment_id': 'recSeg', 'operation': 'combine'}),
+        '{"v": 1, "data": {"segment_id": "recSeg", "operation": "combine"}}'
+    ])
+    def test_extract_from_payload(self, monitor, raw):
+        fields = {'Request Payload': raw}
+
+        assert monitor.extract_segment_id(fields) == 'recSeg'
+        assert monitor.extract_operation(fields) == 'combine'
+
+
+class TestCheckCycle:
+    """Test the listing-based output check and the concurrent status probes."""
+
+    @staticmethod
+    def stuck(*external_ids):
+        return [{'id': f'rec{ext}', 'fields': {'External Job ID': ext}, 'age_minutes': 10} for ext in external_ids]
+
+    @pytest.fixture
+    def s3(self, monitor):
+        monitor.config.NCA_S3_ACCESS_KEY = 'key'
+        monitor.config.JOB_MONITOR_OUTPUT_PREFIX = 'phi-bucket/'
+        with patch('services.job_monitor.get_s3_client') as get_client:
+            yield get_client.return_value.get_paginator.return_value
+
+    def test_listed_outputs_complete_without_head_requests(self, monitor, s3):
+        """Outputs found in the single listing complete their jobs; the rest go to NCA status."""
+        s3.paginate.return_value = [{'Contents': [{'Key': 'phi-bucket/abc1_output_0.mp4'}], 'IsTruncated': False}]
+        monitor.nca.get_job_status.return_value = {'status': 'processing'}
+        monitor.session = Mock()
+
+        with patch.object(monitor, 'check_stuck_jobs', return_value=self.stuck('abc1', 'abc2')), \
+                patch.object(monitor, 'process_completed_job') as completed:
+            monitor.run_check_cycle()
+
+        assert s3.paginate.call_count == 1
+        assert s3.paginate.call_args.kwargs['Prefix'] == 'phi-bucket/abc'
+        completed.assert_called_once()
+        assert completed.call_args[0][1].endswith('/phi-bucket/abc1_output_0.mp4')
+        monitor.nca.get_job_status.assert_called_once_with('abc2')
+        monitor.session.head.assert_not_called()
+
+    def test_falls_back_to_head_without_listing(self, monitor):
+        """Without bucket credentials, outputs are checked with HEAD on the pooled session."""
+        monitor.config.NCA_S3_ACCESS_KEY = None
+        monitor.session = Mock()
+        monitor.session.head.return_value.status_code = 200
+
+        with patch.object(monitor, 'check_stuck_jobs', return_value=self.stuck('abc1')), \
+                patch.object(monitor, 'process_completed_job') as completed:
+            monitor.run_check_cycle()
+
+        monitor.session.head.assert_called_once()
+        completed.assert_called_once()
+
+    def test_status_checks_respect_cycle_budget(self, monitor, s3):
+        """Probes that don't finish within the budget are deferred, not waited for."""
+        import threading
+        release = threading.Event()
+        s3.paginate.return_value = [{'Contents': [], 'IsTruncated': False}]
+        monitor.config.JOB_MONITOR_CYCLE_BUDGET_SECONDS = 0
+        monitor.nca.get_job_status.side_effect = lambda ext: release.wait(5) and {'status': 'failed'}
+
+        started = time.monotonic()
+        with patch.object(monitor, 'check_stuck_jobs', return_value=self.stuck('abc1', 'abc2')):
+            monitor.run_check_cycle()
+        release.set()
+
+        assert time.monotonic() - started < 2
+        monitor.airtable.fail_job.assert_not_called()
+
+
+class TestProbeFailure:
+    """Test that giving up on a normalization job still continues its parent concat."""
+
+    @staticmethod
+    def normalize_job(age_minutes=10):
+        payload = '{"v": 1, "data": {"operation": "normalize", "parent_job_id": "recParent"}}'
+        return {'id': 'recNorm', 'fields': {'Request Payload': payload}, 'age_minutes': age_minutes}
+
+    def test_failed_normalization_continues_parent(self, monitor):
+        with patch('services.job_monitor.submit_after_normalization') as submit:
+            assert monitor.apply_probe_result(self.normalize_job(), None, {'status': 'failed'}) == 'failed'
+
+        monitor.airtable.fail_job.assert_called_once()
+        assert submit.call_args.args[2] == 'recParent'
+        assert submit.call_args.kwargs['child_results'] == {'recNorm': {'status': monitor.config.STATUS_FAILED}}
+
+    def test_timed_out_normalization_continues_parent(self, monitor):
+        with patch('services.job_monitor.submit_after_normalization') as submit:
+            assert monitor.apply_probe_result(self.normalize_job(age_minutes=90), None, None) == 'failed'
+
+        submit.assert_called_once()
+
+    def test_submission_error_fails_parent(self, monitor):
+        with patch('services.job_monitor.submit_after_normalization', side_effect=RuntimeError('NCA down')):
+            monitor.apply_probe_result(self.normalize_job(), None, {'status': 'failed'})
+
+        assert [call.args[0] for call in monitor.airtable.fail_job.call_args_list] == ['recNorm', 'recParent']
+
+
+class TestInterruptedBatches:
+    """Test failing background batch jobs whose worker went away."""
+
+    @staticmethod
+    def batch_job(mode='batch', job_type='voiceover'):
+        payload = '{"v": 1, "data": {"mode": "%s", "segment_ids": ["recSeg0", "recSeg1"]}}' % mode
+        return {'id': 'recBatch', 'fields': {'Request Payload': payload, 'Type': job_type}}
+
+    def test_stale_batch_and_unfinished_segments_are_failed(self, monitor):
+        monitor.config.JOB_TYPE_VOICEOVER = 'voiceover'
+        monitor.airtable.get_records_by_ids.return_value = [
+            {'id': 'recSeg0', 'fields': {'Status': 'Voiceover Ready'}},
+            {'id': 'recSeg1', 'fields': {'Status': 'Generating Voiceover'}}
+        ]
+
+        with patch.object(monitor, '_fetch_jobs', return_value=[self.batch_job()]) as fetch:
+            assert monitor.fail_interrupted_batches() == 1
+
+        assert 'LAST_MODIFIED_TIME()' in fetch.call_args.args[0]
+        assert monitor.airtable.fail_job.call_args.args[0] == 'recBatch'
+        monitor.airtable.update_segments.assert_called_once_with({'recSeg1': {'Status': 'Voiceover Failed'}})
+
+    def test_other_jobs_are_left_alone(self, monitor):
+        with patch.object(monitor, '_fetch_jobs', return_value=[self.batch_job(mode='fan_out')]):
+            assert monitor.fail_interrupted_batches() == 0
+
+        monitor.airtable.fail_job.assert_not_called()
+
+    def test_image_prompt_batch_is_failed(self, monitor):
+        """generate-ai-image-prompts jobs have no per-segment status to reset."""
+        monitor.config.JOB_TYPE_VOICEOVER = 'voiceover'
+
+        with patch.object(monitor, '_fetch_jobs', return_value=[self.batch_job(mode='prompts', job_type='ai_image')]):
+            assert monitor.fail_interrupted_batches() == 1
+
+        monitor.airtable.update_segments.assert_not_called()
@@ -0,0 +1,61 @@
+"""Unit tests for job payload encoding and parsing."""
+
+import pytest
+
+from utils.job_payload import (
+    JOB_PAYLOAD_VERSION, VERSION_LEGACY_REPR, VERSION_PLAIN_JSON,
+    encode_job_payload, job_payload_from_fields, parse_job_payload
+)
+
+
+class TestJobPayload:
+    """Test the versioned encoding and the legacy reader."""
+
+    def test_round_trip(self):
+        raw = encode_job_payload({'segment_id': 'recSeg', 'operation': 'combine'})
+
+        payload = parse_job_payload(raw)
+
+        assert payload.version == JOB_PAYLOAD_VERSION
+        assert not payload.is_legacy
+        assert payload.segment_id == 'recSeg'
+        assert payload.operation == 'combine'
+
+    def test_legacy_repr_rows(self):
+        """Rows written with str(dict) (single quotes, True/None) still parse."""
+        raw = str({'record_id': 'recVid', 'zoom': True, 'theme': None})
+
+        payload = parse_job_payload(raw)
+
+        assert payload.version == VERSION_LEGACY_REPR
+        assert payload.is_legacy
+        assert payload.record_id == 'recVid'
+        assert payload.get('zoom') is True
+
+    def test_plain_json_rows(self):
+        payload = parse_job_payload('{"video_id": "recVid"}')
+
+        assert payload.version == VERSION_PLAIN_JSON
+        assert payload.video_id == 'recVid'
+
+    @pytest.mark.parametrize('raw', [None, '', '{}', '  '])
+    def test_empty_values(self, raw):
+        assert parse_job_payload(raw).data == {}
+
+    @pytest.mark.parametrize('raw', ['not a payload', '[1, 2]', "{'a': "])
+    def test_invalid_values_raise(self, raw):
+        with pytest.raises(ValueError):
+            parse_job_payload(raw)
+
+    def test_parsed_once(self):
+        """The same stored string yields the same cached object."""
+        raw = encode_job_payload({'video_id': 'recVid'})
+
+        assert parse_job_payload(raw) is job_payload_from_fields({'Request Payload': raw})
+
+    def test_as_dict_is_a_copy(self):
+        payload = parse_job_payload(encode_job_payload({'video_id': 'recVid'}))
+
+        payload.as_dict()['video_id'] = 'changed'
+
+        assert payload.video_id == 'recVid'
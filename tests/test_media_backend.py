@@ -0,0 +1,168 @@
+"""Unit tests for the pluggable media backend and local FFmpeg executor."""
+
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+from services.media_backend import LocalFFmpegBackend, build_ffmpeg_command, is_stream_copy
+
+MUX_PAYLOAD = {
+    'inputs': [{'file_url': 'https://example.com/v.mp4'}, {'file_url': 'https://example.com/a.mp3'}],
+    'outputs': [{
+        'filename': 'combined.mp4',
+        'options': [
+            {'option': '-map', 'argument': '0:v'},
+            {'option': '-map', 'argument': '1:a'},
+            {'option': '-c:v', 'argument': 'copy'},
+            {'option': '-c:a', 'argument': 'copy'},
+            {'option': '-shortest'}
+        ]
+    }],
+    'global_options': [{'option': '-y'}],
+    'webhook_url': 'https://app.example.com/webhooks/nca-toolkit?operation=combine',
+    'id': 'recJob1'
+}
+
+
+def fake_ffmpeg(command, **kwargs):
+    """Stand-in for subprocess.run that writes the output file."""
+    with open(command[-1], 'wb') as f:
+        f.write(b'muxed')
+    return MagicMock(returncode=0, stderr=b'')
+
+
+class TestPayloadTranslation:
+    """Test reading NCA compose payloads."""
+
+    def test_stream_copy_detection(self):
+        assert is_stream_copy(MUX_PAYLOAD)
+        reencode = dict(MUX_PAYLOAD, outputs=[{'options': [{'option': '-c:v', 'argument': 'libx264'}]}])
+        assert not is_stream_copy(reencode)
+        assert not is_stream_copy(dict(MUX_PAYLOAD, filters=[{'filter': '[0:a]volume=1.0[a0]'}]))
+
+    def test_build_command(self):
+        command = build_ffmpeg_command(MUX_PAYLOAD, ['/tmp/out.mp4'])
+
+        assert command[:4] == ['ffmpeg', '-hide_banner', '-nostdin', '-y']
+        assert command.count('-i') == 2
+        assert command[-6:] == ['-c:v', 'copy', '-c:a', 'copy', '-shortest', '/tmp/out.mp4']
+
+    def test_filters_become_filter_complex(self):
+        payload = dict(MUX_PAYLOAD, filters=[{'filter': '[0:a]volume=1.0[a0]'}, {'filter': '[a0]anull[aout]'}])
+        command = build_ffmpeg_command(payload, ['/tmp/out.mp4'])
+
+        assert command[command.index('-filter_complex') + 1] == '[0:a]volume=1.0[a0];[a0]anull[aout]'
+
+
+class TestLocalFFmpegBackend:
+    """Test local execution, upload and webhook callback."""
+
+    @pytest.fixture
+    def backend(self):
+        uploader = MagicMock(return_value={'url': 'https://cdn.example.com/combined.mp4'})
+        backend = LocalFFmpegBackend(uploader=uploader, mode='auto', workers=1)
+        yield backend
+        backend._executor.shutdown(wait=True)
+
+    def test_compose_runs_uploads_and_calls_back(self, backend):
+        with patch('services.media_backend.subprocess.run', side_effect=fake_ffmpeg), \
+                patch('services.media_backend.requests.post') as post:
+            post.return_value.status_code = 200
+            result = backend.compose(MUX_PAYLOAD)
+            backend._executor.shutdown(wait=True)
+
+        assert result['job_id'].startswith('local-')
+        assert result['id'] == 'recJob1'
+        backend.uploader.assert_called_once()
+        body = json.loads(post.call_args.kwargs['data'])
+        assert post.call_args.args[0] == MUX_PAYLOAD['webhook_url']
+        assert body['code'] == 200
+        assert body['id'] == 'recJob1'
+        assert body['response'] == {'outputs': [{'url': 'https://cdn.example.com/combined.mp4'}]}
+        assert backend.get_job_status(result['job_id'])['status'] == 'completed'
+
+    def test_ffmpeg_failure_reported(self, backend):
+        failed = MagicMock(returncode=1, stderr=b'Invalid data found when processing input')
+        with patch('services.media_backend.subprocess.run', return_value=failed), \
+                patch('services.media_backend.requests.post') as post:
+            post.return_value.status_code = 200
+            result = backend.compose(MUX_PAYLOAD)
+            backend._executor.shutdown(wait=True)
+
+        body = json.loads(post.call_args.kwargs['data'])
+        assert body['code'] == 500
+        assert 'Invalid data' in body['message']
+        assert backend.get_job_status(result['job_id'])['status'] == 'failed'
+        backend.uploader.assert_not_called()
+
+    def test_callback_signed_for_webhook_validator(self, backend):
+        from utils.webhook_validator import WebhookValidator
+
+        backend.webhook_secret = 'nca-secret'
+        with patch('services.media_backend.subprocess.run', side_effect=fake_ffmpeg), \
+                patch('services.media_backend.requests.post') as post:
+            post.return_value.status_code = 200
+            backend.compose(MUX_PAYLOAD)
+            backend._executor.shutdown(wait=True)
+
+        config = MagicMock(WEBHOOK_VALIDATION_NCA_ENABLED=True, WEBHOOK_SECRET_NCA='nca-secret')
+        signature = post.call_args.kwargs['headers']['X-NCA-Signature']
+        assert WebhookValidator(config).validate_signature('nca-toolkit', post.call_args.kwargs['data'], signature)
+
+    def test_rejected_callback_is_retried(self, backend):
+        """A 4xx (e.g. 401 from signature validation) is not a delivery."""
+        with patch('services.media_backend.subprocess.run', side_effect=fake_ffmpeg), \
+                patch('services.media_backend.requests.post') as post, \
+                patch('services.media_backend.time.sleep'):
+            post.return_value.status_code = 401
+            backend.compose(MUX_PAYLOAD)
+            backend._executor.shutdown(wait=True)
+
+        assert post.call_count == 3
+
+    def test_job_from_another_process_times_out(self, backend):
+        """A local job this process doesn't hold (e.g. after a restart) falls to the monitor's age timeout."""
+        from services.job_monitor import JobMonitor
+        from services.nca_service import NCAService
+
+        assert backend.get_job_status('local-from-before-restart') is None
+
+        with patch('services.job_monitor.AirtableService'), patch('services.job_monitor.NCAService'):
+            monitor = JobMonitor()
+        monitor.nca = NCAService()
+        monitor.nca.media_backend = backend
+        monitor.nca.session = MagicMock()
+        monitor.nca.session.get.side_effect = Exception('404 Not Found')
+        job = {'id': 'recJob1', 'fields': {'External Job ID': 'local-from-before-restart'}, 'age_minutes': 90}
+
+        with patch.object(monitor, 'fail_probed_job') as fail:
+            output_url, status = monitor.probe_job(job, check_output=False)
+            assert monitor.apply_probe_result(job, output_url, status) == 'failed'
+        fail.assert_called_once()
+
+    def test_auto_mode_routing(self, backend):
+        assert backend.accepts(MUX_PAYLOAD)
+        assert not backend.accepts({'video_urls': [{'video_url': 'https://example.com/1.mp4'}]})
+        assert backend.get_job_status('nca-job-id') is None
+
+
+class TestNCAServiceRouting:
+    """Test that NCAService hands eligible jobs to the local backend."""
+
+    def test_stream_copy_mux_runs_locally(self):
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.media_backend = MagicMock()
+        nca.media_backend.accepts.return_value = True
+        nca.media_backend.compose.return_value = {'job_id': 'local-1'}
+        nca.session = MagicMock()
+
+        result = nca.combine_audio_video('https://example.com/v.mp4', 'https://example.com/a.mp3',
+                                         'out.mp4', webhook_url='https://hook', custom_id='recJob1')
+
+        assert result == {'job_id': 'local-1'}
+        nca.session.post.assert_not_called()
+        payload = nca.media_backend.compose.call_args.args[0]
+        assert payload['id'] == 'recJob1'
+        assert payload['webhook_url'] == 'https://hook'
@@ -0,0 +1,132 @@
+"""Unit tests for the cached media probe."""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from services.media_probe import MediaInfo, MediaProbe, ProbeCache, parse_ffprobe_output
+
+FFPROBE_OUTPUT = {
+    'streams': [
+        {'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080,
+         'avg_frame_rate': '30000/1001', 'pix_fmt': 'yuv420p'},
+        {'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '44100', 'channels': 2},
+    ],
+    'format': {'format_name': 'mov,mp4,m4a,3gp,3g2,mj2', 'duration': '12.480000', 'size': '1048576'}
+}
+
+
+@pytest.fixture
+def probe(tmp_path):
+    media_probe = MediaProbe(ProbeCache(str(tmp_path / 'probe.sqlite3')), session=MagicMock())
+    media_probe.session.head.return_value.status_code = 200
+    media_probe.session.head.return_value.headers = {'ETag': '"abc"'}
+    return media_probe
+
+
+class TestParseFfprobeOutput:
+    """Test mapping ffprobe JSON to MediaInfo."""
+
+    def test_video_and_audio_streams(self):
+        info = parse_ffprobe_output('https://example.com/a.mp4', FFPROBE_OUTPUT)
+
+        assert info.duration == 12.48
+        assert (info.video_codec, info.width, info.height, info.fps) == ('h264', 1920, 1080, 29.97)
+        assert (info.audio_codec, info.sample_rate, info.channels) == ('aac', 44100, 2)
+        assert info.size == 1048576
+
+    def test_audio_only_with_stream_duration(self):
+        data = {'streams': [{'codec_type': 'audio', 'codec_name': 'mp3', 'duration': '3.5'}], 'format': {}}
+
+        info = parse_ffprobe_output('https://example.com/a.mp3', data)
+
+        assert info.duration == 3.5
+        assert not info.has_video and info.has_audio
+
+
+class TestMediaProbeCache:
+    """Test that probes are reused until the object's validator changes."""
+
+    def test_second_probe_is_served_from_cache(self, probe):
+        with patch.object(probe, 'run_ffprobe', return_value=MediaInfo(url='u', duration=2.0)) as run:
+            probe.probe('https://example.com/a.mp4')
+            info = probe.probe('https://example.com/a.mp4')
+
+        assert run.call_count == 1
+        assert info.duration == 2.0
+        assert probe.cache.stats()['hits'] == 1
+
+    def test_changed_etag_reprobes(self, probe):
+        with patch.object(probe, 'run_ffprobe', return_value=MediaInfo(url='u', duration=2.0)) as run:
+            probe.probe('https://example.com/a.mp4')
+            probe.session.head.return_value.headers = {'ETag': '"def"'}
+            probe.probe('https://example.com/a.mp4')
+
+        assert run.call_count == 2
+
+    def test_cache_persists_across_instances(self, probe, tmp_path):
+        with patch.object(probe, 'run_ffprobe', return_value=MediaInfo(url='u', duration=2.0)):
+            probe.probe('https://example.com/a.mp4')
+
+        other = MediaProbe(ProbeCache(str(tmp_path / 'probe.sqlite3')), session=probe.session)
+        with patch.object(other, 'run_ffprobe') as run:
+            assert other.probe('https://example.com/a.mp4').duration == 2.0
+        run.assert_not_called()
+
+    def test_head_rejected_uses_ranged_get(self, probe):
+        probe.session.head.return_value.status_code = 403
+        probe.session.get.return_value.status_code = 206
+        probe.session.get.return_value.headers = {'Last-Modified': 'Mon', 'Content-Range': 'bytes 0-0/500'}
+
+        assert probe.validator('https://example.com/a.mp4') == 'Mon|500'
+        assert probe.session.get.call_args.kwargs['headers'] == {'Range': 'bytes=0-0'}
+
+    def test_probe_many_maps_failures_to_none(self, probe):
+        def run(url):
+            if url.endswith('bad.mp4'):
+                raise RuntimeError('ffprobe failed')
+            return MediaInfo(url=url, duration=1.0)
+
+        with patch.object(probe, 'run_ffprobe', side_effect=run):
+            results = probe.probe_many(['https://example.com/a.mp4', 'https://example.com/bad.mp4'])
+
+        assert results['https://example.com/a.mp4'].duration == 1.0
+        assert results['https://example.com/bad.mp4'] is None
+
+
+class TestCombineWithProbe:
+    """Test that combine_audio_video uses probed durations."""
+
+    @pytest.fixture
+    def nca(self):
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.media_backend = None
+        nca.session = MagicMock()
+        nca.session.post.return_value.json.return_value = {'job_id': 'nca-1'}
+        return nca
+
+    def sent_payload(self, nca):
+        nca.combine_audio_video('https://v/video.mp4', 'https://v/voice.mp3', 'out.mp4')
+        return nca.session.post.call_args.kwargs['json']
+
+    def test_short_video_is_looped_and_trimmed_to_audio(self, nca):
+        nca.probe_media = MagicMock(return_value={
+            'https://v/video.mp4': MediaInfo(url='v', duration=4.0),
+            'https://v/voice.mp3': MediaInfo(url='a', duration=9.25)
+        })
+
+        payload = self.sent_payload(nca)
+
+        assert payload['inputs'][0]['options'] == [{'option': '-stream_loop', 'argument': '-1'}]
+        options = payload['outputs'][0]['options']
+        assert {'option': '-t', 'argument': '9.250'} in options
+        assert {'option': '-shortest'} not in options
+
+    def test_falls_back_to_shortest_without_probe(self, nca):
+        nca.probe_media = MagicMock(return_value={})
+
+        payload = self.sent_payload(nca)
+
+        assert {'option': '-shortest'} in payload['outputs'][0]['options']
+        assert 'options' not in payload['inputs'][0]
@@ -0,0 +1,121 @@
+"""Unit tests for the shared token bucket rate limiter."""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from requests.adapters import HTTPAdapter
+
+from utils.rate_limiter import (
+    FileTokenBucket, LocalTokenBucket, RateLimitedAdapter, PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE, _take_token, current_priority, parse_retry_after, rate_limit_priority
+)
+
+
+class TestTakeToken:
+    """Test the bucket arithmetic."""
+
+    def test_full_bucket_grants_token(self):
+        state, wait = _take_token({}, now=100.0, rate=5, capacity=5, reserve=0)
+
+        assert wait == 0
+        assert state['tokens'] == 4
+
+    def test_empty_bucket_reports_wait(self):
+        state, wait = _take_token({'tokens': 0.0, 'ts': 100.0}, now=100.0, rate=5, capacity=5, reserve=0)
+
+        assert wait == pytest.approx(0.2)
+        assert state['tokens'] == 0
+
+    def test_refill_is_capped(self):
+        state, wait = _take_token({'tokens': 0.0, 'ts': 0.0}, now=100.0, rate=5, capacity=5, reserve=0)
+
+        assert wait == 0
+        assert state['tokens'] == 4
+
+    def test_background_reserve(self):
+        """Background callers can't take the last reserved tokens; interactive callers can."""
+        state = {'tokens': 2.5, 'ts': 100.0}
+
+        _, background_wait = _take_token(state, now=100.0, rate=5, capacity=5, reserve=2)
+        _, interactive_wait = _take_token(state, now=100.0, rate=5, capacity=5, reserve=0)
+
+        assert background_wait == pytest.approx(0.1)
+        assert interactive_wait == 0
+
+    def test_pause_blocks_until_deadline(self):
+        _, wait = _take_token({'blocked_until': 130.0}, now=100.0, rate=5, capacity=5, reserve=0)
+
+        assert wait == 30.0
+
+
+class TestBuckets:
+    """Test bucket backends."""
+
+    def test_file_bucket_is_shared(self, tmp_path):
+        """Two bucket instances on the same file draw from the same budget."""
+        path = str(tmp_path / 'bucket.json')
+        first = FileTokenBucket(path, rate=0.001, capacity=2)
+        second = FileTokenBucket(path, rate=0.001, capacity=2)
+
+        assert first._try_take(0) == 0
+        assert second._try_take(0) == 0
+        assert first._try_take(0) > 0
+
+    def test_pause_applies_to_all_instances(self, tmp_path):
+        path = str(tmp_path / 'bucket.json')
+        FileTokenBucket(path, rate=5, capacity=5).pause(30)
+
+        assert FileTokenBucket(path, rate=5, capacity=5)._try_take(0) == pytest.approx(30, abs=1)
+
+    def test_acquire_gives_up_after_max_wait(self):
+        bucket = LocalTokenBucket(rate=0.001, capacity=1, max_wait=0.5)
+        bucket.acquire()
+
+        bucket.acquire()
+
+        assert bucket.stats()['timeouts'] == 1
+        assert bucket.stats()['acquired'] == 2
+
+
+class TestPriority:
+    """Test the thread priority context."""
+
+    def test_priority_context(self):
+        assert current_priority() == PRIORITY_INTERACTIVE
+        with rate_limit_priority(PRIORITY_BACKGROUND):
+            assert current_priority() == PRIORITY_BACKGROUND
+        assert current_priority() == PRIORITY_INTERACTIVE
+
+
+class TestRateLimitedAdapter:
+    """Test 429 handling."""
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('7', 30) == 7.0
+        assert parse_retry_after(None, 30) == 30
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', 30) == 30
+
+    def test_429_pauses_bucket_and_retries(self):
+        bucket = Mock()
+        throttled = Mock(status_code=429, headers={'Retry-After': '3'})
+        ok = Mock(status_code=200, headers={})
+        request = Mock(url='https://api.airtable.com/v0/base/Jobs?x=1')
+
+        with patch.object(HTTPAdapter, 'send', side_effect=[throttled, ok]) as mock_send:
+            response = RateLimitedAdapter(bucket).send(request)
+
+        assert response is ok
+        assert mock_send.call_count == 2
+        assert bucket.acquire.call_count == 2
+        bucket.pause.assert_called_once_with(3.0)
+
+    def test_gives_up_after_max_retries(self):
+        bucket = Mock()
+        throttled = Mock(status_code=429, headers={})
+        request = Mock(url='https://api.airtable.com/v0/base/Jobs')
+
+        with patch.object(HTTPAdapter, 'send', return_value=throttled):
+            response = RateLimitedAdapter(bucket, throttle_pause=30, max_throttle_retries=2).send(request)
+
+        assert response.status_code == 429
+        assert bucket.pause.call_count == 2
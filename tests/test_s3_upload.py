@@ -0,0 +1,187 @@
+"""Unit tests for the shared S3 client and streaming uploads."""
+
+import hashlib
+import io
+import pytest
+from unittest.mock import MagicMock, patch
+
+import utils.s3 as s3_module
+from utils.s3 import IteratorReader, TeeReader, as_file_object, get_s3_client
+
+
+@pytest.fixture(autouse=True)
+def reset_client():
+    s3_module._client = None
+    s3_module._transfer_config = None
+    s3_module._upload_index = None
+    yield
+    s3_module._client = None
+    s3_module._transfer_config = None
+    s3_module._upload_index = None
+
+
+class TestStreamingReaders:
+    """Test the file-object adapters used for streaming uploads."""
+
+    def test_iterator_reader(self):
+        reader = io.BufferedReader(IteratorReader([b'ab', b'', b'cde', b'f']))
+        assert reader.read(4) == b'abcd'
+        assert reader.read() == b'ef'
+
+    def test_tee_reader_feeds_sinks(self):
+        copy = io.BytesIO()
+        tee = TeeReader(io.BytesIO(b'hello world'), copy.write)
+
+        assert tee.read(5) == b'hello'
+        assert tee.read() == b' world'
+        assert copy.getvalue() == b'hello world'
+        assert tee.bytes_read == 11
+
+    def test_as_file_object(self):
+        assert as_file_object(b'xyz').read() == b'xyz'
+        assert as_file_object(iter([b'x', b'yz'])).read() == b'xyz'
+        fileobj = io.BytesIO(b'xyz')
+        assert as_file_object(fileobj) is fileobj
+
+
+class TestSharedClient:
+    """Test that one pooled client is shared by the process."""
+
+    def test_client_created_once(self):
+        config = MagicMock(S3_MAX_POOL_CONNECTIONS=32)
+        with patch('boto3.client') as mock_client:
+            first = get_s3_client(config)
+            second = get_s3_client(config)
+
+        assert first is second
+        mock_client.assert_called_once()
+        assert mock_client.call_args.kwargs['config'].max_pool_connections == 32
+
+
+class TestUploadFile:
+    """Test NCAService.upload_file against a mocked S3 client."""
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.config.LOCAL_BACKUP_PATH = str(tmp_path)
+        nca.config.S3_CONTENT_INDEX_PATH = str(tmp_path / 'uploads.sqlite3')
+        nca.config.S3_CONTENT_HASH_UPLOADS = False
+        client = MagicMock()
+        with patch('services.nca_service.get_s3_client', return_value=client), \
+                patch('services.nca_service.send_to_remote_backup', return_value=None):
+            yield nca, client
+
+    def test_small_bytes_use_put_object(self, service):
+        nca, client = service
+
+        result = nca.upload_file(b'audio', 'voice.mp3', 'audio/mpeg')
+
+        client.put_object.assert_called_once()
+        client.upload_fileobj.assert_not_called()
+        assert result['size'] == 5
+        assert 'bytes_per_second' in result
+        assert result['url'].endswith(result['key'])
+
+    def test_stream_is_uploaded_and_backed_up(self, service):
+        nca, client = service
+        client.upload_fileobj.side_effect = lambda fileobj, *args, **kwargs: fileobj.read()
+
+        result = nca.upload_file(iter([b'chunk1', b'chunk2']), 'clip.mp4', 'video/mp4')
+
+        client.upload_fileobj.assert_called_once()
+        assert result['size'] == 12
+        with open(result['local_path'], 'rb') as f:
+            assert f.read() == b'chunk1chunk2'
+
+
+class TestContentHashUploads:
+    """Test content-addressed upload deduplication."""
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        from botocore.exceptions import ClientError
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.config.LOCAL_BACKUP_PATH = None
+        nca.config.S3_CONTENT_INDEX_PATH = str(tmp_path / 'uploads.sqlite3')
+        nca.config.S3_CONTENT_HASH_UPLOADS = True
+        client = MagicMock()
+        client.head_object.side_effect = ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        client.upload_fileobj.side_effect = lambda fileobj, *args, **kwargs: fileobj.read()
+        with patch('services.nca_service.get_s3_client', return_value=client), \
+                patch('services.nca_service.send_to_remote_backup', return_value=None):
+            yield nca, client
+
+    def test_key_is_content_hash(self, service):
+        nca, client = service
+
+        result = nca.upload_file(b'same audio', 'voice.mp3', 'audio/mpeg')
+
+        digest = hashlib.sha256(b'same audio').hexdigest()
+        assert result['key'] == f'youtube-video-engine/voiceovers/sha256/audio-mpeg/{digest}.mp3'
+        assert result['content_sha256'] == digest
+        assert result['deduplicated'] is False
+        client.put_object.assert_called_once()
+
+    def test_off_by_default(self):
+        from config import get_config
+        assert get_config()().S3_CONTENT_HASH_UPLOADS is False
+
+    def test_repeat_upload_skips_transfer(self, service):
+        """Identical content is reused once HEAD confirms the object is still there."""
+        nca, client = service
+        first = nca.upload_file(b'same audio', 'voice.mp3', 'audio/mpeg')
+        client.head_object.side_effect = None
+
+        second = nca.upload_file(iter([b'same ', b'audio']), 'other_name.mp3', 'audio/mpeg')
+
+        assert second['deduplicated'] is True
+        assert second['url'] == first['url']
+        assert second['size'] == len(b'same audio')
+        client.put_object.assert_called_once()
+        client.upload_fileobj.assert_not_called()
+
+    def test_deleted_object_is_uploaded_again(self, service):
+        """An index entry whose object is gone is dropped instead of returning a dead URL."""
+        nca, client = service
+        first = nca.upload_file(b'same audio', 'voice.mp3', 'audio/mpeg')
+
+        second = nca.upload_file(b'same audio', 'voice.mp3', 'audio/mpeg')
+
+        assert second['deduplicated'] is False
+        assert second['key'] == first['key']
+        assert client.put_object.call_count == 2
+
+    def test_content_type_is_part_of_key(self, service):
+        nca, client = service
+
+        audio = nca.upload_file(b'same bytes', 'clip.bin', 'audio/mpeg')
+        other = nca.upload_file(b'same bytes', 'clip.bin', 'application/octet-stream')
+
+        assert audio['key'] != other['key']
+        assert other['deduplicated'] is False
+
+    def test_head_hit_on_index_miss(self, service):
+        """Content already in the bucket (uploaded by another host) is found with HEAD."""
+        nca, client = service
+        client.head_object.side_effect = None
+
+        result = nca.upload_file(iter([b'big ', b'video']), 'clip.mp4', 'video/mp4')
+
+        assert result['deduplicated'] is True
+        client.upload_fileobj.assert_not_called()
+        client.put_object.assert_not_called()
+
+    def test_stored_file_exists(self, service):
+        """Bucket URLs are checked with an S3 HEAD on their key."""
+        nca, client = service
+        url = nca._public_url('youtube-video-engine/voiceovers/voice.mp3')
+
+        assert nca.stored_file_exists(url) is False
+        client.head_object.side_effect = None
+        assert nca.stored_file_exists(url) is True
+        assert client.head_object.call_args.kwargs['Key'] == 'youtube-video-engine/voiceovers/voice.mp3'
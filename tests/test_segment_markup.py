@@ -0,0 +1,262 @@
+"""Tests for concurrent ElevenLabs markup generation."""
+
+import json
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+import openai
+
+import services.openai_service as openai_module
+from services.markup_cache import MarkupCache, markup_cache_key
+from services.openai_service import OpenAIService
+from services.script_processor import ScriptProcessor, Segment
+from utils.rate_limiter import LocalTokenBucket
+
+
+def make_segments(count):
+    return [Segment(text=f"Line {i}", order=i + 1, start_time=i * 2.0, end_time=(i + 1) * 2.0,
+                    estimated_duration=2.0, word_count=2) for i in range(count)]
+
+
+@pytest.fixture
+def processor():
+    processor = ScriptProcessor()
+    processor._openai_service = MagicMock()
+    processor.config.MARKUP_BATCH_SIZE = 1
+    return processor
+
+
+class TestProcessSegmentsWithMarkup:
+    """Test fan-out, ordering and context of ScriptProcessor markup generation."""
+
+    def test_order_and_context_preserved(self, processor):
+        """Results follow script order even when later segments finish first."""
+        def markup(target, previous, following):
+            time.sleep(0.03 if target == 'Line 0' else 0.0)
+            return f"{previous}|{target.upper()}|{following}"
+
+        processor._openai_service.generate_elevenlabs_markup.side_effect = markup
+
+        result = processor.process_segments_with_markup(make_segments(4))
+
+        assert [s['order'] for s in result] == [1, 2, 3, 4]
+        assert result[0]['text'] == 'None|LINE 0|Line 1'
+        assert result[2]['text'] == 'Line 1|LINE 2|Line 3'
+        assert result[3]['text'] == 'Line 2|LINE 3|None'
+        assert result[2]['original_text'] == 'Line 2'
+
+    def test_batched_mode_uses_process_segments_batch(self, processor):
+        processor.config.MARKUP_BATCH_SIZE = 10
+        processor._openai_service.process_segments_batch.side_effect = lambda items, batch_size: [
+            {**item, 'marked_text': item['text'].upper()} for item in items]
+
+        result = processor.process_segments_with_markup(make_segments(3))
+
+        assert [s['text'] for s in result] == ['LINE 0', 'LINE 1', 'LINE 2']
+        processor._openai_service.generate_elevenlabs_markup.assert_not_called()
+
+    def test_concurrency_bounded(self, processor):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def markup(target, previous, following):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return target
+
+        processor._openai_service.generate_elevenlabs_markup.side_effect = markup
+        processor.config.MARKUP_MAX_CONCURRENCY = 3
+
+        processor.process_segments_with_markup(make_segments(12))
+
+        assert 1 < peak[0] <= 3
+
+
+class TestMarkupRetries:
+    """Test per-item retries and the shared rate limit pause."""
+
+    @pytest.fixture
+    def service(self):
+        with patch.object(openai_module, '_rate_limiter', LocalTokenBucket(1000, 10)), \
+                patch('services.openai_service.get_markup_cache', return_value=None):
+            service = OpenAIService()
+            service.client = MagicMock()
+            service.retry_delay = 0
+            yield service
+
+    @staticmethod
+    def completion(text):
+        response = MagicMock()
+        response.choices[0].message.content = text
+        return response
+
+    def test_rate_limit_pauses_shared_bucket_then_retries(self, service):
+        error = openai.RateLimitError('slow down', response=MagicMock(headers={'retry-after': '0'}), body=None)
+        service.client.chat.completions.create.side_effect = [error, self.completion('Marked')]
+
+        with patch.object(openai_module._rate_limiter, 'pause') as pause:
+            assert service.generate_elevenlabs_markup('Plain') == 'Marked'
+
+        pause.assert_called_once_with(0.0)
+
+    def test_exhausted_retries_keep_original_text(self, service):
+        service.client.chat.completions.create.side_effect = RuntimeError('boom')
+
+        assert service.generate_elevenlabs_markup('Plain') == 'Plain'
+        assert service.client.chat.completions.create.call_count == service.max_retries
+
+
+class TestMarkupCache:
+    """Test the persistent markup cache and its use by generate_elevenlabs_markup."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return MarkupCache(str(tmp_path / 'markup.sqlite3'))
+
+    def test_key_depends_on_context_prompt_and_model(self):
+        base = markup_cache_key('Line', 'Before', 'After', 'v1', 'gpt-4o', 0.7)
+        assert markup_cache_key('Line', 'Before', 'After', 'v1', 'gpt-4o', 0.7) == base
+        assert markup_cache_key('Line', 'Changed', 'After', 'v1', 'gpt-4o', 0.7) != base
+        assert markup_cache_key('Line', 'Before', None, 'v1', 'gpt-4o', 0.7) != base
+        assert markup_cache_key('Line', 'Before', 'After', 'v2', 'gpt-4o', 0.7) != base
+        assert markup_cache_key('Line', 'Before', 'After', 'v1', 'gpt-4o-mini', 0.7) != base
+        assert markup_cache_key('Line', 'Before', 'After', 'v1', 'gpt-4o', 0.2) != base
+
+    def test_hit_skips_api_and_counts_tokens(self, cache):
+        with patch.object(openai_module, '_rate_limiter', LocalTokenBucket(1000, 10)), \
+                patch('services.openai_service.get_markup_cache', return_value=cache):
+            service = OpenAIService()
+            service.client = MagicMock()
+            response = TestMarkupRetries.completion('MARKED')
+            response.usage.total_tokens = 1200
+            service.client.chat.completions.create.return_value = response
+
+            first = service.generate_elevenlabs_markup('Plain', 'Before', 'After')
+            second = service.generate_elevenlabs_markup('Plain', 'Before', 'After')
+            service.generate_elevenlabs_markup('Plain', 'Edited', 'After')
+
+        assert first == second == 'MARKED'
+        assert service.client.chat.completions.create.call_count == 2
+        assert cache.stats() == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3, 'tokens_saved': 1200}
+
+    def test_fallback_text_is_not_cached(self, cache):
+        with patch.object(openai_module, '_rate_limiter', LocalTokenBucket(1000, 10)), \
+                patch('services.openai_service.get_markup_cache', return_value=cache):
+            service = OpenAIService()
+            service.client = MagicMock()
+            service.retry_delay = 0
+            service.client.chat.completions.create.side_effect = RuntimeError('boom')
+
+            assert service.generate_elevenlabs_markup('Plain') == 'Plain'
+
+        key = markup_cache_key('Plain', None, None, service.MARKUP_PROMPT_VERSION, service.model,
+                               service.MARKUP_TEMPERATURE)
+        assert cache.get(key) is None
+
+
+class TestProcessSegmentsBatch:
+    """Test the windowed JSON-mode markup requests."""
+
+    @pytest.fixture
+    def service(self):
+        with patch.object(openai_module, '_rate_limiter', LocalTokenBucket(1000, 10)), \
+                patch('services.openai_service.get_markup_cache', return_value=None):
+            service = OpenAIService()
+            service.client = MagicMock()
+            service.retry_delay = 0
+            yield service
+
+    @staticmethod
+    def window_reply(**kwargs):
+        """Answer a window request by upper-casing every target segment."""
+        prompt = kwargs['messages'][1]['content']
+        entries = []
+        for line in prompt.splitlines():
+            if line.startswith('['):
+                index, _, text = line.partition('] ')
+                entries.append({'index': int(index[1:]), 'text': text.strip('"').upper()})
+        return TestMarkupRetries.completion(json.dumps({'segments': entries}))
+
+    def test_one_request_per_window(self, service):
+        service.client.chat.completions.create.side_effect = self.window_reply
+        segments = [{'text': f"line number {i}", 'order': i} for i in range(25)]
+
+        result = service.process_segments_batch(segments, batch_size=10)
+
+        assert service.client.chat.completions.create.call_count == 3
+        assert [s['marked_text'] for s in result] == [f"LINE NUMBER {i}" for i in range(25)]
+        assert result[7]['original_text'] == 'line number 7' and result[7]['order'] == 7
+        calls = service.client.chat.completions.create.call_args_list
+        assert all(c.kwargs['response_format'] == {'type': 'json_object'} for c in calls)
+        # Windows run concurrently, so find the middle one by its first index
+        second_prompt = next(c.kwargs['messages'][1]['content'] for c in calls
+                             if '[10]' in c.kwargs['messages'][1]['content'])
+        assert 'Previous segment: "line number 9"' in second_prompt
+        assert 'Following segment: "line number 20"' in second_prompt
+
+    def test_invalid_items_fall_back_individually(self, service):
+        """Only entries that are missing or don't match their segment get a single-segment request."""
+        batch_reply = TestMarkupRetries.completion(json.dumps({'segments': [
+            {'index': 0, 'text': 'FIRST line here'},
+            {'index': 1, 'text': 'something else entirely'},
+        ]}))
+        single_reply = TestMarkupRetries.completion('fixed')
+        service.client.chat.completions.create.side_effect = [batch_reply, single_reply, single_reply]
+        segments = [{'text': 'first line here'}, {'text': 'second line here'}, {'text': 'third line here'}]
+
+        result = service.process_segments_batch(segments, batch_size=3)
+
+        assert [s['marked_text'] for s in result] == ['FIRST line here', 'fixed', 'fixed']
+        assert service.client.chat.completions.create.call_count == 3
+        single_calls = service.client.chat.completions.create.call_args_list[1:]
+        assert all('response_format' not in c.kwargs for c in single_calls)
+
+    def test_fallback_runs_concurrently(self, service):
+        """Single-segment retries share the MARKUP_MAX_CONCURRENCY bound and keep their order."""
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def markup(target, previous, following):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return target.upper()
+
+        service.client.chat.completions.create.return_value = TestMarkupRetries.completion('{"segments": []}')
+        service.config.MARKUP_MAX_CONCURRENCY = 3
+        segments = [{'text': f"line number {i}"} for i in range(8)]
+
+        with patch.object(service, 'generate_elevenlabs_markup', side_effect=markup):
+            result = service.process_segments_batch(segments, batch_size=8)
+
+        assert [s['marked_text'] for s in result] == [f"LINE NUMBER {i}" for i in range(8)]
+        assert 1 < peak[0] <= 3
+
+    def test_fallback_markup_reused_by_next_batch(self, service, tmp_path):
+        """Markup from a single-segment fallback is found by the next batch run."""
+        cache = MarkupCache(str(tmp_path / 'markup.sqlite3'))
+        segments = [{'text': 'first line here'}, {'text': 'second line here'}]
+        batch_reply = TestMarkupRetries.completion(json.dumps({'segments': [{'index': 0, 'text': 'FIRST line here'}]}))
+        service.client.chat.completions.create.side_effect = [batch_reply, TestMarkupRetries.completion('SECOND line here')]
+
+        with patch('services.openai_service.get_markup_cache', return_value=cache):
+            first = service.process_segments_batch(segments, batch_size=2)
+            second = service.process_segments_batch(segments, batch_size=2)
+
+        assert [s['marked_text'] for s in second] == [s['marked_text'] for s in first] == \
+            ['FIRST line here', 'SECOND line here']
+        assert service.client.chat.completions.create.call_count == 2
+        assert cache.stats()['hits'] == 2
+
+    def test_markup_validation(self):
+        assert OpenAIService._valid_markup('I can not do this', 'I can NOT... <break time="1s"/> do this')
+        assert not OpenAIService._valid_markup('I can not do this', 'Completely different words')
+        assert not OpenAIService._valid_markup('Hello', '')
+        assert not OpenAIService._valid_markup('Hello', None)
@@ -0,0 +1,34 @@
+"""Unit tests for the cross-process semaphore."""
+
+import pytest
+
+from utils.shared_lock import SharedSemaphore
+
+
+class TestFileSemaphore:
+    """Test the flock-backed slots; separate opens conflict even within one process."""
+
+    def test_holders_are_capped(self, tmp_path):
+        first = SharedSemaphore('slots', 2, lock_dir=str(tmp_path))
+        second = SharedSemaphore('slots', 2, lock_dir=str(tmp_path))
+
+        with first.hold(), second.hold():
+            with pytest.raises(TimeoutError):
+                with SharedSemaphore('slots', 2, lock_dir=str(tmp_path)).hold(timeout=0.1):
+                    pass
+
+    def test_slot_is_freed_on_exit(self, tmp_path):
+        semaphore = SharedSemaphore('lock', 1, lock_dir=str(tmp_path))
+        with semaphore.hold():
+            pass
+
+        with SharedSemaphore('lock', 1, lock_dir=str(tmp_path)).hold(timeout=0.1):
+            pass
+
+    def test_memory_backend(self):
+        semaphore = SharedSemaphore('local', 1, backend='memory')
+
+        with semaphore.hold():
+            with pytest.raises(TimeoutError):
+                with semaphore.hold(timeout=0.05):
+                    pass
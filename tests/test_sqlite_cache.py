@@ -0,0 +1,37 @@
+"""Unit tests for the shared SQLite store base class."""
+
+import threading
+
+from utils.sqlite_cache import SQLiteCache
+
+
+class Store(SQLiteCache):
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY, value TEXT)'
+    SAVED_STAT = 'bytes_saved'
+
+
+class TestSQLiteCache:
+    """Test schema setup, per-thread connections and the lookup counters."""
+
+    def test_schema_and_wal(self, tmp_path):
+        store = Store(str(tmp_path / 'store.sqlite3'))
+
+        assert store._connection().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        store._connection().execute('SELECT key, value FROM items').fetchall()
+
+    def test_connection_per_thread(self, tmp_path):
+        store = Store(str(tmp_path / 'store.sqlite3'))
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(store._connection()))
+        thread.start()
+        thread.join()
+
+        assert connections[0] is not store._connection()
+        assert store._connection() is store._connection()
+
+    def test_stats(self, tmp_path):
+        store = Store(str(tmp_path / 'store.sqlite3'))
+        store._count(True, 100)
+        store._count(False)
+
+        assert store.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'bytes_saved': 100}
@@ -0,0 +1,115 @@
+"""Tests for the persistent voiceover (TTS) cache."""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from services.tts_cache import TTSCache, estimate_mp3_duration, tts_cache_key
+
+SETTINGS = {'voice_id': 'el-voice', 'stability': 0.5, 'similarity_boost': 0.75, 'speed': 1.0,
+            'style_exaggeration': 0.0, 'use_speaker_boost': True}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TTSCache(str(tmp_path / 'tts.sqlite3'))
+
+
+class TestTTSCacheKey:
+    """Test what does and doesn't change the cache key."""
+
+    def test_whitespace_is_normalized(self):
+        assert tts_cache_key('Hello  world\n', model_id='m', **SETTINGS) == \
+            tts_cache_key(' Hello world', model_id='m', **SETTINGS)
+
+    def test_settings_and_model_change_key(self):
+        base = tts_cache_key('Hello', model_id='m', **SETTINGS)
+        assert tts_cache_key('Hello', model_id='other', **SETTINGS) != base
+        assert tts_cache_key('Hello', model_id='m', **{**SETTINGS, 'speed': 1.1}) != base
+        assert tts_cache_key('Hello', model_id='m', **{**SETTINGS, 'voice_id': 'v2'}) != base
+
+
+class TestTTSCache:
+    """Test lookups, persistence and stats."""
+
+    def test_hit_counts_characters_saved(self, cache):
+        cache.put('k', 'https://cdn/a.mp3', 2.5, 42)
+
+        assert cache.get('k') == {'url': 'https://cdn/a.mp3', 'duration': 2.5, 'characters': 42}
+        assert cache.get('missing') is None
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'characters_saved': 42}
+
+    def test_persists_across_instances(self, cache):
+        cache.put('k', 'https://cdn/a.mp3', 2.5, 42)
+
+        assert TTSCache(cache.path).get('k')['url'] == 'https://cdn/a.mp3'
+
+    def test_invalidate_recounts_hit_as_miss(self, cache):
+        cache.put('k', 'https://cdn/a.mp3', 2.5, 42)
+        cache.get('k')
+
+        assert cache.invalidate('k') is True
+        assert cache.invalidate('k') is False
+        assert cache.stats() == {'hits': 0, 'misses': 1, 'hit_rate': 0.0, 'characters_saved': 0}
+        assert cache.get('k') is None
+
+    def test_mp3_duration_estimate(self):
+        assert estimate_mp3_duration(16000) == 1.0
+
+
+class TestGenerateVoiceoverCache:
+    """Test /api/v2/generate-voiceover with the cache."""
+
+    @pytest.fixture
+    def client(self):
+        return create_app('testing').test_client()
+
+    @pytest.fixture
+    def mock_airtable(self):
+        airtable = MagicMock()
+        airtable.get_segment.return_value = {'id': 'recSeg', 'fields': {'SRT Text': 'Hello there', 'Voices': ['recVoice']}}
+        airtable.get_voice.return_value = {'id': 'recVoice', 'fields': {'Voice ID': 'el-voice'}}
+        with patch('api.routes_v2.airtable', airtable):
+            yield airtable
+
+    def test_second_request_skips_elevenlabs(self, client, mock_airtable, cache):
+        """An unchanged segment is served from the cache without synthesis or upload."""
+        elevenlabs = MagicMock(model_id='eleven_multilingual_v2')
+        elevenlabs.generate_voice_sync.return_value = {'audio_data': b'x' * 32000}
+        nca = MagicMock()
+        nca.upload_file.return_value = {'url': 'https://cdn/voiceover.mp3'}
+
+        with patch('api.routes_v2.get_tts_cache', return_value=cache), \
+                patch('api.routes_v2.config.ELEVENLABS_STREAMING', False), \
+                patch('api.routes_v2.ElevenLabsService', return_value=elevenlabs), \
+                patch('api.routes_v2.NCAService', return_value=nca):
+            first = client.post('/api/v2/generate-voiceover', json={'record_id': 'recSeg'}).get_json()
+            second = client.post('/api/v2/generate-voiceover', json={'record_id': 'recSeg'}).get_json()
+
+        assert first['cached'] is False
+        assert second['cached'] is True
+        assert second['voiceover_url'] == 'https://cdn/voiceover.mp3'
+        assert second['duration'] == 2.0
+        assert elevenlabs.generate_voice_sync.call_count == 1
+        assert nca.upload_file.call_count == 1
+        assert cache.stats()['characters_saved'] == len('Hello there')
+
+    def test_deleted_file_is_synthesized_again(self, client, mock_airtable, cache):
+        """A hit whose stored file is gone is dropped and the text voiced again."""
+        elevenlabs = MagicMock(model_id='eleven_multilingual_v2')
+        elevenlabs.generate_voice_sync.return_value = {'audio_data': b'x' * 32000}
+        nca = MagicMock()
+        nca.upload_file.return_value = {'url': 'https://cdn/voiceover.mp3'}
+        nca.stored_file_exists.return_value = False
+
+        with patch('api.routes_v2.get_tts_cache', return_value=cache), \
+                patch('api.routes_v2.config.ELEVENLABS_STREAMING', False), \
+                patch('api.routes_v2.ElevenLabsService', return_value=elevenlabs), \
+                patch('api.routes_v2.NCAService', return_value=nca):
+            client.post('/api/v2/generate-voiceover', json={'record_id': 'recSeg'})
+            second = client.post('/api/v2/generate-voiceover', json={'record_id': 'recSeg'}).get_json()
+
+        assert second['cached'] is False
+        nca.stored_file_exists.assert_called_once_with('https://cdn/voiceover.mp3')
+        assert elevenlabs.generate_voice_sync.call_count == 2
+        assert cache.stats()['hits'] == 0
@@ -0,0 +1,95 @@
+"""Unit tests for the Zoom video style payload builder."""
+
+import pytest
+
+from services.encoding_profiles import ENCODING_PROFILES, get_encoding_profile
+from services.zoom_renderer import ZOOM_MODE_FAST, ZOOM_MODE_SMOOTH, build_zoom_payload, resolve_zoom_mode
+
+
+class TestZoomPayload:
+    """Test the smooth and fast zoom renderers."""
+
+    def test_smooth_final_matches_original_filter(self):
+        """smooth + final reproduces the renderer used before modes and profiles existed."""
+        payload = build_zoom_payload('https://example.com/img.jpg', 10.0, ZOOM_MODE_SMOOTH,
+                                     get_encoding_profile('final'))
+
+        assert payload['filters'] == [{'filter': (
+            "scale=5760:-1,zoompan=z='min(zoom+0.000250,1.15)':"
+            "x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':d=600:s=1920x1080:fps=60"
+        )}]
+        assert {'option': '-loop', 'argument': '1'} in payload['inputs'][0]['options']
+        assert {'option': '-preset', 'argument': 'slow'} in payload['outputs'][0]['options']
+
+    def test_fast_mode_scales_once_at_intermediate_size(self):
+        payload = build_zoom_payload('https://example.com/img.jpg', 10.0, ZOOM_MODE_FAST,
+                                     get_encoding_profile('standard'))
+        zoom_filter = payload['filters'][0]['filter']
+
+        assert zoom_filter.startswith('scale=3840:2160:force_original_aspect_ratio=increase')
+        assert 'd=300:' in zoom_filter and 'fps=30' in zoom_filter
+        assert {'option': '-preset', 'argument': 'veryfast'} in payload['outputs'][0]['options']
+        # Single decoded frame: no looped input
+        assert payload['inputs'][0]['options'] == []
+        assert {'option': '-t', 'argument': '10.0'} in payload['outputs'][0]['options']
+
+    def test_fast_mode_caps_final_profile(self):
+        """Under the 60 fps / preset slow final profile, fast mode still renders at 30 fps, veryfast."""
+        payload = build_zoom_payload('https://example.com/img.jpg', 10.0, ZOOM_MODE_FAST,
+                                     get_encoding_profile('final'))
+
+        assert 'd=300:s=1920x1080:fps=30' in payload['filters'][0]['filter']
+        assert {'option': '-preset', 'argument': 'veryfast'} in payload['outputs'][0]['options']
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            build_zoom_payload('https://example.com/img.jpg', 5.0, 'turbo')
+
+    def test_draft_profile_renders_smaller_and_faster(self):
+        payload = build_zoom_payload('https://example.com/img.jpg', 10.0, ZOOM_MODE_FAST,
+                                     get_encoding_profile('draft'))
+
+        assert 's=1280x720:fps=24' in payload['filters'][0]['filter']
+        assert {'option': '-preset', 'argument': 'ultrafast'} in payload['outputs'][0]['options']
+
+    @pytest.mark.parametrize('requested,fields,default,expected', [
+        ('fast', {'Zoom Mode': 'Smooth'}, 'smooth', 'fast'),
+        (None, {'Zoom Mode': 'Fast'}, 'smooth', 'fast'),
+        (None, {}, 'fast', 'fast'),
+        (None, {'Zoom Mode': 'bogus'}, 'smooth', 'smooth'),
+    ])
+    def test_resolve_mode(self, requested, fields, default, expected):
+        assert resolve_zoom_mode(requested, fields, default) == expected
+
+
+class TestEncodingProfiles:
+    """Test profile lookup and the options each profile emits."""
+
+    def test_default_comes_from_config(self):
+        """The default keeps the settings used before profiles existed."""
+        assert get_encoding_profile().name == 'final'
+
+    def test_unknown_profile_rejected(self):
+        with pytest.raises(ValueError):
+            get_encoding_profile('ultra')
+
+    def test_only_final_uses_slow_preset(self):
+        slow = [name for name, profile in ENCODING_PROFILES.items() if profile.preset == 'slow']
+        assert slow == ['final']
+
+    def test_music_mix_uses_profile_audio_bitrate(self):
+        from unittest.mock import MagicMock
+        from services.nca_service import NCAService
+
+        nca = NCAService()
+        nca.media_backend = None
+        nca.session = MagicMock()
+        nca.add_background_music('https://example.com/v.mp4', 'https://example.com/m.mp3', 'out.mp4',
+                                 encoding_profile='draft')
+
+        options = nca.session.post.call_args.kwargs['json']['outputs'][0]['options']
+        assert {'option': '-c:v', 'argument': 'copy'} in options
+        assert {'option': '-b:a', 'argument': '96k'} in options
+
+    def test_final_profile_keeps_encoder_default_audio_bitrate(self):
+        assert get_encoding_profile('final').audio_options() == [{'option': '-c:a', 'argument': 'aac'}]
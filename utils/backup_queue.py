@@ -0,0 +1,384 @@
+"""Durable background queue for remote backups.
+
+Files are spooled to disk and delivered to the remote backup receiver by
+worker threads, so a slow or offline receiver never delays an upload request.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+import requests
+
+from utils.remote_backup import send_to_remote_backup
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class BackupQueue:
+    """On-disk spool of pending remote backups with retrying worker threads.
+
+    Each entry is a pair of files in spool_dir: ``<id>.data`` with the bytes
+    and ``<id>.json`` with the delivery metadata. A worker claims an entry by
+    renaming its metadata to ``<id>.inflight``; the rename is atomic, so
+    several processes can share one spool. Entries survive restarts, and
+    claims left behind by a dead process are released after stale_seconds.
+    """
+
+    def __init__(self, spool_dir: str, workers: int = 2, batch_size: int = 10,
+                 max_bytes: int = 2 * 1024 ** 3, max_attempts: int = 20,
+                 backoff_seconds: float = 5.0, max_backoff_seconds: float = 900.0,
+                 poll_interval: float = 5.0, stale_seconds: float = 600.0,
+                 sender: Optional[Callable[..., Optional[Dict]]] = None):
+        """
+        Initialize the queue (workers are started by start()).
+
+        Args:
+            spool_dir: Directory holding queued entries (created if missing)
+            workers: Number of delivery threads
+            batch_size: Entries a worker claims per pass and sends over one connection
+            max_bytes: Disk budget; the oldest entries are dropped to stay under it
+            max_attempts: Deliveries tried before an entry is given up
+            backoff_seconds: First retry delay, doubled on each failure
+            max_backoff_seconds: Upper bound on the retry delay
+            poll_interval: Seconds an idle worker sleeps between scans
+            stale_seconds: Age after which an in-flight claim is assumed dead
+            sender: Delivery function, defaults to send_to_remote_backup
+        """
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.sender = sender or send_to_remote_backup
+
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._disk_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.delivered = 0
+        self.retries = 0
+        self.dropped = 0
+        self.last_delivery_lag = None
+
+        os.makedirs(spool_dir, exist_ok=True)
+
+    # Paths
+
+    def _data_path(self, entry_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{entry_id}.data")
+
+    def _meta_path(self, entry_id: str, suffix: str = '.json') -> str:
+        return os.path.join(self.spool_dir, f"{entry_id}{suffix}")
+
+    def _entry_ids(self, suffix: str = '.json') -> List[str]:
+        """IDs of entries in a given state, oldest first (IDs sort by enqueue time)."""
+        paths = glob.glob(os.path.join(self.spool_dir, f"*{suffix}"))
+        return sorted(os.path.basename(path)[:-len(suffix)] for path in paths)
+
+    @staticmethod
+    def _write_json(path: str, data: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _remove(self, entry_id: str, suffix: str):
+        for path in (self._meta_path(entry_id, suffix), self._data_path(entry_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # Producer side
+
+    def enqueue(self, source: Union[bytes, str, BinaryIO], filename: str, file_type: str = 'unknown',
+                original_path: Optional[str] = None) -> Optional[str]:
+        """Spool a file for delivery and return its entry ID.
+
+        Args:
+            source: File bytes, a path to an existing file (hard-linked when
+                possible, otherwise copied) or an open binary file
+            filename: Name to store the backup under
+            file_type: Type of file (voiceovers, videos, music, images)
+            original_path: Original S3 key for reference
+
+        Returns:
+            Entry ID, or None if the file is larger than the whole disk budget
+        """
+        entry_id = self._new_entry_id()
+        data_path = self._data_path(entry_id)
+
+        if isinstance(source, (bytes, bytearray)):
+            with open(data_path, 'wb') as f:
+                f.write(source)
+        elif isinstance(source, str):
+            try:
+                os.link(source, data_path)
+            except OSError:
+                shutil.copyfile(source, data_path)
+        else:
+            with open(data_path, 'wb') as f:
+                shutil.copyfileobj(source, f)
+
+        return self.commit(entry_id, filename, file_type, original_path)
+
+    def open_spool(self) -> Tuple[str, BinaryIO]:
+        """Start an entry whose bytes are written while they stream elsewhere.
+
+        Lets an upload tee its body into the spool instead of buffering it or
+        writing a second copy first. Workers ignore the entry until commit();
+        call discard() if the stream fails.
+
+        Returns:
+            (entry ID, data file open for binary writing)
+        """
+        entry_id = self._new_entry_id()
+        return entry_id, open(self._data_path(entry_id), 'wb')
+
+    def commit(self, entry_id: str, filename: str, file_type: str = 'unknown',
+               original_path: Optional[str] = None) -> Optional[str]:
+        """Queue an entry whose data file is complete; returns its ID, or None if it was dropped."""
+        size = os.path.getsize(self._data_path(entry_id))
+        if size > self.max_bytes:
+            os.remove(self._data_path(entry_id))
+            logger.error(f"Backup of {filename} ({size} bytes) exceeds the backup queue budget; not queued")
+            with self._stats_lock:
+                self.dropped += 1
+            return None
+
+        with self._disk_lock:
+            self._make_room(size, exclude=entry_id)
+            self._write_json(self._meta_path(entry_id), {
+                'filename': filename,
+                'file_type': file_type,
+                'original_path': original_path,
+                'size': size,
+                'enqueued_at': time.time(),
+                'attempts': 0,
+                'next_attempt_at': 0
+            })
+
+        with self._stats_lock:
+            self.enqueued += 1
+        self._wakeup.set()
+        return entry_id
+
+    def discard(self, entry_id: str):
+        """Drop an uncommitted entry."""
+        self._remove(entry_id, '.json')
+
+    @staticmethod
+    def _new_entry_id() -> str:
+        return f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+    def _spool_bytes(self) -> int:
+        total = 0
+        for path in glob.glob(os.path.join(self.spool_dir, '*.data')):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _make_room(self, incoming: int, exclude: str):
+        """Drop the oldest queued entries until incoming fits in the disk budget."""
+        used = self._spool_bytes()
+        for entry_id in self._entry_ids():
+            if used <= self.max_bytes:
+                break
+            if entry_id == exclude:
+                continue
+            try:
+                size = os.path.getsize(self._data_path(entry_id))
+            except FileNotFoundError:
+                size = 0
+            self._remove(entry_id, '.json')
+            used -= size
+            logger.warning(f"Backup queue over budget; dropped oldest entry {entry_id}")
+            with self._stats_lock:
+                self.dropped += 1
+
+    # Worker side
+
+    def start(self):
+        """Release stale claims and start the worker threads."""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._release_stale_claims()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"backup-queue-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers; undelivered entries stay on disk for the next start."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _release_stale_claims(self):
+        now = time.time()
+        for entry_id in self._entry_ids('.inflight'):
+            path = self._meta_path(entry_id, '.inflight')
+            try:
+                if now - os.path.getmtime(path) > self.stale_seconds:
+                    os.replace(path, self._meta_path(entry_id))
+            except FileNotFoundError:
+                pass
+
+    def _claim_batch(self) -> List[Dict]:
+        """Claim up to batch_size entries that are due for delivery."""
+        now = time.time()
+        batch = []
+        for entry_id in self._entry_ids():
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                with open(self._meta_path(entry_id)) as f:
+                    meta = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            if meta.get('next_attempt_at', 0) > now:
+                continue
+            inflight_path = self._meta_path(entry_id, '.inflight')
+            try:
+                os.rename(self._meta_path(entry_id), inflight_path)
+            except FileNotFoundError:
+                continue  # Claimed by another worker
+            os.utime(inflight_path)
+            meta['id'] = entry_id
+            batch.append(meta)
+        return batch
+
+    def _run(self):
+        session = requests.Session()
+        while not self._stop.is_set():
+            try:
+                batch = self._claim_batch()
+            except Exception as e:
+                logger.error(f"Backup queue scan failed: {e}")
+                batch = []
+
+            if not batch:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                if not self._stop.is_set():
+                    self._release_stale_claims()
+                continue
+
+            for meta in batch:
+                self._deliver(meta, session)
+
+    def process_once(self) -> int:
+        """Deliver one batch in the calling thread (for scripts and tests).
+
+        Returns:
+            Number of entries attempted
+        """
+        batch = self._claim_batch()
+        with requests.Session() as session:
+            for meta in batch:
+                self._deliver(meta, session)
+        return len(batch)
+
+    def _deliver(self, meta: Dict, session: requests.Session):
+        entry_id = meta.pop('id')
+        try:
+            with open(self._data_path(entry_id), 'rb') as f:
+                result = self.sender(
+                    file_data=f,
+                    filename=meta['filename'],
+                    file_type=meta['file_type'],
+                    original_path=meta.get('original_path'),
+                    session=session
+                )
+        except FileNotFoundError:
+            self._remove(entry_id, '.inflight')
+            return
+        except Exception as e:
+            logger.error(f"Backup delivery of {meta['filename']} raised: {e}")
+            result = None
+
+        if result is not None:
+            self._remove(entry_id, '.inflight')
+            with self._stats_lock:
+                self.delivered += 1
+                self.last_delivery_lag = time.time() - meta['enqueued_at']
+            return
+
+        meta['attempts'] += 1
+        if meta['attempts'] >= self.max_attempts:
+            self._remove(entry_id, '.inflight')
+            logger.error(f"Giving up on backup of {meta['filename']} after {meta['attempts']} attempts")
+            with self._stats_lock:
+                self.dropped += 1
+            return
+
+        delay = min(self.backoff_seconds * (2 ** (meta['attempts'] - 1)), self.max_backoff_seconds)
+        meta['next_attempt_at'] = time.time() + delay
+        self._write_json(self._meta_path(entry_id, '.inflight'), meta)
+        os.replace(self._meta_path(entry_id, '.inflight'), self._meta_path(entry_id))
+        with self._stats_lock:
+            self.retries += 1
+
+    def stats(self) -> Dict:
+        """Return queue depth, lag and delivery counters for metrics reporting."""
+        pending = self._entry_ids()
+        inflight = self._entry_ids('.inflight')
+        oldest = min(pending + inflight) if pending or inflight else None
+        lag = time.time() - int(oldest.split('-')[0]) / 1e9 if oldest else 0.0
+        with self._stats_lock:
+            return {
+                'depth': len(pending) + len(inflight),
+                'in_flight': len(inflight),
+                'bytes': self._spool_bytes(),
+                'max_bytes': self.max_bytes,
+                'oldest_entry_age_seconds': round(lag, 1),
+                'last_delivery_lag_seconds': round(self.last_delivery_lag, 1) if self.last_delivery_lag is not None else None,
+                'enqueued': self.enqueued,
+                'delivered': self.delivered,
+                'retries': self.retries,
+                'dropped': self.dropped
+            }
+
+
+def get_backup_queue(config) -> BackupQueue:
+    """Return the process-wide backup queue, starting its workers on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = BackupQueue(
+                    spool_dir=config.BACKUP_QUEUE_DIR,
+                    workers=config.BACKUP_QUEUE_WORKERS,
+                    batch_size=config.BACKUP_QUEUE_BATCH_SIZE,
+                    max_bytes=config.BACKUP_QUEUE_MAX_MB * 1024 * 1024,
+                    max_attempts=config.BACKUP_QUEUE_MAX_ATTEMPTS,
+                    backoff_seconds=config.BACKUP_QUEUE_BACKOFF_SECONDS,
+                    max_backoff_seconds=config.BACKUP_QUEUE_MAX_BACKOFF_SECONDS
+                )
+                atexit.register(_queue.stop)
+    # Threads don't survive a fork, so (re)start them in whichever process uses the queue
+    _queue.start()
+    return _queue
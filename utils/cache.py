@@ -0,0 +1,122 @@
+"""In-process caching utilities for YouTube Video Engine."""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache with per-entry time-to-live.
+
+    Entries expire ``ttl_seconds`` after they were stored. When the cache is full,
+    the least recently used entry is evicted. Values are deep-copied on the way in
+    and out so callers can't mutate cached records.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_size: int = 256,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds: How long an entry stays valid after it is stored
+            max_size: Maximum number of entries before LRU eviction
+            clock: Monotonic time source (overridable for tests)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting the least recently used entry if full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader on a miss.
+
+        None results from the loader are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None,
+                   predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop entries from the cache.
+
+        Args:
+            key: Drop a single key
+            predicate: Drop every key for which predicate(key) is true
+
+        With neither argument, the whole cache is cleared.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            if key is not None:
+                return 1 if self._entries.pop(key, None) is not None else 0
+
+            if predicate is not None:
+                doomed = [k for k in self._entries if predicate(k)]
+            else:
+                doomed = list(self._entries)
+
+            for k in doomed:
+                del self._entries[k]
+            return len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters for metrics reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
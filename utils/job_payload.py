@@ -0,0 +1,98 @@
+"""Encoding and parsing of the Jobs table 'Request Payload' field."""
+
+import ast
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Current encoding: {"v": JOB_PAYLOAD_VERSION, "data": {...}}
+JOB_PAYLOAD_VERSION = 1
+
+# Versions reported for rows written before the versioned encoding existed
+VERSION_LEGACY_REPR = -1   # str(dict), needs ast.literal_eval
+VERSION_PLAIN_JSON = 0     # bare JSON object
+
+
+@dataclass(frozen=True)
+class JobPayload:
+    """Parsed job request payload.
+
+    Instances are cached and shared between callers, so treat them as
+    read-only; use as_dict() for a mutable copy.
+    """
+    data: Dict[str, Any] = field(default_factory=dict)
+    version: int = JOB_PAYLOAD_VERSION
+
+    @property
+    def is_legacy(self) -> bool:
+        """True if the row predates the versioned JSON encoding."""
+        return self.version < JOB_PAYLOAD_VERSION
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.data)
+
+    @property
+    def video_id(self) -> Optional[str]:
+        return self.data.get('video_id')
+
+    @property
+    def segment_id(self) -> Optional[str]:
+        return self.data.get('segment_id')
+
+    @property
+    def record_id(self) -> Optional[str]:
+        return self.data.get('record_id')
+
+    @property
+    def operation(self) -> Optional[str]:
+        return self.data.get('operation')
+
+
+EMPTY_PAYLOAD = JobPayload()
+
+
+def encode_job_payload(data: Optional[Dict[str, Any]]) -> str:
+    """Encode a request payload for the 'Request Payload' field."""
+    return json.dumps({'v': JOB_PAYLOAD_VERSION, 'data': data or {}}, default=str)
+
+
+@lru_cache(maxsize=2048)
+def parse_job_payload(raw: Optional[str]) -> JobPayload:
+    """Parse a 'Request Payload' value, accepting every encoding used so far.
+
+    Results are cached by the raw string, so each job's payload is only parsed
+    once per process no matter how many handlers read it.
+
+    Raises:
+        ValueError: If the value isn't a recognisable payload
+    """
+    if not raw or not raw.strip() or raw.strip() == '{}':
+        return EMPTY_PAYLOAD
+
+    try:
+        decoded = json.loads(raw)
+        version = VERSION_PLAIN_JSON
+    except ValueError:
+        # Legacy rows were written with str(dict)
+        try:
+            decoded = ast.literal_eval(raw)
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(f"Unparseable job payload: {raw[:100]}") from e
+        version = VERSION_LEGACY_REPR
+
+    if not isinstance(decoded, dict):
+        raise ValueError(f"Job payload is not an object: {raw[:100]}")
+
+    if version == VERSION_PLAIN_JSON and isinstance(decoded.get('v'), int) and isinstance(decoded.get('data'), dict):
+        return JobPayload(data=decoded['data'], version=decoded['v'])
+
+    return JobPayload(data=decoded, version=version)
+
+
+def job_payload_from_fields(fields: Dict[str, Any]) -> JobPayload:
+    """Return the parsed 'Request Payload' of a job record's fields."""
+    return parse_job_payload(fields.get('Request Payload'))
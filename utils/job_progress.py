@@ -0,0 +1,40 @@
+"""Aggregate progress of batch and fan-out jobs from their items' statuses."""
+
+from typing import Any, Dict, Iterable, Optional
+
+from config import get_config
+
+# Item statuses that count as failed ('webhook_error' is written by the webhook handlers)
+FAILED_STATUSES = ('failed', 'webhook_error')
+
+
+def summarize_progress(statuses: Iterable[Optional[str]]) -> Dict[str, Any]:
+    """Count items by outcome and derive the job's overall status.
+
+    The job is processing while any item is neither completed nor failed, then
+    completed, or failed if any item failed.
+
+    Returns:
+        Dict with total, completed, failed, in_progress, percent_complete and status
+    """
+    config = get_config()
+    counts = {'completed': 0, 'failed': 0, 'in_progress': 0}
+    for status in statuses:
+        if status == config.STATUS_COMPLETED:
+            counts['completed'] += 1
+        elif status in FAILED_STATUSES:
+            counts['failed'] += 1
+        else:
+            counts['in_progress'] += 1
+
+    total = sum(counts.values())
+    if total and counts['in_progress'] == 0:
+        status = config.STATUS_FAILED if counts['failed'] else config.STATUS_COMPLETED
+    else:
+        status = config.STATUS_PROCESSING
+    return {
+        'total': total,
+        **counts,
+        'percent_complete': round(100.0 * (counts['completed'] + counts['failed']) / total, 1) if total else 0.0,
+        'status': status
+    }
@@ -61,6 +61,9 @@ class MetricsCollector:
         # Error tracking
         self.error_details = deque(maxlen=1000)
         
+        # External stats providers (caches, queues) included in the summary
+        self.providers = {}
+        
         # Performance alerts
         self.alert_thresholds = {
             'response_time_p95': 10.0,  # seconds
@@ -209,6 +212,27 @@ class MetricsCollector:
             if self.hourly_metrics:
                 self.hourly_metrics[-1]['errors'].append(error_record)
     
+    def register_provider(self, name: str, provider):
+        """Register a callable whose stats are reported in the metrics summary.
+        
+        Args:
+            name: Key under which the provider's stats appear in the summary
+            provider: Zero-argument callable returning a JSON-serializable dict
+        """
+        with self.lock:
+            self.providers[name] = provider
+    
+    def _collect_provider_stats(self) -> Dict[str, Any]:
+        """Collect stats from registered providers, isolating their failures."""
+        stats = {}
+        for name, provider in self.providers.items():
+            try:
+                stats[name] = provider()
+            except Exception as e:
+                logger.warning(f"Metrics provider '{name}' failed: {e}")
+                stats[name] = {'error': str(e)}
+        return stats
+    
     def get_metrics_summary(self) -> Dict[str, Any]:
         """Get comprehensive metrics summary.
         
@@ -274,6 +298,7 @@ class MetricsCollector:
                 'health_indicators': self._get_health_indicators(),
                 'alerts': self._check_alerts()
             }
+            summary.update(self._collect_provider_stats())
             
             return summary
     
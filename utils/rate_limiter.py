@@ -0,0 +1,342 @@
+"""Cross-process token bucket rate limiting for outbound API calls."""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+
+_priority = threading.local()
+
+
+def current_priority() -> str:
+    """Return the rate limit priority of the calling thread."""
+    return getattr(_priority, 'value', PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def rate_limit_priority(priority: str):
+    """Run the block with the given rate limit priority on this thread.
+
+    Request handlers run as interactive by default; background jobs such as the
+    job monitor should wrap their work in ``rate_limit_priority(PRIORITY_BACKGROUND)``
+    so they back off first when the shared budget runs low.
+    """
+    previous = current_priority()
+    _priority.value = priority
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+
+def _take_token(state: Dict[str, float], now: float, rate: float, capacity: float,
+                reserve: float) -> Tuple[Dict[str, float], float]:
+    """Refill the bucket and try to take one token.
+
+    Args:
+        state: Bucket state with 'tokens', 'ts' and 'blocked_until'
+        now: Current wall-clock time
+        rate: Tokens added per second
+        capacity: Maximum tokens in the bucket
+        reserve: Tokens that must remain after taking one
+
+    Returns:
+        Tuple of (new state, seconds to wait). A wait of 0 means a token was taken.
+    """
+    blocked_until = state.get('blocked_until', 0.0)
+    if now < blocked_until:
+        return state, blocked_until - now
+
+    tokens = state.get('tokens', capacity)
+    last = state.get('ts', now)
+    tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+
+    if tokens - 1 >= reserve:
+        return {'tokens': tokens - 1, 'ts': now, 'blocked_until': blocked_until}, 0.0
+
+    wait = (1 + reserve - tokens) / rate
+    return {'tokens': tokens, 'ts': now, 'blocked_until': blocked_until}, wait
+
+
+class TokenBucket(ABC):
+    """Token bucket with a background reserve and a shared 429 pause.
+
+    Interactive callers may drain the bucket completely. Background callers only
+    get a token while more than ``background_reserve`` tokens are left, so polling
+    backs off first when the budget is tight. Subclasses store the bucket state
+    somewhere all worker processes can see it.
+    """
+
+    backend = 'base'
+
+    def __init__(self, rate: float, capacity: float, background_reserve: float = 0.0,
+                 max_wait: float = 60.0):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second (sustained requests per second)
+            capacity: Bucket size (maximum burst)
+            background_reserve: Tokens kept back from background callers
+            max_wait: Longest acquire() will block before proceeding anyway
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.background_reserve = float(background_reserve)
+        self.max_wait = max_wait
+        self._stats_lock = threading.Lock()
+
+        # Per-process counters
+        self.acquired = 0
+        self.waited_seconds = 0.0
+        self.timeouts = 0
+        self.pauses = 0
+
+    @abstractmethod
+    def _try_take(self, reserve: float) -> float:
+        """Try to take a token. Returns 0 on success, else seconds to wait."""
+
+    @abstractmethod
+    def _extend_pause(self, until: float):
+        """Block all callers until the given wall-clock time."""
+
+    def acquire(self, priority: Optional[str] = None) -> float:
+        """Block until a token is available.
+
+        Args:
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND (defaults to the
+                      calling thread's priority)
+
+        Returns:
+            Seconds spent waiting
+        """
+        priority = priority or current_priority()
+        reserve = self.background_reserve if priority == PRIORITY_BACKGROUND else 0.0
+        started = time.monotonic()
+
+        while True:
+            wait = self._try_take(reserve)
+            waited = time.monotonic() - started
+            if wait <= 0:
+                break
+            if waited + wait > self.max_wait:
+                logger.warning(f"Rate limiter wait exceeded {self.max_wait}s ({priority}); proceeding without a token")
+                with self._stats_lock:
+                    self.timeouts += 1
+                break
+            time.sleep(wait)
+
+        with self._stats_lock:
+            self.acquired += 1
+            self.waited_seconds += waited
+        return waited
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens to every process for the given number of seconds."""
+        self._extend_pause(time.time() + seconds)
+        with self._stats_lock:
+            self.pauses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limiter counters for metrics reporting."""
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'rate_per_second': self.rate,
+                'capacity': self.capacity,
+                'background_reserve': self.background_reserve,
+                'acquired': self.acquired,
+                'waited_seconds': round(self.waited_seconds, 3),
+                'timeouts': self.timeouts,
+                'pauses': self.pauses
+            }
+
+
+class LocalTokenBucket(TokenBucket):
+    """Token bucket held in process memory (single worker or tests)."""
+
+    backend = 'memory'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._state: Dict[str, float] = {}
+
+    def _try_take(self, reserve: float) -> float:
+        with self._lock:
+            self._state, wait = _take_token(self._state, time.time(), self.rate, self.capacity, reserve)
+            return wait
+
+    def _extend_pause(self, until: float):
+        with self._lock:
+            self._state['blocked_until'] = max(self._state.get('blocked_until', 0.0), until)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket stored in a small file guarded by flock.
+
+    Shared by every process on the host. Put the file on a tmpfs such as
+    /dev/shm (where gunicorn already keeps its worker heartbeat files).
+    """
+
+    backend = 'file'
+
+    def __init__(self, path: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self):
+        """Yield the bucket state under an exclusive lock and write back changes."""
+        with self._thread_lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.read(fd, 4096)
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                holder = {'state': state}
+                yield holder
+                data = json.dumps(holder['state']).encode()
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def _try_take(self, reserve: float) -> float:
+        with self._locked_state() as holder:
+            holder['state'], wait = _take_token(holder['state'], time.time(), self.rate, self.capacity, reserve)
+            return wait
+
+    def _extend_pause(self, until: float):
+        with self._locked_state() as holder:
+            holder['state']['blocked_until'] = max(holder['state'].get('blocked_until', 0.0), until)
+
+
+# Same algorithm as _take_token, run atomically inside Redis. Numbers are returned
+# as strings because Redis truncates Lua numbers to integers.
+_REDIS_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local blocked_until = tonumber(data[3]) or 0
+if now < blocked_until then
+  return tostring(blocked_until - now)
+end
+local tokens = tonumber(data[1]) or capacity
+local last = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens - 1 >= reserve then
+  tokens = tokens - 1
+else
+  wait = (1 + reserve - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+_REDIS_PAUSE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+local until_ts = tonumber(ARGV[1])
+if until_ts > current then
+  redis.call('HSET', KEYS[1], 'blocked_until', tostring(until_ts))
+end
+redis.call('EXPIRE', KEYS[1], 3600)
+return 1
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket stored in Redis, shared by every process and host.
+
+    If Redis is unreachable the bucket degrades to a per-process LocalTokenBucket
+    rather than blocking Airtable access.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, redis_url: str, key: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import redis
+        self._redis_errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(redis_url, socket_timeout=1.0)
+        self._take_script = self._client.register_script(_REDIS_TAKE_SCRIPT)
+        self._pause_script = self._client.register_script(_REDIS_PAUSE_SCRIPT)
+        self.key = key
+        self._fallback = LocalTokenBucket(*args, **kwargs)
+
+    def _try_take(self, reserve: float) -> float:
+        try:
+            wait = self._take_script(keys=[self.key],
+                                     args=[self.rate, self.capacity, reserve, time.time()])
+            return float(wait)
+        except self._redis_errors as e:
+            logger.warning(f"Redis rate limiter unavailable, using local bucket: {e}")
+            return self._fallback._try_take(reserve)
+
+    def _extend_pause(self, until: float):
+        try:
+            self._pause_script(keys=[self.key], args=[until])
+        except self._redis_errors as e:
+            logger.warning(f"Redis rate limiter unavailable, pausing local bucket: {e}")
+            self._fallback._extend_pause(until)
+
+
+def parse_retry_after(value: Optional[str], default: float) -> float:
+    """Parse a Retry-After header given in seconds, falling back to default."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return default
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a token before every request and honors 429s.
+
+    On a 429 the shared bucket is paused for the Retry-After period (or
+    ``throttle_pause`` seconds when the header is missing), so every worker
+    backs off together, then the request is retried.
+    """
+
+    def __init__(self, bucket: TokenBucket, throttle_pause: float = 30.0,
+                 max_throttle_retries: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.throttle_pause = throttle_pause
+        self.max_throttle_retries = max_throttle_retries
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            response = super().send(request, **kwargs)
+            if response.status_code != 429 or attempt >= self.max_throttle_retries:
+                return response
+
+            attempt += 1
+            pause = parse_retry_after(response.headers.get('Retry-After'), self.throttle_pause)
+            logger.warning(f"Rate limited by {request.url.split('?')[0]} (attempt {attempt}); pausing {pause}s")
+            self.bucket.pause(pause)
+            response.close()
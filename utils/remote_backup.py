@@ -4,22 +4,29 @@ Utility for sending files to a remote backup location (e.g., local machine).
 
 import requests
 import logging
-from typing import Optional, Dict
+from typing import BinaryIO, Optional, Dict, Union
 import os
 
 logger = logging.getLogger(__name__)
 
 
-def send_to_remote_backup(file_data: bytes, filename: str, file_type: str = 'unknown',
-                         original_path: Optional[str] = None) -> Optional[Dict]:
+def remote_backup_configured() -> bool:
+    """Return True if a remote backup receiver and upload secret are set."""
+    return bool(os.getenv('LOCAL_RECEIVER_URL') and os.getenv('LOCAL_UPLOAD_SECRET'))
+
+
+def send_to_remote_backup(file_data: Union[bytes, BinaryIO], filename: str, file_type: str = 'unknown',
+                         original_path: Optional[str] = None,
+                         session: Optional[requests.Session] = None) -> Optional[Dict]:
     """
     Send a file to a remote backup location.
     
     Args:
-        file_data: The file content as bytes
+        file_data: The file content as bytes or an open binary file
         filename: The filename to save as
         file_type: Type of file (voiceovers, videos, music, images)
         original_path: Original S3 path for reference
+        session: Optional session to reuse a keep-alive connection across sends
         
     Returns:
         Response data from remote server or None if failed/not configured
@@ -52,7 +59,7 @@ def send_to_remote_backup(file_data: bytes, filename: str, file_type: str = 'unk
         }
         
         # Send to remote receiver
-        response = requests.post(
+        response = (session or requests).post(
             f"{receiver_url}/upload",
             files=files,
             data=data,
@@ -0,0 +1,226 @@
+"""Shared S3 (DigitalOcean Spaces) client and streaming upload helpers."""
+
+import hashlib
+import io
+import logging
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from utils.sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+SPACES_ENDPOINT_URL = 'https://nyc3.digitaloceanspaces.com'
+
+# Anything upload helpers accept as a body
+UploadSource = Union[bytes, bytearray, BinaryIO, Iterable[bytes]]
+
+_client = None
+_transfer_config = None
+_upload_index = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client(config):
+    """Return the process-wide S3 client, creating it on first use.
+
+    boto3 clients are thread-safe, so one client (and its connection pool) is
+    shared by every request thread and upload worker in the process.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.client import Config
+
+                _client = boto3.client(
+                    's3',
+                    endpoint_url=SPACES_ENDPOINT_URL,
+                    aws_access_key_id=config.NCA_S3_ACCESS_KEY,
+                    aws_secret_access_key=config.NCA_S3_SECRET_KEY,
+                    config=Config(
+                        signature_version='s3v4',
+                        max_pool_connections=config.S3_MAX_POOL_CONNECTIONS,
+                        retries={'max_attempts': 5, 'mode': 'standard'},
+                        tcp_keepalive=True
+                    ),
+                    region_name=config.NCA_S3_REGION
+                )
+    return _client
+
+
+def get_transfer_config(config):
+    """Return the multipart transfer settings shared by all uploads."""
+    global _transfer_config
+    if _transfer_config is None:
+        from boto3.s3.transfer import TransferConfig
+
+        _transfer_config = TransferConfig(
+            multipart_threshold=config.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            multipart_chunksize=config.S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+            max_concurrency=config.S3_MULTIPART_CONCURRENCY,
+            use_threads=True
+        )
+    return _transfer_config
+
+
+class IteratorReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class TeeReader(io.RawIOBase):
+    """File object that passes reads through and reports every chunk read.
+
+    Used to write a local backup or feed a hash while the same bytes stream
+    to S3, without holding the whole file in memory.
+    """
+
+    def __init__(self, source: BinaryIO, *sinks: Callable[[bytes], None]):
+        self._source = source
+        self._sinks = sinks
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._source.read(size)
+        if data:
+            self.bytes_read += len(data)
+            for sink in self._sinks:
+                sink(data)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def as_file_object(source: UploadSource) -> BinaryIO:
+    """Wrap bytes, a file-like object or an iterator of chunks as a readable file object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, 'read'):
+        return source
+    return io.BufferedReader(IteratorReader(source), buffer_size=1024 * 1024)
+
+
+def hash_upload_source(source: UploadSource, spool_max_bytes: int,
+                       chunk_size: int = 1024 * 1024) -> Tuple[str, UploadSource]:
+    """Compute the SHA-256 of an upload body without holding it all in memory.
+
+    Streams can only be read once, so they are copied into a spooled temporary
+    file (in memory up to spool_max_bytes, on disk beyond) while hashing.
+
+    Returns:
+        (hex digest, body to upload): bytes are returned unchanged; streams
+        come back as a rewound spooled file the caller must close
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest(), source
+
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    reader = as_file_object(source)
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), spool
+
+
+def object_exists(client, bucket: str, key: str) -> bool:
+    """Return True if the object exists (HEAD request)."""
+    from botocore.exceptions import ClientError
+
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+class UploadIndex(SQLiteCache):
+    """Local SQLite map of content-addressed object key to its URL and size.
+
+    Remembers what this host has stored so deduplicated uploads can report
+    the size they saved. S3 stays authoritative: callers confirm the object
+    still exists before reusing an entry.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS objects ('
+        'key TEXT PRIMARY KEY, url TEXT NOT NULL, size INTEGER, created_at REAL NOT NULL)'
+    )
+    SAVED_STAT = 'bytes_saved'
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return {'url', 'size'} for a known object key, or None."""
+        row = self._connection().execute(
+            'SELECT url, size FROM objects WHERE key = ?', (key,)
+        ).fetchone()
+        return {'url': row[0], 'size': row[1]} if row else None
+
+    def put(self, key: str, url: str, size: Optional[int] = None):
+        """Record an uploaded object."""
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO objects (key, url, size, created_at) VALUES (?, ?, ?, ?)',
+                (key, url, size, time.time())
+            )
+
+    def remove(self, key: str):
+        """Forget an object that no longer exists in the bucket."""
+        with self._connection() as conn:
+            conn.execute('DELETE FROM objects WHERE key = ?', (key,))
+
+    def record(self, deduplicated: bool, size: int = 0):
+        """Count an upload that was (or wasn't) satisfied by existing content."""
+        self._count(deduplicated, size)
+
+    def stats(self) -> Dict:
+        """Return dedup counters for metrics reporting."""
+        counts = super().stats()
+        return {
+            'deduplicated': counts['hits'],
+            'uploaded': counts['misses'],
+            'dedup_rate': counts['hit_rate'],
+            'bytes_saved': counts['bytes_saved']
+        }
+
+
+def get_upload_index(config) -> UploadIndex:
+    """Return the process-wide content hash index."""
+    global _upload_index
+    if _upload_index is None:
+        with _client_lock:
+            if _upload_index is None:
+                _upload_index = UploadIndex(config.S3_CONTENT_INDEX_PATH)
+    return _upload_index
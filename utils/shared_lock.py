@@ -0,0 +1,141 @@
+"""Locks and semaphores shared by every worker process (and, with Redis, every host)."""
+
+import fcntl
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_semaphores: Dict[str, 'SharedSemaphore'] = {}
+_semaphores_lock = threading.Lock()
+
+
+class SharedSemaphore:
+    """Counting semaphore whose slots are held across processes.
+
+    Backends mirror the Airtable token bucket's:
+    - 'file': slot i is an flock on ``<lock_dir>/<name>.<i>.lock``. Every
+      process on the host sees it, and the kernel frees a slot when its
+      holder dies.
+    - 'redis': slot i is a Redis lock key with a TTL, shared by every host.
+      If Redis is unreachable the semaphore degrades to a per-process one.
+    - anything else: a per-process threading.BoundedSemaphore.
+    """
+
+    def __init__(self, name: str, slots: int, backend: str = 'file', lock_dir: Optional[str] = None,
+                 redis_url: Optional[str] = None, ttl: float = 600.0, poll_interval: float = 0.05):
+        """
+        Initialize the semaphore.
+
+        Args:
+            name: Semaphore name, unique per protected resource
+            slots: Number of concurrent holders
+            backend: 'file', 'redis' or 'memory'
+            lock_dir: Directory of the lock files (file backend)
+            redis_url: Redis URL (redis backend)
+            ttl: Seconds after which a Redis slot is freed if its holder never released it
+            poll_interval: Seconds between attempts while every slot is taken
+        """
+        self.name = name
+        self.slots = max(int(slots), 1)
+        self.backend = backend
+        self.lock_dir = lock_dir
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._local = threading.BoundedSemaphore(self.slots)
+        self._client = None
+        self._redis_errors = ()
+        if backend == 'redis':
+            import redis
+            self._redis_errors = (redis.RedisError,)
+            self._client = redis.Redis.from_url(redis_url, socket_timeout=1.0)
+
+    def _try_file_slot(self, index: int):
+        fd = os.open(os.path.join(self.lock_dir, f"{self.name}.{index}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+    def _try_redis_slot(self, index: int):
+        lock = self._client.lock(f"{self.name}:{index}", timeout=self.ttl, blocking=False)
+        return lock if lock.acquire() else None
+
+    def _try_acquire(self):
+        """Take any free slot; returns a release callable, or None if every slot is taken."""
+        offset = random.randrange(self.slots)
+        for step in range(self.slots):
+            index = (offset + step) % self.slots
+            if self.backend == 'file':
+                fd = self._try_file_slot(index)
+                if fd is not None:
+                    return lambda: os.close(fd)
+            else:
+                lock = self._try_redis_slot(index)
+                if lock is not None:
+                    return lock.release
+        return None
+
+    def _acquire_local(self, timeout: Optional[float]):
+        if not self._local.acquire(timeout=timeout if timeout is not None else -1):
+            raise TimeoutError(f"No free {self.name} slot after {timeout}s")
+        return self._local.release
+
+    @contextmanager
+    def hold(self, timeout: Optional[float] = None):
+        """Hold one slot for the duration of the block.
+
+        Raises:
+            TimeoutError: If no slot became free within timeout seconds
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if self.backend not in ('file', 'redis'):
+                release = self._acquire_local(timeout)
+            else:
+                try:
+                    release = self._try_acquire()
+                except self._redis_errors as e:
+                    logger.warning(f"Redis unavailable for {self.name}, using a per-process semaphore: {e}")
+                    release = self._acquire_local(timeout)
+            if release:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No free {self.name} slot after {timeout}s")
+            time.sleep(self.poll_interval)
+
+        try:
+            yield
+        finally:
+            try:
+                release()
+            except Exception as e:
+                logger.warning(f"Failed to release {self.name} slot: {e}")
+
+
+def get_shared_semaphore(config, name: str, slots: int) -> SharedSemaphore:
+    """Return the process-wide handle on a named semaphore, creating it on first use."""
+    semaphore = _semaphores.get(name)
+    if semaphore is None or semaphore.slots != max(int(slots), 1):
+        with _semaphores_lock:
+            semaphore = _semaphores.get(name)
+            if semaphore is None or semaphore.slots != max(int(slots), 1):
+                semaphore = SharedSemaphore(name, slots, backend=config.SHARED_LOCK_BACKEND,
+                                            lock_dir=config.SHARED_LOCK_DIR,
+                                            redis_url=config.SHARED_LOCK_REDIS_URL)
+                _semaphores[name] = semaphore
+    return semaphore
+
+
+@contextmanager
+def shared_lock(config, name: str, timeout: Optional[float] = None):
+    """Hold a lock named `name` that every worker process sees."""
+    with get_shared_semaphore(config, name, 1).hold(timeout):
+        yield
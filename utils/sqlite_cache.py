@@ -0,0 +1,75 @@
+"""Base class for the local SQLite stores shared by the worker processes of a host."""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+
+class SQLiteCache:
+    """Local SQLite file shared by every worker process on the host.
+
+    Each thread opens its own connection on first use, and connections are
+    never shared across a fork (e.g. gunicorn preload). The database runs in
+    WAL mode so readers don't block the writer.
+
+    Subclasses set SCHEMA (run once when the store is opened) and count
+    lookups with _count. If SAVED_STAT is set, stats() also reports the
+    savings added up by hits (e.g. tokens or bytes) under that name.
+    """
+
+    SCHEMA = ''
+    SAVED_STAT: Optional[str] = None
+    # Optional PRAGMA synchronous level, e.g. 'NORMAL'
+    SYNCHRONOUS: Optional[str] = None
+
+    def __init__(self, path: str):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            if self.SYNCHRONOUS:
+                conn.execute(f'PRAGMA synchronous={self.SYNCHRONOUS}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, hit: bool, saved: int = 0):
+        """Count a lookup, adding saved to the savings on a hit."""
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+                self.saved += saved
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup counters for metrics reporting."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+            if self.SAVED_STAT:
+                stats[self.SAVED_STAT] = self.saved
+            return stats